@@ -1,11 +1,14 @@
 """Configuration management for 2TTS"""
 import json
 import os
+import threading
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 from dataclasses import dataclass, field
 
 from core.models import APIKey, Proxy, Voice, VoiceSettings
+from services.key_scheduler import KeyScheduler, POLICY_SMALLEST_CREDITS
+from services.proxy_health import get_proxy_health
 
 
 class Config:
@@ -20,9 +23,11 @@ class Config:
         
         self._ensure_config_dir()
         self._api_keys: List[APIKey] = []
+        self._key_scheduler: Optional[KeyScheduler] = None  # Built on first use, dropped when the key list changes
         self._proxies: List[Proxy] = []
         self._voice_library: List[Voice] = []
         self._settings: Dict[str, Any] = {}
+        self._write_lock = threading.RLock()  # IPC handlers save from several threads
         
         self.load()
     
@@ -51,8 +56,9 @@ class Config:
             self._settings = self._default_settings()
     
     def _save_settings(self):
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            json.dump(self._settings, f, indent=2)
+        with self._write_lock:
+            with open(self.config_file, 'w', encoding='utf-8') as f:
+                json.dump(self._settings, f, indent=2)
     
     def _default_settings(self) -> Dict[str, Any]:
         return {
@@ -66,6 +72,21 @@ class Config:
             "max_chars": 5000,
             "silence_gap": 0.0,
             "low_credit_threshold": 1000,
+            "tts_cache_enabled": True,
+            "tts_cache_max_mb": 2048,
+            "credit_reconcile_interval": 120,  # seconds
+            "credit_reconcile_lines": 500,
+            "hedge_requests": False,
+            "hedge_percentile": 95,  # Hedge requests slower than this latency percentile
+            "hedge_max_extra": 0.05,  # At most this fraction of extra requests
+            "warm_connections": True,  # Pre-open API connections when a run starts
+            "tts_streaming": False,  # Use the /stream endpoint for TTS downloads
+            "assemble_output": True,  # Build the joined audio + SRT while lines render
+            "key_policy": "round_robin",  # Key rotation in runs: round_robin, smallest_credits or least_loaded
+            "plan_keys": True,  # Assign lines to keys by remaining credits before a run starts
+            "key_concurrency": 5,  # Requests one key can run at once (the ElevenLabs plan's limit)
+            "circuit_breakers": True,  # Skip keys/proxies that keep failing until a probe request succeeds
+            "proxy_health_interval": 60,  # Seconds between background proxy probes, 0 to disable
             "window_geometry": None,
             "recent_projects": [],
             "favorite_voices": [],
@@ -84,14 +105,16 @@ class Config:
     
     def _load_api_keys(self):
         self._api_keys = []
+        self._key_scheduler = None
         if self.api_keys_file.exists():
             with open(self.api_keys_file, 'r', encoding='utf-8') as f:
                 data = json.load(f)
                 self._api_keys = [APIKey.from_dict(k) for k in data]
     
     def _save_api_keys(self):
-        with open(self.api_keys_file, 'w', encoding='utf-8') as f:
-            json.dump([k.to_dict() for k in self._api_keys], f, indent=2)
+        with self._write_lock:
+            with open(self.api_keys_file, 'w', encoding='utf-8') as f:
+                json.dump([k.to_dict() for k in self._api_keys], f, indent=2)
     
     def _load_proxies(self):
         self._proxies = []
@@ -101,8 +124,9 @@ class Config:
                 self._proxies = [Proxy.from_dict(p) for p in data]
     
     def _save_proxies(self):
-        with open(self.proxies_file, 'w', encoding='utf-8') as f:
-            json.dump([p.to_dict() for p in self._proxies], f, indent=2)
+        with self._write_lock:
+            with open(self.proxies_file, 'w', encoding='utf-8') as f:
+                json.dump([p.to_dict() for p in self._proxies], f, indent=2)
     
     def _load_voice_library(self):
         self._voice_library = []
@@ -112,8 +136,9 @@ class Config:
                 self._voice_library = [Voice.from_dict(v) for v in data]
     
     def _save_voice_library(self):
-        with open(self.voice_library_file, 'w', encoding='utf-8') as f:
-            json.dump([v.to_dict() for v in self._voice_library], f, indent=2)
+        with self._write_lock:
+            with open(self.voice_library_file, 'w', encoding='utf-8') as f:
+                json.dump([v.to_dict() for v in self._voice_library], f, indent=2)
     
     # API Keys management
     @property
@@ -122,10 +147,14 @@ class Config:
     
     def add_api_key(self, key: APIKey):
         self._api_keys.append(key)
+        if self._key_scheduler:
+            self._key_scheduler.add(key)
         self._save_api_keys()
     
     def remove_api_key(self, key_id: str):
         self._api_keys = [k for k in self._api_keys if k.id != key_id]
+        if self._key_scheduler:
+            self._key_scheduler.remove(key_id)
         self._save_api_keys()
     
     def update_api_key(self, key: APIKey):
@@ -133,16 +162,41 @@ class Config:
             if k.id == key.id:
                 self._api_keys[i] = key
                 break
+        if self._key_scheduler:
+            self._key_scheduler.update(key)
         self._save_api_keys()
     
+    def update_api_keys(self, keys: List[APIKey]):
+        """Update several keys with a single write"""
+        by_id = {k.id: k for k in keys}
+        for i, k in enumerate(self._api_keys):
+            if k.id in by_id:
+                self._api_keys[i] = by_id[k.id]
+        if self._key_scheduler:
+            for key in keys:
+                self._key_scheduler.update(key)
+        self._save_api_keys()
+    
+    def _scheduler(self) -> KeyScheduler:
+        if self._key_scheduler is None:
+            # Keys that run dry are parked, not dropped: a refresh may bring them back
+            self._key_scheduler = KeyScheduler(
+                self._api_keys, policy=POLICY_SMALLEST_CREDITS, remove_low_credit=False
+            )
+        return self._key_scheduler
+    
     def get_available_api_key(self) -> Optional[APIKey]:
         """Get the next available API key for use (prioritizes smallest credits first)"""
-        available_keys = [k for k in self._api_keys if k.is_available]
-        if not available_keys:
-            return None
-        # Sort by remaining credits ascending (use smallest credits first)
-        available_keys.sort(key=lambda k: k.remaining_credits)
-        return available_keys[0]
+        return self._scheduler().peek()
+    
+    def reserve_api_key(self, characters: int) -> Optional[APIKey]:
+        """Like get_available_api_key, but only a key with `characters` credits not already
+        reserved by other requests, and reserve them. Debit the real usage, then call
+        release_api_key()."""
+        return self._scheduler().reserve(characters)
+    
+    def release_api_key(self, key: APIKey, characters: int):
+        self._scheduler().release(key, characters)
     
     def get_total_credits(self) -> int:
         """Get total remaining credits across all keys"""
@@ -159,6 +213,7 @@ class Config:
     
     def remove_proxy(self, proxy_id: str):
         self._proxies = [p for p in self._proxies if p.id != proxy_id]
+        get_proxy_health().forget(proxy_id)
         self._save_proxies()
     
     def update_proxy(self, proxy: Proxy):
@@ -169,20 +224,12 @@ class Config:
         self._save_proxies()
     
     def get_proxy_for_key(self, key: APIKey) -> Optional[Proxy]:
-        """Get the proxy assigned to an API key"""
-        if not key.assigned_proxy_id:
-            return None
-        for proxy in self._proxies:
-            if proxy.id == key.assigned_proxy_id and proxy.enabled and proxy.is_healthy:
-                return proxy
-        return None
+        """Get the proxy assigned to an API key, or the fastest healthy one if it is failing"""
+        return get_proxy_health().route(key.assigned_proxy_id, self._proxies)
     
     def get_available_proxy(self) -> Optional[Proxy]:
-        """Get an available healthy proxy"""
-        for proxy in self._proxies:
-            if proxy.enabled and proxy.is_healthy:
-                return proxy
-        return None
+        """Get the fastest healthy proxy"""
+        return get_proxy_health().fastest(self._proxies)
     
     # Voice Library management
     @property
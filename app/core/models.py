@@ -6,6 +6,8 @@ from datetime import datetime
 import json
 import uuid
 
+from core.project_file import ProjectFile
+
 
 class LineStatus(Enum):
     PENDING = "Pending"
@@ -36,6 +38,9 @@ class TTSModel(Enum):
     FLASH_V2 = "eleven_flash_v2"  # English only, 30k chars, ~75ms
 
 
+DEFAULT_OUTPUT_FORMAT = "mp3_44100_128"
+
+
 @dataclass
 class VoiceSettings:
     stability: float = 0.5
@@ -44,6 +49,7 @@ class VoiceSettings:
     use_speaker_boost: bool = True  # Enhances similarity, increases latency
     speed: float = 1.0
     model: TTSModel = TTSModel.V3
+    output_format: Optional[str] = None  # e.g. "pcm_44100", "opus_48000_64"; None = project setting
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -52,7 +58,8 @@ class VoiceSettings:
             "style": self.style,
             "use_speaker_boost": self.use_speaker_boost,
             "speed": self.speed,
-            "model": self.model.value
+            "model": self.model.value,
+            "output_format": self.output_format
         }
     
     @classmethod
@@ -63,7 +70,8 @@ class VoiceSettings:
             style=data.get("style", 0.0),
             use_speaker_boost=data.get("use_speaker_boost", True),
             speed=data.get("speed", 1.0),
-            model=TTSModel(data.get("model", TTSModel.V3.value))
+            model=TTSModel(data.get("model", TTSModel.V3.value)),
+            output_format=data.get("output_format")
         )
 
 
@@ -276,12 +284,15 @@ class ProjectSettings:
     default_voice_name: Optional[str] = None
     output_folder: str = ""
     thread_count: int = 5
+    engine: str = "threaded"  # "threaded" (one thread per request) or "async" (single event loop)
+    adaptive_concurrency: bool = True  # AIMD pacing up to thread_count instead of request_delay
     max_retries: int = 3
     request_delay: float = 0.5  # seconds between requests to avoid rate limiting
     loop_enabled: bool = False
     loop_count: int = 0  # 0 = infinite
     loop_delay: int = 5  # seconds
     silence_gap: float = 0.0  # seconds between segments
+    output_format: str = DEFAULT_OUTPUT_FORMAT  # ElevenLabs output_format for every line
     timing_offset: float = 0.0  # global timing offset
     auto_split_enabled: bool = True
     split_delimiter: str = ".,?!;"
@@ -301,11 +312,14 @@ class ProjectSettings:
             "default_voice_name": self.default_voice_name,
             "output_folder": self.output_folder,
             "thread_count": self.thread_count,
+            "engine": self.engine,
+            "adaptive_concurrency": self.adaptive_concurrency,
             "max_retries": self.max_retries,
             "loop_enabled": self.loop_enabled,
             "loop_count": self.loop_count,
             "loop_delay": self.loop_delay,
             "silence_gap": self.silence_gap,
+            "output_format": self.output_format,
             "timing_offset": self.timing_offset,
             "auto_split_enabled": self.auto_split_enabled,
             "split_delimiter": self.split_delimiter,
@@ -357,11 +371,13 @@ class Project:
         self.modified_at = datetime.now()
         with open(path, 'w', encoding='utf-8') as f:
             json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        # The snapshot holds everything now; changes logged by the desktop app would replay over it
+        ProjectFile(path).discard_changes()
     
     @classmethod
     def load(cls, path: str) -> "Project":
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        """Read a project, including changes the desktop app saved to its change log"""
+        data, _ = ProjectFile(path).load()
         project = cls.from_dict(data)
         project.file_path = path
         return project
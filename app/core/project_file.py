@@ -0,0 +1,180 @@
+"""Project files: a JSON snapshot plus an append-only log of changes"""
+import json
+import os
+import uuid
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+
+
+class Codec(Protocol):
+    def dumps(self, obj: Any) -> bytes: ...
+    
+    def loads(self, data: bytes) -> Any: ...
+
+
+class JsonCodec:
+    """Compact stdlib json, one document per line"""
+    
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class ChangeError(ValueError):
+    """A patch that does not apply to the project (unknown line id, bad index, ...)"""
+
+
+def apply_change(meta: dict, order: List[str], lines: Dict[str, dict], change: dict):
+    """Apply one change record in place. Validates before mutating, so a
+    rejected change leaves the project untouched.
+    
+    Records: {"op": "update", "lines": [{"id", <fields>}]},
+    {"op": "insert", "index", "lines"}, {"op": "delete", "ids"},
+    {"op": "move", "ids", "index"} and {"op": "meta", "fields"}.
+    """
+    op = change.get("op")
+    if op == "update":
+        updates = change.get("lines") or []
+        missing = [u.get("id") for u in updates if u.get("id") not in lines]
+        if missing:
+            raise ChangeError(f"Unknown line ids: {missing[:5]}")
+        for update in updates:
+            lines[update["id"]].update((k, v) for k, v in update.items() if k != "index")
+    elif op == "insert":
+        new_lines = change.get("lines") or []
+        ids = [line.get("id") for line in new_lines]
+        if any(not isinstance(i, str) or not i for i in ids) or len(set(ids)) != len(ids):
+            raise ChangeError("Inserted lines need unique string ids")
+        if any(i in lines for i in ids):
+            raise ChangeError("Line ids already in the project")
+        index = change.get("index")
+        index = len(order) if index is None else index
+        if not 0 <= index <= len(order):
+            raise ChangeError(f"Index out of range: {index}")
+        for line in new_lines:
+            lines[line["id"]] = {k: v for k, v in line.items() if k != "index"}
+        order[index:index] = ids
+    elif op == "delete":
+        ids = set(change.get("ids") or [])
+        if not ids <= lines.keys():
+            raise ChangeError(f"Unknown line ids: {list(ids - lines.keys())[:5]}")
+        order[:] = [i for i in order if i not in ids]
+        for line_id in ids:
+            del lines[line_id]
+    elif op == "move":
+        ids = change.get("ids") or []
+        moving = set(ids)
+        if not moving <= lines.keys() or len(moving) != len(ids):
+            raise ChangeError("Moved line ids must be unique and in the project")
+        rest = [i for i in order if i not in moving]
+        index = change.get("index", 0)
+        if not 0 <= index <= len(rest):
+            raise ChangeError(f"Index out of range: {index}")
+        # ids land at index in the list without them, in the order given
+        order[:] = rest[:index] + list(ids) + rest[index:]
+    elif op == "meta":
+        fields = change.get("fields") or {}
+        if "lines" in fields:
+            raise ChangeError("Lines are changed with the project.lines.* methods")
+        meta.update(fields)
+    else:
+        raise ChangeError(f"Unknown change: {op}")
+
+
+class ProjectFile:
+    """A project on disk: the .2tts snapshot plus an append-only change log.
+    
+    Saving appends the changes made since the last save to <path>.changes,
+    one JSON record per line, so a save costs what was edited rather than
+    the whole project. Once the log outgrows COMPACT_RATIO of the snapshot
+    it is folded into a new snapshot (written to a temp file, then renamed).
+    The snapshot's "revision" is the version it holds; loading replays only
+    newer log records, so a crash between the two steps loses nothing.
+    """
+    
+    CHANGES_SUFFIX = ".changes"
+    COMPACT_RATIO = 0.5
+    MIN_COMPACT_BYTES = 1024 * 1024
+    
+    def __init__(self, path: str, codec: Optional[Codec] = None):
+        self.path = path
+        self.changes_path = path + self.CHANGES_SUFFIX
+        self._codec = codec or JsonCodec()
+    
+    def load(self) -> Tuple[dict, int]:
+        """The project as of its last save, and its version"""
+        with open(self.path, "rb") as f:
+            data = self._codec.loads(f.read())
+        version = data.pop("revision", 0)
+        if not os.path.exists(self.changes_path):
+            return data, version
+        
+        meta = {k: v for k, v in data.items() if k != "lines"}
+        lines = {}
+        order = []
+        for line in data.get("lines") or []:
+            line_id = line.get("id") or str(uuid.uuid4())
+            lines[line_id] = dict(line, id=line_id)
+            order.append(line_id)
+        torn_at = None
+        with open(self.changes_path, "rb") as f:
+            while True:
+                position = f.tell()
+                raw = f.readline()
+                if not raw:
+                    break
+                try:
+                    change = self._codec.loads(raw)
+                except ValueError:
+                    torn_at = position  # Final record of an interrupted save
+                    break
+                if change.get("version", 0) <= version:
+                    continue
+                apply_change(meta, order, lines, change)
+                version = change["version"]
+        if torn_at is not None:
+            # Cut it off, or the next save would append to the broken record
+            with open(self.changes_path, "r+b") as f:
+                f.truncate(torn_at)
+        meta["lines"] = [dict(lines[line_id], index=i) for i, line_id in enumerate(order)]
+        return meta, version
+    
+    def should_compact(self) -> bool:
+        try:
+            changes = os.path.getsize(self.changes_path)
+        except OSError:
+            return False
+        try:
+            snapshot = os.path.getsize(self.path)
+        except OSError:
+            return True
+        return changes > max(self.MIN_COMPACT_BYTES, snapshot * self.COMPACT_RATIO)
+    
+    def append(self, changes: List[dict]):
+        if not changes:
+            return
+        with open(self.changes_path, "ab") as f:
+            f.write(b"".join(self._codec.dumps(c) + b"\n" for c in changes))
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def write_snapshot(self, data: dict, version: int):
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        tmp_path = f"{self.path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(self._codec.dumps(dict(data, revision=version)))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.discard_changes()
+    
+    def discard_changes(self):
+        """Drop the change log, after the snapshot was rewritten by other means"""
+        if os.path.exists(self.changes_path):
+            os.remove(self.changes_path)
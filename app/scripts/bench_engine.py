@@ -0,0 +1,229 @@
+"""
+Throughput benchmark: threaded ProcessingEngine vs AsyncProcessingEngine.
+
+Runs both engines against a local mock ElevenLabs server with a fixed
+per-request latency and reports lines/second at each concurrency level,
+with adaptive (AIMD) pacing on and off. --max-inflight makes the server
+answer 429 above that many concurrent requests, like a real account limit.
+--stall-rate/--stall make a fraction of requests hang, and --hedge adds
+runs with hedged requests to compare how long the stragglers hold a batch.
+--mixed-lengths sends lines of very different lengths and --per-char makes
+the server's latency grow with the text, like real rendering.
+
+Usage:
+    python scripts/bench_engine.py --lines 500 --latency 0.5 --concurrency 10 50 200
+    python scripts/bench_engine.py --lines 500 --concurrency 50 --max-inflight 20
+    python scripts/bench_engine.py --lines 500 --concurrency 50 --stall-rate 0.02 --stall 20 --hedge
+    python scripts/bench_engine.py --lines 500 --concurrency 50 --mixed-lengths --per-char 0.002
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aiohttp import web
+
+from core.models import APIKey, TextLine, LineStatus
+from services.processing import ProcessingEngine
+from services.async_processing import AsyncProcessingEngine
+from services.logger import get_logger
+
+
+# Ten silent MPEG-1 Layer III frames (128 kbps, 44.1 kHz), so durations and joins are real
+FAKE_AUDIO = (b"\xff\xfb\x90\x64" + b"\x00" * 413) * 10
+
+
+class MockElevenLabsServer:
+    """Minimal /v1 API on localhost with a configurable response latency"""
+
+    def __init__(
+        self,
+        latency: float,
+        max_inflight: int = 0,
+        stall_rate: float = 0.0,
+        stall: float = 0.0,
+        per_char: float = 0.0
+    ):
+        self._latency = latency
+        self._per_char = per_char
+        self._max_inflight = max_inflight
+        self._stall_rate = stall_rate
+        self._stall = stall
+        self._inflight = 0
+        self._loop = asyncio.new_event_loop()
+        self._runner: web.AppRunner = None
+        self.port = 0
+        self.requests = 0
+        self.rate_limited = 0
+
+    async def _tts(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        body = await request.json()
+        if self._max_inflight and self._inflight >= self._max_inflight:
+            self.rate_limited += 1
+            return web.json_response({"detail": "too_many_concurrent_requests"}, status=429)
+        self._inflight += 1
+        try:
+            delay = self._latency + self._per_char * len(body.get("text", ""))
+            if self._stall_rate and random.random() < self._stall_rate:
+                delay += self._stall
+            await asyncio.sleep(delay)
+        finally:
+            self._inflight -= 1
+        return web.Response(body=FAKE_AUDIO, content_type="audio/mpeg")
+
+    async def _subscription(self, request: web.Request) -> web.Response:
+        return web.json_response({"character_count": 0, "character_limit": 10_000_000})
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_post("/v1/text-to-speech/{voice_id}", self._tts)
+        app.router.add_post("/v1/text-to-speech/{voice_id}/stream", self._tts)
+        app.router.add_get("/v1/user/subscription", self._subscription)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0, backlog=2048)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def start(self):
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start())
+            ready.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        ready.wait()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+
+def make_lines(count: int, mixed_lengths: bool = False) -> List[TextLine]:
+    if not mixed_lengths:
+        return [TextLine(index=i, text=f"Benchmark line number {i}.") for i in range(count)]
+    # 25 to ~800 characters, shuffled the same way every run
+    rng = random.Random(count)
+    return [
+        TextLine(index=i, text=f"Benchmark line number {i}. " + "word " * rng.choice((4, 20, 60, 160)))
+        for i in range(count)
+    ]
+
+
+def make_keys(count: int) -> List[APIKey]:
+    return [
+        APIKey(key=f"bench-key-{i}", name=f"bench{i}", is_valid=True, character_limit=10_000_000)
+        for i in range(count)
+    ]
+
+
+def run_engine(
+    engine_cls,
+    base_url: str,
+    lines: int,
+    concurrency: int,
+    keys: int,
+    adaptive: bool,
+    hedge: bool = False,
+    mixed_lengths: bool = False
+) -> Tuple[float, int, int]:
+    """Run one engine to completion. Returns (seconds, completed lines, hedges sent)."""
+    with tempfile.TemporaryDirectory(prefix="2tts_bench_") as output_folder:
+        engine = engine_cls(
+            api_keys=make_keys(keys),
+            proxies=[],
+            voices={},
+            output_folder=output_folder,
+            thread_count=concurrency,
+            max_retries=3,
+            default_voice_id="bench-voice",
+            request_delay=0.0,
+            journal_enabled=False,
+            adaptive_concurrency=adaptive,
+            dedupe_lines=False,
+            hedge_requests=hedge
+        )
+        engine._api.BASE_URL = base_url
+        if hasattr(engine._key_manager, "_api"):
+            engine._key_manager._api.BASE_URL = base_url
+
+        text_lines = make_lines(lines, mixed_lengths)
+        start = time.perf_counter()
+        engine.start(text_lines)
+        time.sleep(0.05)
+        while engine.is_running:
+            time.sleep(0.02)
+        elapsed = time.perf_counter() - start
+
+        done = sum(1 for l in text_lines if l.status == LineStatus.DONE)
+        return elapsed, done, engine.stats.hedged
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark threaded vs async TTS processing engines")
+    parser.add_argument("--lines", type=int, default=500, help="Lines per run")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mock server latency per request (s)")
+    parser.add_argument("--keys", type=int, default=10, help="Number of fake API keys")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200],
+                        help="Concurrency levels to test")
+    parser.add_argument("--max-inflight", type=int, default=0,
+                        help="Server answers 429 above this many concurrent requests (0 = unlimited)")
+    parser.add_argument("--stall-rate", type=float, default=0.0,
+                        help="Fraction of requests that stall for --stall extra seconds")
+    parser.add_argument("--stall", type=float, default=0.0, help="Extra latency of a stalled request (s)")
+    parser.add_argument("--hedge", action="store_true", help="Also run with hedged requests")
+    parser.add_argument("--mixed-lengths", action="store_true", help="Lines of very different lengths")
+    parser.add_argument("--per-char", type=float, default=0.0, help="Extra mock latency per character (s)")
+    args = parser.parse_args()
+
+    # Per-request API logging would dominate the measurement
+    get_logger().logger.setLevel(logging.WARNING)
+
+    server = MockElevenLabsServer(args.latency, args.max_inflight, args.stall_rate, args.stall, args.per_char)
+    server.start()
+    print(f"Mock server on {server.base_url} (latency {args.latency * 1000:.0f} ms)")
+    print(f"{'engine':<10} {'pacing':<7} {'hedge':<6} {'conc':>6} {'done':>6} {'seconds':>9} {'lines/s':>9} "
+          f"{'429s':>6} {'hedges':>7}")
+
+    try:
+        for concurrency in args.concurrency:
+            for name, engine_cls in (("threaded", ProcessingEngine), ("async", AsyncProcessingEngine)):
+                for adaptive in (False, True):
+                    for hedge in ((False, True) if args.hedge else (False,)):
+                        # The threaded engine caps itself at 50 threads
+                        effective = concurrency if name == "async" else min(concurrency, 50)
+                        limited_before = server.rate_limited
+                        elapsed, done, hedges = run_engine(
+                            engine_cls, server.base_url, args.lines, concurrency, args.keys, adaptive, hedge,
+                            args.mixed_lengths
+                        )
+                        rate = done / elapsed if elapsed > 0 else 0.0
+                        pacing = "aimd" if adaptive else "fixed"
+                        print(f"{name:<10} {pacing:<7} {'on' if hedge else 'off':<6} {effective:>6} {done:>6} "
+                              f"{elapsed:>9.2f} {rate:>9.1f} {server.rate_limited - limited_before:>6} {hedges:>7}")
+    finally:
+        server.stop()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Latency benchmark for the JSON-RPC stdio server while long calls are running.
+
+Starts the backend server in a child process with three synthetic methods:
+bench.batch (long-running, holds a worker for --batch-seconds), bench.query
+(worker pool, a few milliseconds) and bench.ping (inline). It measures
+round trips of the small calls on an idle server, then again while
+--batches batch calls are in flight. --serial registers every method
+inline, which reproduces the old read-handle-reply loop for comparison.
+
+Usage:
+    python scripts/bench_ipc_latency.py
+    python scripts/bench_ipc_latency.py --batches 8 --batch-seconds 5 --calls 200
+    python scripts/bench_ipc_latency.py --serial --calls 5
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BACKEND_DIR = Path(__file__).parent.parent.parent / "backend"
+
+
+def serve(serial: bool, batch_seconds: float):
+    """Child process: a server with only the benchmark methods"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    from ipc.server import JsonRpcServer, DISPATCH_INLINE, DISPATCH_POOL, DISPATCH_LONG
+    
+    server = JsonRpcServer()
+    
+    def batch(params: dict, srv: JsonRpcServer) -> dict:
+        time.sleep(params.get("seconds", batch_seconds))
+        return {"lines": 0}
+    
+    def query(params: dict, srv: JsonRpcServer) -> int:
+        time.sleep(0.002)
+        return 0
+    
+    def ping(params: dict, srv: JsonRpcServer) -> str:
+        return "pong"
+    
+    server.register("bench.batch", batch, DISPATCH_INLINE if serial else DISPATCH_LONG)
+    server.register("bench.query", query, DISPATCH_INLINE if serial else DISPATCH_POOL)
+    server.register("bench.ping", ping, DISPATCH_INLINE)
+    server.run()
+
+
+class Client:
+    """Sends requests down the child's stdin and matches responses by id"""
+    
+    def __init__(self, args: List[str]):
+        self._proc = subprocess.Popen(
+            [sys.executable, __file__, "--serve"] + args,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1
+        )
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._waiting: Dict[int, threading.Event] = {}
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+    
+    def _read(self):
+        for line in self._proc.stdout:
+            message = json.loads(line)
+            event = self._waiting.pop(message.get("id"), None)
+            if event is not None:
+                event.set()
+    
+    def send(self, method: str, params: dict = None) -> threading.Event:
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            done = self._waiting[request_id] = threading.Event()
+            self._proc.stdin.write(json.dumps({
+                "jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}
+            }) + "\n")
+            self._proc.stdin.flush()
+        return done
+    
+    def call(self, method: str, params: dict = None, timeout: float = 600.0) -> float:
+        """Round trip of one call in seconds"""
+        start = time.perf_counter()
+        if not self.send(method, params).wait(timeout):
+            raise TimeoutError(method)
+        return time.perf_counter() - start
+    
+    def close(self):
+        self._proc.stdin.close()
+        self._proc.wait(timeout=10)
+
+
+def measure(client: Client, method: str, calls: int) -> List[float]:
+    return [client.call(method) for _ in range(calls)]
+
+
+def report(label: str, samples: List[float]):
+    ms = sorted(s * 1000 for s in samples)
+    p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+    print(f"{label:<28} {len(ms):>6} {statistics.median(ms):>9.2f} {p99:>9.2f} {ms[-1]:>9.2f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure small-call latency on the IPC server during long calls")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--serial", action="store_true", help="Dispatch every method inline (old behaviour)")
+    parser.add_argument("--batches", type=int, default=4, help="Long calls in flight during the busy phase")
+    parser.add_argument("--batch-seconds", type=float, default=3.0, help="Duration of each long call")
+    parser.add_argument("--calls", type=int, default=100, help="Small calls per measurement")
+    args = parser.parse_args()
+    
+    if args.serve:
+        serve(args.serial, args.batch_seconds)
+        return 0
+    
+    client = Client(["--batch-seconds", str(args.batch_seconds)] + (["--serial"] if args.serial else []))
+    try:
+        client.call("bench.ping")  # Child is up
+        print(f"dispatch: {'serial' if args.serial else 'concurrent'}, "
+              f"{args.batches} x {args.batch_seconds:.1f}s batches")
+        print(f"{'call':<28} {'calls':>6} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        report("ping (idle)", measure(client, "bench.ping", args.calls))
+        report("query (idle)", measure(client, "bench.query", args.calls))
+        
+        batches = [client.send("bench.batch") for _ in range(args.batches)]
+        report("ping (batches running)", measure(client, "bench.ping", args.calls))
+        report("query (batches running)", measure(client, "bench.query", args.calls))
+        still_running = sum(1 for b in batches if not b.is_set())
+        for b in batches:
+            b.wait(args.batch_seconds * args.batches + 60)
+        print(f"{still_running}/{args.batches} batches were still running when the busy phase ended")
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
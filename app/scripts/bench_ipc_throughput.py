@@ -0,0 +1,177 @@
+"""
+Throughput benchmark for the JSON-RPC stdio link: codecs, framing and batching.
+
+First encodes and decodes project-like payloads of several sizes with each
+available codec in-process. Then starts the backend server in a child
+process with a bench.echo method (returns a payload of the requested size)
+and measures round trips for every codec and framing, plus --calls small
+calls sent one at a time vs as one JSON-RPC batch.
+
+Usage:
+    python scripts/bench_ipc_throughput.py
+    python scripts/bench_ipc_throughput.py --sizes 1000,100000,5000000 --repeat 20
+    python scripts/bench_ipc_throughput.py --codecs json --framings line
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+BACKEND_DIR = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from ipc.codec import get_codec, get_framing, orjson, CODEC_STDLIB, CODEC_ORJSON, FRAMING_LINE, FRAMING_LENGTH
+
+
+def make_payload(size: int) -> dict:
+    """A project-like document of roughly size bytes once encoded"""
+    line = {
+        "id": "3f2b8a1c-0000-0000-0000-000000000000",
+        "index": 0,
+        "text": "Xin chào, đây là một dòng phụ đề mẫu.",
+        "voice_id": "21m00Tcm4TlvDq8Ikwam",
+        "status": "pending",
+        "start_time": 1.25,
+        "end_time": 3.5,
+        "output_path": None
+    }
+    per_line = len(get_codec(CODEC_STDLIB).dumps(line)) + 1
+    return {"name": "bench", "lines": [dict(line, index=i) for i in range(max(1, size // per_line))]}
+
+
+def serve(codec: str, framing: str):
+    """Child process: a server with only the benchmark methods"""
+    from ipc.server import JsonRpcServer, DISPATCH_INLINE
+    
+    server = JsonRpcServer(codec=codec, framing=framing)
+    payloads = {}
+    
+    def echo(params: dict, srv: JsonRpcServer) -> dict:
+        size = params.get("size", 0)
+        if size not in payloads:
+            payloads[size] = make_payload(size)
+        return payloads[size]
+    
+    def ping(params: dict, srv: JsonRpcServer) -> str:
+        return "pong"
+    
+    server.register("bench.echo", echo, DISPATCH_INLINE)
+    server.register("bench.ping", ping)
+    server.run()
+
+
+class Client:
+    """Synchronous client: one request (or batch) in flight at a time"""
+    
+    def __init__(self, codec: str, framing: str):
+        self._codec = get_codec(codec)
+        self._framing = get_framing(framing)
+        self._proc = subprocess.Popen(
+            [sys.executable, __file__, "--serve", "--codec", codec, "--framing", framing],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+        self._next_id = 0
+        self.received = 0  # Bytes read from the child
+    
+    def _request(self, method: str, params: dict) -> dict:
+        self._next_id += 1
+        return {"jsonrpc": "2.0", "id": self._next_id, "method": method, "params": params}
+    
+    def _roundtrip(self, message) -> object:
+        self._framing.write(self._proc.stdin, [self._codec.dumps(message)])
+        self._proc.stdin.flush()
+        data = self._framing.read(self._proc.stdout)
+        self.received += len(data)
+        return self._codec.loads(data)
+    
+    def call(self, method: str, params: dict = None) -> object:
+        return self._roundtrip(self._request(method, params or {}))["result"]
+    
+    def batch(self, method: str, count: int) -> List[object]:
+        return self._roundtrip([self._request(method, {}) for _ in range(count)])
+    
+    def close(self):
+        self._proc.stdin.close()
+        self._proc.wait(timeout=10)
+
+
+def timed(fn: Callable[[], object], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_codecs(codecs: List[str], sizes: List[int], repeat: int):
+    print(f"{'codec':<8} {'size':>10} {'encode MB/s':>12} {'decode MB/s':>12}")
+    for size in sizes:
+        payload = make_payload(size)
+        for name in codecs:
+            codec = get_codec(name)
+            data = codec.dumps(payload)
+            mb = len(data) / 1e6
+            enc = statistics.median(timed(lambda: codec.dumps(payload), repeat))
+            dec = statistics.median(timed(lambda: codec.loads(data), repeat))
+            print(f"{name:<8} {len(data):>10} {mb / enc:>12.1f} {mb / dec:>12.1f}")
+
+
+def bench_link(codecs: List[str], framings: List[str], sizes: List[int], repeat: int, calls: int):
+    print(f"{'codec':<8} {'framing':<8} {'call':<22} {'p50 ms':>9} {'MB/s':>9}")
+    for name in codecs:
+        for framing in framings:
+            client = Client(name, framing)
+            try:
+                client.call("bench.ping")  # Child is up
+                for size in sizes:
+                    client.call("bench.echo", {"size": size})  # Payload built and cached
+                    client.received = 0
+                    samples = timed(lambda: client.call("bench.echo", {"size": size}), repeat)
+                    mb = client.received / repeat / 1e6
+                    p50 = statistics.median(samples)
+                    print(f"{name:<8} {framing:<8} {f'echo {size} B':<22} {p50 * 1000:>9.2f} {mb / p50:>9.1f}")
+                
+                single = sum(timed(lambda: client.call("bench.ping"), calls))
+                batch = timed(lambda: client.batch("bench.ping", calls), 1)[0]
+                print(f"{name:<8} {framing:<8} {f'{calls} pings, one by one':<22} {single * 1000:>9.2f}")
+                print(f"{name:<8} {framing:<8} {f'{calls} pings, batched':<22} {batch * 1000:>9.2f}")
+            finally:
+                client.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure IPC throughput by codec, framing and batching")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--codec", default=CODEC_STDLIB, help=argparse.SUPPRESS)
+    parser.add_argument("--framing", default=FRAMING_LINE, help=argparse.SUPPRESS)
+    parser.add_argument("--codecs", default=None, help="Comma-separated codecs (default: all available)")
+    parser.add_argument("--framings", default=f"{FRAMING_LINE},{FRAMING_LENGTH}", help="Comma-separated framings")
+    parser.add_argument("--sizes", default="200,20000,2000000,20000000", help="Comma-separated payload sizes in bytes")
+    parser.add_argument("--repeat", type=int, default=10, help="Samples per measurement")
+    parser.add_argument("--calls", type=int, default=200, help="Small calls in the batching comparison")
+    args = parser.parse_args()
+    
+    if args.serve:
+        serve(args.codec, args.framing)
+        return 0
+    
+    codecs = args.codecs.split(",") if args.codecs else [CODEC_STDLIB] + ([CODEC_ORJSON] if orjson else [])
+    framings = args.framings.split(",")
+    sizes = [int(s) for s in args.sizes.split(",")]
+    
+    print("in-process encode/decode")
+    bench_codecs(codecs, sizes, args.repeat)
+    print()
+    print("round trips through a child server")
+    bench_link(codecs, framings, sizes, args.repeat, args.calls)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
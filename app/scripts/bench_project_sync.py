@@ -0,0 +1,226 @@
+"""
+Round-trip and memory benchmark for project sync: whole-project save/load vs patches.
+
+Starts the real backend (backend/main.py) in a child process and, for a
+project of --lines lines, measures:
+
+- whole-project project.save / project.load (what the UI used to do)
+- project.create and its first save (a full snapshot)
+- --edits rounds of "change --touched lines, then project.save", sent as
+  one batch of patches plus a delta save
+- project.open of the saved file (snapshot plus change log)
+
+It reports time, bytes over the pipe and bytes written to disk per step.
+It also measures, in-process, the memory a ProjectDocument holds for the
+project, next to the plain dict the UI sends.
+
+Usage:
+    python scripts/bench_project_sync.py
+    python scripts/bench_project_sync.py --lines 100000 --edits 20 --touched 50
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List
+
+BACKEND_DIR = Path(__file__).parent.parent.parent / "backend"
+
+
+def make_project(count: int) -> dict:
+    return {
+        "version": "1.0",
+        "name": "bench",
+        "outputFolder": "C:/output",
+        "defaultVoiceId": "21m00Tcm4TlvDq8Ikwam",
+        "defaultVoiceName": "Rachel",
+        "voiceSettings": {"stability": 0.5, "similarity_boost": 0.75, "style": 0.0, "speed": 1.0},
+        "lines": [
+            {
+                "id": f"line-{i:08d}",
+                "index": i,
+                "text": f"Dòng phụ đề số {i}, đủ dài để giống một câu thật trong dự án.",
+                "voice_id": "21m00Tcm4TlvDq8Ikwam",
+                "voice_name": "Rachel",
+                "status": "pending"
+            }
+            for i in range(count)
+        ]
+    }
+
+
+class Client:
+    """Line-framed JSON-RPC client for the backend, counting bytes each way"""
+    
+    def __init__(self, home: str):
+        env = dict(os.environ, HOME=home, USERPROFILE=home, APPDATA=home, LOCALAPPDATA=home)
+        self._proc = subprocess.Popen(
+            [sys.executable, str(BACKEND_DIR / "main.py")],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env
+        )
+        self._next_id = 0
+        self.sent = 0
+        self.received = 0
+    
+    def _roundtrip(self, message) -> object:
+        data = json.dumps(message).encode("utf-8") + b"\n"
+        self._proc.stdin.write(data)
+        self._proc.stdin.flush()
+        self.sent += len(data)
+        while True:
+            line = self._proc.stdout.readline()
+            if not line:
+                raise RuntimeError("backend exited")
+            self.received += len(line)
+            reply = json.loads(line)
+            # Skip notifications (events arrive as objects with a method, or arrays of them)
+            if isinstance(reply, dict) and "method" in reply:
+                continue
+            if isinstance(reply, list) and reply and "method" in reply[0]:
+                continue
+            return reply
+    
+    def _request(self, method: str, params: dict) -> dict:
+        self._next_id += 1
+        return {"jsonrpc": "2.0", "id": self._next_id, "method": method, "params": params}
+    
+    def call(self, method: str, params: dict) -> object:
+        reply = self._roundtrip(self._request(method, params))
+        if "error" in reply:
+            raise RuntimeError(f"{method}: {reply['error']['message']}")
+        return reply["result"]
+    
+    def batch(self, calls: List[tuple]) -> List[object]:
+        replies = self._roundtrip([self._request(m, p) for m, p in calls])
+        errors = [r["error"]["message"] for r in replies if "error" in r]
+        if errors:
+            raise RuntimeError(errors[0])
+        return [r["result"] for r in sorted(replies, key=lambda r: r["id"])]
+    
+    def close(self):
+        self._proc.stdin.close()
+        self._proc.wait(timeout=30)
+
+
+def disk_bytes(path: str) -> int:
+    return sum(os.path.getsize(p) for p in (path, path + ".changes") if os.path.exists(p))
+
+
+def report(label: str, seconds: float, sent: int, received: int, written: int):
+    print(f"{label:<34} {seconds * 1000:>10.1f} {sent / 1e3:>10.1f} {received / 1e3:>10.1f} {written / 1e3:>10.1f}")
+
+
+def bench_roundtrip(project: dict, edits: int, touched: int, folder: str):
+    client = Client(folder)
+    legacy_path = os.path.join(folder, "legacy.2tts")
+    delta_path = os.path.join(folder, "delta.2tts")
+    count = len(project["lines"])
+    try:
+        client.call("system.handshake", {"ui_version": "0.0.0", "protocol_version": 1})
+        print(f"{'step':<34} {'ms':>10} {'KB sent':>10} {'KB recv':>10} {'KB disk':>10}")
+        
+        def step(label: str, fn, path: str):
+            sent, received = client.sent, client.received
+            before = disk_bytes(path)
+            start = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - start
+            written = disk_bytes(path) - before if path == delta_path else disk_bytes(path)
+            report(label, elapsed, client.sent - sent, client.received - received, max(0, written))
+            return result
+        
+        step("legacy project.save", lambda: client.call("project.save", {"file_path": legacy_path, "project": project}), legacy_path)
+        step("legacy project.load", lambda: client.call("project.load", {"file_path": legacy_path}), legacy_path)
+        
+        info = step("project.create (once per session)", lambda: client.call(
+            "project.create", {"project": project, "file_path": delta_path}), delta_path)
+        project_id = info["project_id"]
+        step("  first save (snapshot)", lambda: client.call("project.save", {"project_id": project_id}), delta_path)
+        
+        total = 0.0
+        sent, received = client.sent, client.received
+        before = disk_bytes(delta_path)
+        snapshots = 0
+        for round_no in range(edits):
+            lines = [
+                {"id": f"line-{(round_no * touched + i) % count:08d}", "text": f"edited {round_no}.{i}", "status": "done"}
+                for i in range(touched)
+            ]
+            start = time.perf_counter()
+            results = client.batch([
+                ("project.lines.update", {"project_id": project_id, "lines": lines}),
+                ("project.save", {"project_id": project_id})
+            ])
+            total += time.perf_counter() - start
+            snapshots += results[-1]["snapshot"]
+        written = max(0, disk_bytes(delta_path) - before)
+        report(f"  edit {touched} lines + save (avg)", total / max(1, edits),
+               (client.sent - sent) / max(1, edits), (client.received - received) / max(1, edits), written / max(1, edits))
+        if snapshots:
+            print(f"  ({snapshots} of {edits} saves compacted the change log into a new snapshot)")
+        
+        client.call("project.close", {"project_id": project_id})
+        opened = step("project.open (snapshot + log)", lambda: client.call("project.open", {"file_path": delta_path}), delta_path)
+        assert opened["line_count"] == count
+        client.call("project.close", {"project_id": opened["project_id"]})
+        step("project.open, no lines returned", lambda: client.call(
+            "project.open", {"file_path": delta_path, "include_project": False}), delta_path)
+    finally:
+        client.close()
+
+
+def bench_memory(project: dict):
+    sys.path.insert(0, str(BACKEND_DIR))
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from ipc.projects import ProjectDocument
+    
+    class NoEvents:
+        def send_event(self, method: str, params: dict):
+            pass
+    
+    encoded = json.dumps(project)
+    gc.collect()
+    tracemalloc.start()
+    plain = json.loads(encoded)
+    plain_bytes = tracemalloc.get_traced_memory()[0]
+    del plain
+    gc.collect()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    document = ProjectDocument(NoEvents(), json.loads(encoded))
+    current, peak = tracemalloc.get_traced_memory()
+    for i in range(ProjectDocument.MAX_CHANGES):
+        document.apply({"op": "update", "lines": [{"id": f"line-{i % len(project['lines']):08d}", "text": "x"}]})
+    with_log = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{'decoded project dict':<34} {plain_bytes / 1e6:>10.1f} MB")
+    print(f"{'ProjectDocument':<34} {(current - base) / 1e6:>10.1f} MB (peak while loading {(peak - base) / 1e6:.1f} MB)")
+    print(f"{'  + full change log':<34} {(with_log - base) / 1e6:>10.1f} MB")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare whole-project save/load with patch-based project sync")
+    parser.add_argument("--lines", type=int, default=100000, help="Lines in the project")
+    parser.add_argument("--edits", type=int, default=10, help="Edit-and-save rounds")
+    parser.add_argument("--touched", type=int, default=20, help="Lines changed per round")
+    args = parser.parse_args()
+    
+    project = make_project(args.lines)
+    print(f"project: {args.lines} lines, {len(json.dumps(project)) / 1e6:.1f} MB as JSON")
+    with tempfile.TemporaryDirectory() as folder:
+        bench_roundtrip(project, args.edits, args.touched, folder)
+    print()
+    bench_memory(project)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Dispatch overhead benchmark: bounded work queue vs one future per line.
+
+Builds a large batch of lines, replaces the per-line TTS call with a
+no-op, and measures the peak memory allocated while dispatching (the
+lines themselves are built before tracing starts) plus wall time. The
+legacy mode reproduces the old "submit every line to the executor up
+front" pattern for comparison.
+
+Usage:
+    python scripts/bench_queue_memory.py --lines 1000000 --concurrency 50
+    python scripts/bench_queue_memory.py --lines 1000000 --skip-legacy
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.models import TextLine, LineStatus
+from services.processing import ProcessingEngine
+from services.async_processing import AsyncProcessingEngine
+from services.logger import get_logger
+
+
+def make_lines(count: int) -> List[TextLine]:
+    return [TextLine(index=i, text="x") for i in range(count)]
+
+
+def _finish(line: TextLine):
+    line.status = LineStatus.DONE
+
+
+def run_legacy(lines: List[TextLine], concurrency: int) -> Tuple[float, int]:
+    """Old dispatch: a Future per pending line, all created before any finishes"""
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = [l for l in lines if l.status == LineStatus.PENDING]
+        futures = {executor.submit(_finish, line): line for line in pending}
+        for future in as_completed(futures):
+            future.result()
+    elapsed = time.perf_counter() - start
+    return elapsed, tracemalloc.get_traced_memory()[1]
+
+
+def run_engine(engine_cls, lines: List[TextLine], concurrency: int) -> Tuple[float, int]:
+    """Current dispatch: the engine's producer feeding a bounded queue"""
+    with tempfile.TemporaryDirectory(prefix="2tts_bench_") as output_folder:
+        engine = engine_cls(
+            api_keys=[],
+            proxies=[],
+            voices={},
+            output_folder=output_folder,
+            thread_count=concurrency,
+            default_voice_id="bench-voice",
+            journal_enabled=False
+        )
+        if engine_cls is AsyncProcessingEngine:
+            async def process_line(line, slot_id=0):
+                _finish(line)
+                return True
+            engine._process_line = process_line
+        else:
+            def process_line(line, thread_id=0):
+                _finish(line)
+                return True
+            engine._process_line = process_line
+        
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        engine.start(lines)
+        while engine.is_running:
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        return elapsed, tracemalloc.get_traced_memory()[1]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure dispatch memory for large line batches")
+    parser.add_argument("--lines", type=int, default=1_000_000, help="Lines per run")
+    parser.add_argument("--concurrency", type=int, default=50, help="Worker threads / coroutines")
+    parser.add_argument("--skip-legacy", action="store_true", help="Don't run the future-per-line baseline")
+    args = parser.parse_args()
+    
+    get_logger().logger.setLevel(logging.WARNING)
+    
+    runs = [("threaded", ProcessingEngine), ("async", AsyncProcessingEngine)]
+    if not args.skip_legacy:
+        runs.insert(0, ("legacy", None))
+    
+    print(f"{args.lines} lines, concurrency {args.concurrency}")
+    print(f"{'dispatch':<10} {'done':>9} {'seconds':>9} {'peak MB':>9}")
+    
+    for name, engine_cls in runs:
+        lines = make_lines(args.lines)
+        tracemalloc.start()
+        try:
+            if engine_cls is None:
+                elapsed, peak = run_legacy(lines, args.concurrency)
+            else:
+                elapsed, peak = run_engine(engine_cls, lines, args.concurrency)
+        finally:
+            tracemalloc.stop()
+        done = sum(1 for l in lines if l.status == LineStatus.DONE)
+        print(f"{name:<10} {done:>9} {elapsed:>9.2f} {peak / 1024 ** 2:>9.1f}")
+        del lines
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
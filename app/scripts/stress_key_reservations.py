@@ -0,0 +1,160 @@
+"""
+Contention test: credit reservations vs plain key picking.
+
+Hundreds of threads render lines against a handful of keys whose
+credits can't cover them all. A simulated API rejects any request that
+would take a key past its limit (a quota error, which costs a wasted
+round trip and a retry on another key). In "pick" mode threads take
+whatever key the scheduler offers, as before reservations existed; in
+"reserve" mode each line's characters are reserved on the key first.
+Reserve mode must never see a quota error or overspend a key; the
+script exits non-zero if it does.
+
+Usage:
+    python scripts/stress_key_reservations.py --threads 400 --keys 5 --credits 3000
+    python scripts/stress_key_reservations.py --threads 800 --lines 20000 --policy smallest_credits
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.models import APIKey
+from services.key_scheduler import KeyScheduler, KEY_POLICIES
+
+
+@dataclass
+class Outcome:
+    mode: str
+    rendered: int = 0
+    quota_errors: int = 0
+    no_key: int = 0
+    overspent_keys: int = 0
+    leaked_reservations: int = 0
+    seconds: float = 0.0
+
+
+class MockQuota:
+    """Server-side credit check: a request that doesn't fit is rejected"""
+    
+    def __init__(self, latency: float):
+        self._lock = threading.Lock()
+        self._latency = latency
+    
+    def request(self, key: APIKey, chars: int) -> bool:
+        time.sleep(random.uniform(0, self._latency))
+        with self._lock:
+            if key.character_count + chars > key.character_limit:
+                return False
+            key.character_count += chars  # Billed as the response is sent
+        return True
+
+
+def make_keys(count: int, credits: int) -> List[APIKey]:
+    return [
+        APIKey(id=f"key-{i}", key=f"sk_{i}", is_valid=True, character_limit=credits)
+        for i in range(count)
+    ]
+
+
+def run(mode: str, args: argparse.Namespace) -> Outcome:
+    random.seed(args.seed)
+    sizes = [random.randint(args.min_chars, args.max_chars) for _ in range(args.lines)]
+    keys = make_keys(args.keys, args.credits)
+    scheduler = KeyScheduler(keys, policy=args.policy)
+    quota = MockQuota(args.latency)
+    outcome = Outcome(mode)
+    lock = threading.Lock()
+    next_line = iter(range(args.lines))
+    
+    def worker():
+        while True:
+            with lock:
+                index = next(next_line, None)
+            if index is None:
+                return
+            chars = sizes[index]
+            tried = set()
+            while True:
+                if mode == "reserve":
+                    key = scheduler.reserve(chars)
+                else:
+                    key = None
+                    for _ in range(args.keys):
+                        candidate = scheduler.next_key()
+                        if candidate is None or candidate.id not in tried:
+                            key = candidate
+                            break
+                if key is None:
+                    with lock:
+                        outcome.no_key += 1
+                    break
+                ok = quota.request(key, chars)
+                if mode == "reserve":
+                    scheduler.release(key, chars)
+                if ok:
+                    with lock:
+                        outcome.rendered += 1
+                    break
+                tried.add(key.id)
+                with lock:
+                    outcome.quota_errors += 1
+    
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    outcome.seconds = time.perf_counter() - started
+    outcome.overspent_keys = sum(1 for k in keys if k.character_count > k.character_limit)
+    outcome.leaked_reservations = sum(scheduler.reserved(k) for k in keys)
+    return outcome
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Stress credit reservations with many threads and few credits")
+    parser.add_argument("--threads", type=int, default=400, help="Concurrent worker threads")
+    parser.add_argument("--lines", type=int, default=5000, help="Lines to render")
+    parser.add_argument("--keys", type=int, default=5, help="Keys in the pool")
+    parser.add_argument("--credits", type=int, default=3000, help="Credits per key")
+    parser.add_argument("--min-chars", type=int, default=20, help="Shortest line")
+    parser.add_argument("--max-chars", type=int, default=300, help="Longest line")
+    parser.add_argument("--latency", type=float, default=0.005, help="Max simulated request latency (s)")
+    parser.add_argument("--policy", choices=KEY_POLICIES, default="round_robin", help="Key scheduling policy")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for line sizes and latency")
+    args = parser.parse_args()
+    
+    print(
+        f"{args.threads} threads, {args.lines} lines, {args.keys} keys x {args.credits} credits, "
+        f"policy {args.policy}"
+    )
+    print(f"{'mode':<8} {'rendered':>9} {'quota err':>10} {'no key':>8} {'overspent':>10} {'leaked':>7} {'seconds':>8}")
+    
+    failed = False
+    for mode in ("pick", "reserve"):
+        o = run(mode, args)
+        print(
+            f"{o.mode:<8} {o.rendered:>9} {o.quota_errors:>10} {o.no_key:>8} "
+            f"{o.overspent_keys:>10} {o.leaked_reservations:>7} {o.seconds:>8.2f}"
+        )
+        if mode == "reserve" and (o.quota_errors or o.overspent_keys or o.leaked_reservations):
+            failed = True
+    
+    if failed:
+        print("FAIL: reservations let a key be overcommitted")
+        return 1
+    print("OK: no request was sent to a key without room for it")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
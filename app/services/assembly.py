@@ -0,0 +1,249 @@
+"""Ordered incremental assembly of the combined audio and SRT during a run"""
+import os
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Callable
+
+from core.models import TextLine, LineStatus
+from services.audio import SRTGenerator
+from services.audio_format import format_for_path, read_wav_info, wav_header, write_zeros
+from services.mp3_parser import audio_frames, silent_frame
+
+
+@dataclass
+class AssemblyResult:
+    """What the assembler wrote by the end of a run"""
+    audio_path: str
+    srt_path: str
+    lines: int = 0  # Lines appended
+    skipped: int = 0  # Lines left out (failed, missing or unreadable audio)
+    duration: float = 0.0  # Seconds of audio written, gaps included
+    complete: bool = False  # Every line was reached; nothing is still owed
+    silence_gap: float = 0.0
+    offset: float = 0.0
+
+
+class IncrementalAssembler:
+    """Builds the combined audio file and its subtitles while lines still render.
+    
+    Lines are appended strictly in order: whenever the next line in the
+    sequence is done, it and every finished line right behind it are
+    written out, so a line that completes early only waits for the ones
+    before it. MP3 frames and WAV samples are copied as they are; silence
+    gaps are silent MP3 frames or zero samples. Cue times come from the
+    audio actually written, so the SRT can't drift from the file.
+    
+    notify() only wakes the writer thread; all file I/O happens there.
+    """
+    
+    SUPPORTED_CODECS = ("mp3", "pcm")
+    
+    def __init__(
+        self,
+        lines: List[TextLine],
+        audio_path: str,
+        srt_path: str,
+        silence_gap: float = 0.0,
+        offset: float = 0.0,
+        on_log: Optional[Callable[[str], None]] = None
+    ):
+        self._lines = lines
+        self._audio_path = audio_path
+        self._srt_path = srt_path
+        self._codec = format_for_path(audio_path)
+        if self._codec not in self.SUPPORTED_CODECS:
+            raise ValueError(f"Incremental assembly supports MP3 and WAV output, not {os.path.basename(audio_path)}")
+        self._ext = os.path.splitext(audio_path)[1].lower()
+        self._gap = max(0.0, silence_gap)
+        self._offset = offset
+        self._on_log = on_log
+        
+        self._wake = threading.Event()
+        self._finishing = False
+        self._complete_run = False
+        self._thread: Optional[threading.Thread] = None
+        self._next = 0
+        self._failed = False
+        self._result = AssemblyResult(audio_path, srt_path, silence_gap=self._gap, offset=offset)
+        
+        self._audio = None
+        self._srt = None
+        self._cue = 0
+        self._samples = 0  # Audio written so far, in samples (frames for WAV)
+        self._sample_rate = 0
+        # MP3: reference header and its silent frame; WAV: (rate, channels, width) and data bytes
+        self._mp3_header: Optional[bytes] = None
+        self._mp3_compat = None
+        self._silence: bytes = b""
+        self._wav_params = None
+        self._data_size = 0
+    
+    @classmethod
+    def supports(cls, path: str) -> bool:
+        return format_for_path(path) in cls.SUPPORTED_CODECS
+    
+    def start(self):
+        os.makedirs(os.path.dirname(self._audio_path) or ".", exist_ok=True)
+        self._audio = open(self._audio_path, "wb")
+        self._srt = open(self._srt_path, "w", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, daemon=True, name="assembler")
+        self._thread.start()
+        self._wake.set()  # Lines finished before the run (or resumed) are picked up right away
+    
+    def notify(self):
+        """A line finished; append whatever is now contiguous"""
+        self._wake.set()
+    
+    def finish(self, complete_run: bool = True) -> AssemblyResult:
+        """Flush and close. With complete_run, lines that never finished are skipped
+        so the rest still makes it in; otherwise (a stopped run) assembly ends at
+        the first unfinished line."""
+        self._complete_run = complete_run
+        self._finishing = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self._result
+    
+    @property
+    def lines_written(self) -> int:
+        return self._result.lines
+    
+    def _log(self, message: str):
+        if self._on_log:
+            self._on_log(message)
+    
+    def _run(self):
+        try:
+            while True:
+                self._wake.wait()
+                self._wake.clear()
+                finishing = self._finishing
+                self._advance(skip_unfinished=finishing and self._complete_run)
+                if finishing:
+                    break
+        except Exception as e:
+            self._log(f"Incremental assembly stopped: {e}")
+            self._failed = True
+        finally:
+            self._close()
+    
+    def _advance(self, skip_unfinished: bool):
+        while self._next < len(self._lines) and not self._failed:
+            line = self._lines[self._next]
+            if line.status == LineStatus.DONE and line.output_path:
+                self._append(line)
+            elif skip_unfinished:
+                self._result.skipped += 1
+            else:
+                break
+            self._next += 1
+        self._audio.flush()
+        self._srt.flush()
+    
+    def _append(self, line: TextLine):
+        if os.path.splitext(line.output_path)[1].lower() != self._ext:
+            self._disable(f"line {line.index + 1} is not {self._ext[1:].upper()} audio")
+            return
+        try:
+            with open(line.output_path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            self._log(f"Assembly skipped line {line.index + 1}: {e}")
+            self._result.skipped += 1
+            return
+        
+        if self._codec == "mp3":
+            start = self._append_mp3(line, data)
+        else:
+            start = self._append_wav(line, data)
+        if start is None:
+            return
+        
+        self._cue += 1
+        begin = self._offset + start / self._sample_rate
+        end = self._offset + self._samples / self._sample_rate
+        self._srt.write(
+            f"{self._cue}\n{SRTGenerator.format_time(begin)} --> {SRTGenerator.format_time(end)}\n{line.text}\n\n"
+        )
+        self._result.lines += 1
+        self._result.duration = self._samples / self._sample_rate
+    
+    def _gap_needed(self) -> bool:
+        return self._gap > 0 and self._result.lines > 0
+    
+    def _append_mp3(self, line: TextLine, data: bytes) -> Optional[int]:
+        """Append a line's frames after any gap; returns the sample it starts at"""
+        header, spans = audio_frames(data)
+        if header is None or not spans:
+            self._log(f"Assembly skipped line {line.index + 1}: no MP3 frames")
+            self._result.skipped += 1
+            return None
+        if self._mp3_header is None:
+            first = spans[0][0]
+            self._mp3_header = data[first:first + 4]
+            self._mp3_compat = header
+            self._silence = silent_frame(self._mp3_header)
+            self._sample_rate = header.sample_rate
+        elif not header.compatible(self._mp3_compat):
+            self._disable(f"line {line.index + 1} has a different sample rate")
+            return None
+        
+        if self._gap_needed():
+            frames = round(self._gap * self._sample_rate / header.samples)
+            self._audio.write(self._silence * frames)
+            self._samples += frames * header.samples
+        
+        start = self._samples
+        for begin, end in spans:
+            self._audio.write(data[begin:end])
+        self._samples += len(spans) * header.samples
+        return start
+    
+    def _append_wav(self, line: TextLine, data: bytes) -> Optional[int]:
+        info = read_wav_info(line.output_path)
+        if info is None:
+            self._log(f"Assembly skipped line {line.index + 1}: not a PCM WAV file")
+            self._result.skipped += 1
+            return None
+        if self._wav_params is None:
+            self._wav_params = info.params
+            self._sample_rate = info.sample_rate
+            self._audio.write(wav_header(0, *info.params))
+        elif info.params != self._wav_params:
+            self._disable(f"line {line.index + 1} has a different sample format")
+            return None
+        
+        block = info.channels * info.sample_width
+        if self._gap_needed():
+            frames = round(self._gap * self._sample_rate)
+            self._data_size += write_zeros(self._audio, frames * block)
+            self._samples += frames
+        
+        start = self._samples
+        pcm = data[info.data_offset:info.data_offset + info.data_size]
+        pcm = pcm[:len(pcm) - len(pcm) % block]
+        self._audio.write(pcm)
+        self._data_size += len(pcm)
+        self._samples += len(pcm) // block
+        self._patch_wav_header()
+        return start
+    
+    def _patch_wav_header(self):
+        """Keep the WAV playable at every point, not only after the run"""
+        self._audio.seek(0)
+        self._audio.write(wav_header(self._data_size, *self._wav_params))
+        self._audio.seek(0, os.SEEK_END)
+    
+    def _disable(self, reason: str):
+        self._log(f"Incremental assembly stopped: {reason}; join the files after the run instead")
+        self._failed = True
+    
+    def _close(self):
+        self._result.complete = not self._failed and self._next >= len(self._lines)
+        for f in (self._audio, self._srt):
+            if f is not None:
+                try:
+                    f.close()
+                except OSError:
+                    pass
@@ -1,13 +1,20 @@
 """Async ElevenLabs API service using aiohttp"""
 import os
+import time
 import asyncio
 import aiohttp
-from typing import Optional, List, Dict, Any, Tuple
+import contextvars
+from typing import Optional, List, Dict, Any, Tuple, Callable
 from datetime import datetime, timedelta
 from pathlib import Path
 
 from core.models import APIKey, Proxy, Voice, VoiceSettings, TTSModel
 from services.logger import get_logger
+from services.tts_cache import TTSAudioCache
+from services.audio_format import AudioFormat, AudioDownload, audio_duration
+from services.transfer_metrics import TransferMetrics
+from services.key_scheduler import KeyScheduler, POLICY_ROUND_ROBIN
+from services.key_validation import BulkKeyValidator
 
 
 class AsyncResponseCache:
@@ -45,22 +52,72 @@ class AsyncElevenLabsAPI:
     
     BASE_URL = "https://api.elevenlabs.io/v1"
     
-    def __init__(self, cache_enabled: bool = True):
+    DOWNLOAD_CHUNK = 64 * 1024
+    STREAM_CHUNK = 4 * 1024  # Small reads so the first audio is handed over as soon as it lands
+    WRITE_BUFFER = 256 * 1024
+    
+    def __init__(
+        self,
+        cache_enabled: bool = True,
+        connection_limit: int = 100,
+        audio_cache: Optional[TTSAudioCache] = None,
+        stream: bool = False
+    ):
         self._cache_enabled = cache_enabled
+        self._audio_cache = audio_cache
         self._cache = AsyncResponseCache(max_size=100, ttl_seconds=300)
         self._logger = get_logger()
         self._session: Optional[aiohttp.ClientSession] = None
+        self._connection_limit = max(1, connection_limit)
+        self._stream = stream
+        self._transfer_metrics = TransferMetrics()
+        self._request_info: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("request_info", default={})
     
     async def _get_session(self) -> aiohttp.ClientSession:
         if self._session is None or self._session.closed:
             timeout = aiohttp.ClientTimeout(total=120, connect=30)
-            self._session = aiohttp.ClientSession(timeout=timeout)
+            connector = aiohttp.TCPConnector(limit=self._connection_limit, limit_per_host=0)
+            self._session = aiohttp.ClientSession(timeout=timeout, connector=connector)
         return self._session
     
+    @property
+    def transfer_metrics(self) -> TransferMetrics:
+        """TTFB / first-audio / transfer timings of this client's TTS downloads"""
+        return self._transfer_metrics
+    
+    def get_last_request_info(self) -> Dict[str, Any]:
+        """Details of the calling task's last text_to_speech request
+        
+        Same keys as ElevenLabsAPI.get_last_request_info: status, ttfb,
+        timeout and headers.
+        """
+        return self._request_info.get()
+    
     async def close(self):
         if self._session and not self._session.closed:
             await self._session.close()
     
+    async def warmup(self, proxies: List[Optional[Proxy]], connections: int):
+        """Open about `connections` keep-alive connections up front, split across proxies"""
+        routes = {self._get_proxy_url(p): p for p in proxies}
+        if connections <= 0 or not routes:
+            return
+        per_route = min(-(-connections // len(routes)), self._connection_limit)
+        session = await self._get_session()
+        
+        async def touch(proxy_url: Optional[str]):
+            try:
+                async with session.head(
+                    f"{self.BASE_URL}/models",
+                    proxy=proxy_url,
+                    timeout=aiohttp.ClientTimeout(total=10)
+                ):
+                    pass
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+        
+        await asyncio.gather(*(touch(url) for url in routes for _ in range(per_route)))
+    
     def _get_headers(self, api_key: str) -> Dict[str, str]:
         return {
             "xi-api-key": api_key,
@@ -173,13 +230,37 @@ class AsyncElevenLabsAPI:
         api_key: APIKey,
         output_path: str,
         settings: Optional[VoiceSettings] = None,
-        proxy: Optional[Proxy] = None
+        proxy: Optional[Proxy] = None,
+        language_code: Optional[str] = None,
+        stream: Optional[bool] = None,
+        on_first_chunk: Optional[Callable[[bytes], None]] = None
     ) -> Tuple[bool, str, Optional[float]]:
-        """Convert text to speech asynchronously"""
+        """Convert text to speech asynchronously
+        
+        When served from the audio cache, message is "CACHE_HIT" and no credits were spent
+        stream=True (or the client default) uses the /stream endpoint; on_first_chunk
+        receives the first audio bytes as soon as they arrive
+        settings.output_format picks the encoding (default MP3); PCM is saved as WAV
+        """
         if settings is None:
             settings = VoiceSettings()
+        try:
+            audio_format = AudioFormat.parse(settings.output_format)
+        except ValueError as e:
+            return False, str(e), None
         
+        cache_key = None
+        if self._audio_cache is not None:
+            cache_key = TTSAudioCache.make_key(text, voice_id, settings, language_code, audio_format.name)
+            if self._audio_cache.get(cache_key, output_path, audio_format.name):
+                return True, "CACHE_HIT", await self._get_audio_duration(output_path)
+        
+        if stream is None:
+            stream = self._stream
         url = f"{self.BASE_URL}/text-to-speech/{voice_id}"
+        if stream:
+            url += "/stream"
+        url += f"?output_format={audio_format.name}"
         
         payload = {
             "text": text,
@@ -193,13 +274,19 @@ class AsyncElevenLabsAPI:
             }
         }
         
+        if language_code:
+            payload["language_code"] = language_code
+        
         headers = self._get_headers(api_key.key)
-        headers["Accept"] = "audio/mpeg"
+        headers["Accept"] = audio_format.chunk_mime_type
         
         proxy_info = f" via proxy {proxy.host}:{proxy.port}" if proxy else ""
         debug_info = f"[voice={voice_id[:8]}..., model={settings.model.value}, key={api_key.key[:8]}...{proxy_info}]"
         
         start_time = datetime.now()
+        request_start = time.monotonic()
+        request_info = {"status": None, "ttfb": None, "timeout": False, "headers": {}}
+        self._request_info.set(request_info)
         
         try:
             session = await self._get_session()
@@ -212,18 +299,44 @@ class AsyncElevenLabsAPI:
                 proxy=proxy_url
             ) as response:
                 duration_ms = (datetime.now() - start_time).total_seconds() * 1000
+                ttfb = time.monotonic() - request_start
+                request_info.update({"status": response.status, "ttfb": ttfb, "headers": dict(response.headers)})
                 
                 if response.status == 200:
                     os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                    if os.path.lexists(output_path):
+                        os.remove(output_path)  # may be a hard link into the audio cache
+                    
+                    download = AudioDownload(audio_format)
+                    first_chunk = None
+                    with open(output_path, 'wb', buffering=self.WRITE_BUFFER) as f:
+                        download.begin(f)
+                        chunk_size = self.STREAM_CHUNK if stream else self.DOWNLOAD_CHUNK
+                        async for chunk in response.content.iter_chunked(chunk_size):
+                            if first_chunk is None:
+                                first_chunk = time.monotonic() - request_start
+                                if on_first_chunk is not None:
+                                    try:
+                                        on_first_chunk(chunk)
+                                    except Exception:
+                                        pass  # A preview consumer must never break the download
+                            download.write(f, chunk)
+                        download.finish(f)
+                    transfer = time.monotonic() - request_start
+                    self._transfer_metrics.record(
+                        api_key.id, proxy.id if proxy else None,
+                        ttfb, transfer if first_chunk is None else first_chunk, transfer, download.size
+                    )
                     
-                    with open(output_path, 'wb') as f:
-                        async for chunk in response.content.iter_chunked(8192):
-                            f.write(chunk)
+                    if cache_key is not None:
+                        self._audio_cache.put(cache_key, output_path, audio_format.name)
                     
-                    audio_duration = await self._get_audio_duration(output_path)
+                    duration = download.duration
+                    if duration is None:
+                        duration = await self._get_audio_duration(output_path)
                     
                     self._logger.tts_request(voice_id, len(text), True, duration_ms)
-                    return True, "Success", audio_duration
+                    return True, "Success", duration
                 
                 elif response.status == 429:
                     self._logger.tts_request(voice_id, len(text), False, duration_ms, "RATE_LIMIT")
@@ -251,6 +364,7 @@ class AsyncElevenLabsAPI:
                     return False, f"HTTP {response.status}: {error_msg} {debug_info}", None
         
         except asyncio.TimeoutError:
+            request_info["timeout"] = True
             self._logger.tts_request(voice_id, len(text), False, 0, "TIMEOUT")
             return False, f"Request timeout {debug_info}", None
         except aiohttp.ClientProxyConnectionError as e:
@@ -265,17 +379,15 @@ class AsyncElevenLabsAPI:
     
     async def _get_audio_duration(self, file_path: str) -> Optional[float]:
         """Get duration of audio file"""
+        # Header parsing only reads the file; no decoder or executor needed
+        duration = audio_duration(file_path)
+        if duration is not None:
+            return duration
         try:
-            from pydub import AudioSegment
-            loop = asyncio.get_event_loop()
-            audio = await loop.run_in_executor(None, AudioSegment.from_mp3, file_path)
-            return len(audio) / 1000.0
+            file_size = os.path.getsize(file_path)
+            return file_size / (128 * 1024 / 8)
         except:
-            try:
-                file_size = os.path.getsize(file_path)
-                return file_size / (128 * 1024 / 8)
-            except:
-                return None
+            return None
     
     async def get_voice_by_id(
         self,
@@ -374,57 +486,92 @@ class AsyncElevenLabsAPI:
 class AsyncAPIKeyManager:
     """Manages multiple API keys with async rotation"""
     
-    def __init__(self, api_keys: List[APIKey]):
-        self._keys = api_keys
-        self._current_index = 0
+    MIN_CREDIT_THRESHOLD = 500  # Minimum credits required to use a key
+    
+    def __init__(
+        self,
+        api_keys: List[APIKey],
+        on_key_removed: Optional[callable] = None,
+        policy: str = POLICY_ROUND_ROBIN
+    ):
         self._api = AsyncElevenLabsAPI()
-        self._lock = asyncio.Lock()
+        self._on_key_removed = on_key_removed  # Callback when key is removed due to low credits
+        # Scheduler calls only hold a thread lock for a heap operation, so they never block the loop
+        self._scheduler = KeyScheduler(
+            api_keys,
+            policy=policy,
+            min_credits=self.MIN_CREDIT_THRESHOLD,
+            on_key_removed=on_key_removed
+        )
     
     @property
     def keys(self) -> List[APIKey]:
-        return self._keys
+        return self._scheduler.keys
     
-    async def get_next_available_key(self) -> Optional[APIKey]:
-        async with self._lock:
-            if not self._keys:
-                return None
-            
-            for _ in range(len(self._keys)):
-                key = self._keys[self._current_index]
-                self._current_index = (self._current_index + 1) % len(self._keys)
-                
-                if key.is_available:
-                    return key
-            
-            return None
+    async def get_next_available_key(self, exclude: Optional[APIKey] = None) -> Optional[APIKey]:
+        return self._scheduler.next_key(exclude.id if exclude else None)
+    
+    def reserve_key(self, chars: int, exclude: Optional[APIKey] = None) -> Optional[APIKey]:
+        """Next key with room for chars beyond other reservations, reserving them"""
+        return self._scheduler.reserve(chars, exclude.id if exclude else None)
+    
+    def reserve_on_key(self, key: APIKey, chars: int) -> bool:
+        return self._scheduler.reserve_on(key, chars)
+    
+    def release_credits(self, key: APIKey, chars: int):
+        self._scheduler.release(key, chars)
+    
+    def begin_request(self, key: APIKey):
+        self._scheduler.begin(key)
+    
+    def end_request(self, key: APIKey):
+        self._scheduler.end(key)
+    
+    def update_key(self, key: APIKey):
+        self._scheduler.update(key)
     
     def mark_key_rate_limited(self, key: APIKey, cooldown_seconds: int = 60):
-        key.in_cooldown = True
-        key.cooldown_until = datetime.now() + timedelta(seconds=cooldown_seconds)
+        self._scheduler.cooldown(key, cooldown_seconds)
+    
+    def suspend_key(self, key: APIKey, seconds: float):
+        self._scheduler.cooldown(key, seconds)
     
     def mark_key_exhausted(self, key: APIKey):
         key.character_count = key.character_limit
+        self._scheduler.update(key)
     
     def get_total_credits(self) -> int:
-        return sum(k.remaining_credits for k in self._keys if k.is_valid and k.enabled)
+        return sum(k.remaining_credits for k in self.keys if k.is_valid and k.enabled)
     
     async def refresh_all_keys(self, proxies: Optional[List[Proxy]] = None) -> List[Tuple[APIKey, bool, str]]:
-        results = []
+        """Refresh all keys concurrently, at most DEFAULT_PER_PROXY checks per proxy at once"""
         proxy_map = {}
         
         if proxies:
             for p in proxies:
                 proxy_map[p.id] = p
         
-        for key in self._keys:
+        limits: Dict[str, asyncio.Semaphore] = {}
+        
+        async def refresh(key: APIKey) -> Tuple[APIKey, bool, str]:
             proxy = proxy_map.get(key.assigned_proxy_id) if key.assigned_proxy_id else None
-            success, msg = await self._api.validate_key(key, proxy)
-            results.append((key, success, msg))
+            route = proxy.get_url() if proxy else ""
+            if route not in limits:
+                limits[route] = asyncio.Semaphore(BulkKeyValidator.DEFAULT_PER_PROXY)
+            async with limits[route]:
+                try:
+                    success, msg = await self._api.validate_key(key, proxy)
+                except Exception as e:
+                    success, msg = False, f"Error: {e}"
+            self._scheduler.update(key)
+            return key, success, msg
         
-        return results
+        results = await asyncio.gather(*(refresh(key) for key in self.keys))
+        self._scheduler.sweep()
+        return list(results)
     
     def all_keys_exhausted(self) -> bool:
-        return all(not k.is_available for k in self._keys)
+        return self._scheduler.peek() is None
     
     async def close(self):
         await self._api.close()
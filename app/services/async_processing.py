@@ -0,0 +1,436 @@
+"""Asyncio TTS processing engine"""
+import os
+import time
+import asyncio
+import threading
+from typing import List, Optional, Callable, Dict, Tuple, Iterable, Awaitable
+
+from core.models import TextLine, LineStatus, APIKey, Proxy, VoiceSettings
+from services.async_elevenlabs import AsyncElevenLabsAPI, AsyncAPIKeyManager
+from services.elevenlabs import ElevenLabsAPI
+from services.tts_cache import TTSAudioCache
+from services.hedging import RequestAttempt
+from services.engine_base import BaseProcessingEngine, ThreadInfo, LineJob
+
+
+class AsyncProcessingEngine(BaseProcessingEngine):
+    """TTS processing engine running every request on one event loop.
+    
+    Drop-in alternative to ProcessingEngine: same constructor, callbacks,
+    pause/stop/loop semantics and ProcessingStats. Requests are coroutines
+    instead of threads, so hundreds can be in flight at once.
+    """
+    
+    MAX_CONCURRENCY = 500
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._reconcile_api: Optional[ElevenLabsAPI] = None
+        self._request_tasks: set = set()  # Tasks awaiting a TTS response, for cancel()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pause_event: Optional[asyncio.Event] = None
+        self._retry_signal: Optional[asyncio.Event] = None  # Set (and replaced) when idle workers should look again
+        self._slot_signal: Optional[asyncio.Event] = None  # Set (and replaced) when a slot frees or a cooldown ends
+    
+    def _create_api(self, audio_cache: Optional[TTSAudioCache], streaming: bool) -> AsyncElevenLabsAPI:
+        return AsyncElevenLabsAPI(
+            connection_limit=self._concurrency_limit, audio_cache=audio_cache, stream=streaming
+        )
+    
+    def _create_key_manager(self, api_keys: List[APIKey], policy: str) -> AsyncAPIKeyManager:
+        return AsyncAPIKeyManager(api_keys, on_key_removed=self._handle_key_removed, policy=policy)
+    
+    def _reconcile_key(self, key: APIKey) -> bool:
+        """Fetch real usage for a key (runs on the ledger's thread, not the event loop)"""
+        if self._reconcile_api is None:
+            self._reconcile_api = ElevenLabsAPI()
+        return self._reconcile_api.refresh_subscription(key, self._get_proxy_for_key(key))
+    
+    async def _acquire_slot(
+        self,
+        api_key: APIKey,
+        proxy: Optional[Proxy],
+        chars: int = 0
+    ) -> Optional[Tuple[APIKey, Optional[Proxy]]]:
+        """Wait for room in the adaptive windows, moving to another key if this one's is full.
+        The line's credit reservation (chars on api_key) moves with it."""
+        while not self._stop_requested:
+            key, key_proxy = api_key, proxy
+            for _ in range(max(1, len(self._key_manager.keys))):
+                if (key is api_key or not self._blocked(key, key_proxy)) and \
+                        self._concurrency.try_acquire(key.id, key_proxy.id if key_proxy else None):
+                    if key is not api_key:
+                        self._key_manager.release_credits(api_key, chars)
+                    return key, key_proxy
+                if key is not api_key:
+                    self._key_manager.release_credits(key, chars)
+                key = self._key_manager.reserve_key(chars, exclude=api_key)
+                if key is None:
+                    break
+                key_proxy = self._get_proxy_for_key(key)
+            if key is not None and key is not api_key:
+                self._key_manager.release_credits(key, chars)
+            await self._slot_signal.wait()
+        return None
+    
+    def _signal_slots(self):
+        """Wake every worker waiting in _acquire_slot (call on the engine loop)"""
+        if self._slot_signal is not None:
+            self._slot_signal.set()
+            self._slot_signal = asyncio.Event()
+    
+    def _signal_slots_after(self, delay: float):
+        """Wake slot waiters once a cooldown of delay seconds has passed"""
+        if self._loop is not None:
+            self._loop.call_later(delay, self._signal_slots)
+    
+    async def _attempt_tts(
+        self,
+        attempt: RequestAttempt,
+        text: str,
+        voice_id: str,
+        settings: VoiceSettings,
+        language_code: Optional[str] = None
+    ) -> RequestAttempt:
+        """Run one copy of a request and record its outcome"""
+        request_start = time.monotonic()
+        task = asyncio.current_task()
+        self._request_tasks.add(task)
+        try:
+            attempt.success, attempt.message, attempt.duration = await self._api.text_to_speech(
+                text=text,
+                voice_id=voice_id,
+                api_key=attempt.api_key,
+                output_path=attempt.output_path,
+                settings=settings,
+                proxy=attempt.proxy,
+                language_code=language_code
+            )
+        except asyncio.CancelledError:
+            if not self._cancelled:
+                raise
+            # cancel(): the line fails as CANCELLED and its worker carries on
+            if hasattr(task, "uncancel"):
+                task.uncancel()
+            if os.path.lexists(attempt.output_path):
+                os.remove(attempt.output_path)
+            attempt.success = False
+            attempt.message = "CANCELLED"
+            attempt.duration = None
+        except Exception as e:
+            self._log(f"[ERROR] TTS API exception: {type(e).__name__}: {str(e)}")
+            attempt.success = False
+            attempt.message = f"Exception: {type(e).__name__}: {str(e)}"
+            attempt.duration = None
+        finally:
+            self._request_tasks.discard(task)
+        attempt.latency = time.monotonic() - request_start
+        attempt.info = self._api.get_last_request_info()
+        if attempt.success and attempt.message != "CACHE_HIT":
+            self._latency.record(settings.model.value, len(text), attempt.latency)
+        return attempt
+    
+    def _submit_attempt(
+        self,
+        attempt: RequestAttempt,
+        text: str,
+        voice_id: str,
+        settings: VoiceSettings,
+        language_code: Optional[str]
+    ) -> "asyncio.Task[RequestAttempt]":
+        return asyncio.ensure_future(self._attempt_tts(attempt, text, voice_id, settings, language_code))
+    
+    async def _request_tts(
+        self,
+        text: str,
+        voice_id: str,
+        settings: VoiceSettings,
+        api_key: APIKey,
+        proxy: Optional[Proxy],
+        output_path: str,
+        language_code: Optional[str] = None
+    ) -> RequestAttempt:
+        """Make one TTS request, hedging it if it outlives the rolling latency percentile.
+        
+        Returns the attempt whose result counts. The caller holds (and
+        releases) the concurrency slot of whichever attempt is returned.
+        """
+        threshold = None
+        if self._hedge_budget is not None:
+            threshold = self._latency.threshold(settings.model.value, len(text))
+        if threshold is None:
+            return await self._attempt_tts(RequestAttempt(api_key, proxy, output_path), text, voice_id, settings, language_code)
+        
+        self._hedge_budget.on_request()
+        primary = RequestAttempt(api_key, proxy, f"{output_path}.part")
+        attempts: Dict["asyncio.Task[RequestAttempt]", RequestAttempt] = {
+            self._submit_attempt(primary, text, voice_id, settings, language_code): primary
+        }
+        started = time.monotonic()
+        done, _ = await asyncio.wait(attempts, timeout=threshold)
+        # Keep trying while the primary is out: the windows may be full right now
+        while not done and not self._stop_requested:
+            launched = self._launch_hedge(primary, output_path, text, voice_id, settings, language_code,
+                                          time.monotonic() - started)
+            if launched:
+                attempts[launched[0]] = launched[1]
+                break
+            done, _ = await asyncio.wait(attempts, timeout=self.HEDGE_RETRY_INTERVAL)
+        
+        # First successful response wins; a fast failure waits for the other copy
+        winner = None
+        pending = set(attempts)
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if attempts[task].success and winner is None:
+                    winner = attempts[task]
+        if winner is None:
+            winner = primary
+        
+        for task, attempt in attempts.items():
+            if attempt is not winner:
+                # A cancelled copy never sets success, so only one that had already finished is billed
+                task.cancel()
+                task.add_done_callback(lambda _, a=attempt: self._abandon_attempt(a, text))
+        
+        return self._pick_winner(winner, output_path)
+    
+    async def _process_line(self, line: TextLine, slot_id: int = 0) -> Optional[bool]:
+        """Start a line and make its first attempt. Returns True/False once the line
+        is finished, None while a retry of it waits in the delay queue."""
+        if self._stop_requested:
+            return False
+        
+        await self._pause_event.wait()
+        
+        if self._stop_requested:
+            return False
+        
+        job = self._start_line(line)
+        if job is None:
+            return False
+        return await self._attempt_line(job, slot_id)
+    
+    async def _attempt_line(self, job: LineJob, slot_id: int = 0) -> Optional[bool]:
+        """Make one request for a started line. A retryable failure goes back on the
+        delay queue (returns None) so this worker can serve other lines meanwhile."""
+        if self._stop_requested:
+            return self._finish_line(job, False, slot_id)
+        
+        await self._pause_event.wait()
+        admitted, result = self._admit_attempt(job, slot_id)
+        if not admitted:
+            return result
+        
+        api_key, proxy = job.api_key, job.proxy
+        if self._concurrency:
+            slot = await self._acquire_slot(api_key, proxy, job.chars_needed)
+            if slot is None:
+                return self._finish_line(job, False, slot_id)
+            api_key, proxy = self._use_slot(job, slot)
+        
+        self._key_manager.begin_request(api_key)
+        try:
+            attempt = await self._request_tts(job.line.text, job.voice_id, job.settings, api_key, proxy, job.output_path,
+                                              job.line.detected_language)
+        finally:
+            self._key_manager.end_request(api_key)
+        
+        return self._settle_attempt(job, attempt, slot_id)
+    
+    def _queue_retry(self, job: LineJob, delay: float):
+        super()._queue_retry(job, delay)
+        self._wake_workers()
+    
+    def _wake_workers(self):
+        """Wake every worker waiting in _wait_for_work (call on the engine loop)"""
+        if self._retry_signal is not None:
+            self._retry_signal.set()
+            self._retry_signal = asyncio.Event()
+    
+    async def _wait_for_work(
+        self,
+        queue: Optional["asyncio.Queue[Optional[TextLine]]"],
+        timeout: Optional[float]
+    ) -> Tuple[bool, Optional[TextLine]]:
+        """Wait for a queued line, the earliest retry coming due (timeout) or a wake-up,
+        whichever comes first. Returns (True, line) once a line was taken from queue."""
+        waiters = [asyncio.ensure_future(self._retry_signal.wait())]
+        if queue is not None:
+            waiters.append(asyncio.ensure_future(queue.get()))
+        try:
+            await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.cancel()  # A cancelled queue.get() leaves its line in the queue
+        got = waiters[-1] if queue is not None else None
+        if got is not None and got.done() and not got.cancelled():
+            return True, got.result()
+        return False, None
+    
+    def _launch(self, lines: List[TextLine]):
+        self._log(f"Starting async processing of {self._stats.total} lines with {self._concurrency_limit} concurrent requests")
+        
+        self._process_thread = threading.Thread(
+            target=asyncio.run,
+            args=(self._process_all(lines),),
+            daemon=True
+        )
+        self._process_thread.start()
+    
+    async def _produce(self, lines: Iterable[TextLine], queue: "asyncio.Queue[Optional[TextLine]]", worker_count: int):
+        """Feed the bounded queue; suspends while workers are busy"""
+        try:
+            for line in self._iter_pending(lines):
+                if self._stop_requested:
+                    self._leave_pipeline(line)
+                    break
+                await queue.put(line)
+        except Exception as e:
+            self._log(f"Error: {str(e)}")
+        finally:
+            for _ in range(worker_count):
+                await queue.put(None)
+    
+    async def _worker(self, queue: "asyncio.Queue[Optional[TextLine]]", slot_id: int):
+        """Take due retries first, then new lines; after the producer's end marker
+        keep serving retries until no line is left in the pipeline"""
+        producer_done = False
+        while True:
+            # Once stopping, queued retries are settled straight away
+            job = self._retry_queue.pop_ready(ignore_delay=self._stop_requested)
+            if job is not None:
+                await self._run_item(job.line, slot_id, self._attempt_line(job, slot_id))
+                continue
+            
+            # Idle: sleep until a line arrives, a retry comes due or is queued, or stop() is called
+            wait_for = self._retry_queue.time_to_next()
+            if producer_done:
+                if not self._in_pipeline:
+                    break
+                await self._wait_for_work(None, wait_for)
+                continue
+            
+            try:
+                line = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                got, line = await self._wait_for_work(queue, wait_for)
+                if not got:
+                    continue
+            if line is None:
+                producer_done = True
+                continue
+            if self._stop_requested:
+                self._leave_pipeline(line)
+                continue
+            await self._run_item(line, slot_id, self._process_line(line, slot_id))
+    
+    async def _run_item(self, line: TextLine, slot_id: int, step: Awaitable[Optional[bool]]):
+        """Run one attempt of a line on this worker, keeping the line in the pipeline while it waits to retry"""
+        info = self._worker_busy(slot_id, line)
+        result = False
+        try:
+            result = await step
+        except Exception as e:
+            self._log(f"Error: {str(e)}")
+        finally:
+            self._worker_idle(info, line, result)
+    
+    async def _process_all(self, lines: Iterable[TextLine]):
+        """Process lines with a producer feeding a bounded queue and a fixed set of worker coroutines"""
+        self._loop = asyncio.get_running_loop()
+        self._pause_event = asyncio.Event()
+        self._retry_signal = asyncio.Event()
+        self._slot_signal = asyncio.Event()
+        if not self._paused:
+            self._pause_event.set()
+        
+        if self._warm_connections:
+            # The connector is already sized to the concurrency limit; this just pre-opens it
+            started = time.monotonic()
+            proxies = [self._get_proxy_for_key(key) for key in self._key_manager.keys]
+            await self._api.warmup(proxies, self._concurrency_limit)
+            self._log(f"Connections warmed up in {time.monotonic() - started:.1f}s")
+        
+        current_loop = 1
+        
+        try:
+            while True:
+                self._stats.current_loop = current_loop
+                self._update_stats()
+                
+                if current_loop > 1:
+                    for line in lines:
+                        if line.status == LineStatus.ERROR:
+                            line.status = LineStatus.PENDING
+                            self._update_line(line)
+                
+                # Memory stays O(concurrency) no matter how many lines there are
+                worker_count = min(self._concurrency_limit, max(1, self._stats.total))
+                queue: asyncio.Queue = asyncio.Queue(maxsize=worker_count * self.QUEUE_DEPTH_FACTOR)
+                self._stats.thread_info = {i: ThreadInfo(thread_id=i) for i in range(worker_count)}
+                workers = [
+                    asyncio.create_task(self._worker(queue, i))
+                    for i in range(worker_count)
+                ]
+                
+                await self._produce(lines, queue, worker_count)
+                await asyncio.gather(*workers, return_exceptions=True)
+                
+                if self._stop_requested:
+                    break
+                
+                if not self._loop_enabled:
+                    break
+                
+                if self._loop_count > 0 and current_loop >= self._loop_count:
+                    break
+                
+                self._log(f"Loop {current_loop} complete. Starting loop {current_loop + 1} in {self._loop_delay}s...")
+                for _ in range(self._loop_delay):
+                    if self._stop_requested:
+                        break
+                    await asyncio.sleep(1)
+                
+                current_loop += 1
+                
+                self._stats.completed = 0
+                self._stats.failed = 0
+        finally:
+            transfers = self._api.transfer_metrics.overall
+            if transfers.requests:
+                self._log(f"Audio transfers: {transfers.summary()}")
+            await self._api.close()
+            await self._key_manager.close()
+            if self._journal:
+                self._journal.close()
+            await self._loop.run_in_executor(None, self._ledger.stop)
+            if self._assembler is not None:
+                await self._loop.run_in_executor(None, self._finish_assembly)
+            self._loop = None
+            self._end_run()
+    
+    def _call_in_loop(self, callback: Callable[[], None]):
+        """Run a callback on the engine loop from any thread"""
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(callback)
+    
+    def _set_paused(self, paused: bool):
+        if self._pause_event is not None:
+            self._call_in_loop(self._pause_event.clear if paused else self._pause_event.set)
+    
+    def _interrupt_waits(self):
+        if self._pause_event is not None:
+            self._call_in_loop(self._pause_event.set)  # Unpause to allow workers to exit
+        self._call_in_loop(self._wake_workers)  # Waiting retries are settled straight away
+        self._call_in_loop(self._signal_slots)
+    
+    def _abort_requests(self):
+        self._call_in_loop(self._cancel_requests)
+    
+    def _cancel_requests(self):
+        for task in list(self._request_tasks):
+            task.cancel()
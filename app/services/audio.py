@@ -5,6 +5,7 @@ from typing import List, Optional, Callable
 from pathlib import Path
 
 from core.models import TextLine
+from services.audio_format import audio_duration, concatenate_wav, encoder_args, format_for_path
 
 
 class SRTGenerator:
@@ -63,7 +64,7 @@ class SRTGenerator:
 
 
 class MP3Concatenator:
-    """Concatenate multiple MP3 files into one using ffmpeg"""
+    """Concatenate audio files into one: WAV by appending PCM, others using ffmpeg"""
     
     def __init__(self, ffmpeg_path: str = "ffmpeg"):
         self._ffmpeg = ffmpeg_path
@@ -76,10 +77,10 @@ class MP3Concatenator:
         on_progress: Optional[Callable[[int, int], None]] = None
     ) -> tuple[bool, str]:
         """
-        Concatenate MP3 files
+        Concatenate audio files of one format (MP3, WAV or Opus)
         
         Args:
-            input_files: List of input MP3 file paths
+            input_files: List of input audio file paths
             output_path: Output file path
             silence_gap: Silence to insert between files (seconds)
             on_progress: Callback (current, total)
@@ -90,6 +91,10 @@ class MP3Concatenator:
         if not input_files:
             return False, "No input files"
         
+        if all(format_for_path(p) == "pcm" for p in input_files + [output_path]):
+            # PCM needs no codec: append the samples, zeros for the gaps
+            return concatenate_wav(input_files, output_path, silence_gap)
+        
         try:
             # Create temporary list file for ffmpeg
             list_file = output_path + ".txt"
@@ -114,8 +119,7 @@ class MP3Concatenator:
                     '-f', 'concat',
                     '-safe', '0',
                     '-i', list_file,
-                    '-c:a', 'libmp3lame',
-                    '-q:a', '2',
+                    *encoder_args(output_path),
                     output_path
                 ]
             else:
@@ -179,7 +183,11 @@ class AudioUtils:
     
     @staticmethod
     def get_duration(file_path: str) -> Optional[float]:
-        """Get duration of audio file using ffprobe"""
+        """Get duration of audio file (MP3/WAV/Ogg headers, then ffprobe, then pydub)"""
+        duration = audio_duration(file_path)
+        if duration is not None:
+            return duration
+        
         try:
             result = subprocess.run(
                 [
@@ -238,8 +246,7 @@ class AudioUtils:
                     '-y',
                     '-i', input_path,
                     '-af', filter_str,
-                    '-c:a', 'libmp3lame',
-                    '-q:a', '2',
+                    *encoder_args(output_path),
                     output_path
                 ],
                 capture_output=True,
@@ -0,0 +1,333 @@
+"""TTS output formats and the format-specific handling that avoids transcoding"""
+import os
+import struct
+from dataclasses import dataclass
+from typing import Optional, List, Tuple
+
+from core.models import DEFAULT_OUTPUT_FORMAT
+from services.mp3_parser import MP3FrameCounter, mp3_duration
+
+
+# Shorthands accepted wherever an output format is configured
+_ALIASES = {
+    "mp3": DEFAULT_OUTPUT_FORMAT,
+    "pcm": "pcm_44100",
+    "wav": "pcm_44100",
+    "opus": "opus_48000_64",
+}
+
+# (label, output_format) pairs offered in settings
+OUTPUT_FORMAT_CHOICES = [
+    ("MP3 128 kbps", "mp3_44100_128"),
+    ("MP3 192 kbps", "mp3_44100_192"),
+    ("MP3 64 kbps", "mp3_44100_64"),
+    ("WAV (PCM 44.1 kHz)", "pcm_44100"),
+    ("WAV (PCM 24 kHz)", "pcm_24000"),
+    ("Opus 64 kbps", "opus_48000_64"),
+    ("Opus 128 kbps", "opus_48000_128"),
+]
+
+_EXTENSIONS = {"mp3": ".mp3", "pcm": ".wav", "opus": ".opus"}
+_MIME_TYPES = {"mp3": "audio/mpeg", "pcm": "audio/wav", "opus": "audio/ogg"}
+
+PCM_SAMPLE_WIDTH = 2  # ElevenLabs PCM is 16-bit signed little-endian mono
+OPUS_GRANULE_RATE = 48000
+COPY_CHUNK = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class AudioFormat:
+    """A parsed ElevenLabs output_format such as mp3_44100_128 or pcm_24000"""
+    name: str
+    codec: str  # "mp3", "pcm" or "opus"
+    sample_rate: int
+    bitrate: Optional[int] = None  # kbps, None for PCM
+    
+    @classmethod
+    def parse(cls, name: Optional[str]) -> "AudioFormat":
+        """Parse a format name; raises ValueError for formats we can't store"""
+        name = (name or DEFAULT_OUTPUT_FORMAT).lower()
+        name = _ALIASES.get(name, name)
+        parts = name.split("_")
+        codec = parts[0]
+        if codec not in _EXTENSIONS or len(parts) < 2 or not all(p.isdigit() for p in parts[1:]):
+            raise ValueError(f"Unsupported output format: {name}")
+        if codec == "pcm" and len(parts) != 2:
+            raise ValueError(f"Unsupported output format: {name}")
+        return cls(
+            name=name,
+            codec=codec,
+            sample_rate=int(parts[1]),
+            bitrate=int(parts[2]) if len(parts) > 2 else None
+        )
+    
+    @property
+    def is_pcm(self) -> bool:
+        return self.codec == "pcm"
+    
+    @property
+    def extension(self) -> str:
+        """File extension of stored audio; PCM is wrapped in a WAV header"""
+        return _EXTENSIONS[self.codec]
+    
+    @property
+    def mime_type(self) -> str:
+        return _MIME_TYPES[self.codec]
+    
+    @property
+    def chunk_mime_type(self) -> str:
+        """MIME type of raw response bytes (PCM arrives without a WAV header)"""
+        if self.is_pcm:
+            return f"audio/L16;rate={self.sample_rate};channels=1"
+        return self.mime_type
+    
+    @property
+    def bytes_per_second(self) -> int:
+        if self.is_pcm:
+            return self.sample_rate * PCM_SAMPLE_WIDTH
+        return (self.bitrate or 128) * 1000 // 8
+    
+    def duration_from_size(self, size: int) -> float:
+        """Exact for PCM data bytes, an estimate for compressed formats"""
+        return size / self.bytes_per_second
+
+
+class AudioDownload:
+    """Writes a TTS response body to disk in its stored form.
+    
+    PCM gets a WAV header (patched with the real size at the end) so the
+    file is playable and can later be joined by plain appends; MP3 frames
+    are counted as they pass so the duration is known when the body ends.
+    """
+    
+    def __init__(self, audio_format: AudioFormat):
+        self.format = audio_format
+        self.size = 0
+        self._frames = MP3FrameCounter() if audio_format.codec == "mp3" else None
+    
+    def begin(self, f):
+        if self.format.is_pcm:
+            f.write(wav_header(0, self.format.sample_rate))
+    
+    def write(self, f, chunk: bytes):
+        f.write(chunk)
+        self.size += len(chunk)
+        if self._frames is not None:
+            self._frames.feed(chunk)
+    
+    def finish(self, f):
+        if self.format.is_pcm:
+            f.seek(0)
+            f.write(wav_header(self.size, self.format.sample_rate))
+    
+    @property
+    def duration(self) -> Optional[float]:
+        """Exact duration for MP3 and PCM, None when the file must be inspected"""
+        if self.format.is_pcm:
+            return self.format.duration_from_size(self.size)
+        if self._frames is not None:
+            return self._frames.duration
+        return None
+
+
+def format_for_path(path: str) -> Optional[str]:
+    """Codec of a stored file judged by its extension"""
+    ext = os.path.splitext(path)[1].lower()
+    for codec, codec_ext in _EXTENSIONS.items():
+        if ext == codec_ext:
+            return codec
+    if ext == ".ogg":
+        return "opus"
+    return None
+
+
+def encoder_args(path: str) -> List[str]:
+    """ffmpeg codec arguments that re-encode to the format the path's extension implies"""
+    codec = format_for_path(path)
+    if codec == "pcm":
+        return ['-c:a', 'pcm_s16le']
+    if codec == "opus":
+        return ['-c:a', 'libopus', '-b:a', '64k']
+    return ['-c:a', 'libmp3lame', '-q:a', '2']
+
+
+def wav_header(data_size: int, sample_rate: int, channels: int = 1, sample_width: int = PCM_SAMPLE_WIDTH) -> bytes:
+    """Canonical 44-byte RIFF/WAVE header for 16-bit PCM"""
+    block_align = channels * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, sample_rate * block_align, block_align, sample_width * 8,
+        b"data", data_size
+    )
+
+
+@dataclass
+class WavInfo:
+    """Layout of a WAV file's PCM data"""
+    sample_rate: int
+    channels: int
+    sample_width: int
+    data_offset: int
+    data_size: int
+    
+    @property
+    def params(self) -> Tuple[int, int, int]:
+        return self.sample_rate, self.channels, self.sample_width
+    
+    @property
+    def duration(self) -> float:
+        return self.data_size / (self.sample_rate * self.channels * self.sample_width)
+
+
+def read_wav_info(path: str) -> Optional[WavInfo]:
+    """Walk the RIFF chunks for fmt and data; None if it isn't plain PCM WAV"""
+    try:
+        file_size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            riff = f.read(12)
+            if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+                return None
+            fmt = None
+            while True:
+                chunk = f.read(8)
+                if len(chunk) < 8:
+                    return None
+                chunk_id, size = struct.unpack("<4sI", chunk)
+                if chunk_id == b"fmt ":
+                    body = f.read(size)
+                    if len(body) < 16:
+                        return None
+                    audio_format, channels, rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+                    if audio_format != 1:
+                        return None
+                    fmt = (rate, channels, bits // 8)
+                    if size % 2:
+                        f.seek(1, os.SEEK_CUR)
+                elif chunk_id == b"data":
+                    if fmt is None:
+                        return None
+                    offset = f.tell()
+                    # Streamed files may carry a placeholder size; trust the file length
+                    data_size = min(size, file_size - offset) if size else file_size - offset
+                    return WavInfo(fmt[0], fmt[1], fmt[2], offset, data_size)
+                else:
+                    f.seek(size + (size % 2), os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+
+def concatenate_wav(
+    input_files: List[str],
+    output_path: str,
+    silence_gap: float = 0.0,
+    pad_start: float = 0.0,
+    pad_end: float = 0.0
+) -> Tuple[bool, str]:
+    """Join WAV files by appending their PCM data, with zero samples for gaps.
+    
+    No decoding or encoding happens; all inputs must share sample rate,
+    channel count and sample width.
+    """
+    infos = []
+    for path in input_files:
+        info = read_wav_info(path)
+        if info is None:
+            return False, f"Not a PCM WAV file: {path}"
+        if infos and info.params != infos[0].params:
+            return False, f"Sample format of {path} differs from {input_files[0]}"
+        infos.append(info)
+    if not infos:
+        return False, "No input files"
+    
+    rate, channels, width = infos[0].params
+    block = channels * width
+    
+    def silence(seconds: float) -> int:
+        return int(round(seconds * rate)) * block
+    
+    gap_bytes = silence(silence_gap)
+    tmp_path = output_path + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(tmp_path, "wb") as out:
+            out.write(wav_header(0, rate, channels, width))
+            data_size = write_zeros(out, silence(pad_start))
+            for i, (path, info) in enumerate(zip(input_files, infos)):
+                if i and gap_bytes:
+                    data_size += write_zeros(out, gap_bytes)
+                with open(path, "rb") as src:
+                    src.seek(info.data_offset)
+                    remaining = info.data_size
+                    while remaining > 0:
+                        buf = src.read(min(COPY_CHUNK, remaining))
+                        if not buf:
+                            break
+                        out.write(buf)
+                        remaining -= len(buf)
+                        data_size += len(buf)
+            data_size += write_zeros(out, silence(pad_end))
+            out.seek(0)
+            out.write(wav_header(data_size, rate, channels, width))
+        os.replace(tmp_path, output_path)
+        return True, "Success"
+    except OSError as e:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False, str(e)
+
+
+def write_zeros(f, count: int) -> int:
+    """Write count zero bytes (silence for PCM); returns count"""
+    remaining = count
+    zeros = bytes(min(count, COPY_CHUNK))
+    while remaining > 0:
+        n = min(remaining, len(zeros))
+        f.write(zeros[:n])
+        remaining -= n
+    return count
+
+
+def ogg_opus_duration(path: str) -> Optional[float]:
+    """Duration from the last page's granule position minus the OpusHead pre-skip"""
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            head = f.read(4096)
+            at = head.find(b"OpusHead")
+            if head[:4] != b"OggS" or at < 0 or len(head) < at + 12:
+                return None
+            pre_skip = struct.unpack("<H", head[at + 10:at + 12])[0]
+            f.seek(max(0, size - 65536))
+            tail = f.read()
+    except OSError:
+        return None
+    page = tail.rfind(b"OggS")
+    if page < 0 or len(tail) < page + 14:
+        return None
+    granule = struct.unpack("<q", tail[page + 6:page + 14])[0]
+    if granule < 0:
+        return None
+    return max(0, granule - pre_skip) / OPUS_GRANULE_RATE
+
+
+def audio_duration(path: str) -> Optional[float]:
+    """Exact duration from container headers for the formats we store, without decoding"""
+    codec = format_for_path(path)
+    if codec == "mp3":
+        return mp3_duration(path)
+    if codec == "pcm":
+        info = read_wav_info(path)
+        return info.duration if info else None
+    if codec == "opus":
+        return ogg_opus_duration(path)
+    return None
+
+
+def looks_like_audio_header(head: bytes) -> bool:
+    """Whether the first bytes of a file start an MP3, WAV or Ogg stream"""
+    if head[:3] == b"ID3" or head[:4] == b"OggS" or (head[:4] == b"RIFF" and head[8:12] == b"WAVE"):
+        return True
+    return len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0
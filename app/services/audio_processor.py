@@ -6,6 +6,8 @@ from typing import Optional, Tuple, List
 from pathlib import Path
 from dataclasses import dataclass
 
+from services.audio_format import concatenate_wav, encoder_args, format_for_path
+
 
 @dataclass
 class AudioProcessingSettings:
@@ -88,6 +90,13 @@ class AudioProcessor:
         try:
             # Handle silence padding separately as it requires generating silence
             if settings.silence_padding_start > 0 or settings.silence_padding_end > 0:
+                if not filters and format_for_path(input_path) == format_for_path(output_path) == "pcm":
+                    # WAV padding is zero samples around the data; nothing to encode
+                    return concatenate_wav(
+                        [input_path], output_path,
+                        pad_start=settings.silence_padding_start,
+                        pad_end=settings.silence_padding_end
+                    )
                 return self._process_with_padding(input_path, output_path, filters, settings)
             
             if not filters:
@@ -101,8 +110,7 @@ class AudioProcessor:
                 self._ffmpeg, '-y',
                 '-i', input_path,
                 '-af', filter_str,
-                '-c:a', 'libmp3lame',
-                '-q:a', '2',
+                *encoder_args(output_path),
                 output_path
             ]
             
@@ -129,7 +137,9 @@ class AudioProcessor:
         """Process audio with silence padding"""
         try:
             with tempfile.TemporaryDirectory() as tmpdir:
-                processed_path = os.path.join(tmpdir, "processed.mp3")
+                # Intermediate files share the output's format so the join needs no conversion
+                ext = os.path.splitext(output_path)[1] or ".mp3"
+                processed_path = os.path.join(tmpdir, f"processed{ext}")
                 
                 # First apply filters
                 if filters:
@@ -138,8 +148,7 @@ class AudioProcessor:
                         self._ffmpeg, '-y',
                         '-i', input_path,
                         '-af', filter_str,
-                        '-c:a', 'libmp3lame',
-                        '-q:a', '2',
+                        *encoder_args(processed_path),
                         processed_path
                     ]
                     result = subprocess.run(cmd, capture_output=True, timeout=300)
@@ -152,14 +161,14 @@ class AudioProcessor:
                 files_to_concat = []
                 
                 if settings.silence_padding_start > 0:
-                    start_silence = os.path.join(tmpdir, "start_silence.mp3")
+                    start_silence = os.path.join(tmpdir, f"start_silence{ext}")
                     self._generate_silence(start_silence, settings.silence_padding_start)
                     files_to_concat.append(start_silence)
                 
                 files_to_concat.append(processed_path)
                 
                 if settings.silence_padding_end > 0:
-                    end_silence = os.path.join(tmpdir, "end_silence.mp3")
+                    end_silence = os.path.join(tmpdir, f"end_silence{ext}")
                     self._generate_silence(end_silence, settings.silence_padding_end)
                     files_to_concat.append(end_silence)
                 
@@ -175,8 +184,7 @@ class AudioProcessor:
                         '-f', 'concat',
                         '-safe', '0',
                         '-i', list_file,
-                        '-c:a', 'libmp3lame',
-                        '-q:a', '2',
+                        *encoder_args(output_path),
                         output_path
                     ]
                     result = subprocess.run(cmd, capture_output=True, timeout=300)
@@ -198,8 +206,7 @@ class AudioProcessor:
                 self._ffmpeg, '-y',
                 '-f', 'lavfi',
                 '-i', f'anullsrc=r=44100:cl=stereo:d={duration}',
-                '-c:a', 'libmp3lame',
-                '-q:a', '2',
+                *encoder_args(output_path),
                 output_path
             ]
             result = subprocess.run(cmd, capture_output=True, timeout=60)
@@ -0,0 +1,228 @@
+"""Shared circuit breakers for API keys and proxies during a run"""
+import threading
+import time
+from typing import Optional, Dict
+
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+FAULT_KEY = "key"  # The key itself is refused or its requests error server-side
+FAULT_ROUTE = "route"  # The connection (usually the proxy) failed before a response came back
+
+
+def classify_failure(message: str, status: Optional[int] = None) -> Optional[str]:
+    """Which resource a failed TTS request points at: FAULT_KEY, FAULT_ROUTE or None.
+    
+    Rate limits, cancellations and request errors like a bad voice id are
+    None: the key and route worked, so they say nothing about either.
+    """
+    if not message:
+        return None
+    if status is None and message.startswith("HTTP "):
+        try:
+            status = int(message[5:8])
+        except ValueError:
+            status = None
+    if message.startswith("Invalid API key") or status == 401:
+        return FAULT_KEY
+    if status is not None and status >= 500:
+        return FAULT_KEY
+    if message.startswith(("Proxy error", "Connection error", "SSL error", "Request timeout")):
+        return FAULT_ROUTE
+    return None
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker for one key or proxy.
+    
+    failure_threshold consecutive failures open it. Once cooldown seconds
+    have passed it turns half-open and allow() admits exactly one probe
+    request; that probe's success closes it, its failure reopens it with
+    the cooldown doubled (up to max_cooldown). A probe that never reports
+    back frees its slot after PROBE_TIMEOUT. Not thread-safe on its own;
+    BreakerBoard serialises access.
+    """
+    
+    PROBE_TIMEOUT = 150.0  # Longer than a TTS request may take
+    
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0, max_cooldown: float = 300.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_cooldown = cooldown
+        self.max_cooldown = max(cooldown, max_cooldown)
+        self.cooldown = cooldown
+        self.failures = 0
+        self.trips = 0
+        self._opened_at: Optional[float] = None
+        self._probe_started: Optional[float] = None
+    
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return STATE_CLOSED
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return STATE_HALF_OPEN
+        return STATE_OPEN
+    
+    @property
+    def remaining(self) -> float:
+        """Seconds until an open breaker admits its probe"""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+    
+    @property
+    def _probing(self) -> bool:
+        return self._probe_started is not None and time.monotonic() - self._probe_started < self.PROBE_TIMEOUT
+    
+    def blocked(self) -> bool:
+        """True if a request would be refused right now (does not take the probe slot)"""
+        state = self.state
+        return state == STATE_OPEN or (state == STATE_HALF_OPEN and self._probing)
+    
+    def allow(self) -> bool:
+        """Admit a request; in half-open state only the first caller gets through"""
+        state = self.state
+        if state == STATE_CLOSED:
+            return True
+        if state == STATE_HALF_OPEN and not self._probing:
+            self._probe_started = time.monotonic()
+            return True
+        return False
+    
+    def record_success(self):
+        self.failures = 0
+        self.cooldown = self.base_cooldown
+        self._opened_at = None
+        self._probe_started = None
+    
+    def record_failure(self, trip: bool = False) -> bool:
+        """Count a failure; returns True if this one opened the breaker"""
+        self.failures += 1
+        if self._opened_at is not None:
+            if not self._probing:
+                return False  # Already open; a request sent before it tripped
+            # The probe failed: back off harder
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+        elif not trip and self.failures < self.failure_threshold:
+            return False
+        self._opened_at = time.monotonic()
+        self._probe_started = None
+        self.trips += 1
+        return True
+    
+    def release_probe(self):
+        """The probe ended without a verdict (cancelled, rate limited): let another one through"""
+        self._probe_started = None
+
+
+class BreakerBoard:
+    """One breaker per key and per proxy, shared by every worker of a run.
+    
+    Workers call allow() before sending and record() after; a failure
+    classified as FAULT_KEY counts against the key, FAULT_ROUTE against
+    the proxy it went through. record() returns what tripped so the
+    engine can take the key out of rotation at once.
+    """
+    
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0, max_cooldown: float = 300.0):
+        self._failure_threshold = failure_threshold
+        self._cooldown = cooldown
+        self._max_cooldown = max_cooldown
+        self._lock = threading.Lock()
+        self._keys: Dict[str, CircuitBreaker] = {}
+        self._proxies: Dict[str, CircuitBreaker] = {}
+    
+    def _breaker(self, table: Dict[str, CircuitBreaker], resource_id: str) -> CircuitBreaker:
+        breaker = table.get(resource_id)
+        if breaker is None:
+            breaker = table[resource_id] = CircuitBreaker(
+                self._failure_threshold, self._cooldown, self._max_cooldown
+            )
+        return breaker
+    
+    def allow(self, key_id: str, proxy_id: Optional[str]) -> bool:
+        """Admit a request on key_id through proxy_id, taking half-open probe slots as needed"""
+        with self._lock:
+            key_breaker = self._breaker(self._keys, key_id)
+            proxy_breaker = self._breaker(self._proxies, proxy_id) if proxy_id else None
+            if key_breaker.blocked() or (proxy_breaker is not None and proxy_breaker.blocked()):
+                return False
+            key_breaker.allow()
+            if proxy_breaker is not None:
+                proxy_breaker.allow()
+            return True
+    
+    def key_blocked(self, key_id: str) -> bool:
+        with self._lock:
+            breaker = self._keys.get(key_id)
+            return breaker is not None and breaker.blocked()
+    
+    def proxy_blocked(self, proxy_id: str) -> bool:
+        with self._lock:
+            breaker = self._proxies.get(proxy_id)
+            return breaker is not None and breaker.blocked()
+    
+    def release(self, key_id: str, proxy_id: Optional[str]):
+        """An admitted request was never sent: free any probe slot it took"""
+        with self._lock:
+            for table, resource_id in ((self._keys, key_id), (self._proxies, proxy_id)):
+                breaker = table.get(resource_id) if resource_id else None
+                if breaker is not None:
+                    breaker.release_probe()
+    
+    def key_cooldown(self, key_id: str) -> float:
+        """Seconds until key_id's open breaker admits a probe"""
+        with self._lock:
+            breaker = self._keys.get(key_id)
+            return breaker.remaining if breaker else 0.0
+    
+    def proxy_cooldown(self, proxy_id: str) -> float:
+        """Seconds until proxy_id's open breaker admits a probe"""
+        with self._lock:
+            breaker = self._proxies.get(proxy_id)
+            return breaker.remaining if breaker else 0.0
+    
+    def record(
+        self,
+        key_id: str,
+        proxy_id: Optional[str],
+        success: bool,
+        message: str,
+        status: Optional[int] = None
+    ) -> Optional[str]:
+        """Report a request's outcome; returns FAULT_KEY/FAULT_ROUTE if it tripped that breaker"""
+        with self._lock:
+            key_breaker = self._breaker(self._keys, key_id)
+            proxy_breaker = self._breaker(self._proxies, proxy_id) if proxy_id else None
+            if success:
+                key_breaker.record_success()
+                if proxy_breaker is not None:
+                    proxy_breaker.record_success()
+                return None
+            fault = classify_failure(message, status)
+            tripped = None
+            if fault == FAULT_KEY:
+                # A 401 will not fix itself with retries
+                if key_breaker.record_failure(trip=message.startswith("Invalid API key") or status == 401):
+                    tripped = FAULT_KEY
+                if proxy_breaker is not None:
+                    proxy_breaker.record_success()  # The proxy delivered a response
+            elif fault == FAULT_ROUTE and proxy_breaker is not None:
+                if proxy_breaker.record_failure():
+                    tripped = FAULT_ROUTE
+                key_breaker.release_probe()
+            else:
+                key_breaker.release_probe()
+                if proxy_breaker is not None:
+                    proxy_breaker.release_probe()
+            return tripped
+    
+    def snapshot(self) -> Dict[str, Dict[str, str]]:
+        """Breakers that are not closed: {"keys": {id: state}, "proxies": {id: state}}"""
+        with self._lock:
+            return {
+                "keys": {i: b.state for i, b in self._keys.items() if b.state != STATE_CLOSED},
+                "proxies": {i: b.state for i, b in self._proxies.items() if b.state != STATE_CLOSED}
+            }
@@ -0,0 +1,237 @@
+"""Adaptive (AIMD) concurrency control for TTS requests"""
+import time
+import threading
+from dataclasses import dataclass
+from typing import Optional, Dict, Hashable
+
+
+# Request outcomes reported back to the controller
+OUTCOME_OK = "ok"
+OUTCOME_RATE_LIMITED = "rate_limited"
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_ERROR = "error"
+OUTCOME_CACHED = "cached"  # Served locally, no request made: leaves the window alone
+OUTCOME_CANCELLED = "cancelled"  # Lost a hedge race and was abandoned: no load signal
+
+
+@dataclass
+class LimiterSnapshot:
+    """Point-in-time view of one limiter, for stats/UI"""
+    window: int
+    in_flight: int
+    latency_ms: float
+    rate_limits: int
+
+
+class AIMDLimiter:
+    """Congestion window for one scope (global, a key or a proxy).
+    
+    Slow start doubles the window per round trip until the first backoff;
+    after that it grows by ~1 per round trip. 429s and timeouts halve it,
+    latency drifting well above the observed floor trims it by 10%.
+    
+    Render time grows with the text, so latencies are compared per bucket
+    (hedging.LatencyTracker.bucket: model and length): each bucket keeps
+    its own floor and the EWMA tracks latency / floor, so a long line
+    after a run of short ones is not mistaken for congestion. Results
+    without a bucket share one.
+    Not thread-safe on its own; AdaptiveConcurrencyController holds the lock.
+    """
+    
+    DECREASE_FACTOR = 0.5
+    LATENCY_DECREASE_FACTOR = 0.9
+    LATENCY_TOLERANCE = 2.0  # EWMA latency above floor * this is "rising"
+    EWMA_ALPHA = 0.2
+    
+    def __init__(self, max_window: int, initial_window: float = 2.0, min_window: int = 1):
+        self.max_window = max(min_window, max_window)
+        self.min_window = min_window
+        self.window = float(min(max(initial_window, min_window), self.max_window))
+        self.in_flight = 0
+        self.slow_start = True
+        self.latency_ewma: Optional[float] = None
+        self.slowdown_ewma: Optional[float] = None  # EWMA of latency / floor of its bucket
+        self.latency_floors: Dict[Hashable, float] = {}
+        self.rate_limits = 0
+        self.consecutive_rate_limits = 0
+        self._last_decrease = 0.0
+    
+    @property
+    def limit(self) -> int:
+        return max(self.min_window, int(self.window))
+    
+    def has_capacity(self) -> bool:
+        return self.in_flight < self.limit
+    
+    def _decrease(self, factor: float):
+        # At most one cut per round trip, so a burst of failures from
+        # requests that were already in flight counts as one signal
+        now = time.monotonic()
+        rtt = self.latency_ewma or 1.0
+        if now - self._last_decrease < rtt:
+            return
+        self._last_decrease = now
+        self.slow_start = False
+        self.window = max(float(self.min_window), self.window * factor)
+    
+    def on_result(self, outcome: str, latency: Optional[float], bucket: Hashable = None):
+        if outcome == OUTCOME_OK:
+            self.consecutive_rate_limits = 0
+            if latency is not None and latency > 0:
+                if self.latency_ewma is None:
+                    self.latency_ewma = latency
+                else:
+                    self.latency_ewma += self.EWMA_ALPHA * (latency - self.latency_ewma)
+                floor = self.latency_floors.get(bucket)
+                if floor is None or latency < floor:
+                    floor = self.latency_floors[bucket] = latency
+                slowdown = latency / floor
+                if self.slowdown_ewma is None:
+                    self.slowdown_ewma = slowdown
+                else:
+                    self.slowdown_ewma += self.EWMA_ALPHA * (slowdown - self.slowdown_ewma)
+                if self.slowdown_ewma > self.LATENCY_TOLERANCE:
+                    self._decrease(self.LATENCY_DECREASE_FACTOR)
+                    # Let the floors drift up slowly so a permanently slower
+                    # route doesn't pin the window at its minimum
+                    for b in self.latency_floors:
+                        self.latency_floors[b] *= 1.05
+                    return
+            if self.slow_start:
+                self.window = min(float(self.max_window), self.window + 1.0)
+            else:
+                self.window = min(float(self.max_window), self.window + 1.0 / self.window)
+        elif outcome == OUTCOME_RATE_LIMITED:
+            self.rate_limits += 1
+            self.consecutive_rate_limits += 1
+            self._decrease(self.DECREASE_FACTOR)
+        elif outcome == OUTCOME_TIMEOUT:
+            self._decrease(self.DECREASE_FACTOR)
+        # Other errors (bad text, invalid key, ...), cache hits and abandoned hedges say nothing about load
+    
+    def snapshot(self) -> LimiterSnapshot:
+        return LimiterSnapshot(
+            window=self.limit,
+            in_flight=self.in_flight,
+            latency_ms=(self.latency_ewma or 0.0) * 1000,
+            rate_limits=self.rate_limits
+        )
+
+
+class AdaptiveConcurrencyController:
+    """Paces requests with one global window plus one per API key and per proxy.
+    
+    A request may start only when all three windows have room. Workers
+    report every outcome back through release(), which is what moves the
+    windows; nothing here sleeps for a fixed delay.
+    """
+    
+    MIN_COOLDOWN = 2.0
+    MAX_COOLDOWN = 60.0
+    
+    def __init__(self, max_concurrency: int, initial_window: float = 2.0):
+        self._max = max(1, max_concurrency)
+        self._initial = initial_window
+        self._cond = threading.Condition()
+        self._global = AIMDLimiter(self._max, initial_window)
+        self._keys: Dict[str, AIMDLimiter] = {}
+        self._proxies: Dict[str, AIMDLimiter] = {}
+    
+    def _scope(self, table: Dict[str, AIMDLimiter], scope_id: Optional[str]) -> Optional[AIMDLimiter]:
+        if scope_id is None:
+            return None
+        limiter = table.get(scope_id)
+        if limiter is None:
+            limiter = AIMDLimiter(self._max, self._initial)
+            table[scope_id] = limiter
+        return limiter
+    
+    def _limiters(self, key_id: Optional[str], proxy_id: Optional[str]):
+        return [
+            l for l in (
+                self._global,
+                self._scope(self._keys, key_id),
+                self._scope(self._proxies, proxy_id)
+            ) if l is not None
+        ]
+    
+    def try_acquire(self, key_id: Optional[str] = None, proxy_id: Optional[str] = None) -> bool:
+        """Claim a slot without waiting. Returns False if any window is full."""
+        with self._cond:
+            limiters = self._limiters(key_id, proxy_id)
+            if not all(l.has_capacity() for l in limiters):
+                return False
+            for l in limiters:
+                l.in_flight += 1
+            return True
+    
+    def acquire(
+        self,
+        key_id: Optional[str] = None,
+        proxy_id: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> bool:
+        """Block until a slot is free in every window, or timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                limiters = self._limiters(key_id, proxy_id)
+                if all(l.has_capacity() for l in limiters):
+                    for l in limiters:
+                        l.in_flight += 1
+                    return True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+    
+    def release(
+        self,
+        key_id: Optional[str],
+        proxy_id: Optional[str],
+        outcome: str,
+        latency: Optional[float] = None,
+        bucket: Hashable = None
+    ):
+        """Free the slot and feed the outcome to every window it held.
+        
+        bucket groups requests whose latencies are comparable (see AIMDLimiter).
+        """
+        with self._cond:
+            for l in self._limiters(key_id, proxy_id):
+                l.in_flight = max(0, l.in_flight - 1)
+                l.on_result(outcome, latency, bucket)
+            self._cond.notify_all()
+    
+    def has_capacity(self) -> bool:
+        with self._cond:
+            return self._global.has_capacity()
+    
+    def wait_for_release(self, timeout: Optional[float] = None):
+        """Block until some slot is released (or timeout)"""
+        with self._cond:
+            self._cond.wait(timeout)
+    
+    def rate_limit_cooldown(self, key_id: str) -> float:
+        """Cooldown for a key that just returned 429: doubles per consecutive hit"""
+        with self._cond:
+            limiter = self._keys.get(key_id)
+            streak = limiter.consecutive_rate_limits if limiter else 1
+        return min(self.MAX_COOLDOWN, self.MIN_COOLDOWN * (2 ** max(0, streak - 1)))
+    
+    @property
+    def window(self) -> int:
+        with self._cond:
+            return self._global.limit
+    
+    @property
+    def max_concurrency(self) -> int:
+        return self._max
+    
+    def snapshot(self) -> Dict[str, Dict[str, LimiterSnapshot]]:
+        with self._cond:
+            return {
+                "global": {"global": self._global.snapshot()},
+                "keys": {k: l.snapshot() for k, l in self._keys.items()},
+                "proxies": {p: l.snapshot() for p, l in self._proxies.items()}
+            }
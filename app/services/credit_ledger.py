@@ -0,0 +1,136 @@
+"""Local per-key credit accounting with background reconciliation"""
+import time
+import threading
+from typing import Optional, Callable, Dict, List, Any
+
+from core.models import APIKey
+
+
+CHARACTER_COST_HEADERS = ("character-cost", "x-character-count")
+
+
+def character_cost(headers: Optional[Dict[str, Any]], text: str) -> int:
+    """Characters billed for a request: the API's header if present, else len(text)"""
+    if headers:
+        lowered = {str(k).lower(): v for k, v in headers.items()}
+        for name in CHARACTER_COST_HEADERS:
+            value = lowered.get(name)
+            if value is not None:
+                try:
+                    return max(0, int(value))
+                except (TypeError, ValueError):
+                    pass
+    return len(text)
+
+
+class CreditLedger:
+    """Debits keys locally as lines complete instead of asking the API each time.
+    
+    Debits mutate APIKey.character_count immediately (so low-credit checks
+    stay accurate) and mark the key dirty. A background thread hands dirty
+    keys to on_flush in one batch every flush_interval seconds, and
+    re-fetches real usage for keys used since the last reconcile every
+    reconcile_interval seconds or after reconcile_lines debits.
+    """
+    
+    def __init__(
+        self,
+        refresh_key: Callable[[APIKey], bool],
+        on_flush: Optional[Callable[[List[APIKey]], None]] = None,
+        flush_interval: float = 5.0,
+        reconcile_interval: float = 120.0,
+        reconcile_lines: int = 500,
+        on_log: Optional[Callable[[str], None]] = None
+    ):
+        self._refresh_key = refresh_key
+        self._on_flush = on_flush
+        self._flush_interval = max(0.5, flush_interval)
+        self._reconcile_interval = reconcile_interval
+        self._reconcile_lines = reconcile_lines
+        self._on_log = on_log
+        
+        self._lock = threading.Lock()
+        self._dirty: Dict[str, APIKey] = {}
+        self._used_since_reconcile: Dict[str, APIKey] = {}
+        self._debits_since_reconcile = 0
+        self._last_reconcile = time.monotonic()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._last_reconcile = time.monotonic()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+    
+    def stop(self, reconcile: bool = True):
+        """Stop the background thread, optionally reconciling once more, and flush"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if reconcile:
+            self.reconcile()
+        self.flush()
+    
+    def debit(self, key: APIKey, chars: int):
+        """Record chars spent on key. Cheap; safe from any worker thread."""
+        with self._lock:
+            key.character_count += chars
+            self._dirty[key.id] = key
+            self._used_since_reconcile[key.id] = key
+            self._debits_since_reconcile += 1
+            due = self._reconcile_lines > 0 and self._debits_since_reconcile >= self._reconcile_lines
+        if due:
+            self._wake.set()
+    
+    def flush(self):
+        """Persist every key debited or reconciled since the last flush"""
+        with self._lock:
+            keys = list(self._dirty.values())
+            self._dirty.clear()
+        if keys and self._on_flush:
+            try:
+                self._on_flush(keys)
+            except Exception as e:
+                self._log(f"Failed to persist credit usage: {e}")
+    
+    def reconcile(self):
+        """Replace local estimates with the API's numbers for recently used keys"""
+        with self._lock:
+            keys = list(self._used_since_reconcile.values())
+            self._used_since_reconcile.clear()
+            self._debits_since_reconcile = 0
+            self._last_reconcile = time.monotonic()
+        for key in keys:
+            try:
+                if self._refresh_key(key):
+                    with self._lock:
+                        self._dirty[key.id] = key
+            except Exception as e:
+                self._log(f"Credit reconcile failed for key {key.name or key.id[:8]}: {e}")
+    
+    def _reconcile_due(self) -> bool:
+        with self._lock:
+            if not self._used_since_reconcile:
+                return False
+            if self._reconcile_lines > 0 and self._debits_since_reconcile >= self._reconcile_lines:
+                return True
+            return self._reconcile_interval > 0 and time.monotonic() - self._last_reconcile >= self._reconcile_interval
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self._flush_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            if self._reconcile_due():
+                self.reconcile()
+            self.flush()
+    
+    def _log(self, message: str):
+        if self._on_log:
+            self._on_log(message)
@@ -1,8 +1,9 @@
 """ElevenLabs API service"""
 import os
 import time
+import threading
 import requests
-from typing import Optional, List, Dict, Any, Tuple, TYPE_CHECKING
+from typing import Optional, List, Dict, Any, Tuple, Callable, TYPE_CHECKING
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -10,6 +11,12 @@ from core.models import (
     APIKey, Proxy, Voice, VoiceSettings, TTSModel,
     TranscriptionResult, TranscriptionSegment, WordTimestamp, Speaker
 )
+from services.tts_cache import TTSAudioCache
+from services.http_transport import TransportRegistry, get_transport_registry
+from services.audio_format import AudioFormat, AudioDownload, audio_duration
+from services.transfer_metrics import TransferMetrics
+from services.key_scheduler import KeyScheduler, POLICY_ROUND_ROBIN
+from services.key_validation import BulkKeyValidator
 
 
 class ResponseCache:
@@ -54,10 +61,25 @@ class ElevenLabsAPI:
     
     BASE_URL = "https://api.elevenlabs.io/v1"
     
-    def __init__(self, cache_enabled: bool = True):
-        self._session = requests.Session()
+    DOWNLOAD_CHUNK = 64 * 1024
+    STREAM_CHUNK = 4 * 1024  # Small reads so the first audio is handed over as soon as it lands
+    WRITE_BUFFER = 256 * 1024
+    
+    def __init__(
+        self,
+        cache_enabled: bool = True,
+        audio_cache: Optional[TTSAudioCache] = None,
+        transport: Optional[TransportRegistry] = None,
+        stream: bool = False
+    ):
+        # Sessions (and their keep-alive pools) are shared by every client in the process
+        self._transport = transport or get_transport_registry()
         self._cache_enabled = cache_enabled
         self._cache = ResponseCache(max_size=100, ttl_seconds=300)
+        self._audio_cache = audio_cache
+        self._request_info = threading.local()
+        self._stream = stream
+        self._transfer_metrics = TransferMetrics()
     
     def enable_cache(self, enabled: bool = True):
         """Enable or disable response caching"""
@@ -67,6 +89,29 @@ class ElevenLabsAPI:
         """Clear the response cache"""
         self._cache.clear()
     
+    def get_last_request_info(self) -> Dict[str, Any]:
+        """Details of the calling thread's last text_to_speech request
+        
+        Keys: status (HTTP status or None), ttfb (seconds to response headers
+        or None), timeout (bool), headers (response headers); after a
+        successful download also first_chunk (seconds to the first audio
+        bytes), transfer (seconds until the last byte) and bytes.
+        """
+        return getattr(self._request_info, "last", {})
+    
+    def set_streaming(self, enabled: bool):
+        """Use the /stream TTS endpoint by default"""
+        self._stream = enabled
+    
+    @property
+    def transfer_metrics(self) -> TransferMetrics:
+        """TTFB / first-audio / transfer timings of this client's TTS downloads"""
+        return self._transfer_metrics
+    
+    def set_audio_cache(self, audio_cache: Optional[TTSAudioCache]):
+        """Attach (or detach with None) the on-disk TTS audio cache"""
+        self._audio_cache = audio_cache
+    
     def _get_headers(self, api_key: str) -> Dict[str, str]:
         return {
             "xi-api-key": api_key,
@@ -74,6 +119,13 @@ class ElevenLabsAPI:
             "Accept": "application/json"
         }
     
+    def _http(self, proxy: Optional[Proxy]) -> requests.Session:
+        return self._transport.session(proxy)
+    
+    @property
+    def transport(self) -> TransportRegistry:
+        return self._transport
+    
     def _get_proxies(self, proxy: Optional[Proxy]) -> Optional[Dict[str, str]]:
         if not proxy:
             return None
@@ -83,7 +135,7 @@ class ElevenLabsAPI:
     def validate_key(self, api_key: APIKey, proxy: Optional[Proxy] = None) -> Tuple[bool, str]:
         """Validate an API key and fetch subscription info"""
         try:
-            response = self._session.get(
+            response = self._http(proxy).get(
                 f"{self.BASE_URL}/user/subscription",
                 headers=self._get_headers(api_key.key),
                 proxies=self._get_proxies(proxy),
@@ -116,7 +168,7 @@ class ElevenLabsAPI:
         voices = []
         
         try:
-            response = self._session.get(
+            response = self._http(proxy).get(
                 f"{self.BASE_URL}/voices",
                 headers=self._get_headers(api_key.key),
                 proxies=self._get_proxies(proxy),
@@ -150,7 +202,7 @@ class ElevenLabsAPI:
         """
         try:
             # First try to get the voice directly (works for voices in your account)
-            response = self._session.get(
+            response = self._http(proxy).get(
                 f"{self.BASE_URL}/voices/{voice_id}",
                 headers=self._get_headers(api_key.key),
                 proxies=self._get_proxies(proxy),
@@ -195,7 +247,7 @@ class ElevenLabsAPI:
             # But we can also use the simpler approach of just using the voice ID directly
             
             # First, let's try to get voice info from shared voices endpoint
-            response = self._session.get(
+            response = self._http(proxy).get(
                 f"{self.BASE_URL}/shared-voices",
                 headers=self._get_headers(api_key.key),
                 proxies=self._get_proxies(proxy),
@@ -265,7 +317,7 @@ class ElevenLabsAPI:
         
         try:
             # Get shared/public voices
-            response = self._session.get(
+            response = self._http(proxy).get(
                 f"{self.BASE_URL}/shared-voices",
                 headers=self._get_headers(api_key.key),
                 proxies=self._get_proxies(proxy),
@@ -349,7 +401,7 @@ class ElevenLabsAPI:
             params["sort"] = sort
         
         try:
-            response = self._session.get(
+            response = self._http(proxy).get(
                 f"{self.BASE_URL}/shared-voices",
                 headers=self._get_headers(api_key.key),
                 proxies=self._get_proxies(proxy),
@@ -390,7 +442,7 @@ class ElevenLabsAPI:
         Returns: (Voice or None, error_message)
         """
         try:
-            response = self._session.post(
+            response = self._http(proxy).post(
                 f"{self.BASE_URL}/voices/add/{public_user_id}/{voice_id}",
                 headers=self._get_headers(api_key.key),
                 proxies=self._get_proxies(proxy),
@@ -431,7 +483,7 @@ class ElevenLabsAPI:
         models = []
         
         try:
-            response = self._session.get(
+            response = self._http(proxy).get(
                 f"{self.BASE_URL}/models",
                 headers=self._get_headers(api_key.key),
                 proxies=self._get_proxies(proxy),
@@ -500,7 +552,7 @@ class ElevenLabsAPI:
                 import json
                 data['labels'] = json.dumps(labels)
             
-            response = self._session.post(
+            response = self._http(proxy).post(
                 url,
                 headers=headers,
                 files=form_files,
@@ -591,7 +643,7 @@ class ElevenLabsAPI:
         url = f"{self.BASE_URL}/voices/{voice_id}"
         
         try:
-            response = self._session.delete(
+            response = self._http(proxy).delete(
                 url,
                 headers=self._get_headers(api_key.key),
                 proxies=self._get_proxies(proxy),
@@ -674,7 +726,7 @@ class ElevenLabsAPI:
                     opened_files.append(f)
                     form_files.append(('files', (os.path.basename(file_path), f)))
             
-            response = self._session.post(
+            response = self._http(proxy).post(
                 url,
                 headers=headers,
                 files=form_files if form_files else None,
@@ -736,17 +788,42 @@ class ElevenLabsAPI:
         settings: Optional[VoiceSettings] = None,
         proxy: Optional[Proxy] = None,
         language_code: Optional[str] = None,
-        debug: bool = False
+        debug: bool = False,
+        cancel_event: Optional[threading.Event] = None,
+        stream: Optional[bool] = None,
+        on_first_chunk: Optional[Callable[[bytes], None]] = None
     ) -> Tuple[bool, str, Optional[float], Optional[Dict[str, Any]]]:
         """
         Convert text to speech
         Returns: (success, message, audio_duration, debug_info)
         If debug=False, debug_info will be None
+        When served from the audio cache, message is "CACHE_HIT" and no credits were spent
+        Setting cancel_event abandons the download (message "CANCELLED"); a request
+        still waiting for headers can't be interrupted and is abandoned once they arrive
+        stream=True (or the client default) uses the /stream endpoint; on_first_chunk
+        receives the first audio bytes as soon as they arrive, e.g. for a preview
+        settings.output_format picks the encoding (default MP3); PCM is saved as WAV
         """
         if settings is None:
             settings = VoiceSettings()
+        try:
+            audio_format = AudioFormat.parse(settings.output_format)
+        except ValueError as e:
+            return False, str(e), None, None
+        
+        # Debug requests always go to the API so the request/response can be inspected
+        cache_key = None
+        if self._audio_cache is not None and not debug:
+            cache_key = TTSAudioCache.make_key(text, voice_id, settings, language_code, audio_format.name)
+            if self._audio_cache.get(cache_key, output_path, audio_format.name):
+                return True, "CACHE_HIT", self._get_audio_duration(output_path), None
         
+        if stream is None:
+            stream = self._stream
         url = f"{self.BASE_URL}/text-to-speech/{voice_id}"
+        if stream:
+            url += "/stream"
+        url += f"?output_format={audio_format.name}"
         
         payload = {
             "text": text,
@@ -765,7 +842,7 @@ class ElevenLabsAPI:
             payload["language_code"] = language_code
         
         headers = self._get_headers(api_key.key)
-        headers["Accept"] = "audio/mpeg"
+        headers["Accept"] = audio_format.chunk_mime_type
         
         # Build debug info
         proxy_info = f" via proxy {proxy.host}:{proxy.port}" if proxy else ""
@@ -786,8 +863,11 @@ class ElevenLabsAPI:
                 "response": None
             }
         
+        self._request_info.last = {"status": None, "ttfb": None, "timeout": False, "headers": {}}
+        request_start = time.monotonic()
+        
         try:
-            response = self._session.post(
+            response = self._http(proxy).post(
                 url,
                 json=payload,
                 headers=headers,
@@ -796,6 +876,14 @@ class ElevenLabsAPI:
                 stream=True
             )
             
+            # stream=True: post() returns as soon as headers arrive
+            self._request_info.last = {
+                "status": response.status_code,
+                "ttfb": time.monotonic() - request_start,
+                "timeout": False,
+                "headers": dict(response.headers)
+            }
+            
             # Capture response debug info
             if debug:
                 debug_data["response"] = {
@@ -805,14 +893,50 @@ class ElevenLabsAPI:
                 }
             
             if response.status_code == 200:
-                # Save audio file
+                # Save audio file (unlink first: the old file may be a hard link into the audio cache)
                 os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                with open(output_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
+                if os.path.lexists(output_path):
+                    os.remove(output_path)
+                # Frames are counted as they stream, so the duration is known when the download ends
+                download = AudioDownload(audio_format)
+                first_chunk = None
+                with open(output_path, 'wb', buffering=self.WRITE_BUFFER) as f:
+                    download.begin(f)
+                    chunk_size = self.STREAM_CHUNK if stream else self.DOWNLOAD_CHUNK
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        if cancel_event is not None and cancel_event.is_set():
+                            break
+                        if not chunk:
+                            continue
+                        if first_chunk is None:
+                            first_chunk = time.monotonic() - request_start
+                            if on_first_chunk is not None:
+                                try:
+                                    on_first_chunk(chunk)
+                                except Exception:
+                                    pass  # A preview consumer must never break the download
+                        download.write(f, chunk)
+                    download.finish(f)
+                transfer = time.monotonic() - request_start
                 
-                # Get audio duration
-                duration = self._get_audio_duration(output_path)
+                if cancel_event is not None and cancel_event.is_set():
+                    response.close()
+                    os.remove(output_path)
+                    return False, "CANCELLED", None, debug_data
+                
+                ttfb = self._request_info.last["ttfb"]
+                first_chunk = transfer if first_chunk is None else first_chunk
+                self._request_info.last.update({"first_chunk": first_chunk, "transfer": transfer, "bytes": download.size})
+                self._transfer_metrics.record(
+                    api_key.id, proxy.id if proxy else None, ttfb, first_chunk, transfer, download.size
+                )
+                
+                if cache_key is not None:
+                    self._audio_cache.put(cache_key, output_path, audio_format.name)
+                
+                duration = download.duration
+                if duration is None:
+                    duration = self._get_audio_duration(output_path)
                 
                 if debug:
                     debug_data["response"]["audio_file"] = output_path
@@ -845,6 +969,7 @@ class ElevenLabsAPI:
                 return False, f"HTTP {response.status_code}: {error_msg} {debug_str}", None, debug_data
                 
         except requests.Timeout as e:
+            self._request_info.last["timeout"] = True
             return False, f"Request timeout after 120s {debug_str}: {type(e).__name__}", None, debug_data
         except requests.exceptions.ProxyError as e:
             return False, f"Proxy error {debug_str}: {type(e).__name__} - {str(e)}", None, debug_data
@@ -859,18 +984,16 @@ class ElevenLabsAPI:
     
     def _get_audio_duration(self, file_path: str) -> Optional[float]:
         """Get duration of audio file in seconds"""
+        duration = audio_duration(file_path)
+        if duration is not None:
+            return duration
+        # Fallback: estimate from file size (rough approximation)
         try:
-            from pydub import AudioSegment
-            audio = AudioSegment.from_mp3(file_path)
-            return len(audio) / 1000.0  # Convert ms to seconds
+            file_size = os.path.getsize(file_path)
+            # Assume ~128kbps MP3
+            return file_size / (128 * 1024 / 8)
         except:
-            # Fallback: estimate from file size (rough approximation)
-            try:
-                file_size = os.path.getsize(file_path)
-                # Assume ~128kbps MP3
-                return file_size / (128 * 1024 / 8)
-            except:
-                return None
+            return None
     
     def refresh_subscription(self, api_key: APIKey, proxy: Optional[Proxy] = None) -> bool:
         """Refresh subscription info for an API key"""
@@ -928,7 +1051,7 @@ class ElevenLabsAPI:
                     if num_speakers:
                         data['num_speakers'] = str(num_speakers)
                 
-                response = self._session.post(
+                response = self._http(proxy).post(
                     url,
                     headers=headers,
                     files=files,
@@ -1093,7 +1216,7 @@ class ElevenLabsAPI:
         }
         """
         try:
-            response = self._session.get(
+            response = self._http(proxy).get(
                 f"{self.BASE_URL}/user/subscription",
                 headers=self._get_headers(api_key.key),
                 proxies=self._get_proxies(proxy),
@@ -1123,90 +1246,98 @@ class APIKeyManager:
     
     MIN_CREDIT_THRESHOLD = 500  # Minimum credits required to use a key
     
-    def __init__(self, api_keys: List[APIKey], on_key_removed: Optional[callable] = None):
-        self._keys = api_keys
-        self._current_index = 0
+    def __init__(
+        self,
+        api_keys: List[APIKey],
+        on_key_removed: Optional[callable] = None,
+        policy: str = POLICY_ROUND_ROBIN
+    ):
         self._api = ElevenLabsAPI()
         self._on_key_removed = on_key_removed  # Callback when key is removed due to low credits
+        # Keys below the threshold are dropped as the scheduler meets them, not by a scan per call
+        self._scheduler = KeyScheduler(
+            api_keys,
+            policy=policy,
+            min_credits=self.MIN_CREDIT_THRESHOLD,
+            on_key_removed=on_key_removed
+        )
     
     @property
     def keys(self) -> List[APIKey]:
-        return self._keys
+        return self._scheduler.keys
     
     def check_and_remove_low_credit_keys(self) -> List[APIKey]:
         """Check all keys and remove those with credits below threshold.
         Returns list of removed keys."""
-        removed_keys = []
-        keys_to_keep = []
-        
-        for key in self._keys:
-            if key.is_valid and key.remaining_credits < self.MIN_CREDIT_THRESHOLD:
-                removed_keys.append(key)
-                if self._on_key_removed:
-                    self._on_key_removed(key, f"Credits below {self.MIN_CREDIT_THRESHOLD} (has {key.remaining_credits})")
-            else:
-                keys_to_keep.append(key)
-        
-        self._keys = keys_to_keep
-        
-        # Reset index if needed
-        if self._current_index >= len(self._keys):
-            self._current_index = 0
-        
-        return removed_keys
+        return self._scheduler.sweep()
     
-    def get_next_available_key(self) -> Optional[APIKey]:
+    def get_next_available_key(self, exclude: Optional[APIKey] = None) -> Optional[APIKey]:
         """Get the next available API key with at least MIN_CREDIT_THRESHOLD credits.
         Keys with less than threshold credits are automatically removed."""
-        if not self._keys:
-            return None
-        
-        # First, check and remove keys with low credits
-        self.check_and_remove_low_credit_keys()
-        
-        if not self._keys:
-            return None
-        
-        # Try starting from current index
-        for _ in range(len(self._keys)):
-            key = self._keys[self._current_index]
-            self._current_index = (self._current_index + 1) % len(self._keys)
-            
-            # Check if key is available and has enough credits
-            if key.is_available and key.remaining_credits >= self.MIN_CREDIT_THRESHOLD:
-                return key
-        
-        return None
+        return self._scheduler.next_key(exclude.id if exclude else None)
+    
+    def reserve_key(self, chars: int, exclude: Optional[APIKey] = None) -> Optional[APIKey]:
+        """Next key with room for chars beyond what other requests reserved, reserving them.
+        Pair with release_credits() once the request's real usage is debited."""
+        return self._scheduler.reserve(chars, exclude.id if exclude else None)
+    
+    def reserve_on_key(self, key: APIKey, chars: int) -> bool:
+        return self._scheduler.reserve_on(key, chars)
+    
+    def release_credits(self, key: APIKey, chars: int):
+        self._scheduler.release(key, chars)
+    
+    def wait_for_key(self, timeout: Optional[float] = None) -> Optional[APIKey]:
+        """Block until a key is available (e.g. a cooldown ends) or timeout passes"""
+        return self._scheduler.wait(timeout)
+    
+    def begin_request(self, key: APIKey):
+        """Count a request in flight on key (for the least-loaded policy)"""
+        self._scheduler.begin(key)
+    
+    def end_request(self, key: APIKey):
+        self._scheduler.end(key)
+    
+    def update_key(self, key: APIKey):
+        """Re-rank a key whose credits or state changed outside the manager"""
+        self._scheduler.update(key)
     
     def mark_key_rate_limited(self, key: APIKey, cooldown_seconds: int = 60):
         """Mark a key as rate limited"""
-        key.in_cooldown = True
-        key.cooldown_until = datetime.now() + timedelta(seconds=cooldown_seconds)
+        self._scheduler.cooldown(key, cooldown_seconds)
+    
+    def suspend_key(self, key: APIKey, seconds: float):
+        """Take a key out of rotation for seconds, e.g. while its circuit breaker is open"""
+        self._scheduler.cooldown(key, seconds)
     
     def mark_key_exhausted(self, key: APIKey):
         """Mark a key as quota exhausted"""
         key.character_count = key.character_limit
+        self._scheduler.update(key)
     
     def get_total_credits(self) -> int:
         """Get total remaining credits across all keys"""
-        return sum(k.remaining_credits for k in self._keys if k.is_valid and k.enabled)
+        return sum(k.remaining_credits for k in self.keys if k.is_valid and k.enabled)
     
     def refresh_all_keys(self, proxies: Optional[List[Proxy]] = None) -> List[Tuple[APIKey, bool, str]]:
-        """Refresh subscription info for all keys"""
-        results = []
+        """Refresh subscription info for all keys, a few at a time per proxy"""
         proxy_map = {}
         
         if proxies:
             for p in proxies:
                 proxy_map[p.id] = p
         
-        for key in self._keys:
-            proxy = proxy_map.get(key.assigned_proxy_id) if key.assigned_proxy_id else None
-            success, msg = self._api.validate_key(key, proxy)
-            results.append((key, success, msg))
+        validator = BulkKeyValidator(self._api)
+        checked = validator.validate(
+            self.keys,
+            lambda key: proxy_map.get(key.assigned_proxy_id) if key.assigned_proxy_id else None
+        )
+        for result in checked:
+            self._scheduler.update(result.key)
         
-        return results
+        self._scheduler.sweep()
+        return [(r.key, r.success, r.message) for r in checked]
     
     def all_keys_exhausted(self) -> bool:
         """Check if all keys are exhausted or unavailable"""
-        return all(not k.is_available for k in self._keys)
+        return self._scheduler.peek() is None
@@ -0,0 +1,1036 @@
+"""Line bookkeeping shared by the threaded and asyncio TTS processing engines"""
+import os
+import time
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import List, Optional, Callable, Dict, Any, Tuple, Iterable, Iterator
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+
+from core.models import TextLine, LineStatus, APIKey, Proxy, Voice, VoiceSettings, DEFAULT_OUTPUT_FORMAT
+from services.key_scheduler import POLICY_ROUND_ROBIN
+from services.key_planner import KeyPlan, plan_key_assignment
+from services.tts_cache import TTSAudioCache, link_or_copy
+from services.audio_format import AudioFormat
+from services.assembly import IncrementalAssembler, AssemblyResult
+from services.job_journal import JobJournal, JournalEntry, line_fingerprint, looks_like_audio
+from services.credit_ledger import CreditLedger, character_cost
+from services.line_dedupe import DuplicateGroups, dedupe_key
+from services.proxy_health import get_proxy_health
+from services.circuit_breaker import BreakerBoard, FAULT_KEY, FAULT_ROUTE
+from services.retry_queue import DelayQueue, RetryPolicy, error_class
+from services.hedging import LatencyTracker, HedgeBudget, RequestAttempt
+from services.concurrency import (
+    AdaptiveConcurrencyController, OUTCOME_OK, OUTCOME_RATE_LIMITED,
+    OUTCOME_TIMEOUT, OUTCOME_ERROR, OUTCOME_CACHED, OUTCOME_CANCELLED
+)
+
+
+@dataclass
+class ThreadInfo:
+    """Information about a single thread's activity"""
+    thread_id: int
+    status: str = "idle"  # idle, working, waiting
+    current_line_index: Optional[int] = None
+    lines_processed: int = 0
+    last_activity: Optional[datetime] = None
+
+
+@dataclass
+class LineJob:
+    """A started line between attempts: what it renders with and where its retries stand"""
+    line: TextLine
+    voice_id: str
+    settings: VoiceSettings
+    output_path: str
+    fingerprint: str
+    chars_needed: int
+    api_key: Optional[APIKey]
+    proxy: Optional[Proxy]
+    reserved_key: Optional[APIKey]  # Holds the line's credit reservation
+    attempts: int = 0
+    retries: Dict[str, int] = field(default_factory=dict)  # Per error class
+    last_error: str = ""
+    paced: bool = False  # Already waited its request_delay turn
+
+
+@dataclass
+class ProcessingStats:
+    total: int = 0
+    completed: int = 0
+    failed: int = 0
+    processing: int = 0
+    start_time: Optional[datetime] = None
+    current_loop: int = 1
+    cache_hits: int = 0
+    concurrency_window: int = 0  # Requests currently allowed in flight
+    deduplicated: int = 0  # Lines filled from an identical line's audio
+    dedup_saved_requests: int = 0
+    dedup_saved_credits: int = 0
+    hedged: int = 0  # Duplicate requests sent for stragglers
+    hedge_wins: int = 0  # ...that answered before the original
+    hedge_extra_credits: int = 0  # Credits billed for requests that lost the race
+    breaker_trips: int = 0  # Times a key's or proxy's circuit breaker opened
+    rerouted: int = 0  # Requests moved off a key/proxy whose breaker was open
+    breakers: Dict[str, Dict[str, str]] = field(default_factory=dict)  # {"keys"|"proxies": {name: state}} not closed
+    thread_info: Dict[int, ThreadInfo] = field(default_factory=dict)
+    
+    @property
+    def pending(self) -> int:
+        return self.total - self.completed - self.failed - self.processing
+    
+    @property
+    def progress_percent(self) -> float:
+        if self.total == 0:
+            return 0
+        return (self.completed / self.total) * 100
+    
+    @property
+    def elapsed_time(self) -> float:
+        if not self.start_time:
+            return 0
+        return (datetime.now() - self.start_time).total_seconds()
+    
+    @property
+    def active_threads(self) -> int:
+        return sum(1 for t in self.thread_info.values() if t.status == "working")
+    
+    def get_thread_display(self) -> Dict[int, str]:
+        """Get thread info formatted for display"""
+        return {
+            tid: f"Line {info.current_line_index + 1}" if info.current_line_index is not None else info.status
+            for tid, info in self.thread_info.items()
+        }
+
+
+class BaseProcessingEngine(ABC):
+    """What a TTS run does with its lines, whatever sends the requests.
+    
+    Keys, breakers, retries, dedupe, journal, credits and stats live here.
+    Subclasses supply the API client, the worker loop, slot acquisition
+    and the request call, plus the hooks below that wake their workers.
+    """
+    
+    MAX_CONCURRENCY = 50
+    QUEUE_DEPTH_FACTOR = 4  # Queued lines per worker
+    HEDGE_RETRY_INTERVAL = 0.25  # Seconds between attempts to place a hedge
+    
+    def __init__(
+        self,
+        api_keys: List[APIKey],
+        proxies: List[Proxy],
+        voices: Dict[str, Voice],
+        output_folder: str,
+        thread_count: int = 5,
+        max_retries: int = 3,
+        default_voice_id: Optional[str] = None,
+        request_delay: float = 0.0,
+        on_progress: Optional[Callable[[ProcessingStats], None]] = None,
+        on_line_update: Optional[Callable[[TextLine], None]] = None,
+        on_log: Optional[Callable[[str], None]] = None,
+        on_credit_used: Optional[Callable[[APIKey, int], None]] = None,
+        on_key_removed: Optional[Callable[[APIKey, str], None]] = None,
+        on_complete: Optional[Callable[[ProcessingStats], None]] = None,
+        audio_cache: Optional[TTSAudioCache] = None,
+        journal_enabled: bool = True,
+        adaptive_concurrency: bool = True,
+        on_credits_flushed: Optional[Callable[[List[APIKey]], None]] = None,
+        credit_reconcile_interval: float = 120.0,
+        credit_reconcile_lines: int = 500,
+        dedupe_lines: bool = True,
+        hedge_requests: bool = False,
+        hedge_percentile: float = 95.0,
+        hedge_max_extra: float = 0.05,
+        warm_connections: bool = False,
+        streaming: bool = False,
+        output_format: str = DEFAULT_OUTPUT_FORMAT,
+        assemble_output: bool = False,
+        silence_gap: float = 0.0,
+        timing_offset: float = 0.0,
+        key_policy: str = POLICY_ROUND_ROBIN,
+        plan_keys: bool = False,
+        key_concurrency: int = 0,
+        circuit_breakers: bool = True
+    ):
+        # Workers (threads or coroutines) the run may use at once
+        self._concurrency_limit = min(max(1, thread_count), self.MAX_CONCURRENCY)
+        self._api = self._create_api(audio_cache, streaming)
+        self._on_key_removed = on_key_removed
+        self._key_manager = self._create_key_manager(api_keys, key_policy)
+        self._proxies = {p.id: p for p in proxies}
+        self._proxy_health = get_proxy_health()  # Background scores pick the route for each key
+        self._voices = voices
+        self._output_folder = output_folder
+        self._max_retries = max_retries
+        self._default_voice_id = default_voice_id
+        self._request_delay = max(0.0, request_delay)
+        
+        # AIMD pacing replaces the fixed request_delay; thread_count becomes the ceiling
+        self._adaptive_concurrency = adaptive_concurrency
+        self._concurrency: Optional[AdaptiveConcurrencyController] = None
+        
+        self._on_progress = on_progress
+        self._on_line_update = on_line_update
+        self._on_log = on_log
+        self._on_credit_used = on_credit_used
+        self._on_complete = on_complete  # Called once a run has fully stopped
+        
+        # Credits are debited locally and reconciled with the API in the background
+        self._on_credits_flushed = on_credits_flushed
+        self._credit_reconcile_interval = credit_reconcile_interval
+        self._credit_reconcile_lines = credit_reconcile_lines
+        self._ledger: Optional[CreditLedger] = None
+        
+        # Crash-safe record of finished lines, kept in the output folder
+        self._journal_enabled = journal_enabled
+        self._journal: Optional[JobJournal] = None
+        
+        # Identical lines in one run are rendered once and copied to the rest
+        self._dedupe_lines = dedupe_lines
+        self._duplicates = DuplicateGroups()
+        
+        # Hedging: a request slower than the recent percentile gets a duplicate on another key
+        self._hedge_requests = hedge_requests
+        self._latency = LatencyTracker(percentile=hedge_percentile)
+        self._hedge_max_extra = hedge_max_extra
+        self._hedge_budget: Optional[HedgeBudget] = None
+        
+        # Open keep-alive connections before the first line instead of on it
+        self._warm_connections = warm_connections
+        # Project-wide encoding; a voice's own output_format takes precedence
+        self._output_format = output_format
+        # Append finished lines to the combined audio/SRT in order while the run goes on
+        self._assemble_output = assemble_output
+        self._silence_gap = silence_gap
+        self._timing_offset = timing_offset
+        self._plan_keys = plan_keys
+        self._key_concurrency = key_concurrency  # Requests one key may run at once, for planning
+        self._key_plan: Optional[KeyPlan] = None
+        self._assembler: Optional[IncrementalAssembler] = None
+        self._assembly_result: Optional[AssemblyResult] = None
+        
+        # Keys/proxies that keep failing are skipped by every worker until a probe succeeds
+        self._circuit_breakers = circuit_breakers
+        self._breakers: Optional[BreakerBoard] = None
+        
+        # Failed attempts wait out their backoff here instead of in a worker
+        self._retry_policy = RetryPolicy(max_retries)
+        self._retry_queue: "DelayQueue[LineJob]" = self._create_retry_queue()
+        self._next_request_at = 0.0  # request_delay pacing
+        self._cancelled = False
+        
+        self._running = False
+        self._paused = False
+        self._stop_requested = False
+        self._stats = ProcessingStats()
+        self._lock = threading.Lock()
+        self._process_thread: Optional[threading.Thread] = None
+        
+        # Dispatch pipeline: lines pulled lazily, urgent ones jump the queue
+        self._priority: "deque[TextLine]" = deque()
+        self._in_pipeline: set = set()  # id() of lines queued or being processed
+        
+        # Loop mode
+        self._loop_enabled = False
+        self._loop_count = 0
+        self._loop_delay = 5
+    
+    # --- What each engine provides ---
+    
+    @abstractmethod
+    def _create_api(self, audio_cache: Optional[TTSAudioCache], streaming: bool):
+        """The ElevenLabs client this engine sends requests with"""
+    
+    @abstractmethod
+    def _create_key_manager(self, api_keys: List[APIKey], policy: str):
+        """The key manager matching the client (reports removals to _handle_key_removed)"""
+    
+    @abstractmethod
+    def _reconcile_key(self, key: APIKey) -> bool:
+        """Fetch real usage for a key; runs on the credit ledger's thread"""
+    
+    @abstractmethod
+    def _submit_attempt(
+        self,
+        attempt: RequestAttempt,
+        text: str,
+        voice_id: str,
+        settings: VoiceSettings,
+        language_code: Optional[str]
+    ) -> Any:
+        """Run _attempt_tts in the background; returns its future or task"""
+    
+    @abstractmethod
+    def _launch(self, lines: List[TextLine]):
+        """Start the run's worker loop in the background once start() has prepared it"""
+    
+    @abstractmethod
+    def _wake_workers(self):
+        """Wake every idle worker so it looks for work again (from the workers' side)"""
+    
+    @abstractmethod
+    def _set_paused(self, paused: bool):
+        """Hold workers at their next pause check, or let them go (any thread)"""
+    
+    @abstractmethod
+    def _interrupt_waits(self):
+        """Wake every worker waiting on a pause, work or a slot so it sees the stop (any thread)"""
+    
+    @abstractmethod
+    def _abort_requests(self):
+        """Abandon the requests in flight; their attempts end as CANCELLED (any thread)"""
+    
+    def _create_retry_queue(self) -> "DelayQueue[LineJob]":
+        return DelayQueue()
+    
+    def _prepare_run(self):
+        """Per-run setup of the engine's own resources, called by start()"""
+    
+    def _signal_slots(self):
+        """Wake workers waiting in _acquire_slot (an engine whose wait is not woken by the controller overrides this)"""
+    
+    def _signal_slots_after(self, delay: float):
+        """Wake workers waiting in _acquire_slot once a cooldown of delay seconds has passed"""
+    
+    # --- Shared bookkeeping ---
+    
+    def _log(self, message: str):
+        if self._on_log:
+            self._on_log(f"[{datetime.now().strftime('%H:%M:%S')}] {message}")
+    
+    def _handle_key_removed(self, key: APIKey, reason: str):
+        """Handle API key removal due to low credits"""
+        self._log(f"API key '{key.name or key.id[:8]}' removed: {reason}")
+        if self._on_key_removed:
+            self._on_key_removed(key, reason)
+    
+    def _update_stats(self):
+        if self._breakers is not None:
+            self._stats.breakers = self._breaker_states()
+        if self._on_progress:
+            self._on_progress(self._stats)
+    
+    def _update_line(self, line: TextLine):
+        if self._assembler is not None and line.status == LineStatus.DONE:
+            self._assembler.notify()
+        if self._on_line_update:
+            self._on_line_update(line)
+    
+    def _get_proxy_for_key(self, key: APIKey) -> Optional[Proxy]:
+        proxies = self._proxies.values()
+        if self._breakers is not None:
+            proxies = [p for p in proxies if not self._breakers.proxy_blocked(p.id)]
+        return self._proxy_health.route(key.assigned_proxy_id, proxies)
+    
+    def _breaker_states(self) -> Dict[str, Dict[str, str]]:
+        snapshot = self._breakers.snapshot()
+        keys = {k.id: k for k in self._key_manager.keys}
+        return {
+            "keys": {
+                (keys[i].name or i[:8]) if i in keys else i[:8]: state
+                for i, state in snapshot["keys"].items()
+            },
+            "proxies": {
+                (self._proxies[i].name or self._proxies[i].host) if i in self._proxies else i[:8]: state
+                for i, state in snapshot["proxies"].items()
+            }
+        }
+    
+    def _blocked(self, key: APIKey, proxy: Optional[Proxy]) -> bool:
+        if self._breakers is None:
+            return False
+        return self._breakers.key_blocked(key.id) or (proxy is not None and self._breakers.proxy_blocked(proxy.id))
+    
+    def _pass_breakers(
+        self,
+        api_key: APIKey,
+        chars: int = 0
+    ) -> Optional[Tuple[APIKey, Optional[Proxy]]]:
+        """The key and route to send a line through: api_key's if their breakers admit it,
+        else the next key's whose do. The line's credit reservation moves with the key."""
+        key = api_key
+        for _ in range(max(1, len(self._key_manager.keys))):
+            proxy = self._get_proxy_for_key(key)
+            if self._breakers.allow(key.id, proxy.id if proxy else None):
+                if key is not api_key:
+                    self._key_manager.release_credits(api_key, chars)
+                    with self._lock:
+                        self._stats.rerouted += 1
+                return key, proxy
+            if key is not api_key:
+                self._key_manager.release_credits(key, chars)
+            key = self._key_manager.reserve_key(chars, exclude=api_key)
+            if key is None:
+                break
+        if key is not None and key is not api_key:
+            self._key_manager.release_credits(key, chars)
+        return None
+    
+    def _record_breakers(self, api_key: APIKey, proxy: Optional[Proxy], success: bool, message: str, status: Optional[int]):
+        """Feed a request's outcome to the breakers; a key whose breaker opens leaves rotation at once"""
+        if message == "CACHE_HIT":
+            # Never reached the API: says nothing about the key or proxy
+            self._breakers.release(api_key.id, proxy.id if proxy else None)
+            return
+        tripped = self._breakers.record(api_key.id, proxy.id if proxy else None, success, message, status)
+        if tripped == FAULT_KEY:
+            cooldown = self._breakers.key_cooldown(api_key.id)
+            self._key_manager.suspend_key(api_key, cooldown)
+            self._signal_slots_after(cooldown)
+            self._log(f"Circuit breaker opened for key {api_key.name or api_key.id[:8]}: skipping it for {cooldown:.0f}s")
+        elif tripped == FAULT_ROUTE:
+            self._signal_slots_after(self._breakers.proxy_cooldown(proxy.id))
+            self._log(f"Circuit breaker opened for proxy {proxy.name or proxy.host}: routing around it")
+        if tripped:
+            with self._lock:
+                self._stats.breaker_trips += 1
+            self._update_stats()
+    
+    def _voice_settings(self, voice_id: Optional[str]) -> VoiceSettings:
+        """Settings a line is rendered with, output format resolved"""
+        voice = self._voices.get(voice_id) if voice_id else None
+        settings = voice.settings if voice else VoiceSettings()
+        if settings.output_format:
+            return settings
+        return replace(settings, output_format=self._output_format)
+    
+    def _output_extension(self, settings: VoiceSettings) -> str:
+        try:
+            return AudioFormat.parse(settings.output_format).extension
+        except ValueError:
+            return ".mp3"  # The request itself reports the unsupported format
+    
+    def _finish_assembly(self):
+        result = self._assembler.finish(complete_run=not self._stop_requested)
+        self._assembler = None
+        self._assembly_result = result
+        if result.complete:
+            self._log(
+                f"Combined audio ready: {result.audio_path} ({result.lines} lines, {result.duration:.1f}s"
+                + (f", {result.skipped} unfinished lines left out)" if result.skipped else ")")
+            )
+        else:
+            self._log(f"Partial combined audio: {result.audio_path} ({result.lines} lines in order)")
+    
+    def _plan_key_assignment(self, lines: List[TextLine]) -> KeyPlan:
+        """Pack the run's lines into the keys' credits before any request is sent"""
+        plan = plan_key_assignment(
+            lines,
+            self._key_manager.keys,
+            min_credits=self._key_manager.MIN_CREDIT_THRESHOLD,
+            concurrency=self._concurrency_limit,
+            per_key_concurrency=self._key_concurrency
+        )
+        self._log(f"Key plan: {plan.summary()}")
+        return plan
+    
+    def _reserve_line_key(self, line: TextLine, chars: int) -> Optional[APIKey]:
+        """The planned key for a line if it still has room, else whichever key does"""
+        planned = self._key_plan.key_for(line.index) if self._key_plan else None
+        if planned is not None and self._key_manager.reserve_on_key(planned, chars):
+            return planned
+        return self._key_manager.reserve_key(chars)
+    
+    def _create_assembler(self, lines: List[TextLine]) -> Optional[IncrementalAssembler]:
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        ext = self._output_extension(VoiceSettings(output_format=self._output_format))
+        audio_path = os.path.join(self._output_folder, f"joined_{stamp}{ext}")
+        if not IncrementalAssembler.supports(audio_path):
+            self._log(f"Incremental assembly needs MP3 or WAV output; join the {ext} files after the run")
+            return None
+        assembler = IncrementalAssembler(
+            lines,
+            audio_path,
+            os.path.join(self._output_folder, f"subtitles_{stamp}.srt"),
+            silence_gap=self._silence_gap,
+            offset=self._timing_offset,
+            on_log=self._log
+        )
+        assembler.start()
+        return assembler
+    
+    def _line_fingerprint(self, line: TextLine) -> str:
+        voice_id = line.voice_id or self._default_voice_id
+        settings = self._voice_settings(voice_id)
+        return line_fingerprint(line.text, voice_id, settings.model.value, settings.output_format)
+    
+    def _dedupe_key(self, line: TextLine):
+        voice_id = line.voice_id or self._default_voice_id
+        if not voice_id:
+            return None
+        settings = self._voice_settings(voice_id)
+        return dedupe_key(line.text, voice_id, settings, line.detected_language)
+    
+    def _fan_out(self, leader: TextLine, chars_used: int, key_id: Optional[str]):
+        """Give every follower of a finished leader a copy of its audio"""
+        for follower in self._duplicates.followers(leader):
+            if follower.status != LineStatus.PENDING:
+                continue
+            ext = os.path.splitext(leader.output_path)[1]
+            output_path = os.path.join(self._output_folder, f"{follower.index + 1:05d}{ext}")
+            try:
+                link_or_copy(leader.output_path, output_path)
+            except OSError as e:
+                # Fail it on its own so a retry dispatches it normally
+                self._log(f"Could not copy audio of line {leader.index + 1} to line {follower.index + 1}: {e}")
+                follower.status = LineStatus.ERROR
+                follower.error_message = f"Could not copy duplicate audio: {e}"
+                with self._lock:
+                    self._duplicates.detach(follower)
+                    self._stats.failed += 1
+                self._update_line(follower)
+                continue
+            
+            follower.output_path = output_path
+            follower.audio_duration = leader.audio_duration
+            follower.model_used = leader.model_used
+            follower.error_message = None
+            follower.status = LineStatus.DONE
+            if self._journal:
+                self._journal.record_done(
+                    follower.index, self._line_fingerprint(follower), output_path,
+                    leader.audio_duration, key_id, leader.model_used
+                )
+            with self._lock:
+                self._stats.completed += 1
+                self._stats.deduplicated += 1
+                if chars_used:
+                    self._stats.dedup_saved_requests += 1
+                    self._stats.dedup_saved_credits += chars_used
+            self._update_line(follower)
+    
+    def _fail_followers(self, leader: TextLine, error: str):
+        """Followers share their leader's failure; the next loop retries the leader"""
+        for follower in self._duplicates.followers(leader):
+            if follower.status != LineStatus.PENDING:
+                continue
+            follower.status = LineStatus.ERROR
+            follower.error_message = error
+            follower.retry_count += 1
+            with self._lock:
+                self._stats.failed += 1
+            self._update_line(follower)
+    
+    def _resume_line(self, line: TextLine, completed: Dict[int, JournalEntry]) -> bool:
+        """Mark a line done if the journal already finished it. Returns True if resumed."""
+        entry = completed.get(line.index)
+        if entry is None or entry.fingerprint != self._line_fingerprint(line):
+            return False
+        if not looks_like_audio(entry.output_path):
+            return False
+        line.output_path = entry.output_path
+        line.audio_duration = entry.audio_duration
+        line.model_used = entry.model_id
+        line.error_message = None
+        line.status = LineStatus.DONE
+        self._update_line(line)
+        return True
+    
+    def _use_slot(self, job: LineJob, slot: Tuple[APIKey, Optional[Proxy]]) -> Tuple[APIKey, Optional[Proxy]]:
+        """Send the attempt through the key a slot was found on; the line's reservation moved with it"""
+        if self._breakers is not None and slot[0] is not job.api_key:
+            self._breakers.release(job.api_key.id, job.proxy.id if job.proxy else None)
+        job.reserved_key = slot[0]
+        return slot
+    
+    def _release_slot(
+        self,
+        api_key: APIKey,
+        proxy: Optional[Proxy],
+        success: bool,
+        message: str,
+        info: Dict[str, Any],
+        bucket: Optional[Tuple[str, int]] = None
+    ):
+        """Report a request's outcome and latency (for requests like it, see bucket) to the adaptive windows"""
+        if message == "CANCELLED":
+            outcome = OUTCOME_CANCELLED
+        elif message == "CACHE_HIT":
+            outcome = OUTCOME_CACHED
+        elif message == "RATE_LIMIT":
+            outcome = OUTCOME_RATE_LIMITED
+        elif info.get("timeout"):
+            outcome = OUTCOME_TIMEOUT
+        else:
+            outcome = OUTCOME_OK if success else OUTCOME_ERROR
+        self._concurrency.release(api_key.id, proxy.id if proxy else None, outcome, info.get("ttfb"), bucket)
+        self._stats.concurrency_window = self._concurrency.window
+        self._signal_slots()
+    
+    def _launch_hedge(
+        self,
+        primary: RequestAttempt,
+        output_path: str,
+        text: str,
+        voice_id: str,
+        settings: VoiceSettings,
+        language_code: Optional[str],
+        waited: float
+    ) -> Optional[Tuple[Any, RequestAttempt]]:
+        """Send a duplicate of a straggling request through a different key"""
+        if not self._hedge_budget.try_spend():
+            return None
+        key = self._key_manager.reserve_key(len(text), exclude=primary.api_key)
+        proxy = self._get_proxy_for_key(key) if key else None
+        if key is None or self._blocked(key, proxy) or \
+                (self._concurrency and not self._concurrency.try_acquire(key.id, proxy.id if proxy else None)):
+            if key is not None:
+                self._key_manager.release_credits(key, len(text))
+            self._hedge_budget.refund()
+            return None
+        
+        hedge = RequestAttempt(key, proxy, f"{output_path}.hedge.part", hedge=True, reserved=len(text))
+        with self._lock:
+            self._stats.hedged += 1
+        self._log(f"Hedging {os.path.basename(output_path)} on key {key.name or key.id[:8]} after {waited:.1f}s")
+        return self._submit_attempt(hedge, text, voice_id, settings, language_code), hedge
+    
+    def _abandon_attempt(self, attempt: RequestAttempt, text: str):
+        """Clean up a request that lost the hedge race, once it actually returns"""
+        if os.path.lexists(attempt.output_path):
+            try:
+                os.remove(attempt.output_path)
+            except OSError:
+                pass
+        if attempt.success and attempt.message != "CACHE_HIT":
+            # Finished anyway: the credits are spent
+            chars_used = character_cost(attempt.info.get("headers"), text)
+            self._ledger.debit(attempt.api_key, chars_used)
+            with self._lock:
+                self._stats.hedge_extra_credits += chars_used
+        self._key_manager.release_credits(attempt.api_key, attempt.reserved)
+        if self._concurrency:
+            self._release_slot(attempt.api_key, attempt.proxy, False, "CANCELLED", attempt.info)
+    
+    def _pick_winner(self, winner: RequestAttempt, output_path: str) -> RequestAttempt:
+        """Move the winning copy's audio to output_path (or drop a failed one's)"""
+        if winner.hedge and winner.success:
+            with self._lock:
+                self._stats.hedge_wins += 1
+        if winner.success:
+            if os.path.lexists(output_path):
+                os.remove(output_path)
+            os.replace(winner.output_path, output_path)
+            winner.output_path = output_path
+        elif os.path.lexists(winner.output_path):
+            os.remove(winner.output_path)
+        return winner
+    
+    def _start_line(self, line: TextLine) -> Optional[LineJob]:
+        """Reserve a key for a line and mark it processing. None if the line cannot start."""
+        # Get an API key with room for this line, reserving the credits until it finishes
+        chars_needed = len(line.text)
+        api_key = self._reserve_line_key(line, chars_needed)
+        if not api_key:
+            self._log(f"No available API keys for line {line.index + 1}")
+            return None
+        
+        # Get voice ID - use default if not set
+        voice_id = line.voice_id or self._default_voice_id
+        if not voice_id:
+            self._key_manager.release_credits(api_key, chars_needed)
+            self._log(f"No voice assigned for line {line.index + 1}")
+            line.status = LineStatus.ERROR
+            line.error_message = "No voice assigned"
+            self._update_line(line)
+            return None
+        
+        # Get voice settings
+        settings = self._voice_settings(voice_id)
+        
+        # Generate output path
+        output_path = os.path.join(
+            self._output_folder,
+            f"{line.index + 1:05d}{self._output_extension(settings)}"
+        )
+        
+        job = LineJob(
+            line=line,
+            voice_id=voice_id,
+            settings=settings,
+            output_path=output_path,
+            fingerprint=line_fingerprint(line.text, voice_id, settings.model.value, settings.output_format),
+            chars_needed=chars_needed,
+            api_key=api_key,
+            proxy=self._get_proxy_for_key(api_key),
+            reserved_key=api_key
+        )
+        
+        # Update status
+        with self._lock:
+            line.status = LineStatus.PROCESSING
+            self._stats.processing += 1
+        self._update_line(line)
+        
+        if self._journal:
+            self._journal.record_dispatch(line.index, job.fingerprint, api_key.id)
+        
+        # Log processing start with model info
+        self._log(f"Processing line {line.index + 1} with model: {settings.model.value}")
+        return job
+    
+    def _admit_attempt(self, job: LineJob, slot_id: int) -> Tuple[bool, Optional[bool]]:
+        """Checks before a started line's next request, once any pause is over.
+        Returns (True, None) to send it, else (False, the attempt's result)."""
+        line = job.line
+        if self._stop_requested:
+            return False, self._finish_line(job, False, slot_id)
+        
+        # A key or proxy other workers found broken is skipped without spending a request on it
+        if self._breakers is not None:
+            admitted = self._pass_breakers(job.api_key, job.chars_needed)
+            if admitted is None:
+                self._log(f"No key with a closed circuit breaker for line {line.index + 1}")
+                return False, self._retry_later(job, "Circuit breakers open on every usable key", slot_id)
+            job.api_key, job.proxy = admitted
+            job.reserved_key = job.api_key
+        
+        # Fixed pacing without the adaptive controller: wait in the delay queue, not in a worker
+        if self._concurrency is None and self._request_delay > 0 and not job.paced:
+            wait_for = self._reserve_request_start()
+            if wait_for > 0:
+                job.paced = True
+                self._queue_retry(job, wait_for)
+                return False, None
+        job.paced = False
+        
+        if job.attempts > 0:
+            self._log(f"Retry {job.attempts}/{self._retry_policy.max_attempts - 1} for line {line.index + 1}")
+        job.attempts += 1
+        return True, None
+    
+    def _settle_attempt(self, job: LineJob, attempt: RequestAttempt, slot_id: int) -> Optional[bool]:
+        """Book a returned request: breakers, windows and credits, then finish the line or retry it"""
+        line = job.line
+        success, message, duration = attempt.success, attempt.message, attempt.duration
+        api_key, proxy = attempt.api_key, attempt.proxy
+        job.api_key, job.proxy = api_key, proxy
+        
+        if self._breakers is not None:
+            self._record_breakers(api_key, proxy, success, message, attempt.info.get("status"))
+        
+        if self._concurrency:
+            self._release_slot(api_key, proxy, success, message, attempt.info,
+                               LatencyTracker.bucket(job.settings.model.value, len(line.text)))
+        
+        if success:
+            settings = job.settings
+            line.output_path = job.output_path
+            line.audio_duration = duration
+            line.error_message = None
+            line.status = LineStatus.DONE
+            line.model_used = settings.model.value  # Store which model was used
+            
+            if self._journal:
+                self._journal.record_done(
+                    line.index, job.fingerprint, job.output_path, duration,
+                    api_key.id, settings.model.value
+                )
+            
+            # Log the model used
+            self._log(f"Line {line.index + 1} completed with model: {settings.model.value}")
+            
+            if message == "CACHE_HIT":
+                # Served from the audio cache: no request was made, no credits spent
+                self._log(f"Line {line.index + 1} served from audio cache")
+                with self._lock:
+                    self._stats.cache_hits += 1
+                self._key_manager.release_credits(api_key, attempt.reserved)
+                self._fan_out(line, 0, api_key.id)
+                return self._finish_line(job, True, slot_id)
+            
+            # Debit locally; the ledger reconciles with the API in the background
+            chars_used = character_cost(attempt.info.get("headers"), line.text)
+            self._ledger.debit(api_key, chars_used)
+            self._key_manager.release_credits(api_key, attempt.reserved)  # A winning hedge's own reservation
+            if self._on_credit_used:
+                self._on_credit_used(api_key, chars_used)
+            
+            self._fan_out(line, chars_used, api_key.id)
+            return self._finish_line(job, True, slot_id)
+        
+        # Handle rate limiting
+        if message == "RATE_LIMIT":
+            self._log(f"Rate limit hit on key {api_key.name or api_key.id[:8]}, rotating...")
+            cooldown = self._concurrency.rate_limit_cooldown(api_key.id) if self._concurrency else 60
+            self._key_manager.mark_key_rate_limited(api_key, cooldown)
+            self._signal_slots_after(cooldown)
+            # Try with a different key, taking the reservation along
+            job.api_key = self._key_manager.reserve_key(job.chars_needed)
+            self._key_manager.release_credits(job.reserved_key, job.chars_needed)
+            job.reserved_key = job.api_key
+            if not job.api_key:
+                job.last_error = message
+                return self._finish_line(job, False, slot_id)
+            job.proxy = self._get_proxy_for_key(job.api_key)
+        
+        # Check if all keys exhausted
+        if self._key_manager.all_keys_exhausted():
+            self._log("All API keys exhausted")
+            job.last_error = message
+            return self._finish_line(job, False, slot_id)
+        
+        return self._retry_later(job, message, slot_id)
+    
+    def _retry_later(self, job: LineJob, error: str, slot_id: int) -> Optional[bool]:
+        """Put a failed line on the delay queue if its error class has retries left, else fail it"""
+        job.last_error = error
+        cls = error_class(error)
+        if self._stop_requested or not self._retry_policy.allows(job.retries, job.attempts, cls):
+            return self._finish_line(job, False, slot_id)
+        job.retries[cls] = job.retries.get(cls, 0) + 1
+        delay = self._retry_policy.delay(job.retries[cls])
+        if self._blocked(job.api_key, job.proxy):
+            delay = 0.0  # The next attempt goes through another key or proxy
+        self._log(f"Line {job.line.index + 1} will retry in {delay:.1f}s ({cls})")
+        self._queue_retry(job, delay)
+        return None
+    
+    def _queue_retry(self, job: LineJob, delay: float):
+        self._retry_queue.put(job, delay)
+    
+    def _reserve_request_start(self) -> float:
+        """Seconds until this request may start under request_delay pacing.
+        Starts are spaced so the workers together keep the configured delay."""
+        spacing = self._request_delay / self._concurrency_limit
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_request_at)
+            self._next_request_at = start + spacing
+        return start - now
+    
+    def _finish_line(self, job: LineJob, success: bool, slot_id: int) -> bool:
+        """Settle a line's stats, journal and followers once it succeeded or ran out of retries"""
+        line = job.line
+        
+        # Usage is debited by now; hand back what was set aside
+        if job.reserved_key:
+            self._key_manager.release_credits(job.reserved_key, job.chars_needed)
+        
+        # Update final status
+        with self._lock:
+            self._stats.processing -= 1
+            if success:
+                self._stats.completed += 1
+            else:
+                line.status = LineStatus.ERROR
+                line.error_message = job.last_error
+                line.retry_count += 1
+                self._stats.failed += 1
+                if self._journal:
+                    self._journal.record_failed(
+                        line.index, job.fingerprint, job.last_error, job.api_key.id if job.api_key else None
+                    )
+            
+            if slot_id in self._stats.thread_info:
+                self._stats.thread_info[slot_id].lines_processed += 1
+        
+        if not success:
+            self._fail_followers(line, job.last_error)
+        
+        self._update_line(line)
+        self._update_stats()
+        
+        return success
+    
+    def start(self, lines: List[TextLine]):
+        """Start processing lines"""
+        if self._running:
+            return
+        
+        self._running = True
+        self._stop_requested = False
+        self._cancelled = False
+        self._paused = False
+        self._priority.clear()
+        self._in_pipeline.clear()
+        self._duplicates.clear()
+        
+        max_concurrency = self._concurrency_limit
+        if self._adaptive_concurrency:
+            self._concurrency = AdaptiveConcurrencyController(max_concurrency)
+        
+        self._breakers = BreakerBoard() if self._circuit_breakers else None
+        self._retry_queue = self._create_retry_queue()
+        self._next_request_at = 0.0
+        self._hedge_budget = HedgeBudget(self._hedge_max_extra) if self._hedge_requests else None
+        self._prepare_run()
+        
+        self._ledger = CreditLedger(
+            refresh_key=self._reconcile_key,
+            on_flush=self._on_credits_flushed,
+            reconcile_interval=self._credit_reconcile_interval,
+            reconcile_lines=self._credit_reconcile_lines,
+            on_log=self._log
+        )
+        self._ledger.start()
+        
+        # Skip lines a previous (possibly crashed) run already rendered
+        self._journal = None
+        completed: Dict[int, JournalEntry] = {}
+        if self._journal_enabled:
+            try:
+                self._journal = JobJournal(self._output_folder)
+                completed = self._journal.load_completed()
+                self._journal.compact()
+                self._journal.open()
+            except Exception as e:
+                self._log(f"Job journal unavailable, continuing without it: {e}")
+                self._journal = None
+        
+        self._assembly_result = None
+        self._assembler = self._create_assembler(lines) if self._assemble_output else None
+        
+        # Single pass, no copies: reset error lines to pending, resume journaled ones, count the rest
+        pending_count = 0
+        resumed = 0
+        to_plan: List[TextLine] = []
+        for line in lines:
+            if line.status not in (LineStatus.PENDING, LineStatus.ERROR):
+                continue
+            if line.status == LineStatus.ERROR:
+                line.status = LineStatus.PENDING
+                line.error_message = None
+                self._update_line(line)
+            if completed and self._resume_line(line, completed):
+                resumed += 1
+                continue
+            if self._dedupe_lines:
+                key = self._dedupe_key(line)
+                if key is not None and not self._duplicates.add(line, key):
+                    pending_count += 1
+                    continue  # A follower reuses its leader's audio and spends no credits
+            if self._plan_keys:
+                to_plan.append(line)
+            pending_count += 1
+        if resumed:
+            self._log(f"Resumed {resumed} already rendered lines from job journal")
+        if self._duplicates.follower_count:
+            self._log(f"{self._duplicates.follower_count} duplicate lines will reuse the audio of an identical line")
+        self._key_plan = self._plan_key_assignment(to_plan) if self._plan_keys else None
+        
+        # Reset stats
+        self._stats = ProcessingStats(
+            total=pending_count,
+            start_time=datetime.now(),
+            concurrency_window=self._concurrency.window if self._concurrency else max_concurrency
+        )
+        self._update_stats()
+        
+        # Ensure output folder exists
+        os.makedirs(self._output_folder, exist_ok=True)
+        
+        self._launch(lines)
+    
+    def prioritize(self, lines: Iterable[TextLine]):
+        """Dispatch these pending lines before the rest. Safe to call mid-run."""
+        self._priority.extend(self._duplicates.leader_of(line) for line in lines)
+    
+    def _claim(self, line: TextLine) -> bool:
+        """Reserve a pending line for dispatch so it is never queued twice"""
+        with self._lock:
+            if line.status != LineStatus.PENDING or id(line) in self._in_pipeline:
+                return False
+            if self._duplicates.is_follower(line):
+                return False
+            self._in_pipeline.add(id(line))
+            return True
+    
+    def _iter_pending(self, lines: Iterable[TextLine]) -> Iterator[TextLine]:
+        """Lazily yield lines to dispatch: prioritized ones first, then file order"""
+        for line in lines:
+            while self._priority:
+                urgent = self._priority.popleft()
+                if self._claim(urgent):
+                    yield urgent
+            if self._claim(line):
+                yield line
+        while self._priority:
+            urgent = self._priority.popleft()
+            if self._claim(urgent):
+                yield urgent
+    
+    def _leave_pipeline(self, line: TextLine):
+        """Forget a settled line; the last one out wakes the workers waiting to exit"""
+        with self._lock:
+            self._in_pipeline.discard(id(line))
+            drained = not self._in_pipeline
+        if drained:
+            self._wake_workers()
+    
+    def _worker_busy(self, slot_id: int, line: TextLine) -> ThreadInfo:
+        with self._lock:
+            info = self._stats.thread_info.setdefault(slot_id, ThreadInfo(thread_id=slot_id))
+            info.status = "working"
+            info.current_line_index = line.index
+            info.last_activity = datetime.now()
+        return info
+    
+    def _worker_idle(self, info: ThreadInfo, line: TextLine, result: Optional[bool]):
+        """A worker is done with one attempt; the line stays in the pipeline while a retry of it waits"""
+        with self._lock:
+            info.status = "idle"
+            info.current_line_index = None
+        if result is not None:
+            self._leave_pipeline(line)
+    
+    def _end_run(self):
+        self._running = False
+        self._log("Processing complete")
+        if self._on_complete:
+            self._on_complete(self._stats)
+    
+    def stop(self):
+        """Stop processing gracefully"""
+        self._stop_requested = True
+        self._interrupt_waits()
+        self._log("Stop requested, waiting for current tasks to complete...")
+    
+    def cancel(self):
+        """Stop processing and abandon the requests in flight; their lines fail as CANCELLED"""
+        self._cancelled = True
+        self._abort_requests()
+        self.stop()
+    
+    def pause(self):
+        """Pause processing"""
+        if self._running and not self._paused:
+            self._paused = True
+            self._set_paused(True)
+            self._log("Processing paused")
+    
+    def resume(self):
+        """Resume processing"""
+        if self._running and self._paused:
+            self._paused = False
+            self._set_paused(False)
+            self._log("Processing resumed")
+    
+    def set_loop_mode(self, enabled: bool, count: int = 0, delay: int = 5):
+        """Configure loop mode"""
+        self._loop_enabled = enabled
+        self._loop_count = count
+        self._loop_delay = delay
+    
+    @property
+    def is_running(self) -> bool:
+        return self._running
+    
+    @property
+    def key_plan(self) -> Optional[KeyPlan]:
+        """The line-to-key plan made at start, if planning is on"""
+        return self._key_plan
+    
+    @property
+    def assembly_result(self) -> Optional[AssemblyResult]:
+        """Combined audio/SRT written during the last run, once it has ended"""
+        return self._assembly_result
+    
+    @property
+    def is_paused(self) -> bool:
+        return self._paused
+    
+    @property
+    def stats(self) -> ProcessingStats:
+        return self._stats
@@ -0,0 +1,101 @@
+"""Hedged TTS requests: re-issue stragglers on another key/proxy"""
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, Tuple
+
+from core.models import APIKey, Proxy
+
+
+class LatencyTracker:
+    """Rolling request latencies per (model, text-length bucket).
+    
+    threshold() is the configured percentile of the recent window, i.e.
+    how long a request may run before it counts as a straggler. Buckets
+    are powers of two in characters, since render time grows with length.
+    """
+    
+    WINDOW = 200
+    MIN_SAMPLES = 20
+    
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        min_delay: float = 1.0,
+        window: int = WINDOW,
+        min_samples: int = MIN_SAMPLES
+    ):
+        self._percentile = min(max(percentile, 1.0), 99.9)
+        self._min_delay = min_delay
+        self._window = window
+        self._min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples: Dict[Tuple[str, int], "deque[float]"] = {}
+    
+    @staticmethod
+    def bucket(model_id: str, chars: int) -> Tuple[str, int]:
+        return model_id, max(0, chars).bit_length()
+    
+    def record(self, model_id: str, chars: int, latency: float):
+        key = self.bucket(model_id, chars)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self._window)
+            samples.append(latency)
+    
+    def threshold(self, model_id: str, chars: int) -> Optional[float]:
+        """Seconds after which a request should be hedged, or None while still learning"""
+        with self._lock:
+            samples = self._samples.get(self.bucket(model_id, chars))
+            if samples is None or len(samples) < self._min_samples:
+                return None
+            ordered = sorted(samples)
+        rank = min(len(ordered) - 1, int(len(ordered) * self._percentile / 100.0))
+        return max(self._min_delay, ordered[rank])
+
+
+class HedgeBudget:
+    """Caps hedges at a fraction of hedge-eligible requests.
+    
+    Hedges that get past headers are billed like any request, so this is
+    what bounds the extra credit spend.
+    """
+    
+    def __init__(self, max_extra: float = 0.05, burst: int = 2):
+        self._max_extra = max(0.0, max_extra)
+        self._burst = burst
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._hedges = 0
+    
+    def on_request(self):
+        with self._lock:
+            self._requests += 1
+    
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._hedges >= self._burst + self._requests * self._max_extra:
+                return False
+            self._hedges += 1
+            return True
+    
+    def refund(self):
+        with self._lock:
+            self._hedges = max(0, self._hedges - 1)
+
+
+@dataclass
+class RequestAttempt:
+    """One copy of a TTS request (the primary or its hedge) and its outcome"""
+    api_key: APIKey
+    proxy: Optional[Proxy]
+    output_path: str
+    hedge: bool = False
+    reserved: int = 0  # Credits this copy holds on api_key (hedges; the line holds the primary's)
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    success: bool = False
+    message: str = ""
+    duration: Optional[float] = None
+    latency: float = 0.0
+    info: Dict[str, Any] = field(default_factory=dict)
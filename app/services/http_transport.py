@@ -0,0 +1,222 @@
+"""Process-wide pooled HTTP transport for API clients"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Any, Iterable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.models import Proxy
+
+
+DIRECT = "direct"
+
+
+@dataclass
+class PoolMetrics:
+    """Connection pool usage for one transport (direct or one proxy)"""
+    transport: str
+    pool_size: int
+    active_requests: int = 0
+    peak_active_requests: int = 0
+    requests: int = 0
+    idle_connections: int = 0
+    connections_opened: int = 0  # New TCP/TLS handshakes since the pool was created
+    
+    @property
+    def utilization(self) -> float:
+        if self.pool_size == 0:
+            return 0.0
+        return min(1.0, self.active_requests / self.pool_size)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "transport": self.transport,
+            "pool_size": self.pool_size,
+            "active_requests": self.active_requests,
+            "peak_active_requests": self.peak_active_requests,
+            "requests": self.requests,
+            "idle_connections": self.idle_connections,
+            "connections_opened": self.connections_opened,
+            "utilization": self.utilization
+        }
+
+
+class MeteredHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that counts requests in flight through it"""
+    
+    def __init__(self, pool_size: int):
+        super().__init__(pool_connections=4, pool_maxsize=pool_size, pool_block=False)
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self.active = 0
+        self.peak_active = 0
+        self.requests = 0
+    
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.active += 1
+            self.requests += 1
+            self.peak_active = max(self.peak_active, self.active)
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+    
+    def _pools(self) -> Iterable[Any]:
+        managers = [self.poolmanager] + list(self.proxy_manager.values())
+        for manager in managers:
+            for key in list(manager.pools.keys()):
+                pool = manager.pools.get(key)
+                if pool is not None:
+                    yield pool
+    
+    def connection_counts(self) -> Dict[str, int]:
+        """Idle keep-alive connections and total connections opened, across host pools"""
+        idle = 0
+        opened = 0
+        for pool in self._pools():
+            opened += getattr(pool, "num_connections", 0)
+            queue = getattr(pool, "pool", None)
+            if queue is not None:
+                idle += sum(1 for conn in list(queue.queue) if conn is not None)
+        return {"idle": idle, "opened": opened}
+
+
+class TransportRegistry:
+    """One keep-alive requests.Session per proxy (plus one direct), shared process-wide.
+    
+    Every ElevenLabsAPI instance draws its sessions from here, so the
+    engine, key manager, transcription and backend all reuse the same
+    warm connections. Pools never block: ensure_pool_size() sizes them to
+    the caller's concurrency so no request waits for a slot or has its
+    connection discarded for lack of room.
+    """
+    
+    DEFAULT_POOL_SIZE = 10
+    MAX_WARMUP_CONNECTIONS = 20
+    
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE):
+        self._lock = threading.Lock()
+        self._pool_size = max(1, pool_size)
+        self._sessions: Dict[str, requests.Session] = {}
+        self._adapters: Dict[str, MeteredHTTPAdapter] = {}
+    
+    @staticmethod
+    def transport_id(proxy: Optional[Proxy]) -> str:
+        return proxy.get_url() if proxy else DIRECT
+    
+    def _mount(self, session: requests.Session, transport: str):
+        adapter = MeteredHTTPAdapter(self._pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        self._adapters[transport] = adapter
+    
+    def session(self, proxy: Optional[Proxy] = None) -> requests.Session:
+        """Shared session for requests going through proxy (or direct)"""
+        transport = self.transport_id(proxy)
+        session = self._sessions.get(transport)
+        if session is not None:
+            return session
+        with self._lock:
+            session = self._sessions.get(transport)
+            if session is None:
+                session = requests.Session()
+                self._mount(session, transport)
+                self._sessions[transport] = session
+            return session
+    
+    def ensure_pool_size(self, pool_size: int):
+        """Grow every pool to at least pool_size connections.
+        
+        Growing replaces the adapter, dropping that transport's idle
+        connections, so call it at engine start rather than per request.
+        """
+        with self._lock:
+            if pool_size <= self._pool_size:
+                return
+            self._pool_size = pool_size
+            for transport, session in self._sessions.items():
+                old = self._adapters.get(transport)
+                self._mount(session, transport)
+                if old is not None:
+                    old.close()
+    
+    def warmup(self, url: str, proxies: Iterable[Optional[Proxy]], connections: int):
+        """Open about `connections` keep-alive connections ahead of time, split across transports.
+        
+        Sends cheap unauthenticated HEAD requests in parallel so the TCP and
+        TLS handshakes happen now instead of on the first TTS requests.
+        """
+        targets = {self.transport_id(p): p for p in proxies}
+        if connections <= 0 or not targets:
+            return
+        per_transport = -(-connections // len(targets))
+        per_transport = min(per_transport, self._pool_size, self.MAX_WARMUP_CONNECTIONS)
+        
+        def touch(proxy: Optional[Proxy]):
+            proxy_url = proxy.get_url() if proxy else None
+            try:
+                self.session(proxy).head(
+                    url,
+                    proxies={"http": proxy_url, "https": proxy_url} if proxy_url else None,
+                    timeout=10
+                )
+            except requests.RequestException:
+                pass
+        
+        jobs = [p for p in targets.values() for _ in range(per_transport)]
+        with ThreadPoolExecutor(max_workers=min(len(jobs), 32), thread_name_prefix="http-warmup") as executor:
+            list(executor.map(touch, jobs))
+    
+    @property
+    def pool_size(self) -> int:
+        return self._pool_size
+    
+    def metrics(self) -> List[PoolMetrics]:
+        with self._lock:
+            adapters = list(self._adapters.items())
+        result = []
+        for transport, adapter in adapters:
+            counts = adapter.connection_counts()
+            result.append(PoolMetrics(
+                transport=transport if transport == DIRECT else _redact(transport),
+                pool_size=adapter.pool_size,
+                active_requests=adapter.active,
+                peak_active_requests=adapter.peak_active,
+                requests=adapter.requests,
+                idle_connections=counts["idle"],
+                connections_opened=counts["opened"]
+            ))
+        return result
+    
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._adapters.clear()
+
+
+def _redact(proxy_url: str) -> str:
+    """Strip credentials from a proxy URL for display"""
+    if "@" not in proxy_url:
+        return proxy_url
+    scheme, _, rest = proxy_url.partition("://")
+    return f"{scheme}://{rest.rsplit('@', 1)[1]}"
+
+
+# Global transport registry
+_transport_registry: Optional[TransportRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_transport_registry() -> TransportRegistry:
+    global _transport_registry
+    if _transport_registry is None:
+        with _registry_lock:
+            if _transport_registry is None:
+                _transport_registry = TransportRegistry()
+    return _transport_registry
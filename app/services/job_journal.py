@@ -0,0 +1,197 @@
+"""Crash-safe append-only journal of TTS line processing"""
+import os
+import time
+import queue
+import sqlite3
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Optional, Dict, Tuple
+
+from core.models import DEFAULT_OUTPUT_FORMAT
+from services.audio_format import looks_like_audio_header
+
+
+JOURNAL_FILENAME = ".2tts_journal.db"
+
+MIN_AUDIO_BYTES = 128  # Anything smaller can't hold a single MP3 frame plus header
+
+
+@dataclass
+class JournalEntry:
+    """Last recorded completion of a line"""
+    line_index: int
+    fingerprint: str
+    output_path: str
+    audio_duration: Optional[float]
+    key_id: Optional[str]
+    model_id: Optional[str]
+
+
+def line_fingerprint(
+    text: str,
+    voice_id: Optional[str],
+    model_id: Optional[str],
+    output_format: Optional[str] = None
+) -> str:
+    """Identify what a line renders to, so edited lines aren't resumed"""
+    material = f"{voice_id or ''}\x00{model_id or ''}\x00{text}"
+    if output_format and output_format != DEFAULT_OUTPUT_FORMAT:
+        # Default-format fingerprints stay as they were, so existing journals still resume
+        material += f"\x00{output_format}"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def looks_like_audio(path: str) -> bool:
+    """Cheap completeness check: plausible size and an MP3, WAV or Ogg header"""
+    try:
+        if os.path.getsize(path) < MIN_AUDIO_BYTES:
+            return False
+        with open(path, "rb") as f:
+            head = f.read(12)
+    except OSError:
+        return False
+    return looks_like_audio_header(head)
+
+
+class JobJournal:
+    """SQLite (WAL) journal of dispatch/done/failed events for one output folder.
+    
+    record_* calls only enqueue; a single writer thread commits events in
+    batches, so the per-line cost stays negligible with many worker threads.
+    """
+    
+    FLUSH_INTERVAL = 0.25  # seconds
+    MAX_BATCH = 500
+    
+    def __init__(self, output_folder: str):
+        self._path = os.path.join(output_folder, JOURNAL_FILENAME)
+        os.makedirs(output_folder, exist_ok=True)
+        self._queue: "queue.Queue[Optional[Tuple]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._init_db()
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS line_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ts REAL NOT NULL,
+                    event TEXT NOT NULL,
+                    line_index INTEGER NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    output_path TEXT,
+                    audio_duration REAL,
+                    key_id TEXT,
+                    model_id TEXT,
+                    error TEXT
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_line_events_line ON line_events(line_index, id)")
+            conn.commit()
+        finally:
+            conn.close()
+    
+    @property
+    def path(self) -> str:
+        return self._path
+    
+    def open(self):
+        """Start the background writer"""
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer.start()
+    
+    def close(self):
+        """Flush pending events and stop the writer"""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._writer = None
+    
+    def _write_loop(self):
+        conn = self._connect()
+        try:
+            stopping = False
+            while not stopping:
+                batch = []
+                try:
+                    item = self._queue.get(timeout=self.FLUSH_INTERVAL)
+                except queue.Empty:
+                    continue
+                if item is None:
+                    stopping = True
+                else:
+                    batch.append(item)
+                while len(batch) < self.MAX_BATCH:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+                if batch:
+                    try:
+                        conn.executemany(
+                            "INSERT INTO line_events (ts, event, line_index, fingerprint, output_path, "
+                            "audio_duration, key_id, model_id, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            batch
+                        )
+                        conn.commit()
+                    except sqlite3.Error:
+                        conn.rollback()
+        finally:
+            conn.close()
+    
+    def record_dispatch(self, line_index: int, fingerprint: str, key_id: Optional[str] = None):
+        self._queue.put((time.time(), "dispatch", line_index, fingerprint, None, None, key_id, None, None))
+    
+    def record_done(
+        self,
+        line_index: int,
+        fingerprint: str,
+        output_path: str,
+        audio_duration: Optional[float],
+        key_id: Optional[str] = None,
+        model_id: Optional[str] = None
+    ):
+        self._queue.put((time.time(), "done", line_index, fingerprint, output_path, audio_duration, key_id, model_id, None))
+    
+    def record_failed(self, line_index: int, fingerprint: str, error: str, key_id: Optional[str] = None):
+        self._queue.put((time.time(), "failed", line_index, fingerprint, None, None, key_id, None, error[:500]))
+    
+    def load_completed(self) -> Dict[int, JournalEntry]:
+        """Lines whose most recent event is a completion, by line index"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                """SELECT e.line_index, e.fingerprint, e.output_path, e.audio_duration, e.key_id, e.model_id
+                   FROM line_events e
+                   JOIN (SELECT line_index, MAX(id) AS last_id FROM line_events GROUP BY line_index) last
+                     ON e.id = last.last_id
+                   WHERE e.event = 'done'"""
+            ).fetchall()
+        finally:
+            conn.close()
+        return {row[0]: JournalEntry(*row) for row in rows}
+    
+    def compact(self):
+        """Drop every event except the latest one per line"""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "DELETE FROM line_events WHERE id NOT IN "
+                "(SELECT MAX(id) FROM line_events GROUP BY line_index)"
+            )
+            conn.commit()
+        finally:
+            conn.close()
@@ -0,0 +1,165 @@
+"""Up-front assignment of a run's lines to API keys by remaining credits"""
+from array import array
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Any, Sequence
+
+from core.models import APIKey, TextLine
+
+
+UNPLANNED = -1
+
+
+class _FirstFitTree:
+    """Max segment tree over key capacities: leftmost key with room for n, in O(log k)"""
+    
+    def __init__(self, capacities: Sequence[int]):
+        self._size = 1
+        while self._size < max(1, len(capacities)):
+            self._size *= 2
+        self._tree = [-1] * (2 * self._size)
+        self._tree[self._size:self._size + len(capacities)] = capacities
+        for i in range(self._size - 1, 0, -1):
+            self._tree[i] = max(self._tree[2 * i], self._tree[2 * i + 1])
+    
+    def first_at_least(self, need: int) -> int:
+        """Leftmost slot whose capacity is >= need, or -1"""
+        if self._tree[1] < need:
+            return -1
+        i = 1
+        while i < self._size:
+            i = 2 * i if self._tree[2 * i] >= need else 2 * i + 1
+        return i - self._size
+    
+    def set(self, slot: int, capacity: int):
+        i = slot + self._size
+        self._tree[i] = capacity
+        i //= 2
+        while i:
+            self._tree[i] = max(self._tree[2 * i], self._tree[2 * i + 1])
+            i //= 2
+
+
+@dataclass
+class KeyPlan:
+    """Which key each pending line should use, and whether the run fits the credits"""
+    keys: List[APIKey]
+    assignment: array  # Key slot per line index, UNPLANNED where none had room
+    planned_chars: List[int]  # Characters planned per key slot
+    lines: int = 0
+    placed: int = 0
+    needed: int = 0  # Characters across all planned lines
+    available: int = 0  # Remaining credits across usable keys
+    unplaced_chars: int = 0
+    line_cap: Optional[int] = None  # Lines per key allowed before spreading gave way to fitting
+    
+    @property
+    def fits(self) -> bool:
+        return self.placed == self.lines
+    
+    def key_for(self, line_index: int) -> Optional[APIKey]:
+        if 0 <= line_index < len(self.assignment):
+            slot = self.assignment[line_index]
+            if slot != UNPLANNED:
+                return self.keys[slot]
+        return None
+    
+    @property
+    def keys_used(self) -> int:
+        return sum(1 for chars in self.planned_chars if chars)
+    
+    def summary(self) -> str:
+        text = (
+            f"{self.placed}/{self.lines} lines planned on {self.keys_used} keys, "
+            f"{self.needed:,} of {self.available:,} credits"
+        )
+        if self.fits:
+            return f"{text}; the whole project fits"
+        short = self.lines - self.placed
+        if self.needed > self.available:
+            return f"{text}; {short} lines ({self.unplaced_chars:,} chars) don't fit, {self.needed - self.available:,} credits short"
+        return f"{text}; {short} lines ({self.unplaced_chars:,} chars) don't fit any single key's remaining credits"
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "lines": self.lines,
+            "placed": self.placed,
+            "fits": self.fits,
+            "needed": self.needed,
+            "available": self.available,
+            "unplaced_chars": self.unplaced_chars,
+            "keys": {
+                key.id: chars for key, chars in zip(self.keys, self.planned_chars) if chars
+            }
+        }
+
+
+def plan_key_assignment(
+    lines: Sequence[TextLine],
+    keys: Sequence[APIKey],
+    min_credits: int = 0,
+    concurrency: int = 1,
+    per_key_concurrency: int = 0
+) -> KeyPlan:
+    """First-fit-decreasing packing of lines into keys' remaining credits.
+    
+    Lines go longest first to the first key, emptiest first, that still
+    has room for them; a key takes a line only while it holds at least
+    min_credits, as at run time. When per_key_concurrency is set and one
+    key can't keep `concurrency` requests busy on its own, a first pass
+    caps each key's share of lines so the run is spread over enough keys
+    to stay parallel; whatever that leaves over is packed without caps.
+    """
+    usable = sorted(
+        (k for k in keys if k.enabled and k.is_valid and k.remaining_credits >= max(1, min_credits)),
+        key=lambda k: k.remaining_credits
+    )
+    free = [k.remaining_credits for k in usable]
+    planned_chars = [0] * len(usable)
+    line_counts = [0] * len(usable)
+    
+    size = max((line.index for line in lines), default=-1) + 1
+    plan = KeyPlan(
+        keys=usable,
+        assignment=array("i", [UNPLANNED]) * size,
+        planned_chars=planned_chars,
+        lines=len(lines),
+        available=sum(free)
+    )
+    order = sorted(range(len(lines)), key=lambda i: len(lines[i].text), reverse=True)
+    plan.needed = sum(len(line.text) for line in lines)
+    if not usable:
+        plan.unplaced_chars = plan.needed
+        return plan
+    
+    def capacity(slot: int, cap: Optional[int]) -> int:
+        if free[slot] < min_credits or (cap is not None and line_counts[slot] >= cap):
+            return -1
+        return free[slot]
+    
+    def pack(pending: List[int], cap: Optional[int]) -> List[int]:
+        tree = _FirstFitTree([capacity(s, cap) for s in range(len(usable))])
+        leftover = []
+        for i in pending:
+            line = lines[i]
+            chars = len(line.text)
+            slot = tree.first_at_least(max(chars, min_credits))
+            if slot < 0:
+                leftover.append(i)
+                continue
+            free[slot] -= chars
+            planned_chars[slot] += chars
+            line_counts[slot] += 1
+            plan.assignment[line.index] = slot
+            plan.placed += 1
+            tree.set(slot, capacity(slot, cap))
+        return leftover
+    
+    if per_key_concurrency > 0:
+        keys_wanted = min(len(usable), -(-max(1, concurrency) // per_key_concurrency))
+        if keys_wanted > 1:
+            plan.line_cap = -(-len(lines) // keys_wanted)
+    if plan.line_cap is not None:
+        order = pack(order, plan.line_cap)
+    leftover = pack(order, None)
+    plan.unplaced_chars = sum(len(lines[i].text) for i in leftover)
+    return plan
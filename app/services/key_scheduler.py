@@ -0,0 +1,377 @@
+"""Heap-based API key selection shared by the key managers and Config"""
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Callable, Dict, List, Tuple
+
+from core.models import APIKey
+
+
+POLICY_SMALLEST_CREDITS = "smallest_credits"
+POLICY_ROUND_ROBIN = "round_robin"
+POLICY_LEAST_LOADED = "least_loaded"
+KEY_POLICIES = (POLICY_SMALLEST_CREDITS, POLICY_ROUND_ROBIN, POLICY_LEAST_LOADED)
+
+# Where a key currently sits
+_READY = "ready"
+_COOLDOWN = "cooldown"
+_PARKED = "parked"  # Disabled, invalid or out of credits until update() says otherwise
+
+
+class KeyScheduler:
+    """Picks the next API key in O(log n), safe to call from any thread.
+    
+    Usable keys sit in a ready heap ordered by the policy:
+    smallest_credits drains the emptiest key first, round_robin takes the
+    key used longest ago, least_loaded the key with the fewest requests
+    in flight (begin()/end()). Rate-limited keys move to a second heap
+    ordered by cooldown expiry and come back when it passes; wait() sleeps
+    on a condition until exactly then, or until another key frees up.
+    Keys below min_credits are dropped (reported to on_key_removed) or,
+    with remove_low_credit off, parked until update() shows new credits.
+    
+    reserve() sets a request's characters aside on the key it picks, and
+    only picks keys with that much left after earlier reservations, so
+    concurrent requests can't overcommit a nearly empty key. The caller
+    debits what was really spent, then release()s the reservation.
+    smallest_credits ranks keys by these unreserved credits.
+    
+    Heap entries are invalidated lazily with a per-key version, and an
+    entry whose credits changed since it was pushed is re-keyed when it
+    reaches the top. Keys changed from outside (refreshed, edited,
+    debited while not in front) should be passed to update().
+    """
+    
+    def __init__(
+        self,
+        keys: List[APIKey],
+        policy: str = POLICY_ROUND_ROBIN,
+        min_credits: int = 1,
+        remove_low_credit: bool = True,
+        on_key_removed: Optional[Callable[[APIKey, str], None]] = None
+    ):
+        if policy not in KEY_POLICIES:
+            raise ValueError(f"Unknown key policy: {policy}")
+        self._policy = policy
+        self._min_credits = max(1, min_credits)
+        self._remove_low_credit = remove_low_credit
+        self._on_key_removed = on_key_removed
+        
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._keys: Dict[str, APIKey] = {}
+        self._state: Dict[str, str] = {}
+        self._version: Dict[str, int] = {}
+        self._load: Dict[str, int] = {}
+        self._reserved: Dict[str, int] = {}  # Credits promised to requests in flight
+        self._last_used: Dict[str, int] = {}
+        self._ready: List[Tuple] = []  # (priority, version, key_id)
+        self._cooldown: List[Tuple[float, int, str]] = []  # (monotonic expiry, version, key_id)
+        self._clock = itertools.count()
+        self._ordered: List[APIKey] = []
+        
+        removed = []
+        with self._lock:
+            for key in keys:
+                self._keys[key.id] = key
+                self._load[key.id] = 0
+                self._reserved[key.id] = 0
+                self._last_used[key.id] = next(self._clock)
+                self._version[key.id] = 0
+                self._place(key, removed)
+            self._ordered = list(self._keys.values())
+        self._report_removed(removed)
+    
+    @property
+    def policy(self) -> str:
+        return self._policy
+    
+    @property
+    def keys(self) -> List[APIKey]:
+        """Keys still managed, in their original order"""
+        return self._ordered
+    
+    def next_key(self, exclude: Optional[str] = None) -> Optional[APIKey]:
+        """Best ready key (optionally other than key id `exclude`), or None"""
+        removed = []
+        with self._lock:
+            self._promote_expired()
+            key = self._pick(exclude, removed)
+            if key is not None and self._policy == POLICY_ROUND_ROBIN:
+                self._last_used[key.id] = next(self._clock)
+                self._push_ready(key)
+        self._report_removed(removed)
+        return key
+    
+    def reserve(self, chars: int, exclude: Optional[str] = None) -> Optional[APIKey]:
+        """Pick a key with at least chars unreserved credits and reserve them on it"""
+        removed = []
+        with self._lock:
+            self._promote_expired()
+            key = self._pick(exclude, removed, need=chars)
+            if key is not None:
+                self._take(key, chars)
+        self._report_removed(removed)
+        return key
+    
+    def reserve_on(self, key: APIKey, chars: int) -> bool:
+        """Reserve chars on this particular key, if it is ready and they fit"""
+        with self._lock:
+            if self._state.get(key.id) != _READY or not key.is_available:
+                return False
+            if key.remaining_credits < self._min_credits or self._free(key) < chars:
+                return False
+            self._take(key, chars)
+            return True
+    
+    def release(self, key: APIKey, chars: int):
+        """Return a reservation; debit the real usage first so the credits never look free twice"""
+        if chars <= 0:
+            return
+        with self._lock:
+            if key.id not in self._keys:
+                return
+            self._reserved[key.id] = max(0, self._reserved[key.id] - chars)
+            if self._state[key.id] == _READY:
+                self._push_ready(key)
+            self._changed.notify_all()
+    
+    def reserved(self, key: APIKey) -> int:
+        return self._reserved.get(key.id, 0)
+    
+    def peek(self) -> Optional[APIKey]:
+        """The key next_key() would return, without counting it as used"""
+        removed = []
+        with self._lock:
+            self._promote_expired()
+            key = self._pick(None, removed)
+        self._report_removed(removed)
+        return key
+    
+    def wait(self, timeout: Optional[float] = None, exclude: Optional[str] = None) -> Optional[APIKey]:
+        """Like next_key(), but block until a key is ready or timeout passes.
+        
+        Sleeps until the earliest cooldown expires or another thread
+        frees a key; nothing is polled.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        removed = []
+        try:
+            with self._lock:
+                while True:
+                    self._promote_expired()
+                    key = self._pick(exclude, removed)
+                    if key is not None:
+                        if self._policy == POLICY_ROUND_ROBIN:
+                            self._last_used[key.id] = next(self._clock)
+                            self._push_ready(key)
+                        return key
+                    now = time.monotonic()
+                    delays = []
+                    if deadline is not None:
+                        delays.append(deadline - now)
+                    if self._cooldown:
+                        delays.append(self._cooldown[0][0] - now)
+                    elif not self._has_waitable():
+                        return None  # Nothing will ever come back
+                    delay = min(delays) if delays else None
+                    if delay is not None and delay <= 0:
+                        if deadline is not None and now >= deadline:
+                            return None
+                        continue
+                    self._changed.wait(delay)
+        finally:
+            self._report_removed(removed)
+    
+    def begin(self, key: APIKey):
+        """A request started on key (least_loaded ordering)"""
+        with self._lock:
+            if key.id not in self._keys:
+                return
+            self._load[key.id] += 1
+            if self._policy == POLICY_LEAST_LOADED and self._state[key.id] == _READY:
+                self._push_ready(key)
+    
+    def end(self, key: APIKey):
+        """A request on key finished"""
+        with self._lock:
+            if key.id not in self._keys:
+                return
+            self._load[key.id] = max(0, self._load[key.id] - 1)
+            if self._policy == POLICY_LEAST_LOADED and self._state[key.id] == _READY:
+                self._push_ready(key)
+                self._changed.notify_all()
+    
+    def cooldown(self, key: APIKey, seconds: float):
+        """Take key out of rotation for `seconds`"""
+        with self._lock:
+            key.in_cooldown = True
+            key.cooldown_until = datetime.now() + timedelta(seconds=seconds)
+            if key.id not in self._keys:
+                return
+            self._bump(key.id)
+            self._state[key.id] = _COOLDOWN
+            heapq.heappush(self._cooldown, (time.monotonic() + seconds, self._version[key.id], key.id))
+            self._changed.notify_all()  # A waiter may now need an earlier wake-up
+    
+    def update(self, key: APIKey):
+        """Re-place a key after its credits, flags or cooldown changed outside the scheduler"""
+        removed = []
+        with self._lock:
+            if key.id not in self._keys:
+                return
+            self._keys[key.id] = key
+            self._bump(key.id)
+            self._place(key, removed)
+            self._changed.notify_all()
+        self._report_removed(removed)
+    
+    def add(self, key: APIKey):
+        removed = []
+        with self._lock:
+            if key.id in self._keys:
+                return
+            self._keys[key.id] = key
+            self._load[key.id] = 0
+            self._reserved[key.id] = 0
+            self._last_used[key.id] = next(self._clock)
+            self._version[key.id] = 0
+            self._place(key, removed)
+            self._ordered = list(self._keys.values())
+            self._changed.notify_all()
+        self._report_removed(removed)
+    
+    def remove(self, key_id: str) -> Optional[APIKey]:
+        with self._lock:
+            return self._forget(key_id)
+    
+    def sweep(self) -> List[APIKey]:
+        """Re-check every key at once (e.g. after a bulk refresh); returns keys removed"""
+        removed = []
+        with self._lock:
+            for key in list(self._keys.values()):
+                self._bump(key.id)
+                self._place(key, removed)
+            self._changed.notify_all()
+        self._report_removed(removed)
+        return [key for key, _ in removed]
+    
+    def load(self, key: APIKey) -> int:
+        return self._load.get(key.id, 0)
+    
+    # Internals; callers hold the lock
+    
+    def _bump(self, key_id: str):
+        self._version[key_id] += 1
+    
+    def _free(self, key: APIKey) -> int:
+        return key.remaining_credits - self._reserved[key.id]
+    
+    def _take(self, key: APIKey, chars: int):
+        self._reserved[key.id] += chars
+        if self._policy == POLICY_ROUND_ROBIN:
+            self._last_used[key.id] = next(self._clock)
+        if self._policy != POLICY_LEAST_LOADED:
+            self._push_ready(key)
+    
+    def _priority(self, key: APIKey) -> Tuple:
+        if self._policy == POLICY_SMALLEST_CREDITS:
+            return (self._free(key), self._last_used[key.id])
+        if self._policy == POLICY_LEAST_LOADED:
+            return (self._load[key.id], self._last_used[key.id])
+        return (self._last_used[key.id],)
+    
+    def _push_ready(self, key: APIKey):
+        self._bump(key.id)
+        self._state[key.id] = _READY
+        heapq.heappush(self._ready, (self._priority(key), self._version[key.id], key.id))
+        if len(self._ready) > 2 * len(self._keys) + 64:
+            self._compact()
+    
+    def _compact(self):
+        """Drop stale entries once they outnumber live ones"""
+        self._ready = [e for e in self._ready if self._version.get(e[2]) == e[1]]
+        heapq.heapify(self._ready)
+        self._cooldown = [e for e in self._cooldown if self._version.get(e[2]) == e[1]]
+        heapq.heapify(self._cooldown)
+    
+    def _place(self, key: APIKey, removed: List[Tuple[APIKey, str]]):
+        """Route a key to the heap its current state calls for"""
+        low = key.remaining_credits < self._min_credits
+        if key.is_valid and low and self._remove_low_credit:
+            self._forget(key.id)
+            removed.append((key, f"Credits below {self._min_credits} (has {key.remaining_credits})"))
+            return
+        if not key.enabled or not key.is_valid or low:
+            self._state[key.id] = _PARKED
+            return
+        if key.in_cooldown:
+            # A cooldown without an expiry counts as over, as in APIKey.is_available;
+            # leaving the flag set would send _pick round this key forever
+            remaining = (key.cooldown_until - datetime.now()).total_seconds() if key.cooldown_until else 0
+            if remaining > 0:
+                self._state[key.id] = _COOLDOWN
+                heapq.heappush(self._cooldown, (time.monotonic() + remaining, self._version[key.id], key.id))
+                return
+            key.in_cooldown = False
+        self._push_ready(key)
+    
+    def _forget(self, key_id: str) -> Optional[APIKey]:
+        key = self._keys.pop(key_id, None)
+        if key is None:
+            return None
+        for table in (self._state, self._load, self._reserved, self._last_used):
+            table.pop(key_id, None)
+        self._version[key_id] = self._version.get(key_id, 0) + 1  # Orphans any heap entries
+        self._ordered = list(self._keys.values())
+        return key
+    
+    def _promote_expired(self):
+        now = time.monotonic()
+        while self._cooldown and self._cooldown[0][0] <= now:
+            _, version, key_id = heapq.heappop(self._cooldown)
+            if self._version.get(key_id) != version or key_id not in self._keys:
+                continue
+            key = self._keys[key_id]
+            key.in_cooldown = False
+            self._push_ready(key)
+    
+    def _pick(self, exclude: Optional[str], removed: List[Tuple[APIKey, str]], need: int = 0) -> Optional[APIKey]:
+        """Top valid ready key with `need` unreserved credits; stale entries are dropped and moved keys re-placed"""
+        skipped = []
+        found = None
+        while self._ready:
+            priority, version, key_id = self._ready[0]
+            if self._version.get(key_id) != version or key_id not in self._keys:
+                heapq.heappop(self._ready)
+                continue
+            key = self._keys[key_id]
+            if key.in_cooldown or not key.is_available or key.remaining_credits < self._min_credits:
+                # Changed behind our back (edited, cooled down elsewhere, debited dry)
+                heapq.heappop(self._ready)
+                self._bump(key_id)
+                self._place(key, removed)
+                continue
+            if priority != self._priority(key):
+                heapq.heappop(self._ready)
+                self._push_ready(key)  # Credits moved since the push; re-key
+                continue
+            if key_id == exclude or (need and self._free(key) < need):
+                skipped.append(heapq.heappop(self._ready))
+                continue
+            found = key
+            break
+        for entry in skipped:
+            heapq.heappush(self._ready, entry)
+        return found
+    
+    def _has_waitable(self) -> bool:
+        """Whether some key could still become ready without outside help"""
+        return any(state == _READY for state in self._state.values())
+    
+    def _report_removed(self, removed: List[Tuple[APIKey, str]]):
+        if removed and self._on_key_removed:
+            for key, reason in removed:
+                self._on_key_removed(key, reason)
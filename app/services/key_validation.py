@@ -0,0 +1,127 @@
+"""Concurrent validation and credit refresh for many API keys"""
+import threading
+import time
+from dataclasses import dataclass
+from queue import Queue, Empty
+from typing import Optional, Callable, Dict, List, Any, Iterable
+
+from core.models import APIKey, Proxy
+from services.http_transport import TransportRegistry
+
+
+@dataclass
+class KeyValidationResult:
+    """Outcome of checking one key against /user/subscription"""
+    key: APIKey
+    success: bool
+    message: str
+    elapsed: float = 0.0  # Seconds the check took
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.key.id,
+            "name": self.key.name,
+            "key": self.key.key,
+            "remaining_credits": self.key.remaining_credits,
+            "character_count": self.key.character_count,
+            "character_limit": self.key.character_limit,
+            "is_valid": self.key.is_valid,
+            "message": self.message,
+            "assigned_proxy_id": self.key.assigned_proxy_id
+        }
+
+
+class BulkKeyValidator:
+    """Checks many keys at once with a bounded number of requests per proxy.
+    
+    Keys are grouped by the proxy they go through (or direct); each group
+    gets its own few worker threads, so a slow proxy only holds up its own
+    keys and no proxy sees more than per_proxy requests at a time.
+    Results are handed to on_result on the calling thread as they arrive,
+    so callers can stream them without locking. validate_key() updates
+    each APIKey in place; persisting them is left to the caller (one
+    Config.update_api_keys() call for the whole batch).
+    """
+    
+    DEFAULT_PER_PROXY = 8
+    MAX_WORKERS = 64
+    
+    def __init__(self, api=None, per_proxy: int = DEFAULT_PER_PROXY, max_workers: int = MAX_WORKERS):
+        if api is None:
+            from services.elevenlabs import ElevenLabsAPI
+            api = ElevenLabsAPI()
+        self._api = api
+        self._per_proxy = max(1, per_proxy)
+        self._max_workers = max(1, max_workers)
+    
+    def validate(
+        self,
+        keys: Iterable[APIKey],
+        get_proxy: Optional[Callable[[APIKey], Optional[Proxy]]] = None,
+        on_result: Optional[Callable[[KeyValidationResult, int, int], None]] = None,
+        cancel_event: Optional[threading.Event] = None
+    ) -> List[KeyValidationResult]:
+        """Validate keys; on_result(result, done, total) fires per key as it finishes"""
+        groups: Dict[str, List[tuple]] = {}
+        for key in keys:
+            proxy = get_proxy(key) if get_proxy else None
+            groups.setdefault(TransportRegistry.transport_id(proxy), []).append((key, proxy))
+        total = sum(len(g) for g in groups.values())
+        if not total:
+            return []
+        
+        per_group = self._workers_per_group(groups)
+        self._api.transport.ensure_pool_size(max(per_group.values()))
+        results: "Queue[KeyValidationResult]" = Queue()
+        threads = []
+        for transport, items in groups.items():
+            pending: "Queue[tuple]" = Queue()
+            for item in items:
+                pending.put(item)
+            for _ in range(per_group[transport]):
+                t = threading.Thread(
+                    target=self._work,
+                    args=(pending, results, cancel_event),
+                    daemon=True,
+                    name="key-validate"
+                )
+                t.start()
+                threads.append(t)
+        
+        collected = []
+        while len(collected) < total:
+            result = results.get()
+            if result is None:
+                total -= 1  # Skipped after cancel
+                continue
+            collected.append(result)
+            if on_result:
+                on_result(result, len(collected), total)
+        for t in threads:
+            t.join()
+        return collected
+    
+    def _workers_per_group(self, groups: Dict[str, List[tuple]]) -> Dict[str, int]:
+        """Up to per_proxy workers per group, scaled down (never below one) to fit max_workers"""
+        wanted = {t: min(self._per_proxy, len(items)) for t, items in groups.items()}
+        total = sum(wanted.values())
+        if total <= self._max_workers:
+            return wanted
+        scale = self._max_workers / total
+        return {t: max(1, int(n * scale)) for t, n in wanted.items()}
+    
+    def _work(self, pending: "Queue[tuple]", results: "Queue", cancel_event: Optional[threading.Event]):
+        while True:
+            try:
+                key, proxy = pending.get_nowait()
+            except Empty:
+                return
+            if cancel_event is not None and cancel_event.is_set():
+                results.put(None)
+                continue
+            started = time.monotonic()
+            try:
+                success, message = self._api.validate_key(key, proxy)
+            except Exception as e:
+                success, message = False, f"Error: {e}"
+            results.put(KeyValidationResult(key, success, message, time.monotonic() - started))
@@ -0,0 +1,81 @@
+"""Grouping of identical lines so each distinct render is requested once"""
+import re
+import unicodedata
+from typing import Optional, Dict, List, Tuple, Hashable
+
+from core.models import TextLine, VoiceSettings
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form for duplicate detection: NFC, trimmed, single spaces.
+    
+    Case and punctuation are kept since both change how a line is spoken.
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def dedupe_key(
+    text: str,
+    voice_id: str,
+    settings: VoiceSettings,
+    language: Optional[str] = None
+) -> Tuple[Hashable, ...]:
+    """Everything that makes two lines render to the same audio"""
+    return (normalize_text(text), voice_id, tuple(sorted(settings.to_dict().items())), language)
+
+
+class DuplicateGroups:
+    """Leader/follower bookkeeping for one run.
+    
+    The first pending occurrence of a key becomes the leader and is
+    dispatched; later occurrences are followers that receive a copy of
+    the leader's audio. Only keys are stored for lines without duplicates.
+    """
+    
+    def __init__(self):
+        self._leaders: Dict[Tuple[Hashable, ...], TextLine] = {}
+        self._followers: Dict[int, List[TextLine]] = {}  # id(leader) -> followers
+        self._leader_of: Dict[int, TextLine] = {}  # id(follower) -> leader
+    
+    def add(self, line: TextLine, key: Tuple[Hashable, ...]) -> bool:
+        """Register a pending line. Returns True if it must be dispatched itself."""
+        leader = self._leaders.get(key)
+        if leader is None or leader is line:
+            self._leaders[key] = line
+            return True
+        self._followers.setdefault(id(leader), []).append(line)
+        self._leader_of[id(line)] = leader
+        return False
+    
+    def is_follower(self, line: TextLine) -> bool:
+        return id(line) in self._leader_of
+    
+    def leader_of(self, line: TextLine) -> TextLine:
+        """The line that is dispatched on this line's behalf (itself if not a follower)"""
+        return self._leader_of.get(id(line), line)
+    
+    def followers(self, leader: TextLine) -> List[TextLine]:
+        return list(self._followers.get(id(leader), ()))
+    
+    def detach(self, follower: TextLine):
+        """Make a follower stand alone again, e.g. after its fan-out copy failed"""
+        leader = self._leader_of.pop(id(follower), None)
+        if leader is None:
+            return
+        group = self._followers.get(id(leader))
+        if group is not None:
+            group[:] = [l for l in group if l is not follower]
+            if not group:
+                del self._followers[id(leader)]
+    
+    @property
+    def follower_count(self) -> int:
+        return len(self._leader_of)
+    
+    def clear(self):
+        self._leaders.clear()
+        self._followers.clear()
+        self._leader_of.clear()
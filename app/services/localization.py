@@ -44,6 +44,7 @@ TRANSLATIONS_VI = {
     
     # Thread status
     "active_threads": "Hoạt động: {active} / {total}",
+    "breakers_open": "Tạm ngắt: {keys} khóa, {proxies} proxy",
     
     # Buttons
     "join_mp3": "Ghép MP3",
@@ -203,15 +204,22 @@ TRANSLATIONS_VI = {
     # Settings Dialog
     "settings_title": "Cài đặt",
     "processing": "Xử lý",
+    "processing_engine": "Bộ xử lý",
+    "engine_threaded": "Đa luồng",
+    "engine_async": "Bất đồng bộ (asyncio)",
     "thread_count": "Số luồng",
     "max_retries": "Số lần thử lại tối đa",
     "request_delay": "Độ trễ yêu cầu",
+    "adaptive_concurrency": "Tự điều chỉnh tốc độ",
+    "adaptive_concurrency_tooltip": "Tự tăng/giảm số yêu cầu đồng thời theo lỗi 429 và độ trễ (tối đa bằng số luồng), thay cho độ trễ cố định",
     "text_splitting": "Tách văn bản",
     "auto_split_long_text": "Tự động tách văn bản dài",
     "max_characters": "Số ký tự tối đa",
     "split_delimiters": "Ký tự phân cách",
     "audio": "Âm thanh",
     "silence_gap": "Khoảng lặng",
+    "output_format": "Định dạng âm thanh",
+    "output_format_tooltip": "WAV (PCM) và Opus được nối và đo thời lượng mà không cần mã hóa lại",
     "appearance": "Giao diện",
     "theme": "Chủ đề",
     "system": "Hệ thống",
@@ -442,6 +450,7 @@ TRANSLATIONS_EN = {
     
     # Thread status
     "active_threads": "Active: {active} / {total}",
+    "breakers_open": "Breakers open: {keys} keys, {proxies} proxies",
     
     # Buttons
     "join_mp3": "Join MP3",
@@ -601,15 +610,22 @@ TRANSLATIONS_EN = {
     # Settings Dialog
     "settings_title": "Settings",
     "processing": "Processing",
+    "processing_engine": "Processing Engine",
+    "engine_threaded": "Multi-threaded",
+    "engine_async": "Async (asyncio)",
     "thread_count": "Thread Count",
     "max_retries": "Max Retries",
     "request_delay": "Request Delay",
+    "adaptive_concurrency": "Adaptive pacing",
+    "adaptive_concurrency_tooltip": "Grow and shrink concurrent requests from 429s and latency (up to the thread count) instead of a fixed delay",
     "text_splitting": "Text Splitting",
     "auto_split_long_text": "Auto-split long text",
     "max_characters": "Max characters",
     "split_delimiters": "Split delimiters",
     "audio": "Audio",
     "silence_gap": "Silence gap",
+    "output_format": "Output format",
+    "output_format_tooltip": "WAV (PCM) and Opus output is joined and timed without re-encoding",
     "appearance": "Appearance",
     "theme": "Theme",
     "system": "System",
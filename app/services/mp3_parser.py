@@ -0,0 +1,291 @@
+"""Pure-Python MP3 frame parser for exact durations without decoding"""
+import struct
+from dataclasses import dataclass
+from typing import Optional, List, Tuple
+
+
+# Bitrates in kbps, indexed by the 4-bit header field (0 = free format, 15 = invalid)
+_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+_SAMPLE_RATES = {
+    1: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    2.5: (11025, 12000, 8000),
+}
+
+# Samples per frame by (MPEG version family, layer)
+_SAMPLES_PER_FRAME = {
+    (1, 1): 384, (1, 2): 1152, (1, 3): 1152,
+    (2, 1): 384, (2, 2): 1152, (2, 3): 576,
+}
+
+ID3V2_HEADER_SIZE = 10
+FRAME_HEADER_SIZE = 4
+READ_CHUNK = 64 * 1024
+
+
+@dataclass
+class FrameHeader:
+    """Decoded 4-byte MPEG audio frame header"""
+    version: float  # 1, 2 or 2.5
+    layer: int
+    bitrate: int  # kbps
+    sample_rate: int
+    padding: int
+    channel_mode: int  # 3 = mono
+    
+    @property
+    def samples(self) -> int:
+        return _SAMPLES_PER_FRAME[(1 if self.version == 1 else 2, self.layer)]
+    
+    @property
+    def frame_length(self) -> int:
+        if self.layer == 1:
+            return (12 * self.bitrate * 1000 // self.sample_rate + self.padding) * 4
+        if self.layer == 3 and self.version != 1:
+            return 72 * self.bitrate * 1000 // self.sample_rate + self.padding
+        return 144 * self.bitrate * 1000 // self.sample_rate + self.padding
+    
+    @property
+    def side_info_size(self) -> int:
+        """Layer III side information size, where Xing/Info tags live behind"""
+        mono = self.channel_mode == 3
+        if self.version == 1:
+            return 17 if mono else 32
+        return 9 if mono else 17
+    
+    def compatible(self, other: "FrameHeader") -> bool:
+        return (self.version, self.layer, self.sample_rate) == (other.version, other.layer, other.sample_rate)
+
+
+def parse_frame_header(data: bytes, offset: int = 0) -> Optional[FrameHeader]:
+    """Decode a frame header at offset, or None if the bytes aren't one"""
+    if len(data) - offset < FRAME_HEADER_SIZE:
+        return None
+    b0, b1, b2, b3 = data[offset:offset + FRAME_HEADER_SIZE]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = {0: 2.5, 2: 2, 3: 1}.get((b1 >> 3) & 0x03)
+    layer = {1: 3, 2: 2, 3: 1}.get((b1 >> 1) & 0x03)
+    bitrate_index = (b2 >> 4) & 0x0F
+    rate_index = (b2 >> 2) & 0x03
+    if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    return FrameHeader(
+        version=version,
+        layer=layer,
+        bitrate=_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index],
+        sample_rate=_SAMPLE_RATES[version][rate_index],
+        padding=(b2 >> 1) & 0x01,
+        channel_mode=(b3 >> 6) & 0x03
+    )
+
+
+def id3v2_size(data: bytes) -> Optional[int]:
+    """Total size of an ID3v2 tag at the start of data, None if there isn't one"""
+    if len(data) < ID3V2_HEADER_SIZE or data[:3] != b"ID3":
+        return None
+    size = 0
+    for b in data[6:10]:
+        size = (size << 7) | (b & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return ID3V2_HEADER_SIZE + size + footer
+
+
+class MP3FrameCounter:
+    """Counts MPEG audio frames from bytes fed in arbitrary chunks.
+    
+    Feed the response body as it streams to disk; duration is exact as
+    soon as the last chunk is in. A Xing/Info or VBRI header in the first
+    frame supplies the frame count directly, and a LAME tag's encoder
+    delay and padding are subtracted the way decoders trim them.
+    """
+    
+    def __init__(self):
+        self._buffer = bytearray()
+        self._skip = 0  # Bytes of an ID3 tag still to drop
+        self._started = False
+        self._first: Optional[FrameHeader] = None
+        self.frames = 0
+        self.samples = 0
+        self._tag_frames: Optional[int] = None
+        self._trim_samples = 0
+    
+    def feed(self, chunk: bytes):
+        if self._tag_frames is not None:
+            return  # The VBR tag already gave the frame count
+        if self._skip:
+            if len(chunk) <= self._skip:
+                self._skip -= len(chunk)
+                return
+            chunk = chunk[self._skip:]
+            self._skip = 0
+        self._buffer += chunk
+        self._parse()
+    
+    def _parse(self):
+        buf = self._buffer
+        pos = 0
+        if not self._started:
+            if len(buf) < ID3V2_HEADER_SIZE:
+                return
+            tag = id3v2_size(buf)
+            if tag is not None:
+                if len(buf) < tag:
+                    self._skip = tag - len(buf)
+                    self._buffer = bytearray()
+                    self._started = True
+                    return
+                pos = tag
+            self._started = True
+        
+        while len(buf) - pos >= FRAME_HEADER_SIZE:
+            header = parse_frame_header(buf, pos)
+            if header is None or (self._first is not None and not header.compatible(self._first)):
+                pos += 1  # Resync past garbage (trailing tags, corrupt bytes)
+                continue
+            length = header.frame_length
+            if self._first is None:
+                if len(buf) - pos < length + FRAME_HEADER_SIZE:
+                    break
+                has_tag = self._read_vbr_tag(buf, pos, header)
+                if not has_tag:
+                    # A lone sync word inside garbage is common; require the next header to agree
+                    following = parse_frame_header(buf, pos + length)
+                    if following is None or not following.compatible(header):
+                        pos += 1
+                        continue
+                self._first = header
+                if self._tag_frames is not None:
+                    self._buffer = bytearray()
+                    return
+                if has_tag:
+                    # An Info tag without a frame count: count frames, skipping the tag frame
+                    pos += length
+                    continue
+            if len(buf) - pos < length:
+                break
+            self.frames += 1
+            self.samples += header.samples
+            pos += length
+        del buf[:pos]
+    
+    def _read_vbr_tag(self, buf: bytearray, pos: int, header: FrameHeader) -> bool:
+        """Read a Xing/Info or VBRI tag from the frame at pos. Returns True if present."""
+        frame = bytes(buf[pos:pos + header.frame_length])
+        xing_at = FRAME_HEADER_SIZE + header.side_info_size
+        if frame[xing_at:xing_at + 4] in (b"Xing", b"Info"):
+            flags = struct.unpack(">I", frame[xing_at + 4:xing_at + 8])[0]
+            cursor = xing_at + 8
+            if flags & 0x1:
+                self._tag_frames = struct.unpack(">I", frame[cursor:cursor + 4])[0]
+                cursor += 4
+            if flags & 0x2:
+                cursor += 4
+            if flags & 0x4:
+                cursor += 100
+            if flags & 0x8:
+                cursor += 4
+            lame = frame[cursor:cursor + 36]
+            if len(lame) == 36 and lame[:4] in (b"LAME", b"Lavf", b"Lavc"):
+                delay_padding = lame[21:24]
+                delay = (delay_padding[0] << 4) | (delay_padding[1] >> 4)
+                padding = ((delay_padding[1] & 0x0F) << 8) | delay_padding[2]
+                self._trim_samples = delay + padding
+            return True
+        vbri_at = FRAME_HEADER_SIZE + 32
+        if frame[vbri_at:vbri_at + 4] == b"VBRI":
+            self._tag_frames = struct.unpack(">I", frame[vbri_at + 14:vbri_at + 18])[0]
+            return True
+        return False
+    
+    @property
+    def sample_rate(self) -> Optional[int]:
+        return self._first.sample_rate if self._first else None
+    
+    @property
+    def duration(self) -> Optional[float]:
+        """Seconds of audio, or None if no valid frame has been seen"""
+        if self._first is None:
+            return None
+        if self._tag_frames:
+            total = self._tag_frames * self._first.samples
+        else:
+            total = self.samples
+        total = max(0, total - self._trim_samples)
+        return total / self._first.sample_rate
+
+
+def is_vbr_tag_frame(data: bytes, pos: int, header: FrameHeader) -> bool:
+    """Whether the frame at pos carries a Xing/Info or VBRI tag instead of audio"""
+    xing_at = pos + FRAME_HEADER_SIZE + header.side_info_size
+    vbri_at = pos + FRAME_HEADER_SIZE + 32
+    return data[xing_at:xing_at + 4] in (b"Xing", b"Info") or data[vbri_at:vbri_at + 4] == b"VBRI"
+
+
+def audio_frames(data: bytes) -> Tuple[Optional[FrameHeader], List[Tuple[int, int]]]:
+    """Byte spans of the audio frames in a whole MP3 file.
+    
+    ID3 tags, a leading VBR tag frame and any trailing garbage are left
+    out, so the spans of several files can be joined into one stream.
+    Returns the first frame's header (None if there are no frames).
+    """
+    pos = id3v2_size(data) or 0
+    first: Optional[FrameHeader] = None
+    spans: List[Tuple[int, int]] = []
+    while len(data) - pos >= FRAME_HEADER_SIZE:
+        header = parse_frame_header(data, pos)
+        if header is None or (first is not None and not header.compatible(first)):
+            pos += 1
+            continue
+        end = pos + header.frame_length
+        if end > len(data):
+            break
+        if first is None:
+            following = parse_frame_header(data, end)
+            if end < len(data) and (following is None or not following.compatible(header)):
+                pos += 1  # A stray sync word, not a frame
+                continue
+            first = header
+            if is_vbr_tag_frame(data, pos, header):
+                pos = end
+                continue
+        spans.append((pos, end))
+        pos = end
+    return first, spans
+
+
+def silent_frame(header_bytes: bytes) -> bytes:
+    """A frame with the given frame's parameters that decodes to silence.
+    
+    Zeroed side information means no main data and zero gain, and the
+    frame takes nothing from the bit reservoir, so it can sit anywhere.
+    """
+    b0, b1, b2, b3 = header_bytes[:FRAME_HEADER_SIZE]
+    header = bytes((b0, b1 | 0x01, b2 & ~0x02 & 0xFF, b3))  # No CRC, no padding
+    parsed = parse_frame_header(header)
+    if parsed is None:
+        raise ValueError("Not an MPEG audio frame header")
+    return header + bytes(parsed.frame_length - FRAME_HEADER_SIZE)
+
+
+def mp3_duration(file_path: str) -> Optional[float]:
+    """Exact duration of an MP3 file from its frame headers, None if it isn't one"""
+    counter = MP3FrameCounter()
+    try:
+        with open(file_path, "rb") as f:
+            while True:
+                chunk = f.read(READ_CHUNK)
+                if not chunk:
+                    break
+                counter.feed(chunk)
+    except OSError:
+        return None
+    return counter.duration
@@ -1,331 +1,350 @@
 """Multi-threaded TTS processing engine"""
-import os
 import time
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from queue import Queue, Empty
-from typing import List, Optional, Callable, Dict, Any
-from dataclasses import dataclass, field
-from datetime import datetime
-from pathlib import Path
+from queue import Queue, Full, Empty
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import List, Optional, Callable, Dict, Tuple, Iterable
 
-from core.models import TextLine, LineStatus, APIKey, Proxy, Voice, VoiceSettings, Project
+from core.models import TextLine, LineStatus, APIKey, Proxy, VoiceSettings
 from services.elevenlabs import ElevenLabsAPI, APIKeyManager
+from services.tts_cache import TTSAudioCache
+from services.retry_queue import DelayQueue
+from services.hedging import RequestAttempt
+from services.engine_base import BaseProcessingEngine, ThreadInfo, LineJob, ProcessingStats  # Stats re-exported for callers
 
 
-
-@dataclass
-class ThreadInfo:
-    """Information about a single thread's activity"""
-    thread_id: int
-    status: str = "idle"  # idle, working, waiting
-    current_line_index: Optional[int] = None
-    lines_processed: int = 0
-    last_activity: Optional[datetime] = None
-
-
-@dataclass
-class ProcessingStats:
-    total: int = 0
-    completed: int = 0
-    failed: int = 0
-    processing: int = 0
-    start_time: Optional[datetime] = None
-    current_loop: int = 1
-    thread_info: Dict[int, ThreadInfo] = field(default_factory=dict)
+class ProcessingEngine(BaseProcessingEngine):
+    """Multi-threaded TTS processing engine"""
     
-    @property
-    def pending(self) -> int:
-        return self.total - self.completed - self.failed - self.processing
+    MAX_CONCURRENCY = 50
     
-    @property
-    def progress_percent(self) -> float:
-        if self.total == 0:
-            return 0
-        return (self.completed / self.total) * 100
+    def __init__(self, *args, **kwargs):
+        # Idle workers sleep on this until a line is queued, a retry is added or comes due,
+        # the pipeline drains or stop() is called
+        self._work_ready = threading.Condition()
+        super().__init__(*args, **kwargs)
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self._inflight: Dict[int, RequestAttempt] = {}  # Requests being sent, for cancel()
+        self._pause_event = threading.Event()
+        self._pause_event.set()  # Not paused initially
     
-    @property
-    def elapsed_time(self) -> float:
-        if not self.start_time:
-            return 0
-        return (datetime.now() - self.start_time).total_seconds()
+    def _create_api(self, audio_cache: Optional[TTSAudioCache], streaming: bool) -> ElevenLabsAPI:
+        return ElevenLabsAPI(audio_cache=audio_cache, stream=streaming)
     
-    @property
-    def active_threads(self) -> int:
-        return sum(1 for t in self.thread_info.values() if t.status == "working")
+    def _create_key_manager(self, api_keys: List[APIKey], policy: str) -> APIKeyManager:
+        return APIKeyManager(api_keys, on_key_removed=self._handle_key_removed, policy=policy)
     
-    def get_thread_display(self) -> Dict[int, str]:
-        """Get thread info formatted for display"""
-        return {
-            tid: f"Line {info.current_line_index + 1}" if info.current_line_index is not None else info.status
-            for tid, info in self.thread_info.items()
-        }
-
-
-class ProcessingEngine:
-    """Multi-threaded TTS processing engine"""
+    def _create_retry_queue(self) -> "DelayQueue[LineJob]":
+        return DelayQueue(self._work_ready)
     
-    def __init__(
-        self,
-        api_keys: List[APIKey],
-        proxies: List[Proxy],
-        voices: Dict[str, Voice],
-        output_folder: str,
-        thread_count: int = 5,
-        max_retries: int = 3,
-        default_voice_id: Optional[str] = None,
-        request_delay: float = 0.0,
-        on_progress: Optional[Callable[[ProcessingStats], None]] = None,
-        on_line_update: Optional[Callable[[TextLine], None]] = None,
-        on_log: Optional[Callable[[str], None]] = None,
-        on_credit_used: Optional[Callable[[APIKey, int], None]] = None,
-        on_key_removed: Optional[Callable[[APIKey, str], None]] = None
-    ):
-        self._api = ElevenLabsAPI()
-        self._on_key_removed = on_key_removed
-        self._key_manager = APIKeyManager(api_keys, on_key_removed=self._handle_key_removed)
-        self._proxies = {p.id: p for p in proxies}
-        self._voices = voices
-        self._output_folder = output_folder
-        self._thread_count = min(max(1, thread_count), 50)
-        self._max_retries = max_retries
-        self._default_voice_id = default_voice_id
-        self._request_delay = max(0.0, request_delay)
-        
-        self._on_progress = on_progress
-        self._on_line_update = on_line_update
-        self._on_log = on_log
-        self._on_credit_used = on_credit_used
-        
-        self._running = False
-        self._paused = False
-        self._stop_requested = False
-        self._stats = ProcessingStats()
-        self._lock = threading.Lock()
-        self._pause_event = threading.Event()
-        self._pause_event.set()  # Not paused initially
-        
-        # Loop mode
-        self._loop_enabled = False
-        self._loop_count = 0
-        self._loop_delay = 5
+    def _reconcile_key(self, key: APIKey) -> bool:
+        return self._api.refresh_subscription(key, self._get_proxy_for_key(key))
     
-    def _log(self, message: str):
-        if self._on_log:
-            self._on_log(f"[{datetime.now().strftime('%H:%M:%S')}] {message}")
+    def _prepare_run(self):
+        self._pause_event.set()
+        self._hedge_pool = None
+        if self._hedge_requests:
+            self._hedge_pool = ThreadPoolExecutor(
+                max_workers=self._concurrency_limit * 2,
+                thread_name_prefix="tts-hedge"
+            )
+        
+        # Size the shared connection pools so no request waits for (or discards) a connection;
+        # the extra two cover credit reconciliation running next to the workers
+        self._api.transport.ensure_pool_size(self._concurrency_limit * (2 if self._hedge_requests else 1) + 2)
     
-    def _handle_key_removed(self, key: APIKey, reason: str):
-        """Handle API key removal due to low credits"""
-        self._log(f"API key '{key.name or key.id[:8]}' removed: {reason}")
-        if self._on_key_removed:
-            self._on_key_removed(key, reason)
+    def _acquire_slot(
+        self,
+        api_key: APIKey,
+        proxy: Optional[Proxy],
+        chars: int = 0
+    ) -> Optional[Tuple[APIKey, Optional[Proxy]]]:
+        """Wait for room in the adaptive windows, moving to another key if this one's is full.
+        The line's credit reservation (chars on api_key) moves with it."""
+        while not self._stop_requested:
+            key, key_proxy = api_key, proxy
+            for _ in range(max(1, len(self._key_manager.keys))):
+                if (key is api_key or not self._blocked(key, key_proxy)) and \
+                        self._concurrency.try_acquire(key.id, key_proxy.id if key_proxy else None):
+                    if key is not api_key:
+                        self._key_manager.release_credits(api_key, chars)
+                    return key, key_proxy
+                if key is not api_key:
+                    self._key_manager.release_credits(key, chars)
+                key = self._key_manager.reserve_key(chars, exclude=api_key)
+                if key is None:
+                    break
+                key_proxy = self._get_proxy_for_key(key)
+            if key is not None and key is not api_key:
+                self._key_manager.release_credits(key, chars)
+            self._concurrency.wait_for_release(0.25)
+        return None
     
-    def _update_stats(self):
-        if self._on_progress:
-            self._on_progress(self._stats)
+    def _attempt_tts(
+        self,
+        attempt: RequestAttempt,
+        text: str,
+        voice_id: str,
+        settings: VoiceSettings,
+        language_code: Optional[str] = None
+    ) -> RequestAttempt:
+        """Run one copy of a request on the calling thread and record its outcome"""
+        request_start = time.monotonic()
+        with self._lock:
+            self._inflight[id(attempt)] = attempt
+            if self._cancelled:
+                attempt.cancel_event.set()
+        try:
+            attempt.success, attempt.message, attempt.duration, _ = self._api.text_to_speech(
+                text=text,
+                voice_id=voice_id,
+                api_key=attempt.api_key,
+                output_path=attempt.output_path,
+                settings=settings,
+                proxy=attempt.proxy,
+                language_code=language_code,
+                cancel_event=attempt.cancel_event
+            )
+        except Exception as e:
+            self._log(f"[ERROR] TTS API exception: {type(e).__name__}: {str(e)}")
+            attempt.success = False
+            attempt.message = f"Exception: {type(e).__name__}: {str(e)}"
+            attempt.duration = None
+        finally:
+            with self._lock:
+                self._inflight.pop(id(attempt), None)
+        attempt.latency = time.monotonic() - request_start
+        attempt.info = self._api.get_last_request_info()
+        if attempt.success and attempt.message != "CACHE_HIT":
+            self._latency.record(settings.model.value, len(text), attempt.latency)
+        return attempt
     
-    def _update_line(self, line: TextLine):
-        if self._on_line_update:
-            self._on_line_update(line)
+    def _submit_attempt(
+        self,
+        attempt: RequestAttempt,
+        text: str,
+        voice_id: str,
+        settings: VoiceSettings,
+        language_code: Optional[str]
+    ) -> Future:
+        return self._hedge_pool.submit(self._attempt_tts, attempt, text, voice_id, settings, language_code)
     
-    def _get_proxy_for_key(self, key: APIKey) -> Optional[Proxy]:
-        if key.assigned_proxy_id:
-            proxy = self._proxies.get(key.assigned_proxy_id)
-            if proxy and proxy.enabled and proxy.is_healthy:
-                return proxy
-        return None
+    def _request_tts(
+        self,
+        text: str,
+        voice_id: str,
+        settings: VoiceSettings,
+        api_key: APIKey,
+        proxy: Optional[Proxy],
+        output_path: str,
+        language_code: Optional[str] = None
+    ) -> RequestAttempt:
+        """Make one TTS request, hedging it if it outlives the rolling latency percentile.
+        
+        Returns the attempt whose result counts. The caller holds (and
+        releases) the concurrency slot of whichever attempt is returned.
+        """
+        threshold = None
+        if self._hedge_budget is not None:
+            threshold = self._latency.threshold(settings.model.value, len(text))
+        if threshold is None:
+            return self._attempt_tts(RequestAttempt(api_key, proxy, output_path), text, voice_id, settings, language_code)
+        
+        self._hedge_budget.on_request()
+        primary = RequestAttempt(api_key, proxy, f"{output_path}.part")
+        attempts: Dict[Future, RequestAttempt] = {
+            self._submit_attempt(primary, text, voice_id, settings, language_code): primary
+        }
+        started = time.monotonic()
+        done, _ = wait(attempts, timeout=threshold)
+        # Keep trying while the primary is out: the windows may be full right now
+        while not done and not self._stop_requested:
+            launched = self._launch_hedge(primary, output_path, text, voice_id, settings, language_code,
+                                          time.monotonic() - started)
+            if launched:
+                attempts[launched[0]] = launched[1]
+                break
+            done, _ = wait(attempts, timeout=self.HEDGE_RETRY_INTERVAL)
+        
+        # First successful response wins; a fast failure waits for the other copy
+        winner = None
+        pending = set(attempts)
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if attempts[future].success and winner is None:
+                    winner = attempts[future]
+        if winner is None:
+            winner = primary
+        
+        for future, attempt in attempts.items():
+            if attempt is not winner:
+                attempt.cancel_event.set()
+                future.add_done_callback(lambda _, a=attempt: self._abandon_attempt(a, text))
+        
+        return self._pick_winner(winner, output_path)
     
-    def _process_line(self, line: TextLine, thread_id: int = 0) -> bool:
-        """Process a single line. Returns True if successful."""
+    def _process_line(self, line: TextLine, thread_id: int = 0) -> Optional[bool]:
+        """Start a line and make its first attempt. Returns True/False once the line
+        is finished, None while a retry of it waits in the delay queue."""
         if self._stop_requested:
             return False
         
-        # Update thread info
-        with self._lock:
-            if thread_id not in self._stats.thread_info:
-                self._stats.thread_info[thread_id] = ThreadInfo(thread_id=thread_id)
-            self._stats.thread_info[thread_id].status = "working"
-            self._stats.thread_info[thread_id].current_line_index = line.index
-            self._stats.thread_info[thread_id].last_activity = datetime.now()
-        
         # Wait if paused
         self._pause_event.wait()
         
         if self._stop_requested:
             return False
         
-        # Get available API key
-        api_key = self._key_manager.get_next_available_key()
-        if not api_key:
-            self._log(f"No available API keys for line {line.index + 1}")
-            return False
-        
-        # Get voice ID - use default if not set
-        voice_id = line.voice_id or self._default_voice_id
-        if not voice_id:
-            self._log(f"No voice assigned for line {line.index + 1}")
-            line.status = LineStatus.ERROR
-            line.error_message = "No voice assigned"
-            self._update_line(line)
+        job = self._start_line(line)
+        if job is None:
             return False
-        
-        # Get voice settings
-        voice = self._voices.get(voice_id)
-        settings = voice.settings if voice else VoiceSettings()
-        
-        # Get proxy
-        proxy = self._get_proxy_for_key(api_key)
-        
-        # Generate output path
-        output_path = os.path.join(
-            self._output_folder,
-            f"{line.index + 1:05d}.mp3"
-        )
-        
-        # Update status
-        with self._lock:
-            line.status = LineStatus.PROCESSING
-            self._stats.processing += 1
-        self._update_line(line)
-        
-        # Log processing start with model info
-        self._log(f"Processing line {line.index + 1} with model: {settings.model.value}")
         self._log(f"[DEBUG] Original text: {line.text[:100]}..." if len(line.text) > 100 else f"[DEBUG] Original text: {line.text}")
+        self._log(f"[DEBUG] Final text to TTS ({len(line.text)} chars): {line.text[:150]}..." if len(line.text) > 150 else f"[DEBUG] Final text to TTS ({len(line.text)} chars): {line.text}")
         
-        processed_text = line.text
-        
-        self._log(f"[DEBUG] Final text to TTS ({len(processed_text)} chars): {processed_text[:150]}..." if len(processed_text) > 150 else f"[DEBUG] Final text to TTS ({len(processed_text)} chars): {processed_text}")
-        
-        # Process with retries
-        success = False
-        last_error = ""
-        
-        for attempt in range(self._max_retries + 1):
-            if self._stop_requested:
-                break
-            
-            if attempt > 0:
-                self._log(f"Retry {attempt}/{self._max_retries} for line {line.index + 1}")
-                time.sleep(min(2 ** attempt, 30))  # Exponential backoff
-            
-            self._log(f"[DEBUG] Calling TTS API: voice={voice_id[:8]}..., key={api_key.key[:8]}..., output={output_path}")
-            try:
-                success, message, duration = self._api.text_to_speech(
-                    text=processed_text,
-                    voice_id=voice_id,
-                    api_key=api_key,
-                    output_path=output_path,
-                    settings=settings,
-                    proxy=proxy
-                )
-                self._log(f"[DEBUG] TTS API response: success={success}, message={message[:100] if message else 'None'}, duration={duration}")
-            except Exception as e:
-                self._log(f"[ERROR] TTS API exception: {type(e).__name__}: {str(e)}")
-                success = False
-                message = f"Exception: {type(e).__name__}: {str(e)}"
-                duration = None
-            
-            # Apply request delay to avoid rate limiting
-            if self._request_delay > 0:
-                time.sleep(self._request_delay)
-            
-            if success:
-                line.status = LineStatus.DONE
-                line.output_path = output_path
-                line.audio_duration = duration
-                line.error_message = None
-                line.model_used = settings.model.value  # Store which model was used
-                
-                # Log the model used
-                self._log(f"Line {line.index + 1} completed with model: {settings.model.value}")
-                
-                # Fetch actual credit usage from ElevenLabs API
-                chars_used = len(line.text)
-                self._api.refresh_subscription(api_key, proxy)
-                if self._on_credit_used:
-                    self._on_credit_used(api_key, chars_used)
-                
-                break
-            
-            last_error = message
-            
-            # Handle rate limiting
-            if message == "RATE_LIMIT":
-                self._log(f"Rate limit hit on key {api_key.name or api_key.id[:8]}, rotating...")
-                self._key_manager.mark_key_rate_limited(api_key, 60)
-                # Try with a different key
-                api_key = self._key_manager.get_next_available_key()
-                if not api_key:
-                    break
-                proxy = self._get_proxy_for_key(api_key)
-            
-            # Check if all keys exhausted
-            if self._key_manager.all_keys_exhausted():
-                self._log("All API keys exhausted")
-                break
-        
-        # Update final status
-        with self._lock:
-            self._stats.processing -= 1
-            if success:
-                self._stats.completed += 1
-            else:
-                line.status = LineStatus.ERROR
-                line.error_message = last_error
-                line.retry_count += 1
-                self._stats.failed += 1
-            
-            # Update thread info
-            if thread_id in self._stats.thread_info:
-                self._stats.thread_info[thread_id].status = "idle"
-                self._stats.thread_info[thread_id].current_line_index = None
-                self._stats.thread_info[thread_id].lines_processed += 1
-        
-        self._update_line(line)
-        self._update_stats()
-        
-        return success
+        return self._attempt_line(job, thread_id)
     
-    def start(self, lines: List[TextLine]):
-        """Start processing lines"""
-        if self._running:
-            return
-        
-        self._running = True
-        self._stop_requested = False
-        self._paused = False
-        self._pause_event.set()
+    def _attempt_line(self, job: LineJob, thread_id: int = 0) -> Optional[bool]:
+        """Make one request for a started line. A retryable failure goes back on the
+        delay queue (returns None) so this worker can serve other lines meanwhile."""
+        if self._stop_requested:
+            return self._finish_line(job, False, thread_id)
         
-        # Filter pending and error lines, reset error lines to pending for reprocessing
-        pending_lines = [l for l in lines if l.status in (LineStatus.PENDING, LineStatus.ERROR)]
-        for line in pending_lines:
-            if line.status == LineStatus.ERROR:
-                line.status = LineStatus.PENDING
-                line.error_message = None
-                self._update_line(line)
+        # A retry coming due while paused waits here like a fresh line
+        self._pause_event.wait()
+        admitted, result = self._admit_attempt(job, thread_id)
+        if not admitted:
+            return result
         
-        # Reset stats
-        self._stats = ProcessingStats(
-            total=len(pending_lines),
-            start_time=datetime.now()
-        )
-        self._update_stats()
+        api_key, proxy = job.api_key, job.proxy
+        if self._concurrency:
+            slot = self._acquire_slot(api_key, proxy, job.chars_needed)
+            if slot is None:
+                return self._finish_line(job, False, thread_id)
+            api_key, proxy = self._use_slot(job, slot)
         
-        # Ensure output folder exists
-        os.makedirs(self._output_folder, exist_ok=True)
+        self._log(f"[DEBUG] Calling TTS API: voice={job.voice_id[:8]}..., key={api_key.key[:8]}..., output={job.output_path}")
+        self._key_manager.begin_request(api_key)
+        try:
+            attempt = self._request_tts(job.line.text, job.voice_id, job.settings, api_key, proxy, job.output_path,
+                                        job.line.detected_language)
+        finally:
+            self._key_manager.end_request(api_key)
+        message = attempt.message
+        self._log(f"[DEBUG] TTS API response: success={attempt.success}, message={message[:100] if message else 'None'}, duration={attempt.duration}")
         
-        self._log(f"Starting processing of {len(pending_lines)} lines with {self._thread_count} threads")
+        return self._settle_attempt(job, attempt, thread_id)
+    
+    def _launch(self, lines: List[TextLine]):
+        self._log(f"Starting processing of {self._stats.total} lines with {self._concurrency_limit} threads")
         
         # Start processing thread
         self._process_thread = threading.Thread(
             target=self._process_all,
-            args=(pending_lines,),
+            args=(lines,),
             daemon=True
         )
         self._process_thread.start()
     
-    def _process_all(self, lines: List[TextLine]):
-        """Process all lines using thread pool"""
+    def _produce(self, lines: Iterable[TextLine], work_queue: "Queue[Optional[TextLine]]"):
+        """Feed the bounded work queue; blocks while workers are busy"""
+        try:
+            for line in self._iter_pending(lines):
+                while not self._stop_requested:
+                    try:
+                        work_queue.put(line, timeout=0.25)
+                        self._wake_worker()
+                        break
+                    except Full:
+                        continue
+                if self._stop_requested:
+                    self._leave_pipeline(line)
+                    break
+        except Exception as e:
+            self._log(f"Error: {str(e)}")
+        finally:
+            for _ in range(self._concurrency_limit):
+                work_queue.put(None)
+            self._wake_workers()
+    
+    def _wake_worker(self):
+        """Wake one idle worker waiting in _work"""
+        with self._work_ready:
+            self._work_ready.notify()
+    
+    def _wake_workers(self):
+        with self._work_ready:
+            self._work_ready.notify_all()
+    
+    def _work(self, work_queue: "Queue[Optional[TextLine]]", thread_id: int):
+        """Worker thread: take due retries first, then new lines; after the producer's
+        end marker keep serving retries until no line is left in the pipeline"""
+        producer_done = False
+        while True:
+            job = line = None
+            with self._work_ready:
+                # Once stopping, queued retries are settled straight away
+                job = self._retry_queue.pop_ready(ignore_delay=self._stop_requested)
+                if job is None:
+                    idle = producer_done
+                    if producer_done:
+                        with self._lock:
+                            if not self._in_pipeline:
+                                break
+                    else:
+                        try:
+                            line = work_queue.get_nowait()
+                        except Empty:
+                            idle = True
+                    if idle:
+                        self._retry_queue.wait()
+                        continue
+            
+            if job is not None:
+                self._run_item(job.line, thread_id, lambda: self._attempt_line(job, thread_id))
+                continue
+            if line is None:
+                producer_done = True
+                continue
+            if self._stop_requested:
+                self._leave_pipeline(line)
+                continue
+            self._run_item(line, thread_id, lambda: self._process_line(line, thread_id))
+    
+    def _run_item(self, line: TextLine, thread_id: int, step: Callable[[], Optional[bool]]):
+        """Run one attempt of a line on this worker, keeping the line in the pipeline while it waits to retry"""
+        info = self._worker_busy(thread_id, line)
+        result = False
+        try:
+            result = step()
+        except Exception as e:
+            self._log(f"Error: {str(e)}")
+        finally:
+            self._worker_idle(info, line, result)
+    
+    def _warmup_connections(self):
+        """Handshake with the API on every route this run uses before the first line"""
+        started = time.monotonic()
+        proxies = [self._get_proxy_for_key(key) for key in self._key_manager.keys]
+        self._api.transport.warmup(f"{self._api.BASE_URL}/models", proxies, self._concurrency_limit)
+        self._log(f"Connections warmed up in {time.monotonic() - started:.1f}s")
+    
+    def _log_transport_metrics(self):
+        transfers = self._api.transfer_metrics.overall
+        if transfers.requests:
+            self._log(f"Audio transfers: {transfers.summary()}")
+        for pool in self._api.transport.metrics():
+            if pool.requests:
+                self._log(
+                    f"HTTP pool {pool.transport}: peak {pool.peak_active_requests}/{pool.pool_size} in flight, "
+                    f"{pool.connections_opened} connections opened for {pool.requests} requests"
+                )
+    
+    def _process_all(self, lines: Iterable[TextLine]):
+        """Process lines with a producer feeding a bounded queue and a fixed set of workers"""
+        if self._warm_connections:
+            self._warmup_connections()
+        
         current_loop = 1
         
         while True:
@@ -339,34 +358,21 @@ class ProcessingEngine:
                         line.status = LineStatus.PENDING
                         self._update_line(line)
             
-            pending = [l for l in lines if l.status == LineStatus.PENDING]
-            
             # Initialize thread info for all threads
-            for i in range(self._thread_count):
+            for i in range(self._concurrency_limit):
                 self._stats.thread_info[i] = ThreadInfo(thread_id=i)
             
-            with ThreadPoolExecutor(max_workers=self._thread_count) as executor:
-                # Submit tasks with thread_id tracking
-                futures = {}
-                thread_id_counter = [0]  # Use list for mutable reference
-                
-                def submit_with_thread_id(line):
-                    tid = thread_id_counter[0] % self._thread_count
-                    thread_id_counter[0] += 1
-                    return executor.submit(self._process_line, line, tid), line
-                
-                for line in pending:
-                    future, ln = submit_with_thread_id(line)
-                    futures[future] = ln
-                
-                for future in as_completed(futures):
-                    if self._stop_requested:
-                        executor.shutdown(wait=False, cancel_futures=True)
-                        break
-                    try:
-                        future.result()
-                    except Exception as e:
-                        self._log(f"Error: {str(e)}")
+            # Memory stays O(thread_count) no matter how many lines there are
+            work_queue: "Queue[Optional[TextLine]]" = Queue(maxsize=self._concurrency_limit * self.QUEUE_DEPTH_FACTOR)
+            workers = [
+                threading.Thread(target=self._work, args=(work_queue, i), daemon=True)
+                for i in range(self._concurrency_limit)
+            ]
+            for worker in workers:
+                worker.start()
+            self._produce(lines, work_queue)
+            for worker in workers:
+                worker.join()
             
             # Check if should loop
             if self._stop_requested:
@@ -391,43 +397,29 @@ class ProcessingEngine:
             self._stats.completed = 0
             self._stats.failed = 0
         
-        self._running = False
-        self._log("Processing complete")
-    
-    def stop(self):
-        """Stop processing gracefully"""
-        self._stop_requested = True
-        self._pause_event.set()  # Unpause to allow threads to exit
-        self._log("Stop requested, waiting for current tasks to complete...")
+        if self._hedge_pool:
+            # Abandoned attempts finish (or time out) in the background
+            self._hedge_pool.shutdown(wait=False)
+        if self._journal:
+            self._journal.close()
+        self._ledger.stop()
+        if self._assembler is not None:
+            self._finish_assembly()
+        self._log_transport_metrics()
+        
+        self._end_run()
     
-    def pause(self):
-        """Pause processing"""
-        if self._running and not self._paused:
-            self._paused = True
+    def _set_paused(self, paused: bool):
+        if paused:
             self._pause_event.clear()
-            self._log("Processing paused")
-    
-    def resume(self):
-        """Resume processing"""
-        if self._running and self._paused:
-            self._paused = False
+        else:
             self._pause_event.set()
-            self._log("Processing resumed")
-    
-    def set_loop_mode(self, enabled: bool, count: int = 0, delay: int = 5):
-        """Configure loop mode"""
-        self._loop_enabled = enabled
-        self._loop_count = count
-        self._loop_delay = delay
     
-    @property
-    def is_running(self) -> bool:
-        return self._running
-    
-    @property
-    def is_paused(self) -> bool:
-        return self._paused
+    def _interrupt_waits(self):
+        self._pause_event.set()  # Unpause to allow threads to exit
+        self._wake_workers()  # Waiting retries are settled straight away
     
-    @property
-    def stats(self) -> ProcessingStats:
-        return self._stats
+    def _abort_requests(self):
+        with self._lock:
+            for attempt in self._inflight.values():
+                attempt.cancel_event.set()
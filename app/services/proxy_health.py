@@ -0,0 +1,392 @@
+"""Background proxy health probing and latency scoring"""
+import base64
+import socket
+import ssl
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Callable, Dict, List, Any, Iterable
+
+from core.models import Proxy, ProxyType
+
+
+PROBE_HOST = "api.elevenlabs.io"
+PROBE_PORT = 443
+
+STATE_CLOSED = "closed"  # Proxy is routable
+STATE_OPEN = "open"  # Failing; skipped until its cooldown ends
+STATE_HALF_OPEN = "half_open"  # Cooldown over; the next probe decides
+
+
+@dataclass
+class ProbeResult:
+    """One probe: TCP connect + tunnel setup through the proxy, then a TLS handshake"""
+    proxy_id: str
+    success: bool
+    connect_time: float = 0.0  # Seconds to the proxy and through its tunnel
+    tls_time: float = 0.0  # Seconds for the TLS handshake with the API host
+    error: str = ""
+    
+    @property
+    def total(self) -> float:
+        return self.connect_time + self.tls_time
+
+
+@dataclass
+class ProxyScore:
+    """Smoothed health of one proxy"""
+    proxy_id: str
+    connect_time: Optional[float] = None  # EWMA seconds
+    tls_time: Optional[float] = None  # EWMA seconds
+    error_rate: float = 0.0  # EWMA of failed probes, 0..1
+    probes: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    state: str = STATE_CLOSED
+    open_until: float = 0.0  # time.monotonic() when an open breaker may be retried
+    cooldown: float = 0.0
+    last_probe: Optional[datetime] = None
+    last_error: str = ""
+    
+    @property
+    def latency(self) -> Optional[float]:
+        if self.connect_time is None or self.tls_time is None:
+            return None
+        return self.connect_time + self.tls_time
+    
+    @property
+    def available(self) -> bool:
+        return self.state == STATE_CLOSED
+    
+    def cost(self) -> float:
+        """Ranking value, lower is better: latency inflated by the recent error rate"""
+        latency = self.latency
+        if latency is None:
+            latency = ProxyHealthMonitor.UNKNOWN_LATENCY
+        return latency * (1.0 + 4.0 * self.error_rate)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "proxy_id": self.proxy_id,
+            "connect_ms": None if self.connect_time is None else round(self.connect_time * 1000, 1),
+            "tls_ms": None if self.tls_time is None else round(self.tls_time * 1000, 1),
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+            "error_rate": round(self.error_rate, 3),
+            "probes": self.probes,
+            "failures": self.failures,
+            "state": self.state,
+            "available": self.available,
+            "last_probe": self.last_probe.isoformat() if self.last_probe else None,
+            "last_error": self.last_error
+        }
+
+
+class ProxyHealthMonitor:
+    """Probes every enabled proxy in the background and scores it.
+    
+    Each round probes all proxies at once (bounded by max_workers) and
+    folds connect time, TLS time and failures into EWMAs. A proxy that
+    fails FAILURE_THRESHOLD probes in a row, or whose error rate passes
+    ERROR_RATE_THRESHOLD, has its breaker opened: it is not routed to and
+    not probed until its cooldown ends. The next probe after that closes
+    the breaker on success or reopens it with a doubled cooldown.
+    Breaker changes are mirrored onto Proxy.is_healthy. Proxies never
+    probed fall back to their is_healthy flag.
+    """
+    
+    DEFAULT_INTERVAL = 60.0
+    DEFAULT_TIMEOUT = 10.0
+    MAX_WORKERS = 16
+    ALPHA = 0.3  # EWMA weight of the newest probe
+    FAILURE_THRESHOLD = 3
+    ERROR_RATE_THRESHOLD = 0.5
+    MIN_PROBES_FOR_RATE = 4  # Error rate alone opens the breaker only after this many probes
+    OPEN_COOLDOWN = 60.0
+    MAX_COOLDOWN = 600.0
+    UNKNOWN_LATENCY = 5.0  # Seconds assumed for a proxy with no successful probe yet
+    
+    def __init__(
+        self,
+        interval: float = DEFAULT_INTERVAL,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_workers: int = MAX_WORKERS,
+        probe_host: str = PROBE_HOST,
+        probe_port: int = PROBE_PORT
+    ):
+        self._interval = max(1.0, interval)
+        self._timeout = timeout
+        self._max_workers = max(1, max_workers)
+        self._probe_host = probe_host
+        self._probe_port = probe_port
+        self._lock = threading.Lock()
+        self._scores: Dict[str, ProxyScore] = {}
+        self._get_proxies: Optional[Callable[[], List[Proxy]]] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    # Background loop
+    def start(self, get_proxies: Callable[[], List[Proxy]], interval: Optional[float] = None):
+        """Probe get_proxies() now and then every interval seconds until stop()"""
+        self._get_proxies = get_proxies
+        if interval is not None:
+            self.set_interval(interval)
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="proxy-health")
+            self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def set_interval(self, interval: float):
+        self._interval = max(1.0, interval)
+        self._wake.set()
+    
+    def wake(self):
+        """Run a probe round now instead of waiting for the interval"""
+        self._wake.set()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                proxies = self._get_proxies() if self._get_proxies else []
+                self.probe_all(p for p in proxies if p.enabled and self._due(p.id))
+            except Exception:
+                pass  # Probing is best effort; try again next round
+            self._wake.wait(self._interval)
+            self._wake.clear()
+    
+    def _due(self, proxy_id: str) -> bool:
+        with self._lock:
+            score = self._scores.get(proxy_id)
+            return score is None or score.state != STATE_OPEN or time.monotonic() >= score.open_until
+    
+    # Probing
+    def probe_all(self, proxies: Iterable[Proxy]) -> List[ProbeResult]:
+        """Probe proxies concurrently and record the results"""
+        proxies = list(proxies)
+        if not proxies:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self._max_workers, len(proxies))) as pool:
+            return list(pool.map(self.probe, proxies))
+    
+    def probe(self, proxy: Proxy, trip: bool = False) -> ProbeResult:
+        """Probe one proxy now and record the result (see record() for trip)"""
+        result = self._measure(proxy)
+        self.record(result, proxy, trip)
+        return result
+    
+    def _measure(self, proxy: Proxy) -> ProbeResult:
+        started = time.monotonic()
+        sock = None
+        try:
+            sock = socket.create_connection((proxy.host.strip("[]"), proxy.port), timeout=self._timeout)
+            if proxy.proxy_type == ProxyType.SOCKS5:
+                _socks5_tunnel(sock, proxy, self._probe_host, self._probe_port)
+            else:
+                _http_tunnel(sock, proxy, self._probe_host, self._probe_port)
+            tunneled = time.monotonic()
+            context = ssl.create_default_context()
+            sock = context.wrap_socket(sock, server_hostname=self._probe_host)
+            return ProbeResult(proxy.id, True, tunneled - started, time.monotonic() - tunneled)
+        except Exception as e:
+            return ProbeResult(proxy.id, False, time.monotonic() - started, error=str(e) or type(e).__name__)
+        finally:
+            if sock is not None:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+    
+    def record(self, result: ProbeResult, proxy: Optional[Proxy] = None, trip: bool = False):
+        """Fold a probe (or an equivalent manual test) into the proxy's score.
+        
+        trip=True opens the breaker on this one failure, for manual tests
+        whose verdict the user expects to see straight away.
+        """
+        now = time.monotonic()
+        with self._lock:
+            score = self._scores.get(result.proxy_id)
+            if score is None:
+                score = self._scores[result.proxy_id] = ProxyScore(result.proxy_id)
+            score.probes += 1
+            score.last_probe = datetime.now()
+            score.error_rate = self._ewma(score.error_rate, 0.0 if result.success else 1.0)
+            if result.success:
+                score.connect_time = self._ewma(score.connect_time, result.connect_time)
+                score.tls_time = self._ewma(score.tls_time, result.tls_time)
+                score.consecutive_failures = 0
+                score.last_error = ""
+                score.state = STATE_CLOSED
+                score.cooldown = 0.0
+            else:
+                score.failures += 1
+                score.consecutive_failures += 1
+                score.last_error = result.error
+                if trip or score.state != STATE_CLOSED or self._should_open(score):
+                    score.cooldown = min(self.MAX_COOLDOWN, score.cooldown * 2 or self.OPEN_COOLDOWN)
+                    score.open_until = now + score.cooldown
+                    score.state = STATE_OPEN
+            available = score.available
+        if proxy is not None:
+            proxy.is_healthy = available
+            proxy.last_check = datetime.now()
+    
+    def _should_open(self, score: ProxyScore) -> bool:
+        if score.consecutive_failures >= self.FAILURE_THRESHOLD:
+            return True
+        return score.probes >= self.MIN_PROBES_FOR_RATE and score.error_rate >= self.ERROR_RATE_THRESHOLD
+    
+    def _ewma(self, current: Optional[float], sample: float) -> float:
+        if current is None:
+            return sample
+        return current + self.ALPHA * (sample - current)
+    
+    # Scores and routing
+    def score(self, proxy_id: str) -> Optional[ProxyScore]:
+        with self._lock:
+            score = self._scores.get(proxy_id)
+            if score is not None and score.state == STATE_OPEN and time.monotonic() >= score.open_until:
+                score.state = STATE_HALF_OPEN
+            return score
+    
+    def scores(self) -> List[ProxyScore]:
+        with self._lock:
+            ids = list(self._scores)
+        return [s for s in (self.score(i) for i in ids) if s is not None]
+    
+    def forget(self, proxy_id: str):
+        with self._lock:
+            self._scores.pop(proxy_id, None)
+    
+    def is_available(self, proxy: Proxy) -> bool:
+        if not proxy.enabled:
+            return False
+        score = self.score(proxy.id)
+        if score is None:
+            return proxy.is_healthy
+        return score.available
+    
+    def rank(self, proxies: Iterable[Proxy]) -> List[Proxy]:
+        """Available proxies, fastest first (unprobed ones after measured ones)"""
+        ranked = []
+        for index, proxy in enumerate(proxies):
+            if self.is_available(proxy):
+                score = self.score(proxy.id)
+                ranked.append((score.cost() if score else self.UNKNOWN_LATENCY, index, proxy))
+        ranked.sort(key=lambda item: item[:2])
+        return [proxy for _, _, proxy in ranked]
+    
+    def fastest(self, proxies: Iterable[Proxy]) -> Optional[Proxy]:
+        ranked = self.rank(proxies)
+        return ranked[0] if ranked else None
+    
+    def route(self, assigned_proxy_id: Optional[str], proxies: Iterable[Proxy]) -> Optional[Proxy]:
+        """Proxy for a key assigned to assigned_proxy_id.
+        
+        The assigned proxy while it is available; if it is broken, the
+        fastest available proxy instead; None (direct) for unassigned
+        keys or when no proxy is available.
+        """
+        if not assigned_proxy_id:
+            return None
+        proxies = list(proxies)
+        for proxy in proxies:
+            if proxy.id == assigned_proxy_id:
+                if self.is_available(proxy):
+                    return proxy
+                break
+        return self.fastest(proxies)
+
+
+def _http_tunnel(sock: socket.socket, proxy: Proxy, host: str, port: int):
+    """Open a CONNECT tunnel through an HTTP proxy"""
+    request = f"CONNECT {host}:{port} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+    if proxy.username and proxy.password:
+        token = base64.b64encode(f"{proxy.username}:{proxy.password}".encode()).decode()
+        request += f"Proxy-Authorization: Basic {token}\r\n"
+    sock.sendall((request + "\r\n").encode())
+    response = b""
+    while b"\r\n\r\n" not in response:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise ConnectionError("Proxy closed the connection")
+        response += chunk
+        if len(response) > 65536:
+            raise ConnectionError("Oversized proxy response")
+    status_line = response.split(b"\r\n", 1)[0].decode("latin-1")
+    parts = status_line.split(" ", 2)
+    if len(parts) < 2 or parts[1] != "200":
+        raise ConnectionError(f"Proxy refused CONNECT: {status_line}")
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Proxy closed the connection")
+        data += chunk
+    return data
+
+
+def _socks5_tunnel(sock: socket.socket, proxy: Proxy, host: str, port: int):
+    """Open a SOCKS5 CONNECT tunnel, with username/password auth if configured"""
+    use_auth = bool(proxy.username and proxy.password)
+    sock.sendall(b"\x05\x02\x00\x02" if use_auth else b"\x05\x01\x00")
+    version, method = _recv_exact(sock, 2)
+    if version != 5 or method == 0xFF:
+        raise ConnectionError("SOCKS5 proxy offered no usable auth method")
+    if method == 2:
+        user = (proxy.username or "").encode()
+        password = (proxy.password or "").encode()
+        sock.sendall(bytes([1, len(user)]) + user + bytes([len(password)]) + password)
+        if _recv_exact(sock, 2)[1] != 0:
+            raise ConnectionError("SOCKS5 authentication failed")
+    name = host.encode("idna")
+    sock.sendall(b"\x05\x01\x00\x03" + bytes([len(name)]) + name + struct.pack(">H", port))
+    _, reply, _, address_type = _recv_exact(sock, 4)
+    if reply != 0:
+        raise ConnectionError(f"SOCKS5 CONNECT failed (code {reply})")
+    if address_type == 1:
+        _recv_exact(sock, 4 + 2)
+    elif address_type == 4:
+        _recv_exact(sock, 16 + 2)
+    else:
+        _recv_exact(sock, _recv_exact(sock, 1)[0] + 2)
+
+
+# Global monitor
+_proxy_health: Optional[ProxyHealthMonitor] = None
+_health_lock = threading.Lock()
+
+
+def get_proxy_health() -> ProxyHealthMonitor:
+    global _proxy_health
+    if _proxy_health is None:
+        with _health_lock:
+            if _proxy_health is None:
+                _proxy_health = ProxyHealthMonitor()
+    return _proxy_health
+
+
+def start_proxy_health(get_proxies: Callable[[], List[Proxy]], interval: float) -> ProxyHealthMonitor:
+    """Run the global monitor every interval seconds, or stop it if interval <= 0"""
+    monitor = get_proxy_health()
+    if interval > 0:
+        monitor.start(get_proxies, interval)
+    elif monitor.running:
+        monitor.stop()
+    return monitor
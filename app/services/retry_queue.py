@@ -0,0 +1,127 @@
+"""Timer-based delay queue and per-error-class retry policy"""
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Optional, Dict, List, Generic, TypeVar
+
+from services.circuit_breaker import classify_failure, FAULT_ROUTE
+
+
+T = TypeVar("T")
+
+ERROR_RATE_LIMIT = "rate_limit"
+ERROR_AUTH = "auth"  # Key refused (401)
+ERROR_SERVER = "server"  # HTTP 5xx
+ERROR_NETWORK = "network"  # Proxy, connection, TLS or timeout failure
+ERROR_OTHER = "other"
+
+
+def error_class(message: str) -> str:
+    """Bucket a failed request's message for retry budgeting"""
+    if message == "RATE_LIMIT":
+        return ERROR_RATE_LIMIT
+    if message.startswith("Invalid API key"):
+        return ERROR_AUTH
+    if message.startswith("HTTP 5"):
+        return ERROR_SERVER
+    if classify_failure(message) == FAULT_ROUTE:
+        return ERROR_NETWORK
+    return ERROR_OTHER
+
+
+class RetryPolicy:
+    """Jittered exponential backoff with a separate retry budget per error class.
+    
+    The n-th retry of a class waits between half and all of
+    min(cap, base * 2 ** (n - 1)) seconds, so retries that failed together
+    do not come back together. Rate limits get a couple of extra retries
+    (the line moves to another key anyway); a refused key gets one, on a
+    different key. bases overrides base for a class. max_attempts caps
+    the total whatever the classes.
+    """
+    
+    def __init__(
+        self,
+        max_retries: int = 3,
+        base: float = 2.0,
+        cap: float = 30.0,
+        budgets: Optional[Dict[str, int]] = None,
+        bases: Optional[Dict[str, float]] = None
+    ):
+        max_retries = max(0, max_retries)
+        self.base = base
+        self.cap = cap
+        self.bases = bases or {}
+        self.budgets = {
+            ERROR_RATE_LIMIT: max_retries + 2,
+            ERROR_AUTH: min(1, max_retries),
+            ERROR_SERVER: max_retries,
+            ERROR_NETWORK: max_retries,
+            ERROR_OTHER: max_retries
+        }
+        if budgets:
+            self.budgets.update(budgets)
+        self.max_attempts = 1 + max(self.budgets.values())
+    
+    def allows(self, used: Dict[str, int], attempts: int, cls: str) -> bool:
+        """Whether a request that has made `attempts` attempts may retry after failing with cls"""
+        return attempts < self.max_attempts and used.get(cls, 0) < self.budgets.get(cls, 0)
+    
+    def delay(self, retry: int, cls: Optional[str] = None) -> float:
+        """Seconds before the retry-th retry (1-based) of a class"""
+        ceiling = min(self.cap, self.bases.get(cls, self.base) * 2 ** max(0, retry - 1))
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+class DelayQueue(Generic[T]):
+    """Items that become ready at a set time. Thread-safe.
+    
+    Workers poll pop_ready() between other work instead of sleeping on a
+    retry, so a line waiting out its backoff holds no worker. Pass a
+    shared condition to have wait() also wake on whatever else notifies it.
+    """
+    
+    def __init__(self, cond: Optional[threading.Condition] = None):
+        self._heap: List[tuple] = []
+        self._counter = itertools.count()  # FIFO among items due at the same time
+        self._cond = cond or threading.Condition()
+    
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._heap)
+    
+    def put(self, item: T, delay: float = 0.0):
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + max(0.0, delay), next(self._counter), item))
+            self._cond.notify()
+    
+    def pop_ready(self, ignore_delay: bool = False) -> Optional[T]:
+        """The earliest item whose time has come (any item if ignore_delay), or None"""
+        with self._cond:
+            if self._heap and (ignore_delay or self._heap[0][0] <= time.monotonic()):
+                return heapq.heappop(self._heap)[2]
+            return None
+    
+    def time_to_next(self) -> Optional[float]:
+        """Seconds until the earliest item is ready, None if empty"""
+        with self._cond:
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - time.monotonic())
+    
+    def wait(self, timeout: Optional[float] = None):
+        """Block until an item may be ready, one is added, the condition is notified or timeout passes"""
+        with self._cond:
+            if self._heap:
+                due = max(0.0, self._heap[0][0] - time.monotonic())
+                timeout = due if timeout is None else min(timeout, due)
+            if timeout is None or timeout > 0:
+                self._cond.wait(timeout)
+    
+    def drain(self) -> List[T]:
+        with self._cond:
+            items = [entry[2] for entry in sorted(self._heap)]
+            self._heap.clear()
+            return items
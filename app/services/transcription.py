@@ -4,6 +4,8 @@ import json
 import threading
 import subprocess
 import tempfile
+from collections import deque
+from dataclasses import dataclass, field
 from typing import Optional, List, Dict, Any, Callable
 from datetime import datetime
 from pathlib import Path
@@ -14,6 +16,8 @@ from core.models import (
     JobStatus, APIKey, Proxy
 )
 from services.elevenlabs import ElevenLabsAPI
+from services.audio_format import audio_duration
+from services.retry_queue import DelayQueue, RetryPolicy, error_class, ERROR_AUTH, ERROR_RATE_LIMIT
 
 
 # Supported audio/video formats
@@ -109,14 +113,15 @@ def get_file_info(file_path: str) -> Dict[str, Any]:
     path = Path(file_path)
     stat = path.stat()
     
-    duration = None
-    try:
-        from pydub import AudioSegment
-        if path.suffix.lower() in SUPPORTED_AUDIO_FORMATS:
-            audio = AudioSegment.from_file(file_path)
-            duration = len(audio) / 1000.0
-    except:
-        pass
+    duration = audio_duration(file_path)
+    if duration is None:
+        try:
+            from pydub import AudioSegment
+            if path.suffix.lower() in SUPPORTED_AUDIO_FORMATS:
+                audio = AudioSegment.from_file(file_path)
+                duration = len(audio) / 1000.0
+        except:
+            pass
     
     return {
         "name": path.name,
@@ -236,9 +241,22 @@ class TranscriptionExporter:
             return False
 
 
+@dataclass
+class PendingTranscription:
+    """A started job between attempts"""
+    job: TranscriptionJob
+    file_path: str  # What is uploaded: the input, or audio converted from it
+    temp_audio_path: Optional[str] = None  # Converted audio to delete once the job ends
+    attempts: int = 0
+    retries: Dict[str, int] = field(default_factory=dict)  # Per error class
+    last_error: Optional[str] = None
+
+
 class TranscriptionEngine:
     """Engine for processing transcription jobs"""
     
+    RETRY_POLL_INTERVAL = 1.0  # Longest the run loop sleeps before checking for due retries
+    
     def __init__(
         self,
         api_keys: List[APIKey],
@@ -254,6 +272,14 @@ class TranscriptionEngine:
         self._proxy_map = {p.id: p for p in self._proxies}
         self._max_retries = max_retries
         self._retry_delay = retry_delay
+        # Rate limits back off from a minute; a refused key is not retried (the next attempt would pick it again)
+        self._retry_policy = RetryPolicy(
+            max_retries,
+            base=retry_delay,
+            cap=120.0,
+            budgets={ERROR_AUTH: 0},
+            bases={ERROR_RATE_LIMIT: 60.0}
+        )
         self._on_progress = on_progress
         self._on_log = on_log
         
@@ -329,111 +355,129 @@ class TranscriptionEngine:
         with self._lock:
             self._jobs = [j for j in self._jobs if j.status not in (JobStatus.DONE, JobStatus.ERROR)]
     
-    def _process_job(self, job: TranscriptionJob):
-        """Process a single transcription job with retry logic"""
-        if self._should_stop:
-            return
-        
+    def _prepare_job(self, job: TranscriptionJob) -> Optional[PendingTranscription]:
+        """Mark a job as started and convert video input to audio; None if it failed already"""
         job.status = JobStatus.PROCESSING
         if self._on_progress:
             self._on_progress(job)
         
         # Check if input is a video file - convert to audio first
-        file_to_transcribe = job.input_path
-        temp_audio_path = None
-        
-        if is_video_file(job.input_path):
-            self._log(f"Video file detected, converting to audio: {job.file_name}")
-            success, message, audio_path = convert_video_to_audio(
-                job.input_path, 
-                on_log=self._log
-            )
-            
-            if not success:
-                job.status = JobStatus.ERROR
-                job.error = f"Video conversion failed: {message}"
-                self._log(f"Failed to convert video: {job.file_name} - {message}")
-                if self._on_progress:
-                    self._on_progress(job)
-                return
-            
-            file_to_transcribe = audio_path
-            temp_audio_path = audio_path  # Track for cleanup
+        if not is_video_file(job.input_path):
+            return PendingTranscription(job=job, file_path=job.input_path)
         
-        retry_count = 0
-        last_error = None
+        self._log(f"Video file detected, converting to audio: {job.file_name}")
+        success, message, audio_path = convert_video_to_audio(
+            job.input_path, 
+            on_log=self._log
+        )
         
-        try:
-            while retry_count <= self._max_retries:
-                if self._should_stop:
-                    return
-                
-                api_key, proxy = self._get_available_key()
-                if not api_key:
-                    job.status = JobStatus.ERROR
-                    job.error = "No available API key"
-                    self._log(f"No API key available for: {job.file_name}")
-                    if self._on_progress:
-                        self._on_progress(job)
-                    return
-                
-                if retry_count > 0:
-                    self._log(f"Retry {retry_count}/{self._max_retries}: {job.file_name}")
-                    import time
-                    time.sleep(self._retry_delay)
-                else:
-                    if temp_audio_path:
-                        self._log(f"Transcribing: {job.file_name} (using converted audio: {Path(file_to_transcribe).name})")
-                    else:
-                        self._log(f"Transcribing: {job.file_name}")
-                
-                success, message, result = self._api.transcribe(
-                    file_path=file_to_transcribe,
-                    api_key=api_key,
-                    language=job.language,
-                    diarize=job.diarize,
-                    num_speakers=job.num_speakers,
-                    proxy=proxy
-                )
-                
-                if success and result:
-                    job.status = JobStatus.DONE
-                    job.result = result
-                    job.completed_at = datetime.now()
-                    self._log(f"Completed: {job.file_name} ({result.language})")
-                    if self._on_progress:
-                        self._on_progress(job)
-                    return
-                
-                last_error = message
-                
-                # Don't retry on certain errors
-                if message in ("Invalid API key", "File too large"):
-                    break
-                
-                # Check for rate limit - wait longer before retry
-                if message == "RATE_LIMIT":
-                    self._log(f"Rate limited, waiting 60s before retry...")
-                    import time
-                    time.sleep(60)
-                
-                retry_count += 1
-            
-            # All retries failed
+        if not success:
             job.status = JobStatus.ERROR
-            job.error = last_error or "Unknown error after retries"
-            self._log(f"Failed after {retry_count} retries: {job.file_name} - {last_error}")
-            
+            job.error = f"Video conversion failed: {message}"
+            self._log(f"Failed to convert video: {job.file_name} - {message}")
             if self._on_progress:
                 self._on_progress(job)
+            return None
+        
+        return PendingTranscription(job=job, file_path=audio_path, temp_audio_path=audio_path)
+    
+    def _attempt_job(self, pending: PendingTranscription, retries: "DelayQueue[PendingTranscription]"):
+        """Make one transcription request; a retryable failure is put on the delay queue"""
+        job = pending.job
+        api_key, proxy = self._get_available_key()
+        if not api_key:
+            self._log(f"No API key available for: {job.file_name}")
+            self._finish_job(pending, "No available API key")
+            return
+        
+        if pending.attempts > 0:
+            self._log(f"Retry {pending.attempts}/{self._retry_policy.max_attempts - 1}: {job.file_name}")
+        elif pending.temp_audio_path:
+            self._log(f"Transcribing: {job.file_name} (using converted audio: {Path(pending.file_path).name})")
+        else:
+            self._log(f"Transcribing: {job.file_name}")
+        pending.attempts += 1
+        
+        success, message, result = self._api.transcribe(
+            file_path=pending.file_path,
+            api_key=api_key,
+            language=job.language,
+            diarize=job.diarize,
+            num_speakers=job.num_speakers,
+            proxy=proxy
+        )
+        
+        if success and result:
+            job.result = result
+            self._finish_job(pending)
+            return
+        
+        pending.last_error = message
+        
+        # Don't retry on certain errors
+        cls = error_class(message)
+        if message == "File too large" or not self._retry_policy.allows(pending.retries, pending.attempts, cls):
+            self._finish_job(pending, message)
+            return
+        
+        pending.retries[cls] = pending.retries.get(cls, 0) + 1
+        delay = self._retry_policy.delay(pending.retries[cls], cls)
+        if message == "RATE_LIMIT":
+            self._log(f"Rate limited, retrying {job.file_name} in {delay:.0f}s...")
+        else:
+            self._log(f"{job.file_name} will retry in {delay:.1f}s ({cls})")
+        retries.put(pending, delay)
+    
+    def _finish_job(self, pending: PendingTranscription, error: Optional[str] = None):
+        """Record a job's outcome and remove its temporary audio"""
+        job = pending.job
+        if error is None:
+            job.status = JobStatus.DONE
+            job.completed_at = datetime.now()
+            self._log(f"Completed: {job.file_name} ({job.result.language})")
+        else:
+            job.status = JobStatus.ERROR
+            job.error = error or "Unknown error after retries"
+            self._log(f"Failed after {sum(pending.retries.values())} retries: {job.file_name} - {error}")
+        if self._on_progress:
+            self._on_progress(job)
+        self._cleanup_temp_audio(pending)
+    
+    def _cleanup_temp_audio(self, pending: PendingTranscription):
+        """Clean up temporary audio file from video conversion"""
+        temp_audio_path = pending.temp_audio_path
+        if temp_audio_path and os.path.exists(temp_audio_path):
+            try:
+                os.remove(temp_audio_path)
+                self._log(f"Cleaned up temp audio file: {Path(temp_audio_path).name}")
+            except Exception as e:
+                self._log(f"Warning: Could not remove temp file: {e}")
+    
+    def _run_jobs(self, jobs: List[TranscriptionJob]):
+        """Work through jobs in order. A job waiting out a retry backoff sits on a delay
+        queue while the next ones start, instead of holding up the whole batch."""
+        queued = deque(jobs)
+        retries: "DelayQueue[PendingTranscription]" = DelayQueue()
+        try:
+            while not self._should_stop:
+                pending = retries.pop_ready()
+                if pending is None and queued:
+                    pending = self._prepare_job(queued.popleft())
+                    if pending is None:
+                        continue
+                if pending is None:
+                    if not len(retries):
+                        break
+                    retries.wait(self.RETRY_POLL_INTERVAL)
+                    continue
+                self._attempt_job(pending, retries)
         finally:
-            # Clean up temporary audio file from video conversion
-            if temp_audio_path and os.path.exists(temp_audio_path):
-                try:
-                    os.remove(temp_audio_path)
-                    self._log(f"Cleaned up temp audio file: {Path(temp_audio_path).name}")
-                except Exception as e:
-                    self._log(f"Warning: Could not remove temp file: {e}")
+            # Stopped with retries outstanding: they run again on the next start
+            for pending in retries.drain():
+                pending.job.status = JobStatus.PENDING
+                if self._on_progress:
+                    self._on_progress(pending.job)
+                self._cleanup_temp_audio(pending)
     
     def start(self):
         """Start processing pending jobs"""
@@ -445,11 +489,7 @@ class TranscriptionEngine:
         
         def run():
             try:
-                pending_jobs = [j for j in self._jobs if j.status == JobStatus.PENDING]
-                for job in pending_jobs:
-                    if self._should_stop:
-                        break
-                    self._process_job(job)
+                self._run_jobs([j for j in self._jobs if j.status == JobStatus.PENDING])
             finally:
                 self._is_running = False
         
@@ -464,5 +504,5 @@ class TranscriptionEngine:
         """Transcribe a single file synchronously"""
         job = self.add_job(file_path, language, diarize, num_speakers)
         if job:
-            self._process_job(job)
+            self._run_jobs([job])
         return job
@@ -0,0 +1,97 @@
+"""Per-request audio transfer timings, aggregated per key and proxy"""
+import threading
+from dataclasses import dataclass
+from typing import Optional, Dict, Any
+
+
+@dataclass
+class TransferStats:
+    """Running totals for one scope (everything, one key or one proxy)"""
+    requests: int = 0
+    ttfb_total: float = 0.0  # Request sent -> response headers
+    first_chunk_total: float = 0.0  # Request sent -> first audio bytes
+    transfer_total: float = 0.0  # Request sent -> last byte written
+    bytes_total: int = 0
+    first_chunk_max: float = 0.0
+    
+    def add(self, ttfb: float, first_chunk: float, transfer: float, size: int):
+        self.requests += 1
+        self.ttfb_total += ttfb
+        self.first_chunk_total += first_chunk
+        self.transfer_total += transfer
+        self.bytes_total += size
+        self.first_chunk_max = max(self.first_chunk_max, first_chunk)
+    
+    def _avg(self, total: float) -> float:
+        return total / self.requests if self.requests else 0.0
+    
+    @property
+    def throughput(self) -> float:
+        """Bytes per second over all transfers"""
+        return self.bytes_total / self.transfer_total if self.transfer_total > 0 else 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "avg_ttfb_ms": self._avg(self.ttfb_total) * 1000,
+            "avg_first_chunk_ms": self._avg(self.first_chunk_total) * 1000,
+            "max_first_chunk_ms": self.first_chunk_max * 1000,
+            "avg_transfer_ms": self._avg(self.transfer_total) * 1000,
+            "bytes": self.bytes_total,
+            "throughput_kbps": self.throughput * 8 / 1000
+        }
+    
+    def summary(self) -> str:
+        return (
+            f"{self.requests} transfers, TTFB {self._avg(self.ttfb_total) * 1000:.0f} ms, "
+            f"first audio {self._avg(self.first_chunk_total) * 1000:.0f} ms, "
+            f"total {self._avg(self.transfer_total) * 1000:.0f} ms, "
+            f"{self.throughput * 8 / 1000:.0f} kbps"
+        )
+
+
+class TransferMetrics:
+    """Thread-safe collector fed by every successful TTS download"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._overall = TransferStats()
+        self._keys: Dict[str, TransferStats] = {}
+        self._proxies: Dict[str, TransferStats] = {}
+    
+    def record(
+        self,
+        key_id: Optional[str],
+        proxy_id: Optional[str],
+        ttfb: float,
+        first_chunk: float,
+        transfer: float,
+        size: int
+    ):
+        with self._lock:
+            scopes = [self._overall]
+            if key_id:
+                scopes.append(self._keys.setdefault(key_id, TransferStats()))
+            if proxy_id:
+                scopes.append(self._proxies.setdefault(proxy_id, TransferStats()))
+            for stats in scopes:
+                stats.add(ttfb, first_chunk, transfer, size)
+    
+    @property
+    def overall(self) -> TransferStats:
+        with self._lock:
+            return TransferStats(**self._overall.__dict__)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "overall": self._overall.to_dict(),
+                "keys": {k: s.to_dict() for k, s in self._keys.items()},
+                "proxies": {p: s.to_dict() for p, s in self._proxies.items()}
+            }
+    
+    def reset(self):
+        with self._lock:
+            self._overall = TransferStats()
+            self._keys.clear()
+            self._proxies.clear()
@@ -0,0 +1,216 @@
+"""Content-addressed on-disk cache for synthesized TTS audio"""
+import os
+import json
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+from core.models import VoiceSettings, DEFAULT_OUTPUT_FORMAT
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters for the audio cache"""
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+    
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0.0
+        return self.hits / lookups
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": self.entries,
+            "size_bytes": self.size_bytes,
+            "hit_rate": self.hit_rate
+        }
+
+
+def link_or_copy(src: str, dst: str):
+    """Hard-link src to dst, falling back to a copy across filesystems.
+    
+    Any existing dst is replaced, never written through, so a linked
+    cache entry can't be truncated by a later overwrite of dst.
+    """
+    dst_dir = os.path.dirname(dst)
+    if dst_dir:
+        os.makedirs(dst_dir, exist_ok=True)
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class TTSAudioCache:
+    """Size-bounded LRU cache of rendered audio, keyed by request content.
+    
+    Entries live as <sha256>.<ext> files under cache_dir; recency is kept
+    in memory and mirrored to file mtimes so it survives restarts.
+    """
+    
+    def __init__(self, cache_dir: Optional[Path] = None, max_bytes: int = 2 * 1024 ** 3):
+        self._dir = Path(cache_dir) if cache_dir else Path.home() / ".2tts" / "tts_cache"
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # filename -> size, oldest first
+        self._size = 0
+        self._stats = CacheStats()
+        self._load()
+    
+    def _load(self):
+        self._dir.mkdir(parents=True, exist_ok=True)
+        found = []
+        for entry in os.scandir(self._dir):
+            if not entry.is_file() or entry.name.endswith(".tmp"):
+                continue
+            st = entry.stat()
+            found.append((st.st_mtime, entry.name, st.st_size))
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self._size += size
+    
+    @staticmethod
+    def make_key(
+        text: str,
+        voice_id: str,
+        settings: Optional[VoiceSettings] = None,
+        language_code: Optional[str] = None,
+        output_format: str = DEFAULT_OUTPUT_FORMAT
+    ) -> str:
+        """Hash everything that affects the rendered audio"""
+        if settings is None:
+            settings = VoiceSettings()
+        material = json.dumps({
+            "text": text,
+            "voice_id": voice_id,
+            "model_id": settings.model.value,
+            "voice_settings": settings.to_dict(),
+            "language_code": language_code,
+            "output_format": output_format
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def _filename(key: str, output_format: str) -> str:
+        ext = output_format.split("_", 1)[0] or "bin"
+        return f"{key}.{ext}"
+    
+    def get(self, key: str, output_path: str, output_format: str = DEFAULT_OUTPUT_FORMAT) -> bool:
+        """Materialize a cached entry at output_path. Returns True on hit."""
+        name = self._filename(key, output_format)
+        path = self._dir / name
+        with self._lock:
+            if name not in self._entries:
+                self._stats.misses += 1
+                return False
+            self._entries.move_to_end(name)
+        
+        try:
+            link_or_copy(str(path), output_path)
+            os.utime(path)
+        except OSError:
+            # Entry vanished underneath us (manual cleanup, other process)
+            with self._lock:
+                size = self._entries.pop(name, None)
+                if size is not None:
+                    self._size -= size
+                self._stats.misses += 1
+            return False
+        
+        with self._lock:
+            self._stats.hits += 1
+        return True
+    
+    def put(self, key: str, source_path: str, output_format: str = DEFAULT_OUTPUT_FORMAT):
+        """Store a freshly rendered file. The source is copied, not moved."""
+        name = self._filename(key, output_format)
+        path = self._dir / name
+        tmp_path = self._dir / f"{name}.{threading.get_ident()}.tmp"
+        try:
+            shutil.copyfile(source_path, tmp_path)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        
+        with self._lock:
+            old_size = self._entries.pop(name, None)
+            if old_size is not None:
+                self._size -= old_size
+            self._entries[name] = size
+            self._size += size
+            self._stats.stores += 1
+            self._evict()
+    
+    def _evict(self):
+        """Drop least recently used entries until under budget (caller holds the lock)"""
+        while self._size > self._max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._size -= size
+            self._stats.evictions += 1
+            try:
+                os.remove(self._dir / name)
+            except OSError:
+                pass
+    
+    def set_max_bytes(self, max_bytes: int):
+        with self._lock:
+            self._max_bytes = max(0, max_bytes)
+            self._evict()
+    
+    def clear(self):
+        """Remove every cached entry"""
+        with self._lock:
+            for name in self._entries:
+                try:
+                    os.remove(self._dir / name)
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._size = 0
+    
+    @property
+    def cache_dir(self) -> Path:
+        return self._dir
+    
+    @property
+    def stats(self) -> CacheStats:
+        with self._lock:
+            self._stats.entries = len(self._entries)
+            self._stats.size_bytes = self._size
+            return CacheStats(**{k: v for k, v in self._stats.__dict__.items()})
+
+
+# Global cache instance
+_tts_cache: Optional[TTSAudioCache] = None
+_tts_cache_lock = threading.Lock()
+
+
+def get_tts_cache() -> TTSAudioCache:
+    global _tts_cache
+    if _tts_cache is None:
+        with _tts_cache_lock:
+            if _tts_cache is None:
+                _tts_cache = TTSAudioCache()
+    return _tts_cache
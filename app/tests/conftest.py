@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The app imports its packages (core, services, ...) from the app folder
+sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -0,0 +1,43 @@
+import threading
+
+from core.models import APIKey
+from services.key_scheduler import KeyScheduler, POLICY_ROUND_ROBIN, POLICY_SMALLEST_CREDITS
+
+
+def make_key(name: str, **fields) -> APIKey:
+    return APIKey(key=name, name=name, character_limit=10000, is_valid=True, **fields)
+
+
+def next_key_within(scheduler: KeyScheduler, timeout: float = 2.0):
+    """next_key() on a thread, so a scheduler that spins fails the test instead of hanging it"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(scheduler.next_key()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "next_key() did not return"
+    return result[0]
+
+
+def test_cooldown_without_expiry_counts_as_over():
+    key = make_key("a", in_cooldown=True, cooldown_until=None)
+    scheduler = KeyScheduler([key], policy=POLICY_ROUND_ROBIN)
+    
+    assert next_key_within(scheduler) is key
+    assert not key.in_cooldown
+
+
+def test_cooldown_flag_set_behind_the_schedulers_back():
+    first, second = make_key("a"), make_key("b")
+    scheduler = KeyScheduler([first, second], policy=POLICY_SMALLEST_CREDITS)
+    for key in (first, second):
+        key.in_cooldown = True  # No cooldown_until, and no update() call
+    
+    assert next_key_within(scheduler) in (first, second)
+
+
+def test_timed_cooldown_is_still_honoured():
+    cooling, ready = make_key("a"), make_key("b")
+    scheduler = KeyScheduler([cooling, ready], policy=POLICY_ROUND_ROBIN)
+    scheduler.cooldown(cooling, 60)
+    
+    assert [next_key_within(scheduler) for _ in range(3)] == [ready, ready, ready]
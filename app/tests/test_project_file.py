@@ -0,0 +1,69 @@
+import os
+
+from core.models import Project, TextLine
+from core.project_file import ProjectFile
+
+
+def make_project(path: str) -> Project:
+    project = Project(name="demo", lines=[TextLine(index=i, text=f"line {i}") for i in range(3)])
+    project.save(path)
+    return project
+
+
+def test_load_replays_saved_changes(tmp_path):
+    path = str(tmp_path / "demo.2tts")
+    project = make_project(path)
+    first, second, third = (line.id for line in project.lines)
+    ProjectFile(path).append([
+        {"op": "update", "lines": [{"id": second, "text": "edited"}], "version": 1},
+        {"op": "insert", "index": 0, "lines": [{"id": "new", "text": "inserted"}], "version": 2},
+        {"op": "delete", "ids": [third], "version": 3},
+        {"op": "meta", "fields": {"name": "renamed"}, "version": 4}
+    ])
+    
+    loaded = Project.load(path)
+    
+    assert loaded.name == "renamed"
+    assert [line.id for line in loaded.lines] == ["new", first, second]
+    assert [line.text for line in loaded.lines] == ["inserted", "line 0", "edited"]
+    assert [line.index for line in loaded.lines] == [0, 1, 2]
+
+
+def test_load_skips_changes_already_in_the_snapshot(tmp_path):
+    path = str(tmp_path / "demo.2tts")
+    project = make_project(path)
+    project_file = ProjectFile(path)
+    project_file.write_snapshot(dict(project.to_dict(), name="compacted"), 2)
+    project_file.append([
+        {"op": "meta", "fields": {"name": "stale"}, "version": 2},
+        {"op": "update", "lines": [{"id": project.lines[0].id, "text": "newer"}], "version": 3}
+    ])
+    
+    loaded = Project.load(path)
+    
+    assert loaded.name == "compacted"
+    assert loaded.lines[0].text == "newer"
+
+
+def test_load_drops_a_torn_final_record(tmp_path):
+    path = str(tmp_path / "demo.2tts")
+    project = make_project(path)
+    project_file = ProjectFile(path)
+    project_file.append([{"op": "update", "lines": [{"id": project.lines[0].id, "text": "kept"}], "version": 1}])
+    size = os.path.getsize(project_file.changes_path)
+    with open(project_file.changes_path, "ab") as f:
+        f.write(b'{"op": "update", "lines": [{"id"')
+    
+    assert Project.load(path).lines[0].text == "kept"
+    assert os.path.getsize(project_file.changes_path) == size
+
+
+def test_save_discards_the_change_log(tmp_path):
+    path = str(tmp_path / "demo.2tts")
+    project = make_project(path)
+    ProjectFile(path).append([{"op": "meta", "fields": {"name": "renamed"}, "version": 1}])
+    
+    project.save(path)
+    
+    assert not os.path.exists(path + ProjectFile.CHANGES_SUFFIX)
+    assert Project.load(path).name == "demo"
@@ -9,8 +9,9 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, pyqtSignal
 from typing import List, Optional
 
-from core.models import APIKey, Proxy, ProxyType, Voice, VoiceSettings
+from core.models import APIKey, Proxy, ProxyType, Voice, VoiceSettings, DEFAULT_OUTPUT_FORMAT
 from services.localization import tr, get_localization
+from services.audio_format import OUTPUT_FORMAT_CHOICES
 from ui.workers import (
     ValidateKeysWorker, TestProxiesWorker, FetchVoiceWorker,
     SearchVoiceLibraryWorker, VoicePreviewWorker, CloneVoiceWorker
@@ -723,8 +724,16 @@ class SettingsDialog(QDialog):
         proc_group = QGroupBox(tr("processing"))
         proc_layout = QFormLayout(proc_group)
         
+        self.engine_combo = QComboBox()
+        self.engine_combo.addItem(tr("engine_threaded"), "threaded")
+        self.engine_combo.addItem(tr("engine_async"), "async")
+        engine_index = self.engine_combo.findData(settings.get("engine", "threaded"))
+        self.engine_combo.setCurrentIndex(max(0, engine_index))
+        self.engine_combo.currentIndexChanged.connect(self._on_engine_changed)
+        proc_layout.addRow(tr("processing_engine") + ":", self.engine_combo)
+        
         self.threads_spin = QSpinBox()
-        self.threads_spin.setRange(1, 50)
+        self._on_engine_changed()
         self.threads_spin.setValue(settings.get("thread_count", 5))
         proc_layout.addRow(tr("thread_count") + ":", self.threads_spin)
         
@@ -740,6 +749,13 @@ class SettingsDialog(QDialog):
         self.delay_spin.setSuffix(" s")
         proc_layout.addRow(tr("request_delay") + ":", self.delay_spin)
         
+        self.adaptive_check = QCheckBox()
+        self.adaptive_check.setChecked(settings.get("adaptive_concurrency", True))
+        self.adaptive_check.setToolTip(tr("adaptive_concurrency_tooltip"))
+        self.adaptive_check.toggled.connect(lambda checked: self.delay_spin.setEnabled(not checked))
+        self.delay_spin.setEnabled(not self.adaptive_check.isChecked())
+        proc_layout.addRow(tr("adaptive_concurrency") + ":", self.adaptive_check)
+        
         content_layout.addWidget(proc_group)
         
         # Text splitting group
@@ -771,6 +787,14 @@ class SettingsDialog(QDialog):
         self.silence_spin.setSuffix(" ms")
         audio_layout.addRow(tr("silence_gap") + ":", self.silence_spin)
         
+        self.format_combo = QComboBox()
+        for label, output_format in OUTPUT_FORMAT_CHOICES:
+            self.format_combo.addItem(label, output_format)
+        format_index = self.format_combo.findData(settings.get("output_format", DEFAULT_OUTPUT_FORMAT))
+        self.format_combo.setCurrentIndex(max(0, format_index))
+        self.format_combo.setToolTip(tr("output_format_tooltip"))
+        audio_layout.addRow(tr("output_format") + ":", self.format_combo)
+        
         content_layout.addWidget(audio_group)
         
         # Appearance group
@@ -899,12 +923,16 @@ class SettingsDialog(QDialog):
                     imported = json.load(f)
                 
                 # Apply imported settings to UI
+                if "engine" in imported:
+                    self.engine_combo.setCurrentIndex(max(0, self.engine_combo.findData(imported["engine"])))
                 if "thread_count" in imported:
                     self.threads_spin.setValue(imported["thread_count"])
                 if "max_retries" in imported:
                     self.retries_spin.setValue(imported["max_retries"])
                 if "request_delay" in imported:
                     self.delay_spin.setValue(imported["request_delay"])
+                if "adaptive_concurrency" in imported:
+                    self.adaptive_check.setChecked(imported["adaptive_concurrency"])
                 if "auto_split_enabled" in imported:
                     self.auto_split_check.setChecked(imported["auto_split_enabled"])
                 if "max_chars" in imported:
@@ -913,6 +941,8 @@ class SettingsDialog(QDialog):
                     self.delimiter_edit.setText(imported["split_delimiter"])
                 if "silence_gap" in imported:
                     self.silence_spin.setValue(int(imported["silence_gap"] * 1000))
+                if "output_format" in imported:
+                    self.format_combo.setCurrentIndex(max(0, self.format_combo.findData(imported["output_format"])))
                 if "theme" in imported:
                     theme_index = {"system": 0, "dark": 1, "light": 2}.get(imported["theme"], 1)
                     self.theme_combo.setCurrentIndex(theme_index)
@@ -930,13 +960,16 @@ class SettingsDialog(QDialog):
         if file_path:
             try:
                 export_data = {
+                    "engine": self.engine_combo.currentData(),
                     "thread_count": self.threads_spin.value(),
                     "max_retries": self.retries_spin.value(),
                     "request_delay": self.delay_spin.value(),
+                    "adaptive_concurrency": self.adaptive_check.isChecked(),
                     "auto_split_enabled": self.auto_split_check.isChecked(),
                     "max_chars": self.max_chars_spin.value(),
                     "split_delimiter": self.delimiter_edit.text(),
                     "silence_gap": self.silence_spin.value() / 1000,
+                    "output_format": self.format_combo.currentData(),
                     "theme": self.theme_combo.currentData()
                 }
                 
@@ -947,14 +980,24 @@ class SettingsDialog(QDialog):
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Failed to export settings: {e}")
     
+    def _on_engine_changed(self):
+        """The async engine runs requests as coroutines, so it can go far wider"""
+        if self.engine_combo.currentData() == "async":
+            self.threads_spin.setRange(1, 500)
+        else:
+            self.threads_spin.setRange(1, 50)
+    
     def _save(self):
+        self._settings["engine"] = self.engine_combo.currentData()
         self._settings["thread_count"] = self.threads_spin.value()
         self._settings["max_retries"] = self.retries_spin.value()
         self._settings["request_delay"] = self.delay_spin.value()
+        self._settings["adaptive_concurrency"] = self.adaptive_check.isChecked()
         self._settings["auto_split_enabled"] = self.auto_split_check.isChecked()
         self._settings["max_chars"] = self.max_chars_spin.value()
         self._settings["split_delimiter"] = self.delimiter_edit.text()
         self._settings["silence_gap"] = self.silence_spin.value() / 1000
+        self._settings["output_format"] = self.format_combo.currentData()
         self._settings["theme"] = self.theme_combo.currentData()
         self._settings["app_language"] = self.language_combo.currentData()
         self._settings["auto_start_on_launch"] = self.auto_start_check.isChecked()
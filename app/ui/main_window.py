@@ -3,7 +3,7 @@ import os
 import sys
 import threading
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Union
 from datetime import datetime
 
 from PyQt6.QtWidgets import (
@@ -24,8 +24,13 @@ from core.models import (
 from core.config import get_config
 from services.file_import import FileImporter, TextSplitter
 from services.elevenlabs import ElevenLabsAPI, APIKeyManager
+from services.key_validation import BulkKeyValidator
 from services.processing import ProcessingEngine, ProcessingStats
+from services.async_processing import AsyncProcessingEngine
+from services.proxy_health import start_proxy_health
+from services.tts_cache import get_tts_cache
 from services.audio import SRTGenerator, MP3Concatenator
+from services.assembly import AssemblyResult
 from services.language import LanguageDetector
 from ui.widgets import (
     DropZone, LineTableWidget, VoiceSettingsWidget, 
@@ -94,7 +99,7 @@ class MainWindow(QMainWindow):
         self._lang_detector = LanguageDetector()
         self._srt_generator = SRTGenerator()
         self._mp3_concat = MP3Concatenator()
-        self._engine: Optional[ProcessingEngine] = None
+        self._engine: Optional[Union[ProcessingEngine, AsyncProcessingEngine]] = None
         
         # Voices cache
         self._voices: Dict[str, Voice] = {}
@@ -130,6 +135,9 @@ class MainWindow(QMainWindow):
         # Start analytics session
         self._analytics.start_session()
         
+        # Keep proxy latency scores fresh so runs route around slow or dead proxies
+        start_proxy_health(lambda: self._config.proxies, float(self._config.get("proxy_health_interval", 60)))
+        
         # UI setup
         self._setup_ui()
         self._setup_menu()
@@ -348,7 +356,7 @@ class MainWindow(QMainWindow):
         threads_layout = QHBoxLayout(threads_group)
         threads_layout.addWidget(QLabel(tr("threads") + ":"))
         self._threads_spin = QSpinBox()
-        self._threads_spin.setRange(1, 50)
+        self._threads_spin.setRange(1, 500 if self._project.settings.engine == "async" else 50)
         self._threads_spin.setValue(self._project.settings.thread_count)
         self._threads_spin.setToolTip("Number of concurrent requests")
         threads_layout.addWidget(self._threads_spin)
@@ -788,12 +796,10 @@ class MainWindow(QMainWindow):
     def _refresh_credits(self, fetch_from_api: bool = False):
         """Refresh credit display"""
         if fetch_from_api:
-            # Fetch latest subscription info from API for all keys
-            for key in self._config.api_keys:
-                if key.enabled:
-                    proxy = self._config.get_proxy_for_key(key)
-                    self._api.validate_key(key, proxy)
-            self._config._save_api_keys()
+            # Fetch latest subscription info for all keys concurrently, then save once
+            keys = [key for key in self._config.api_keys if key.enabled]
+            BulkKeyValidator(self._api).validate(keys, self._config.get_proxy_for_key)
+            self._config.update_api_keys(keys)
         
         total = self._config.get_total_credits()
         self._credit_widget.update_credits(total)
@@ -1347,8 +1353,15 @@ class MainWindow(QMainWindow):
         # Ensure output folder exists
         os.makedirs(self._project.settings.output_folder, exist_ok=True)
         
+        # Reuse previously rendered audio instead of paying for it again
+        audio_cache = None
+        if self._config.get("tts_cache_enabled", True):
+            audio_cache = get_tts_cache()
+            audio_cache.set_max_bytes(int(self._config.get("tts_cache_max_mb", 2048)) * 1024 * 1024)
+        
         # Create engine
-        self._engine = ProcessingEngine(
+        engine_cls = AsyncProcessingEngine if self._project.settings.engine == "async" else ProcessingEngine
+        self._engine = engine_cls(
             api_keys=self._config.api_keys,
             proxies=self._config.proxies,
             voices=self._voices,
@@ -1360,8 +1373,25 @@ class MainWindow(QMainWindow):
             on_progress=self._on_processing_progress,
             on_line_update=self._on_line_updated,
             on_log=self._log,
-            on_credit_used=self._on_credit_used,
-            on_key_removed=self._on_key_removed
+            on_key_removed=self._on_key_removed,
+            audio_cache=audio_cache,
+            adaptive_concurrency=self._project.settings.adaptive_concurrency,
+            on_credits_flushed=self._on_credits_flushed,
+            credit_reconcile_interval=float(self._config.get("credit_reconcile_interval", 120)),
+            credit_reconcile_lines=int(self._config.get("credit_reconcile_lines", 500)),
+            hedge_requests=bool(self._config.get("hedge_requests", False)),
+            hedge_percentile=float(self._config.get("hedge_percentile", 95)),
+            hedge_max_extra=float(self._config.get("hedge_max_extra", 0.05)),
+            warm_connections=bool(self._config.get("warm_connections", True)),
+            streaming=bool(self._config.get("tts_streaming", False)),
+            output_format=self._project.settings.output_format,
+            assemble_output=bool(self._config.get("assemble_output", True)),
+            silence_gap=self._project.settings.silence_gap,
+            timing_offset=self._project.settings.timing_offset,
+            key_policy=self._config.get("key_policy", "round_robin"),
+            plan_keys=bool(self._config.get("plan_keys", True)),
+            key_concurrency=int(self._config.get("key_concurrency", 5)),
+            circuit_breakers=bool(self._config.get("circuit_breakers", True))
         )
         
         # Configure loop mode
@@ -1423,10 +1453,9 @@ class MainWindow(QMainWindow):
         # Update table - called from worker thread
         QApplication.instance().postEvent(self, LineUpdateEvent(line))
     
-    def _on_credit_used(self, api_key: APIKey, chars_used: int):
-        """Handle credit used"""
-        # Update local config
-        self._config.update_api_key(api_key)
+    def _on_credits_flushed(self, api_keys: List[APIKey]):
+        """Persist a batch of locally debited / reconciled keys"""
+        self._config.update_api_keys(api_keys)
     
     def _on_key_removed(self, api_key: APIKey, reason: str):
         """Handle API key removal due to low credits (< 500)"""
@@ -1449,6 +1478,23 @@ class MainWindow(QMainWindow):
                 self._stop_btn.setEnabled(False)
                 self._thread_status.reset()
                 self._model_status_label.setText("")  # Clear model indicator
+                if stats.cache_hits:
+                    self._log(f"{stats.cache_hits} line(s) reused from the audio cache (no credits used)")
+                if stats.deduplicated:
+                    self._log(
+                        f"{stats.deduplicated} duplicate line(s) copied from an identical line "
+                        f"({stats.dedup_saved_requests} requests, {stats.dedup_saved_credits} credits saved)"
+                    )
+                if stats.hedged:
+                    self._log(
+                        f"{stats.hedged} slow request(s) hedged, {stats.hedge_wins} answered first "
+                        f"({stats.hedge_extra_credits} extra credits)"
+                    )
+                if stats.breaker_trips:
+                    self._log(
+                        f"{stats.breaker_trips} circuit breaker trip(s), "
+                        f"{stats.rerouted} request(s) routed around a failing key or proxy"
+                    )
             
             if stats.current_loop > 1:
                 status = f"{status} (Loop {stats.current_loop})"
@@ -1461,8 +1507,9 @@ class MainWindow(QMainWindow):
             # Update thread status display
             self._thread_status.update_status(
                 stats.active_threads,
-                self._project.settings.thread_count,
-                stats.get_thread_display()
+                stats.concurrency_window or self._project.settings.thread_count,
+                stats.get_thread_display(),
+                stats.breakers
             )
             
             self._refresh_credits()
@@ -1482,9 +1529,17 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Warning", "No completed audio files to join")
             return
         
+        assembled = self._assembled_output(completed_lines)
+        if assembled:
+            self._log(f"MP3 joined: {assembled.audio_path}")
+            QMessageBox.information(self, "Success", f"MP3 created: {assembled.audio_path}")
+            return
+        
+        # Join in the lines' own format so nothing is re-encoded
+        ext = os.path.splitext(completed_lines[0].output_path)[1] or ".mp3"
         output_path = os.path.join(
             self._project.settings.output_folder,
-            f"joined_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp3"
+            f"joined_{datetime.now().strftime('%Y%m%d_%H%M%S')}{ext}"
         )
         
         success, message = self._mp3_concat.concatenate_streaming(
@@ -1498,6 +1553,19 @@ class MainWindow(QMainWindow):
         else:
             QMessageBox.critical(self, "Error", f"Failed to join MP3: {message}")
     
+    def _assembled_output(self, completed_lines: List[TextLine]) -> Optional[AssemblyResult]:
+        """The engine's incrementally built audio/SRT, if it still matches the project"""
+        result = self._engine.assembly_result if self._engine and not self._engine.is_running else None
+        if (
+            result is None or not result.complete
+            or result.lines != len(completed_lines)
+            or result.silence_gap != max(0.0, self._project.settings.silence_gap)
+            or result.offset != self._project.settings.timing_offset
+            or not os.path.exists(result.audio_path)
+        ):
+            return None
+        return result
+    
     def _on_generate_srt(self):
         """Generate SRT file"""
         completed_lines = [l for l in self._project.lines if l.status == LineStatus.DONE]
@@ -1505,6 +1573,12 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Warning", "No completed lines for SRT")
             return
         
+        assembled = self._assembled_output(completed_lines)
+        if assembled and os.path.exists(assembled.srt_path):
+            self._log(f"SRT generated: {assembled.srt_path}")
+            QMessageBox.information(self, "Success", f"SRT created: {assembled.srt_path}")
+            return
+        
         output_path = os.path.join(
             self._project.settings.output_folder,
             f"subtitles_{datetime.now().strftime('%Y%m%d_%H%M%S')}.srt"
@@ -1560,13 +1634,16 @@ class MainWindow(QMainWindow):
     def _on_settings(self):
         """Open settings dialog"""
         settings = {
+            "engine": self._project.settings.engine,
             "thread_count": self._project.settings.thread_count,
             "max_retries": self._project.settings.max_retries,
             "request_delay": self._project.settings.request_delay,
+            "adaptive_concurrency": self._project.settings.adaptive_concurrency,
             "auto_split_enabled": self._project.settings.auto_split_enabled,
             "max_chars": self._project.settings.max_chars,
             "split_delimiter": self._project.settings.split_delimiter,
             "silence_gap": self._project.settings.silence_gap,
+            "output_format": self._project.settings.output_format,
             "theme": self._config.theme,
             "app_language": self._config.app_language,
             "vn_preprocessing_enabled": self._project.settings.vn_preprocessing_enabled,
@@ -1579,19 +1656,23 @@ class MainWindow(QMainWindow):
         if dialog.exec() == SettingsDialog.DialogCode.Accepted:
             new_settings = dialog.get_settings()
             
+            self._project.settings.engine = new_settings["engine"]
             self._project.settings.thread_count = new_settings["thread_count"]
             self._project.settings.max_retries = new_settings["max_retries"]
             self._project.settings.request_delay = new_settings["request_delay"]
+            self._project.settings.adaptive_concurrency = new_settings["adaptive_concurrency"]
             self._project.settings.auto_split_enabled = new_settings["auto_split_enabled"]
             self._project.settings.max_chars = new_settings["max_chars"]
             self._project.settings.split_delimiter = new_settings["split_delimiter"]
             self._project.settings.silence_gap = new_settings["silence_gap"]
+            self._project.settings.output_format = new_settings["output_format"]
             # Vietnamese TTS settings
             self._project.settings.vn_preprocessing_enabled = new_settings["vn_preprocessing_enabled"]
             self._project.settings.vn_max_phrase_words = new_settings["vn_max_phrase_words"]
             self._project.settings.vn_add_micro_pauses = new_settings["vn_add_micro_pauses"]
             self._project.settings.vn_micro_pause_interval = new_settings["vn_micro_pause_interval"]
             
+            self._threads_spin.setRange(1, 500 if new_settings["engine"] == "async" else 50)
             self._threads_spin.setValue(new_settings["thread_count"])
             
             if new_settings["theme"] != self._config.theme:
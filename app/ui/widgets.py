@@ -966,6 +966,11 @@ class ThreadStatusWidget(QGroupBox):
         self.count_label = QLabel(tr("active_threads", active=0, total=0))
         layout.addWidget(self.count_label)
         
+        # Keys/proxies whose circuit breaker is open, hidden while there are none
+        self.breaker_label = QLabel()
+        self.breaker_label.setVisible(False)
+        layout.addWidget(self.breaker_label)
+        
         # Thread indicators (horizontal layout)
         self._thread_layout = QHBoxLayout()
         self._thread_layout.setSpacing(4)
@@ -981,13 +986,24 @@ class ThreadStatusWidget(QGroupBox):
         self._thread_layout.addStretch()
         layout.addLayout(self._thread_layout)
     
-    def update_status(self, active_count: int, total_threads: int, thread_info: dict = None):
+    def update_status(self, active_count: int, total_threads: int, thread_info: dict = None, breakers: dict = None):
         """Update thread status display"""
         self.count_label.setText(tr("active_threads", active=active_count, total=total_threads))
         
         # Get theme colors
         c = get_current_theme_colors()
         
+        keys = (breakers or {}).get("keys", {})
+        proxies = (breakers or {}).get("proxies", {})
+        if keys or proxies:
+            self.breaker_label.setText(tr("breakers_open", keys=len(keys), proxies=len(proxies)))
+            self.breaker_label.setToolTip("\n".join(
+                [f"Key {name}: {state}" for name, state in keys.items()]
+                + [f"Proxy {name}: {state}" for name, state in proxies.items()]
+            ))
+            self.breaker_label.setStyleSheet(f"color: {c['warning']};")
+        self.breaker_label.setVisible(bool(keys or proxies))
+        
         # Update indicators
         for i, label in enumerate(self._thread_labels):
             if i < total_threads:
@@ -1010,6 +1026,7 @@ class ThreadStatusWidget(QGroupBox):
     def reset(self):
         """Reset all thread indicators"""
         c = get_current_theme_colors()
+        self.breaker_label.setVisible(False)
         for label in self._thread_labels:
             label.setText("○")
             label.setStyleSheet(f"color: {c['fg_tertiary']}; font-size: 14px;")
@@ -38,43 +38,42 @@ class GenericWorker(QThread):
 
 
 class ValidateKeysWorker(QThread):
-    """Worker for validating API keys"""
+    """Worker for validating API keys, several at a time"""
     
     started = pyqtSignal()
     progress = pyqtSignal(int, int, str)  # current, total, message
+    key_validated = pyqtSignal(object)  # KeyValidationResult, as each key finishes
     finished = pyqtSignal(int, int)  # validated_count, total_count
     error = pyqtSignal(str)
     
-    def __init__(self, keys: list, parent=None):
+    def __init__(self, keys: list, parent=None, get_proxy_fn: Optional[Callable] = None):
         super().__init__(parent)
         self._keys = keys
-        self._is_cancelled = False
+        self._get_proxy_fn = get_proxy_fn
+        self._cancel = threading.Event()
     
     def run(self):
-        from services.elevenlabs import ElevenLabsAPI
+        from services.key_validation import BulkKeyValidator
         
         self.started.emit()
-        api = ElevenLabsAPI()
         validated_count = 0
-        total = len(self._keys)
         
-        for i, key in enumerate(self._keys):
-            if self._is_cancelled:
-                break
-            
-            self.progress.emit(i + 1, total, f"Validating key {i + 1}/{total}...")
-            
-            try:
-                success, msg = api.validate_key(key)
-                if success:
-                    validated_count += 1
-            except Exception as e:
-                pass  # Continue with next key
+        def on_result(result, done, total):
+            nonlocal validated_count
+            if result.success:
+                validated_count += 1
+            self.key_validated.emit(result)
+            self.progress.emit(done, total, f"Validated {done}/{total}: {result.key.name} - {result.message}")
         
-        self.finished.emit(validated_count, total)
+        try:
+            BulkKeyValidator().validate(self._keys, self._get_proxy_fn, on_result, self._cancel)
+        except Exception as e:
+            self.error.emit(str(e))
+        
+        self.finished.emit(validated_count, len(self._keys))
     
     def cancel(self):
-        self._is_cancelled = True
+        self._cancel.set()
 
 
 class TestProxiesWorker(QThread):
@@ -91,26 +90,27 @@ class TestProxiesWorker(QThread):
         self._is_cancelled = False
     
     def run(self):
-        import requests
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        from services.proxy_health import get_proxy_health
         
         self.started.emit()
         healthy_count = 0
         total = len(self._proxies)
+        done = 0
         
-        for i, proxy in enumerate(self._proxies):
-            if self._is_cancelled:
-                break
-            
-            self.progress.emit(i + 1, total, f"Testing proxy {i + 1}/{total}...")
-            
-            try:
-                proxies = {"http": proxy.get_url(), "https": proxy.get_url()}
-                response = requests.get("https://api.ipify.org", proxies=proxies, timeout=10)
-                proxy.is_healthy = response.status_code == 200
-                if proxy.is_healthy:
+        # Probe concurrently through the shared monitor so results feed its latency scores
+        monitor = get_proxy_health()
+        with ThreadPoolExecutor(max_workers=max(1, min(16, total))) as pool:
+            futures = [pool.submit(monitor.probe, proxy, True) for proxy in self._proxies]
+            for future in as_completed(futures):
+                if self._is_cancelled:
+                    for f in futures:
+                        f.cancel()
+                    break
+                done += 1
+                if future.result().success:
                     healthy_count += 1
-            except:
-                proxy.is_healthy = False
+                self.progress.emit(done, total, f"Tested proxy {done}/{total}...")
         
         self.finished.emit(healthy_count, total)
     
@@ -212,16 +212,13 @@ class RefreshCreditsWorker(QThread):
         self._get_proxy_fn = get_proxy_fn
     
     def run(self):
-        from services.elevenlabs import ElevenLabsAPI
+        from services.key_validation import BulkKeyValidator
         
         self.started.emit()
-        api = ElevenLabsAPI()
         
         try:
-            for key in self._api_keys:
-                if key.enabled:
-                    proxy = self._get_proxy_fn(key)
-                    api.validate_key(key, proxy)
+            keys = [key for key in self._api_keys if key.enabled]
+            BulkKeyValidator().validate(keys, self._get_proxy_fn)
             self.finished.emit()
         except Exception as e:
             self.error.emit(str(e))
@@ -6,7 +6,7 @@ a = Analysis(
     pathex=['../app'],
     binaries=[],
     datas=[],
-    hiddenimports=['core', 'core.config', 'core.models', 'services', 'services.elevenlabs', 'services.file_import', 'services.audio', 'ipc', 'ipc.server', 'ipc.handlers', 'ipc.types', 'requests', 'pysrt', 'docx', 'langdetect', 'pydub'],
+    hiddenimports=['core', 'core.config', 'core.models', 'core.project_file', 'services', 'services.elevenlabs', 'services.file_import', 'services.audio', 'ipc', 'ipc.server', 'ipc.handlers', 'ipc.types', 'ipc.channel', 'ipc.codec', 'ipc.jobs', 'ipc.projects', 'requests', 'pysrt', 'docx', 'langdetect', 'pydub', 'orjson'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -1,5 +1,5 @@
 """IPC module for JSON-RPC communication"""
-from .server import JsonRpcServer
+from .server import JsonRpcServer, DISPATCH_INLINE, DISPATCH_POOL, DISPATCH_LONG
 from .types import JsonRpcError, ErrorCodes
 
-__all__ = ["JsonRpcServer", "JsonRpcError", "ErrorCodes"]
+__all__ = ["JsonRpcServer", "JsonRpcError", "ErrorCodes", "DISPATCH_INLINE", "DISPATCH_POOL", "DISPATCH_LONG"]
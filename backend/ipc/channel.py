@@ -0,0 +1,134 @@
+"""Outgoing message channel for the stdio server: one writer thread, coalesced progress"""
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+
+class NotificationChannel:
+    """Serialises and writes everything the server sends, on its own thread.
+    
+    Callers only queue messages, so a worker never waits on stdout.
+    Three kinds of traffic are treated differently:
+    
+    - send(): responses and ordinary notifications, written in order
+    - progress(): the latest update per job_id is kept and written at most
+      progress_rate times a second; a final update is never dropped and
+      goes out in order with send() traffic
+    - batched(): line-level events, collected for up to batch_interval
+      seconds (or max_batch items) and written as one JSON array of
+      notifications, like a JSON-RPC batch
+    
+    Whatever is ready is handed to write() together, for one write and
+    one flush.
+    """
+    
+    def __init__(
+        self,
+        write: Callable[[List[bytes]], None],
+        progress_rate: float = 10.0,
+        batch_interval: float = 0.05,
+        max_batch: int = 200,
+        dumps: Callable[[Any], bytes] = lambda obj: json.dumps(obj).encode("utf-8")
+    ):
+        self._write = write
+        self._dumps = dumps
+        self._progress_interval = 1.0 / progress_rate if progress_rate > 0 else 0.0
+        self._batch_interval = batch_interval
+        self._max_batch = max(1, max_batch)
+        self._cond = threading.Condition()
+        self._ordered: Deque[dict] = deque()
+        self._progress: Dict[str, dict] = {}  # job_id -> latest pending notification
+        self._progress_sent: Dict[str, float] = {}  # job_id -> monotonic time of the last write
+        self._batch: List[dict] = []
+        self._batch_started = 0.0
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0  # Messages written
+        self.coalesced = 0  # Progress updates replaced by a newer one before being written
+    
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="rpc-writer", daemon=True)
+            self._thread.start()
+    
+    def send(self, message: dict):
+        with self._cond:
+            self._ordered.append(message)
+            self._cond.notify()
+    
+    def progress(self, job_id: str, message: dict, final: bool = False):
+        with self._cond:
+            if self._progress.pop(job_id, None) is not None:
+                self.coalesced += 1
+            if final:
+                self._progress_sent.pop(job_id, None)
+                self._ordered.append(message)
+            else:
+                self._progress[job_id] = message
+            self._cond.notify()
+    
+    def batched(self, message: dict):
+        with self._cond:
+            started = not self._batch
+            if started:
+                self._batch_started = time.monotonic()
+            self._batch.append(message)
+            if started or len(self._batch) >= self._max_batch:
+                # The writer may be idle with no deadline, so wake it to start the batch timer
+                self._cond.notify()
+    
+    def close(self, timeout: float = 2.0):
+        """Write what is still queued and stop the writer"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def _take(self, now: float) -> List[bytes]:
+        """Encoded messages ready to write (call with the lock held)"""
+        lines: List[bytes] = []
+        if self._batch and (self._ordered or self._closed or len(self._batch) >= self._max_batch
+                            or now - self._batch_started >= self._batch_interval):
+            # Line events go first: a response or final update may refer to them
+            lines.append(self._dumps(self._batch))
+            self._batch = []
+        while self._ordered:
+            lines.append(self._dumps(self._ordered.popleft()))
+        for job_id in list(self._progress):
+            if self._closed or now - self._progress_sent.get(job_id, 0.0) >= self._progress_interval:
+                lines.append(self._dumps(self._progress.pop(job_id)))
+                self._progress_sent[job_id] = now
+        return lines
+    
+    def _next_wait(self, now: float) -> Optional[float]:
+        """Seconds until something queued becomes due, None if nothing is (call with the lock held)"""
+        deadlines = []
+        if self._batch:
+            deadlines.append(self._batch_started + self._batch_interval)
+        for job_id in self._progress:
+            deadlines.append(self._progress_sent.get(job_id, 0.0) + self._progress_interval)
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - now)
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    lines = self._take(now)
+                    if lines or self._closed:
+                        break
+                    self._cond.wait(self._next_wait(now))
+                closed = self._closed and not (self._ordered or self._progress or self._batch)
+            if lines:
+                try:
+                    self._write(lines)
+                except Exception:
+                    pass  # stdout is gone; nothing left to tell
+                self.written += len(lines)
+            if closed:
+                return
@@ -0,0 +1,118 @@
+"""Message encoding and framing for the stdio link"""
+import json
+from typing import Any, BinaryIO, Iterable, Optional
+
+try:
+    import orjson
+except ImportError:  # Optional: stdlib json is used instead
+    orjson = None
+
+
+CODEC_AUTO = "auto"  # orjson when installed, else stdlib
+CODEC_STDLIB = "json"
+CODEC_ORJSON = "orjson"
+
+FRAMING_LINE = "line"  # One JSON document per line (what the desktop app speaks)
+FRAMING_LENGTH = "length"  # Content-Length header before each document, as in LSP
+
+
+class StdlibCodec:
+    """json from the standard library"""
+    
+    name = CODEC_STDLIB
+    
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(StdlibCodec):
+    """orjson, falling back to stdlib json for anything orjson refuses
+    (integers beyond 64 bits, unusual dict keys), so both accept the same objects"""
+    
+    name = CODEC_ORJSON
+    
+    def dumps(self, obj: Any) -> bytes:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            return super().dumps(obj)
+    
+    def loads(self, data: bytes) -> Any:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # stdlib also accepts NaN and Infinity literals; anything else raises its error as usual
+            return super().loads(data)
+
+
+def get_codec(name: Optional[str] = None) -> StdlibCodec:
+    """Codec by name; CODEC_AUTO (the default) picks the fastest one available"""
+    name = (name or CODEC_AUTO).lower()
+    if name == CODEC_AUTO:
+        return OrjsonCodec() if orjson is not None else StdlibCodec()
+    if name == CODEC_ORJSON:
+        if orjson is None:
+            raise ValueError("orjson is not installed. Install with: pip install orjson")
+        return OrjsonCodec()
+    if name == CODEC_STDLIB:
+        return StdlibCodec()
+    raise ValueError(f"Unknown codec: {name}")
+
+
+class LineFraming:
+    """Newline-delimited documents. JSON encoders never emit a raw newline,
+    so a line is always one complete document."""
+    
+    name = FRAMING_LINE
+    
+    def read(self, stream: BinaryIO) -> Optional[bytes]:
+        """Next document, b"" for a blank line, None at end of input"""
+        line = stream.readline()
+        if not line:
+            return None
+        return line.strip()
+    
+    def write(self, stream: BinaryIO, payloads: Iterable[bytes]):
+        stream.write(b"".join(p + b"\n" for p in payloads))
+
+
+class LengthFraming:
+    """Content-Length: N header, blank line, then exactly N bytes of body.
+    The reader never scans the body, so large documents cost one read."""
+    
+    name = FRAMING_LENGTH
+    HEADER = b"Content-Length"
+    
+    def read(self, stream: BinaryIO) -> Optional[bytes]:
+        length = None
+        while True:
+            line = stream.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                if length is None:
+                    continue  # Stray blank line between messages
+                break
+            key, _, value = line.partition(b":")
+            if key.strip().lower() == self.HEADER.lower():
+                length = int(value.strip())
+        body = stream.read(length)
+        if len(body) < length:
+            return None  # Input closed mid-message
+        return body
+    
+    def write(self, stream: BinaryIO, payloads: Iterable[bytes]):
+        stream.write(b"".join(b"%s: %d\r\n\r\n%s" % (self.HEADER, len(p), p) for p in payloads))
+
+
+def get_framing(name: Optional[str] = None):
+    name = (name or FRAMING_LINE).lower()
+    if name == FRAMING_LINE:
+        return LineFraming()
+    if name == FRAMING_LENGTH:
+        return LengthFraming()
+    raise ValueError(f"Unknown framing: {name}")
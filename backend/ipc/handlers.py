@@ -3,28 +3,48 @@ import os
 import sys
 import uuid
 import json
+import base64
 import platform
+import tempfile
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 
-from .server import JsonRpcServer
+from .server import JsonRpcServer, DISPATCH_INLINE, DISPATCH_LONG
 from .types import JsonRpcError, ErrorCodes
 
 # Import existing services from the app
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / "app"))
 
 from core.config import get_config
-from core.models import APIKey, Proxy, Voice, VoiceSettings
+from core.models import APIKey, Proxy, Voice, VoiceSettings, TextLine
 from services.elevenlabs import ElevenLabsAPI
+from services.tts_cache import get_tts_cache
+from services.audio_format import AudioFormat
+from services.credit_ledger import character_cost
+from services.key_validation import BulkKeyValidator, KeyValidationResult
+from services.proxy_health import ProbeResult, get_proxy_health, start_proxy_health
+from services.processing import ProcessingEngine
+
+from .jobs import BatchJob, get_job_registry
+from .projects import ProjectDocument, ProjectFile, ChangeError, VersionConflict, get_project_registry
 
 # Global API instance
 _elevenlabs_api: Optional[ElevenLabsAPI] = None
+_elevenlabs_api_lock = threading.Lock()  # Handlers run on pool threads; build the instance once
 
 def get_api() -> ElevenLabsAPI:
     global _elevenlabs_api
     if _elevenlabs_api is None:
-        _elevenlabs_api = ElevenLabsAPI()
+        with _elevenlabs_api_lock:
+            if _elevenlabs_api is None:
+                config = get_config()
+                audio_cache = None
+                if config.get("tts_cache_enabled", True):
+                    audio_cache = get_tts_cache()
+                    audio_cache.set_max_bytes(int(config.get("tts_cache_max_mb", 2048)) * 1024 * 1024)
+                _elevenlabs_api = ElevenLabsAPI(audio_cache=audio_cache)
     return _elevenlabs_api
 
 
@@ -33,10 +53,17 @@ PROTOCOL_VERSION = 1
 MIN_UI_VERSION = "1.0.0"
 
 
+def _start_proxy_health():
+    config = get_config()
+    start_proxy_health(lambda: config.proxies, float(config.get("proxy_health_interval", 60)))
+
+
 def register_handlers(server: JsonRpcServer):
     """Register all RPC handlers"""
     
-    @server.method("system.handshake")
+    _start_proxy_health()
+    
+    @server.method("system.handshake", dispatch=DISPATCH_INLINE)
     def handshake(params: dict, srv: JsonRpcServer) -> dict:
         ui_version = params.get("ui_version", "0.0.0")
         protocol = params.get("protocol_version", 0)
@@ -60,7 +87,7 @@ def register_handlers(server: JsonRpcServer):
             "min_ui_version": MIN_UI_VERSION
         }
     
-    @server.method("system.shutdown")
+    @server.method("system.shutdown", dispatch=DISPATCH_INLINE)
     def shutdown(params: dict, srv: JsonRpcServer) -> dict:
         srv._running = False
         return {"status": "shutting_down"}
@@ -100,7 +127,7 @@ def register_handlers(server: JsonRpcServer):
         
         return str(diag_file)
     
-    @server.method("config.get")
+    @server.method("config.get", dispatch=DISPATCH_INLINE)
     def config_get(params: dict, srv: JsonRpcServer) -> dict:
         config = get_config()
         return {
@@ -121,7 +148,7 @@ def register_handlers(server: JsonRpcServer):
             "long_pause_punctuation": config.get("long_pause_punctuation", ".!?。！？")
         }
     
-    @server.method("config.set")
+    @server.method("config.set", dispatch=DISPATCH_INLINE)
     def config_set(params: dict, srv: JsonRpcServer) -> dict:
         key = params.get("key")
         value = params.get("value")
@@ -131,10 +158,12 @@ def register_handlers(server: JsonRpcServer):
         
         config = get_config()
         config.set(key, value)
+        if key == "proxy_health_interval":
+            _start_proxy_health()
         
         return {"success": True}
     
-    @server.method("apikeys.list")
+    @server.method("apikeys.list", dispatch=DISPATCH_INLINE)
     def apikeys_list(params: dict, srv: JsonRpcServer) -> List[dict]:
         config = get_config()
         return [
@@ -273,9 +302,17 @@ def register_handlers(server: JsonRpcServer):
         
         return {"success": True}
     
-    @server.method("apikeys.validate")
+    @server.method("apikeys.validate", dispatch=DISPATCH_LONG)
     def apikeys_validate(params: dict, srv: JsonRpcServer) -> dict:
+        """Validate one key by id, or many at once with ids / all.
+        
+        Bulk checks run concurrently (a few at a time per proxy), send an
+        event.apikey_validated notification per key as it finishes and
+        save the refreshed keys with a single write.
+        """
         key_id = params.get("id")
+        if key_id is None and (params.get("ids") is not None or params.get("all")):
+            return validate_keys(srv, params.get("ids"))
         if not key_id:
             raise JsonRpcError(ErrorCodes.INVALID_PARAMS, "ID is required")
         
@@ -293,23 +330,44 @@ def register_handlers(server: JsonRpcServer):
                 if success:
                     config.update_api_key(api_key)
                 
-                return {
-                    "id": api_key.id,
-                    "name": api_key.name,
-                    "key": api_key.key,
-                    "remaining_credits": api_key.remaining_credits,
-                    "character_count": api_key.character_count,
-                    "character_limit": api_key.character_limit,
-                    "is_valid": api_key.is_valid,
-                    "message": message,
-                    "assigned_proxy_id": api_key.assigned_proxy_id
-                }
+                return KeyValidationResult(api_key, success, message).to_dict()
         
         raise JsonRpcError(ErrorCodes.APP_INVALID_API_KEY, "API key not found")
     
-    @server.method("proxies.list")
+    def validate_keys(srv: JsonRpcServer, ids: Optional[List[str]]) -> dict:
+        config = get_config()
+        if ids is None:
+            keys = list(config.api_keys)
+        else:
+            if not isinstance(ids, list):
+                raise JsonRpcError(ErrorCodes.INVALID_PARAMS, "ids must be a list")
+            wanted = set(ids)
+            keys = [k for k in config.api_keys if k.id in wanted]
+            if len(keys) != len(wanted):
+                raise JsonRpcError(ErrorCodes.APP_INVALID_API_KEY, "API key not found")
+        
+        def on_result(result: KeyValidationResult, done: int, total: int):
+            srv.send_notification("event.apikey_validated", {
+                **result.to_dict(),
+                "success": result.success,
+                "done": done,
+                "total": total
+            })
+        
+        results = BulkKeyValidator(get_api()).validate(keys, config.get_proxy_for_key, on_result)
+        refreshed = [r.key for r in results if r.success]
+        if refreshed:
+            config.update_api_keys(refreshed)
+        return {
+            "results": [r.to_dict() for r in results],
+            "validated": len(refreshed),
+            "total": len(keys)
+        }
+    
+    @server.method("proxies.list", dispatch=DISPATCH_INLINE)
     def proxies_list(params: dict, srv: JsonRpcServer) -> List[dict]:
         config = get_config()
+        health = get_proxy_health()
         return [
             {
                 "id": p.id,
@@ -320,9 +378,10 @@ def register_handlers(server: JsonRpcServer):
                 "password": None,  # Don't expose password
                 "proxy_type": p.proxy_type.value.lower() if hasattr(p.proxy_type, 'value') else str(p.proxy_type).lower(),
                 "enabled": p.enabled,
-                "is_healthy": p.is_healthy
+                "is_healthy": p.is_healthy,
+                "health": score.to_dict() if score else None
             }
-            for p in config.proxies
+            for p, score in ((p, health.score(p.id)) for p in config.proxies)
         ]
     
     @server.method("proxies.add")
@@ -379,7 +438,7 @@ def register_handlers(server: JsonRpcServer):
         
         return {"success": True}
     
-    @server.method("proxies.test")
+    @server.method("proxies.test", dispatch=DISPATCH_LONG)
     def proxies_test(params: dict, srv: JsonRpcServer) -> dict:
         proxy_id = params.get("id")
         if not proxy_id:
@@ -407,16 +466,33 @@ def register_handlers(server: JsonRpcServer):
             )
             
             is_healthy = response.status_code in (200, 401)  # 401 means proxy works but no API key
-            proxy.is_healthy = is_healthy
+            if is_healthy:
+                get_proxy_health().probe(proxy, trip=True)  # Refresh its latency score as well
+            else:
+                get_proxy_health().record(ProbeResult(proxy.id, False, error=f"HTTP {response.status_code}"), proxy, trip=True)
             config.update_proxy(proxy)
             
-            return {"success": is_healthy, "status_code": response.status_code}
+            return {"success": proxy.is_healthy, "status_code": response.status_code}
         except Exception as e:
-            proxy.is_healthy = False
+            get_proxy_health().record(ProbeResult(proxy.id, False, error=str(e)), proxy, trip=True)
             config.update_proxy(proxy)
             return {"success": False, "error": str(e)}
     
-    @server.method("voices.list")
+    @server.method("proxies.health")
+    def proxies_health(params: dict, srv: JsonRpcServer) -> List[dict]:
+        """Background probe scores per proxy; probe=true probes all enabled proxies first"""
+        config = get_config()
+        health = get_proxy_health()
+        if params.get("probe"):
+            health.probe_all(p for p in config.proxies if p.enabled)
+        ranked = {p.id: i for i, p in enumerate(health.rank(config.proxies))}
+        return [
+            dict(score.to_dict(), rank=ranked.get(score.proxy_id))
+            for score in health.scores()
+            if any(p.id == score.proxy_id for p in config.proxies)
+        ]
+    
+    @server.method("voices.list", dispatch=DISPATCH_INLINE)
     def voices_list(params: dict, srv: JsonRpcServer) -> List[dict]:
         config = get_config()
         return [
@@ -431,7 +507,7 @@ def register_handlers(server: JsonRpcServer):
             for v in config.voice_library
         ]
     
-    @server.method("voices.get")
+    @server.method("voices.get", dispatch=DISPATCH_INLINE)
     def voices_get(params: dict, srv: JsonRpcServer) -> dict:
         voice_id = params.get("voice_id")
         if not voice_id:
@@ -451,7 +527,7 @@ def register_handlers(server: JsonRpcServer):
         
         raise JsonRpcError(ErrorCodes.INVALID_PARAMS, "Voice not found")
     
-    @server.method("voices.refresh")
+    @server.method("voices.refresh", dispatch=DISPATCH_LONG)
     def voices_refresh(params: dict, srv: JsonRpcServer) -> List[dict]:
         config = get_config()
         api = get_api()
@@ -512,7 +588,7 @@ def register_handlers(server: JsonRpcServer):
         except Exception:
             return 'en'  # Default to English if detection fails
 
-    @server.method("tts.start")
+    @server.method("tts.start", dispatch=DISPATCH_LONG)
     def tts_start(params: dict, srv: JsonRpcServer) -> dict:
         text = params.get("text")
         voice_id = params.get("voice_id")
@@ -532,15 +608,22 @@ def register_handlers(server: JsonRpcServer):
         config = get_config()
         api = get_api()
         
-        # Get available API key
-        api_key = config.get_available_api_key()
+        # Get an API key with room for the text; the credits stay reserved until the request ends
+        api_key = config.reserve_api_key(len(text))
         if not api_key:
             raise JsonRpcError(ErrorCodes.APP_INVALID_API_KEY, "No valid API key available")
-        
+        try:
+            return _run_tts_start(srv, config, api, api_key, text, voice_id, output_path, language_code, params)
+        finally:
+            config.release_api_key(api_key, len(text))
+    
+    def _run_tts_start(srv, config, api, api_key, text, voice_id, output_path, language_code, params):
+        """Body of tts.start once a key is reserved"""
         # Get proxy if assigned
         proxy = config.get_proxy_for_key(api_key)
         
-        job_id = str(uuid.uuid4())
+        # A caller-chosen id lets the UI match progress and preview events that arrive before the result
+        job_id = str(params.get("job_id") or uuid.uuid4())
         
         # Send progress updates
         srv.send_progress(job_id, 10, "Initializing...")
@@ -551,8 +634,13 @@ def register_handlers(server: JsonRpcServer):
             similarity_boost=params.get("similarity_boost", 0.75),
             style=params.get("style", 0.0),
             use_speaker_boost=params.get("use_speaker_boost", True),
-            speed=params.get("speed", 1.0)
+            speed=params.get("speed", 1.0),
+            output_format=params.get("output_format")
         )
+        try:
+            audio_format = AudioFormat.parse(settings.output_format)
+        except ValueError as e:
+            raise JsonRpcError(ErrorCodes.INVALID_PARAMS, str(e))
         
         # Set model if provided
         model_id = params.get("model_id")
@@ -568,6 +656,19 @@ def register_handlers(server: JsonRpcServer):
         # Check if debug mode is enabled
         debug_mode = params.get("debug", False)
         
+        # Preview pushes the first audio chunk to the UI before the file is complete
+        preview = bool(params.get("preview", False))
+        stream = bool(params.get("stream", False)) or preview
+        
+        def forward_first_chunk(chunk: bytes):
+            srv.send_notification("event.tts_preview", {
+                "job_id": job_id,
+                "chunk": base64.b64encode(chunk).decode("ascii"),
+                "mime_type": audio_format.chunk_mime_type
+            })
+        
+        on_first_chunk = forward_first_chunk if preview else None
+        
         # Call ElevenLabs TTS API
         success, message, duration, debug_data = api.text_to_speech(
             text=text,
@@ -577,7 +678,9 @@ def register_handlers(server: JsonRpcServer):
             settings=settings,
             proxy=proxy,
             language_code=language_code,
-            debug=debug_mode
+            debug=debug_mode,
+            stream=stream,
+            on_first_chunk=on_first_chunk
         )
         
         if not success:
@@ -586,17 +689,22 @@ def register_handlers(server: JsonRpcServer):
                 raise JsonRpcError(ErrorCodes.APP_RATE_LIMITED, "Rate limited, please try again later")
             raise JsonRpcError(ErrorCodes.APP_TTS_FAILED, message)
         
-        # Update API key usage
-        api_key.character_count += len(text)
-        config.update_api_key(api_key)
+        # Cache hits never reached the API, so there is no usage to record
+        cached = message == "CACHE_HIT"
+        characters_used = 0 if cached else character_cost(api.get_last_request_info().get("headers"), text)
         
-        # Track analytics
-        try:
-            from services.analytics import get_analytics
-            analytics = get_analytics()
-            analytics.track_tts(len(text), 1, voice_id)
-        except Exception:
-            pass  # Don't fail if analytics fails
+        if not cached:
+            # Update API key usage
+            api_key.character_count += characters_used
+            config.update_api_key(api_key)
+            
+            # Track analytics
+            try:
+                from services.analytics import get_analytics
+                analytics = get_analytics()
+                analytics.track_tts(len(text), 1, voice_id)
+            except Exception:
+                pass  # Don't fail if analytics fails
         
         srv.send_progress(job_id, 100, "Complete")
         
@@ -604,32 +712,65 @@ def register_handlers(server: JsonRpcServer):
             "job_id": job_id,
             "output_path": output_path,
             "duration_ms": int((duration or 0) * 1000),
-            "characters_used": len(text),
-            "language_code": language_code
+            "characters_used": characters_used,
+            "language_code": language_code,
+            "cached": cached
         }
         
+        if not cached:
+            info = api.get_last_request_info()
+            for field in ("ttfb", "first_chunk", "transfer"):
+                if info.get(field) is not None:
+                    result[f"{field}_ms"] = int(info[field] * 1000)
+        
         # Include debug data if requested
         if debug_mode and debug_data:
             result["debug"] = debug_data
         
         return result
     
-    @server.method("jobs.cancel")
-    def jobs_cancel(params: dict, srv: JsonRpcServer) -> dict:
+    def find_job(params: dict) -> BatchJob:
         job_id = params.get("job_id")
         if not job_id:
             raise JsonRpcError(ErrorCodes.INVALID_PARAMS, "job_id is required")
-        
-        # TODO: Implement job cancellation
-        return {"success": True}
+        job = get_job_registry().get(job_id)
+        if job is None:
+            raise JsonRpcError(ErrorCodes.INVALID_PARAMS, "Job not found")
+        return job
+    
+    @server.method("jobs.cancel", dispatch=DISPATCH_INLINE)
+    def jobs_cancel(params: dict, srv: JsonRpcServer) -> dict:
+        """Stop a job and abandon its requests in flight; event.job_complete follows"""
+        return {"success": find_job(params).cancel()}
+    
+    @server.method("jobs.pause", dispatch=DISPATCH_INLINE)
+    def jobs_pause(params: dict, srv: JsonRpcServer) -> dict:
+        return {"success": find_job(params).pause()}
+    
+    @server.method("jobs.resume", dispatch=DISPATCH_INLINE)
+    def jobs_resume(params: dict, srv: JsonRpcServer) -> dict:
+        return {"success": find_job(params).resume()}
+    
+    @server.method("jobs.status", dispatch=DISPATCH_INLINE)
+    def jobs_status(params: dict, srv: JsonRpcServer) -> dict:
+        """A job's counters; include_results=true adds every finished line's result"""
+        job = find_job(params)
+        status = job.to_dict()
+        if params.get("include_results"):
+            status["results"] = job.results()
+        return status
     
-    @server.method("credits.total")
+    @server.method("jobs.list", dispatch=DISPATCH_INLINE)
+    def jobs_list(params: dict, srv: JsonRpcServer) -> List[dict]:
+        return [job.to_dict() for job in get_job_registry().list()]
+    
+    @server.method("credits.total", dispatch=DISPATCH_INLINE)
     def credits_total(params: dict, srv: JsonRpcServer) -> int:
         config = get_config()
         return config.get_total_credits()
     
     # File import handlers
-    @server.method("files.import")
+    @server.method("files.import", dispatch=DISPATCH_LONG)
     def files_import(params: dict, srv: JsonRpcServer) -> List[dict]:
         """Import files and return list of text lines"""
         file_paths = params.get("file_paths", [])
@@ -769,7 +910,7 @@ def register_handlers(server: JsonRpcServer):
             raise JsonRpcError(ErrorCodes.INTERNAL_ERROR, "Failed to generate SRT file")
     
     # MP3 concatenation handler
-    @server.method("audio.concatenate")
+    @server.method("audio.concatenate", dispatch=DISPATCH_LONG)
     def audio_concatenate(params: dict, srv: JsonRpcServer) -> dict:
         """Concatenate multiple MP3 files into one"""
         input_files = params.get("input_files", [])
@@ -796,21 +937,31 @@ def register_handlers(server: JsonRpcServer):
     # Project save/load handlers
     @server.method("project.save")
     def project_save(params: dict, srv: JsonRpcServer) -> dict:
-        """Save project to file"""
+        """Save project to file. With project_id, writes only what changed since the last save"""
         file_path = params.get("file_path")
+        project_id = params.get("project_id")
+        
+        if project_id:
+            project = find_project(params)
+            try:
+                result = project.save(file_path)
+            except ChangeError as e:
+                raise JsonRpcError(ErrorCodes.INVALID_PARAMS, str(e))
+            except OSError as e:
+                raise JsonRpcError(ErrorCodes.INTERNAL_ERROR, f"Failed to save project: {str(e)}")
+            return dict(result, success=True)
+        
         project_data = params.get("project")
         
         if not file_path or not project_data:
             raise JsonRpcError(ErrorCodes.INVALID_PARAMS, "file_path and project are required")
         
         try:
-            import json
-            from pathlib import Path
-            
-            Path(file_path).parent.mkdir(parents=True, exist_ok=True)
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(project_data, f, indent=2, ensure_ascii=False)
-            
+            ProjectFile(file_path).write_snapshot(project_data, 0)
+            # The file no longer matches an open copy's change log
+            stale = get_project_registry().find_path(file_path)
+            if stale is not None:
+                get_project_registry().remove(stale.id)
             return {"success": True, "file_path": file_path}
         except Exception as e:
             raise JsonRpcError(ErrorCodes.INTERNAL_ERROR, f"Failed to save project: {str(e)}")
@@ -824,22 +975,142 @@ def register_handlers(server: JsonRpcServer):
             raise JsonRpcError(ErrorCodes.INVALID_PARAMS, "file_path is required")
         
         try:
-            import json
-            
-            with open(file_path, 'r', encoding='utf-8') as f:
-                project_data = json.load(f)
-            
+            project_data, _ = ProjectFile(file_path).load()
             return {"success": True, "project": project_data}
         except FileNotFoundError:
             raise JsonRpcError(ErrorCodes.APP_FILE_NOT_FOUND, "Project file not found")
         except Exception as e:
             raise JsonRpcError(ErrorCodes.INTERNAL_ERROR, f"Failed to load project: {str(e)}")
 
+    # Backend-owned projects: the UI opens a project once, then sends patches
+    def find_project(params: dict) -> ProjectDocument:
+        project_id = params.get("project_id")
+        if not project_id:
+            raise JsonRpcError(ErrorCodes.INVALID_PARAMS, "project_id is required")
+        project = get_project_registry().get(project_id)
+        if project is None:
+            raise JsonRpcError(ErrorCodes.INVALID_PARAMS, "Project not found")
+        return project
+    
+    def project_info(project: ProjectDocument) -> dict:
+        return {
+            "project_id": project.id,
+            "version": project.version,
+            "file_path": project.file_path,
+            "line_count": project.line_count,
+            "dirty": project.dirty
+        }
+    
+    def apply_patch(params: dict, change: dict) -> dict:
+        project = find_project(params)
+        try:
+            change = project.apply(change, params.get("base_version"))
+        except VersionConflict as e:
+            raise JsonRpcError(ErrorCodes.APP_VERSION_CONFLICT, str(e), {"version": e.version})
+        except ChangeError as e:
+            raise JsonRpcError(ErrorCodes.INVALID_PARAMS, str(e))
+        return {"version": change["version"]}
+    
+    @server.method("project.open")
+    def project_open(params: dict, srv: JsonRpcServer) -> dict:
+        """Open a project file (or return it if already open) with its lines"""
+        file_path = params.get("file_path")
+        
+        if not file_path:
+            raise JsonRpcError(ErrorCodes.INVALID_PARAMS, "file_path is required")
+        
+        registry = get_project_registry()
+        project = registry.find_path(file_path)
+        if project is None:
+            try:
+                data, version = ProjectFile(file_path).load()
+            except FileNotFoundError:
+                raise JsonRpcError(ErrorCodes.APP_FILE_NOT_FOUND, "Project file not found")
+            except Exception as e:
+                raise JsonRpcError(ErrorCodes.INTERNAL_ERROR, f"Failed to load project: {str(e)}")
+            project = ProjectDocument(srv, data, file_path=file_path, version=version)
+            registry.add(project)
+        
+        project.subscribed = project.subscribed or params.get("subscribe", False)
+        result = project_info(project)
+        if params.get("include_project", True):
+            result["project"] = project.snapshot()
+        return result
+    
+    @server.method("project.create")
+    def project_create(params: dict, srv: JsonRpcServer) -> dict:
+        """Hand a project to the backend; file_path is where project.save will write it"""
+        data = params.get("project")
+        
+        if not isinstance(data, dict):
+            raise JsonRpcError(ErrorCodes.INVALID_PARAMS, "project is required")
+        
+        project = ProjectDocument(srv, data)
+        project.file_path = params.get("file_path")
+        project.subscribed = params.get("subscribe", False)
+        get_project_registry().add(project)
+        return project_info(project)
+    
+    @server.method("project.get", dispatch=DISPATCH_INLINE)
+    def project_get(params: dict, srv: JsonRpcServer) -> dict:
+        """Project settings and a page of its lines"""
+        project = find_project(params)
+        result = project_info(project)
+        result["project"] = project.snapshot(int(params.get("offset", 0)), params.get("limit"))
+        return result
+    
+    @server.method("project.close", dispatch=DISPATCH_INLINE)
+    def project_close(params: dict, srv: JsonRpcServer) -> dict:
+        """Forget an open project; unsaved changes are dropped"""
+        project = get_project_registry().remove(params.get("project_id"))
+        return {"success": project is not None}
+    
+    # Patches run inline so they apply in the order they were sent
+    @server.method("project.lines.update", dispatch=DISPATCH_INLINE)
+    def project_lines_update(params: dict, srv: JsonRpcServer) -> dict:
+        """Change fields of lines: lines is a list of {id, <fields>}"""
+        return apply_patch(params, {"op": "update", "lines": params.get("lines") or []})
+    
+    @server.method("project.lines.insert", dispatch=DISPATCH_INLINE)
+    def project_lines_insert(params: dict, srv: JsonRpcServer) -> dict:
+        """Insert lines at index (default: the end)"""
+        return apply_patch(params, {"op": "insert", "index": params.get("index"), "lines": params.get("lines") or []})
+    
+    @server.method("project.lines.delete", dispatch=DISPATCH_INLINE)
+    def project_lines_delete(params: dict, srv: JsonRpcServer) -> dict:
+        return apply_patch(params, {"op": "delete", "ids": params.get("ids") or []})
+    
+    @server.method("project.lines.move", dispatch=DISPATCH_INLINE)
+    def project_lines_move(params: dict, srv: JsonRpcServer) -> dict:
+        """Move lines so they start at index of the list without them, in the order given"""
+        return apply_patch(params, {"op": "move", "ids": params.get("ids") or [], "index": params.get("index", 0)})
+    
+    @server.method("project.meta.update", dispatch=DISPATCH_INLINE)
+    def project_meta_update(params: dict, srv: JsonRpcServer) -> dict:
+        """Change project settings (name, output folder, default voice, ...)"""
+        return apply_patch(params, {"op": "meta", "fields": params.get("fields") or {}})
+    
+    @server.method("project.changes", dispatch=DISPATCH_INLINE)
+    def project_changes(params: dict, srv: JsonRpcServer) -> dict:
+        """Changes after since; reset means they are no longer kept and the UI should reload"""
+        project = find_project(params)
+        changes = project.changes_since(int(params.get("since", 0)))
+        if changes is None:
+            return {"version": project.version, "reset": True, "changes": []}
+        return {"version": project.version, "reset": False, "changes": changes}
+    
+    @server.method("project.subscribe", dispatch=DISPATCH_INLINE)
+    def project_subscribe(params: dict, srv: JsonRpcServer) -> dict:
+        """Push changes to this project as event.project_changed"""
+        project = find_project(params)
+        project.subscribed = params.get("enabled", True)
+        return {"success": True, "version": project.version}
+    
     # ============================================
     # TRANSCRIPTION (Speech-to-Text) HANDLERS
     # ============================================
     
-    @server.method("transcription.start")
+    @server.method("transcription.start", dispatch=DISPATCH_LONG)
     def transcription_start(params: dict, srv: JsonRpcServer) -> dict:
         """Start transcription job"""
         file_path = params.get("file_path")
@@ -898,7 +1169,7 @@ def register_handlers(server: JsonRpcServer):
             ] if result.speakers else []
         }
     
-    @server.method("transcription.supported_formats")
+    @server.method("transcription.supported_formats", dispatch=DISPATCH_INLINE)
     def transcription_formats(params: dict, srv: JsonRpcServer) -> dict:
         """Get supported transcription formats"""
         return {
@@ -910,7 +1181,7 @@ def register_handlers(server: JsonRpcServer):
     # VOICE PRESETS HANDLERS
     # ============================================
     
-    @server.method("presets.list")
+    @server.method("presets.list", dispatch=DISPATCH_INLINE)
     def presets_list(params: dict, srv: JsonRpcServer) -> List[dict]:
         """List all voice presets"""
         from services.preset_manager import get_preset_manager
@@ -1078,7 +1349,7 @@ def register_handlers(server: JsonRpcServer):
         
         return {"original": text, "processed": processed}
     
-    @server.method("pause.batch_process")
+    @server.method("pause.batch_process", dispatch=DISPATCH_LONG)
     def pause_batch_process(params: dict, srv: JsonRpcServer) -> List[dict]:
         """Process multiple texts to add pauses"""
         lines = params.get("lines", [])
@@ -1106,7 +1377,7 @@ def register_handlers(server: JsonRpcServer):
     # AUDIO POST-PROCESSING HANDLERS
     # ============================================
     
-    @server.method("audio.process")
+    @server.method("audio.process", dispatch=DISPATCH_LONG)
     def audio_process(params: dict, srv: JsonRpcServer) -> dict:
         """Process audio file with effects"""
         input_path = params.get("input_path")
@@ -1131,7 +1402,7 @@ def register_handlers(server: JsonRpcServer):
         else:
             raise JsonRpcError(ErrorCodes.INTERNAL_ERROR, f"Audio processing failed: {message}")
     
-    @server.method("audio.batch_process")
+    @server.method("audio.batch_process", dispatch=DISPATCH_LONG)
     def audio_batch_process(params: dict, srv: JsonRpcServer) -> dict:
         """Process multiple audio files"""
         files = params.get("files", [])  # [{input_path, output_path}, ...]
@@ -1323,118 +1594,134 @@ def register_handlers(server: JsonRpcServer):
     
     @server.method("tts.batch_start")
     def tts_batch_start(params: dict, srv: JsonRpcServer) -> dict:
-        """Start batch TTS processing with multiple threads"""
+        """Start batch TTS processing in the background and return its job id.
+        
+        The batch runs on a ProcessingEngine (key rotation, retries, circuit
+        breakers, loop mode). Lines are reported with event.line_done as
+        they finish and the run ends with event.job_complete.
+        """
         lines = params.get("lines", [])
-        thread_count = params.get("thread_count", 2)
         settings = params.get("settings", {})
         
         if not lines:
             raise JsonRpcError(ErrorCodes.INVALID_PARAMS, "lines are required")
         
-        from concurrent.futures import ThreadPoolExecutor, as_completed
-        
         config = get_config()
-        api = get_api()
+        if not config.api_keys:
+            raise JsonRpcError(ErrorCodes.APP_INVALID_API_KEY, "No valid API key available")
         
-        batch_id = str(uuid.uuid4())
-        results = []
-        completed = 0
-        failed = 0
+        voice_settings = VoiceSettings(
+            stability=settings.get("stability", 0.5),
+            similarity_boost=settings.get("similarity_boost", 0.75),
+            style=settings.get("style", 0.0),
+            use_speaker_boost=settings.get("use_speaker_boost", True),
+            speed=settings.get("speed", 1.0),
+            output_format=settings.get("output_format")
+        )
+        model_id = settings.get("model_id")
+        if model_id:
+            from core.models import TTSModel
+            try:
+                voice_settings.model = TTSModel(model_id)
+            except ValueError:
+                pass
         
-        def process_line(line_data):
-            nonlocal completed, failed
-            
+        text_lines: List[TextLine] = []
+        targets: Dict[str, tuple] = {}
+        voices: Dict[str, Voice] = {}
+        rejected: List[dict] = []
+        for line_data in lines:
             text = sanitize_text(line_data.get("text", ""))
             voice_id = line_data.get("voice_id")
             output_path = line_data.get("output_path")
-            line_id = line_data.get("id")
-            
             if not text or not voice_id or not output_path:
-                return {"id": line_id, "success": False, "error": "Missing required fields"}
-            
-            # Detect language
-            lang = detect_language(text)
-            
-            # Get API key
-            api_key = config.get_available_api_key()
-            if not api_key:
-                return {"id": line_id, "success": False, "error": "No API key available"}
-            
-            proxy = config.get_proxy_for_key(api_key)
-            
-            # Build settings
-            voice_settings = VoiceSettings(
-                stability=settings.get("stability", 0.5),
-                similarity_boost=settings.get("similarity_boost", 0.75),
-                style=settings.get("style", 0.0),
-                use_speaker_boost=settings.get("use_speaker_boost", True),
-                speed=settings.get("speed", 1.0)
+                rejected.append({"id": line_data.get("id"), "success": False, "error": "Missing required fields"})
+                continue
+            line = TextLine(index=len(text_lines), text=text, original_text=text, voice_id=voice_id)
+            line.detected_language = detect_language(text)
+            text_lines.append(line)
+            targets[line.id] = (line_data.get("id") or line.id, output_path)
+            voices.setdefault(voice_id, Voice(voice_id=voice_id, name=voice_id, settings=voice_settings))
+        
+        if not text_lines:
+            raise JsonRpcError(ErrorCodes.INVALID_PARAMS, "No line has text, voice_id and output_path")
+        
+        # The engine names files itself, so it renders into a private folder next to the
+        # requested paths; files are moved out as lines finish and the folder goes with the job
+        session_folder = os.path.dirname(targets[text_lines[0].id][1]) or "."
+        os.makedirs(session_folder, exist_ok=True)
+        output_folder = tempfile.mkdtemp(prefix=".render-", dir=session_folder)
+        
+        audio_cache = None
+        if config.get("tts_cache_enabled", True):
+            audio_cache = get_tts_cache()
+            audio_cache.set_max_bytes(int(config.get("tts_cache_max_mb", 2048)) * 1024 * 1024)
+        
+        def make_engine(job: BatchJob) -> ProcessingEngine:
+            engine = ProcessingEngine(
+                api_keys=config.api_keys,
+                proxies=config.proxies,
+                voices=voices,
+                output_folder=output_folder,
+                thread_count=int(params.get("thread_count", config.get("thread_count", 5))),
+                max_retries=int(params.get("max_retries", config.get("max_retries", 3))),
+                request_delay=float(params.get("request_delay", 0.0)),
+                on_line_update=job.on_line_update,
+                on_complete=job.on_complete,
+                on_key_removed=lambda key, reason: config.remove_api_key(key.id),
+                audio_cache=audio_cache,
+                journal_enabled=False,  # Each batch writes to a fresh session folder
+                on_credits_flushed=config.update_api_keys,
+                credit_reconcile_interval=float(config.get("credit_reconcile_interval", 120)),
+                credit_reconcile_lines=int(config.get("credit_reconcile_lines", 500)),
+                hedge_requests=bool(config.get("hedge_requests", False)),
+                hedge_percentile=float(config.get("hedge_percentile", 95)),
+                hedge_max_extra=float(config.get("hedge_max_extra", 0.05)),
+                warm_connections=bool(config.get("warm_connections", True)),
+                streaming=bool(config.get("tts_streaming", False)),
+                key_policy=config.get("key_policy", "round_robin"),
+                plan_keys=bool(config.get("plan_keys", True)),
+                key_concurrency=int(config.get("key_concurrency", 5)),
+                circuit_breakers=bool(config.get("circuit_breakers", True))
             )
-            
-            model_id = settings.get("model_id")
-            if model_id:
-                from core.models import TTSModel
-                try:
-                    voice_settings.model = TTSModel(model_id)
-                except ValueError:
-                    pass
-            
-            success, message, duration, _ = api.text_to_speech(
-                text=text,
-                voice_id=voice_id,
-                api_key=api_key,
-                output_path=output_path,
-                settings=voice_settings,
-                proxy=proxy,
-                language_code=lang,
-                debug=False
+            engine.set_loop_mode(
+                bool(params.get("loop_enabled", False)),
+                int(params.get("loop_count", 0)),
+                int(params.get("loop_delay", 5))
             )
-            
-            if success:
-                api_key.character_count += len(text)
-                config.update_api_key(api_key)
-                return {
-                    "id": line_id,
-                    "success": True,
-                    "output_path": output_path,
-                    "duration_ms": int((duration or 0) * 1000),
-                    "language_code": lang
-                }
-            else:
-                return {"id": line_id, "success": False, "error": message}
+            return engine
         
-        # Process in parallel
-        with ThreadPoolExecutor(max_workers=min(thread_count, 5)) as executor:
-            futures = {executor.submit(process_line, line): line for line in lines}
-            
-            for future in as_completed(futures):
-                result = future.result()
-                results.append(result)
-                
-                if result.get("success"):
-                    completed += 1
-                else:
-                    failed += 1
-                
-                srv.send_progress(
-                    batch_id, 
-                    int((completed + failed) / len(lines) * 100),
-                    f"Processed {completed + failed}/{len(lines)}"
-                )
-        
-        return {
-            "batch_id": batch_id,
-            "total": len(lines),
-            "completed": completed,
-            "failed": failed,
-            "results": results
-        }
+        job = BatchJob(srv, text_lines, targets, make_engine, rejected=rejected, render_folder=output_folder)
+        get_job_registry().add(job)
+        job.start()
+        return job.to_dict()
+    
+    @server.method("tts.cache_stats", dispatch=DISPATCH_INLINE)
+    def tts_cache_stats(params: dict, srv: JsonRpcServer) -> dict:
+        """Hit/miss counters and size of the on-disk TTS audio cache"""
+        return get_tts_cache().stats.to_dict()
+    
+    @server.method("tts.cache_clear")
+    def tts_cache_clear(params: dict, srv: JsonRpcServer) -> dict:
+        """Delete every cached TTS rendering"""
+        get_tts_cache().clear()
+        return {"success": True}
+    
+    @server.method("tts.transport_stats", dispatch=DISPATCH_INLINE)
+    def tts_transport_stats(params: dict, srv: JsonRpcServer) -> List[dict]:
+        """Connection pool usage of the shared HTTP transport, one entry per proxy"""
+        return [pool.to_dict() for pool in get_api().transport.metrics()]
+    
+    @server.method("tts.transfer_stats", dispatch=DISPATCH_INLINE)
+    def tts_transfer_stats(params: dict, srv: JsonRpcServer) -> dict:
+        """TTFB / first-audio / transfer timings of TTS downloads, overall and per key and proxy"""
+        return get_api().transfer_metrics.snapshot()
 
     # ============================================
     # LOCALIZATION HANDLERS
     # ============================================
     
-    @server.method("i18n.get_languages")
+    @server.method("i18n.get_languages", dispatch=DISPATCH_INLINE)
     def i18n_get_languages(params: dict, srv: JsonRpcServer) -> List[dict]:
         """Get available languages"""
         return [
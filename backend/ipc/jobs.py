@@ -0,0 +1,226 @@
+"""Background jobs started over IPC"""
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Callable
+
+from .server import JsonRpcServer
+
+from core.models import TextLine, LineStatus
+from services.processing import ProcessingEngine, ProcessingStats
+
+
+JOB_RUNNING = "running"
+JOB_PAUSED = "paused"
+JOB_CANCELLING = "cancelling"
+JOB_COMPLETED = "completed"
+JOB_CANCELLED = "cancelled"
+JOB_FAILED = "failed"
+
+FINISHED_STATES = (JOB_COMPLETED, JOB_CANCELLED, JOB_FAILED)
+
+
+class BatchJob:
+    """A tts.batch_start run: a ProcessingEngine working through the batch in the background.
+    
+    Every finished line is announced with event.line_done (sent in
+    batches) and an event.progress update (merged by the server); the
+    final progress and event.job_complete follow once the engine reports
+    that it has stopped, whether it ran out of lines or was cancelled;
+    lines it never finished are then reported as failed. Audio the engine
+    writes under its own file names in render_folder is moved to the path
+    the UI asked for (keeping the extension of the format rendered), and
+    render_folder is removed once the job ends.
+    """
+    
+    def __init__(
+        self,
+        srv: JsonRpcServer,
+        lines: List[TextLine],
+        targets: Dict[str, Tuple[str, str]],
+        make_engine: Callable[["BatchJob"], ProcessingEngine],
+        rejected: Optional[List[dict]] = None,
+        job_id: Optional[str] = None,
+        render_folder: Optional[str] = None
+    ):
+        self.id = job_id or str(uuid.uuid4())
+        self.kind = "tts.batch"
+        self.status = JOB_RUNNING
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+        self._srv = srv
+        self._lines = lines
+        self._targets = targets  # engine line id -> (UI line id, requested output path)
+        self._results: Dict[str, dict] = {r["id"]: r for r in rejected or []}  # UI line id -> latest result
+        self._total = len(lines) + len(self._results)  # Rejected lines count as failed
+        self._render_folder = render_folder
+        self._keep_render_folder = False  # A file could not be moved out; leave it where the UI was told it is
+        self._lock = threading.Lock()
+        self._engine = make_engine(self)
+    
+    @property
+    def total(self) -> int:
+        return self._total
+    
+    @property
+    def stats(self) -> ProcessingStats:
+        return self._engine.stats
+    
+    def start(self):
+        try:
+            self._engine.start(self._lines)
+        except Exception as e:
+            self.status = JOB_FAILED
+            self.error = str(e)
+            self.finished_at = datetime.now()
+            self._remove_render_folder()
+            raise
+    
+    def pause(self) -> bool:
+        if self.status != JOB_RUNNING:
+            return False
+        self._engine.pause()
+        self.status = JOB_PAUSED
+        return True
+    
+    def resume(self) -> bool:
+        if self.status != JOB_PAUSED:
+            return False
+        self._engine.resume()
+        self.status = JOB_RUNNING
+        return True
+    
+    def cancel(self) -> bool:
+        if self.status in FINISHED_STATES or self.status == JOB_CANCELLING:
+            return False
+        self.status = JOB_CANCELLING
+        self._engine.cancel()
+        return True
+    
+    def on_line_update(self, line: TextLine):
+        """Engine callback (worker threads): report lines as they finish"""
+        if line.status not in (LineStatus.DONE, LineStatus.ERROR):
+            return
+        ui_id, target = self._targets.get(line.id, (line.id, None))
+        if line.status == LineStatus.DONE:
+            result = {
+                "id": ui_id,
+                "success": True,
+                "output_path": self._move_output(line, target),
+                "duration_ms": int((line.audio_duration or 0) * 1000),
+                "language_code": line.detected_language
+            }
+        else:
+            result = {"id": ui_id, "success": False, "error": line.error_message or "Unknown error"}
+        with self._lock:
+            self._results[ui_id] = result
+            done = len(self._results)
+        self._srv.send_event("event.line_done", dict(result, job_id=self.id))
+        self._srv.send_progress(
+            self.id, int(done / max(1, self.total) * 100), f"Processed {done}/{self.total}", final=False
+        )
+    
+    def _move_output(self, line: TextLine, target: Optional[str]) -> Optional[str]:
+        """Put a rendered line at the path the UI asked for, with the extension it was rendered with"""
+        if not target or not line.output_path:
+            return line.output_path
+        target = os.path.splitext(target)[0] + os.path.splitext(line.output_path)[1]
+        if os.path.abspath(line.output_path) == os.path.abspath(target):
+            return target
+        try:
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            shutil.move(line.output_path, target)
+        except OSError:
+            self._keep_render_folder = True
+            return line.output_path
+        line.output_path = target
+        return target
+    
+    def _remove_render_folder(self):
+        if self._render_folder and not self._keep_render_folder:
+            shutil.rmtree(self._render_folder, ignore_errors=True)
+    
+    def on_complete(self, stats: ProcessingStats):
+        """Engine callback once it has stopped: settle unfinished lines, then send the terminal event"""
+        cancelled = self.status == JOB_CANCELLING
+        unfinished = []
+        with self._lock:
+            for line in self._lines:
+                ui_id = self._targets.get(line.id, (line.id, None))[0]
+                if ui_id not in self._results:
+                    error = "Cancelled" if cancelled else line.error_message or "Not processed"
+                    self._results[ui_id] = {"id": ui_id, "success": False, "error": error}
+                    unfinished.append(self._results[ui_id])
+        for result in unfinished:
+            self._srv.send_event("event.line_done", dict(result, job_id=self.id))
+        self._remove_render_folder()
+        self.finished_at = datetime.now()
+        self.status = JOB_CANCELLED if self.status == JOB_CANCELLING else JOB_COMPLETED
+        self._srv.send_progress(self.id, 100, "Cancelled" if self.status == JOB_CANCELLED else "Complete", final=True)
+        self._srv.send_notification("event.job_complete", {"job_id": self.id, "result": self.to_dict()})
+    
+    def results(self) -> List[dict]:
+        with self._lock:
+            return list(self._results.values())
+    
+    def to_dict(self) -> dict:
+        stats = self._engine.stats
+        with self._lock:
+            completed = sum(1 for r in self._results.values() if r["success"])
+            failed = len(self._results) - completed
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "total": self.total,
+            "completed": completed,
+            "failed": failed,
+            "cached": stats.cache_hits,
+            "current_loop": stats.current_loop,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error
+        }
+
+
+class JobRegistry:
+    """Jobs started in this backend session, by id. Finished jobs are kept
+    for status queries until MAX_FINISHED newer ones have finished."""
+    
+    MAX_FINISHED = 50
+    
+    def __init__(self):
+        self._jobs: Dict[str, BatchJob] = {}
+        self._lock = threading.Lock()
+    
+    def add(self, job: BatchJob):
+        with self._lock:
+            self._jobs[job.id] = job
+            finished = [j for j in self._jobs.values() if j.status in FINISHED_STATES]
+            for old in sorted(finished, key=lambda j: j.finished_at)[:max(0, len(finished) - self.MAX_FINISHED)]:
+                del self._jobs[old.id]
+    
+    def get(self, job_id: str) -> Optional[BatchJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def list(self) -> List[BatchJob]:
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.created_at)
+
+
+# Global instance
+_job_registry: Optional[JobRegistry] = None
+_job_registry_lock = threading.Lock()
+
+
+def get_job_registry() -> JobRegistry:
+    global _job_registry
+    if _job_registry is None:
+        with _job_registry_lock:
+            if _job_registry is None:
+                _job_registry = JobRegistry()
+    return _job_registry
@@ -0,0 +1,158 @@
+"""Projects held by the backend and changed by patches"""
+import os
+import threading
+import uuid
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from .codec import get_codec
+from .server import JsonRpcServer
+
+from core import project_file
+from core.project_file import ChangeError, apply_change
+
+
+class VersionConflict(Exception):
+    """A patch was made against an older version of the project"""
+    
+    def __init__(self, version: int):
+        super().__init__(f"Project is at version {version}")
+        self.version = version
+
+
+class ProjectFile(project_file.ProjectFile):
+    """core.project_file.ProjectFile using the IPC codec (orjson when installed)"""
+    
+    def __init__(self, path: str):
+        super().__init__(path, get_codec())
+
+
+class ProjectDocument:
+    """A project the backend owns: settings plus an ordered list of lines.
+    
+    Each patch bumps the version and is recorded as a change: kept in a
+    bounded log for project.changes, pushed as event.project_changed when
+    the UI subscribed, and appended to the change file on the next save.
+    Patches may carry base_version; one made against another version is
+    refused with VersionConflict.
+    """
+    
+    MAX_CHANGES = 1000  # Changes kept for catch-up; older clients reload the snapshot
+    
+    def __init__(self, srv: JsonRpcServer, data: dict, file_path: Optional[str] = None, version: int = 0):
+        self.id = str(uuid.uuid4())
+        self.file_path = file_path
+        self.version = version
+        self.subscribed = False
+        self._srv = srv
+        self._lock = threading.RLock()
+        self._meta = {k: v for k, v in data.items() if k not in ("lines", "revision")}
+        self._lines: Dict[str, dict] = {}
+        self._order: List[str] = []
+        for line in data.get("lines") or []:
+            line_id = line.get("id") or str(uuid.uuid4())
+            self._lines[line_id] = {k: v for k, v in line.items() if k != "index"}
+            self._lines[line_id]["id"] = line_id
+            self._order.append(line_id)
+        self._changes: Deque[dict] = deque(maxlen=self.MAX_CHANGES)
+        self._unsaved: List[dict] = []
+        self._saved_version = version if file_path else -1  # -1: never written
+    
+    @property
+    def line_count(self) -> int:
+        return len(self._order)
+    
+    @property
+    def dirty(self) -> bool:
+        return self.version != self._saved_version
+    
+    def snapshot(self, offset: int = 0, limit: Optional[int] = None) -> dict:
+        """Settings plus lines [offset, offset + limit), each with its current index"""
+        with self._lock:
+            ids = self._order[offset:None if limit is None else offset + limit]
+            lines = [dict(self._lines[line_id], index=offset + i) for i, line_id in enumerate(ids)]
+            return dict(self._meta, lines=lines)
+    
+    def apply(self, change: dict, base_version: Optional[int] = None) -> dict:
+        """Apply a patch and return its change record"""
+        with self._lock:
+            if base_version is not None and base_version != self.version:
+                raise VersionConflict(self.version)
+            apply_change(self._meta, self._order, self._lines, change)
+            self.version += 1
+            change = dict(change, version=self.version)
+            self._changes.append(change)
+            self._unsaved.append(change)
+        if self.subscribed:
+            self._srv.send_event("event.project_changed", dict(change, project_id=self.id))
+        return change
+    
+    def changes_since(self, version: int) -> Optional[List[dict]]:
+        """Changes after version, or None when the log no longer reaches back that far"""
+        with self._lock:
+            if version >= self.version:
+                return []
+            if not self._changes or self._changes[0]["version"] > version + 1:
+                return None
+            return [c for c in self._changes if c["version"] > version]
+    
+    def save(self, file_path: Optional[str] = None) -> dict:
+        """Write what changed since the last save; a new path or an oversized change log gets a full snapshot"""
+        with self._lock:
+            path = file_path or self.file_path
+            if not path:
+                raise ChangeError("file_path is required for a project that was never saved")
+            project_file = ProjectFile(path)
+            full = (path != self.file_path or self._saved_version < 0
+                    or not os.path.exists(path) or project_file.should_compact())
+            if full:
+                project_file.write_snapshot(self.snapshot(), self.version)
+            else:
+                project_file.append(self._unsaved)
+            written = len(self._unsaved)
+            self.file_path = path
+            self._unsaved = []
+            self._saved_version = self.version
+            return {"file_path": path, "version": self.version, "snapshot": full, "changes": 0 if full else written}
+
+
+class ProjectRegistry:
+    """Open projects, by id"""
+    
+    def __init__(self):
+        self._projects: Dict[str, ProjectDocument] = {}
+        self._lock = threading.Lock()
+    
+    def add(self, project: ProjectDocument):
+        with self._lock:
+            self._projects[project.id] = project
+    
+    def get(self, project_id: str) -> Optional[ProjectDocument]:
+        with self._lock:
+            return self._projects.get(project_id)
+    
+    def find_path(self, file_path: str) -> Optional[ProjectDocument]:
+        target = os.path.abspath(file_path)
+        with self._lock:
+            for project in self._projects.values():
+                if project.file_path and os.path.abspath(project.file_path) == target:
+                    return project
+        return None
+    
+    def remove(self, project_id: str) -> Optional[ProjectDocument]:
+        with self._lock:
+            return self._projects.pop(project_id, None)
+
+
+# Global instance
+_project_registry: Optional[ProjectRegistry] = None
+_project_registry_lock = threading.Lock()
+
+
+def get_project_registry() -> ProjectRegistry:
+    global _project_registry
+    if _project_registry is None:
+        with _project_registry_lock:
+            if _project_registry is None:
+                _project_registry = ProjectRegistry()
+    return _project_registry
@@ -1,53 +1,122 @@
 """JSON-RPC 2.0 server over stdio"""
 import sys
-import json
+import asyncio
+import inspect
 import threading
-from typing import Callable, Any, Optional, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Any, Optional, Dict, List
 from .types import JsonRpcError, ErrorCodes, make_response, make_notification
+from .channel import NotificationChannel
+from .codec import get_codec, get_framing
 
 # Note: UTF-8 encoding for stdin/stdout is configured in main.py (entry point)
 
 Handler = Callable[..., Any]
 
+DISPATCH_INLINE = "inline"  # Run on the reader thread: cheap calls on local state
+DISPATCH_POOL = "pool"  # Shared worker pool (default)
+DISPATCH_LONG = "long"  # Separate pool for calls that may run for minutes, so they never starve the rest
+
 
 class JsonRpcServer:
-    def __init__(self):
+    """Reads requests from stdin and writes responses and notifications to stdout.
+    
+    Each method declares how it is dispatched: inline on the reader thread,
+    on the worker pool, or on the long-running pool. Coroutine handlers run
+    on a background event loop whatever they declare. Responses go out as
+    soon as each call finishes, so they may arrive out of order; the
+    client matches them by id. A batch (a JSON array of requests) is
+    answered with one array once all of its calls have finished.
+    
+    Messages are encoded with the codec (orjson when installed) and framed
+    one per line, or with a Content-Length header when framing="length".
+    Everything is written by the NotificationChannel's writer thread.
+    Progress is merged per job_id to at most progress_rate updates a
+    second, and send_event() traffic goes out in batches.
+    """
+    
+    POOL_WORKERS = 8
+    LONG_WORKERS = 4
+    PROGRESS_RATE = 10.0  # Progress updates per second per job
+    
+    def __init__(
+        self,
+        pool_workers: int = POOL_WORKERS,
+        long_workers: int = LONG_WORKERS,
+        progress_rate: float = PROGRESS_RATE,
+        codec: Optional[str] = None,
+        framing: Optional[str] = None
+    ):
         self._handlers: Dict[str, Handler] = {}
+        self._dispatch: Dict[str, str] = {}
         self._running = False
         self._write_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, pool_workers), thread_name_prefix="rpc")
+        self._long_pool = ThreadPoolExecutor(max_workers=max(1, long_workers), thread_name_prefix="rpc-long")
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_lock = threading.Lock()
+        self._codec = get_codec(codec)
+        self._framing = get_framing(framing)
+        self._channel = NotificationChannel(self._write_payloads, progress_rate=progress_rate, dumps=self._codec.dumps)
+        self._channel.start()
     
-    def register(self, method: str, handler: Handler):
+    def register(self, method: str, handler: Handler, dispatch: str = DISPATCH_POOL):
         """Register a handler for a method"""
+        if dispatch not in (DISPATCH_INLINE, DISPATCH_POOL, DISPATCH_LONG):
+            raise ValueError(f"Unknown dispatch mode: {dispatch}")
         self._handlers[method] = handler
+        self._dispatch[method] = dispatch
     
-    def method(self, name: str):
+    def method(self, name: str, dispatch: str = DISPATCH_POOL):
         """Decorator to register a method handler"""
         def decorator(func: Handler):
-            self.register(name, func)
+            self.register(name, func, dispatch)
             return func
         return decorator
     
     def send_notification(self, method: str, params: dict):
         """Send a notification to the frontend"""
-        notification = make_notification(method, params)
-        self._write_line(json.dumps(notification))
+        self._channel.send(make_notification(method, params))
     
-    def send_progress(self, job_id: str, percent: float, message: str):
-        """Send a progress update"""
-        self.send_notification("event.progress", {
+    def send_progress(self, job_id: str, percent: float, message: str, final: Optional[bool] = None):
+        """Send a progress update. Updates for the same job are merged;
+        the final one (percent >= 100 unless final says otherwise) always goes out"""
+        if final is None:
+            final = percent >= 100
+        self._channel.progress(job_id, make_notification("event.progress", {
             "job_id": job_id,
             "percent": percent,
             "message": message
-        })
+        }), final=final)
+    
+    def send_event(self, method: str, params: dict):
+        """Send a high-volume notification (e.g. one per line). Events are
+        collected for a few milliseconds and written as one JSON array"""
+        self._channel.batched(make_notification(method, params))
     
-    def _write_line(self, line: str):
-        """Write a line to stdout (thread-safe)"""
+    def _write_payloads(self, payloads: List[bytes]):
+        """Write encoded messages to stdout (writer thread)"""
+        stream = getattr(sys.stdout, "buffer", sys.stdout)
         with self._write_lock:
-            sys.stdout.write(line + "\n")
-            sys.stdout.flush()
+            self._framing.write(stream, payloads)
+            stream.flush()
+    
+    def _write_response(self, response: Any):
+        if response:
+            self._channel.send(response)
+    
+    def _error_response(self, request_id: Any, error: Exception) -> Optional[dict]:
+        if request_id is None:
+            return None
+        if not isinstance(error, JsonRpcError):
+            error = JsonRpcError(ErrorCodes.INTERNAL_ERROR, str(error))
+        return make_response(request_id, error=error)
     
     def _handle_request(self, request: dict) -> Optional[dict]:
         """Handle a single JSON-RPC request"""
+        if not isinstance(request, dict):
+            return make_response(None, error=JsonRpcError(ErrorCodes.INVALID_REQUEST, "Request must be an object"))
+        
         request_id = request.get("id")
         method = request.get("method")
         params = request.get("params", {})
@@ -71,56 +140,139 @@ class JsonRpcServer:
         
         try:
             result = handler(params, self)
-            
-            if request_id is not None:
-                return make_response(request_id, result=result)
-            return None
-            
-        except JsonRpcError as e:
-            if request_id is not None:
-                return make_response(request_id, error=e)
-            return None
-            
         except Exception as e:
-            if request_id is not None:
-                return make_response(
-                    request_id,
-                    error=JsonRpcError(ErrorCodes.INTERNAL_ERROR, str(e))
-                )
-            return None
+            return self._error_response(request_id, e)
+        
+        if request_id is not None:
+            return make_response(request_id, result=result)
+        return None
+    
+    async def _handle_async(self, request: dict, handler: Handler) -> Optional[dict]:
+        """Handle a request whose handler is a coroutine function"""
+        request_id = request.get("id")
+        try:
+            result = await handler(request.get("params", {}), self)
+        except Exception as e:
+            return self._error_response(request_id, e)
+        if request_id is not None:
+            return make_response(request_id, result=result)
+        return None
+    
+    def _get_async_loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop for coroutine handlers, started on first use"""
+        with self._async_lock:
+            if self._async_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="rpc-async", daemon=True).start()
+                self._async_loop = loop
+            return self._async_loop
+    
+    def _run_request(self, request: dict, reply: Callable[[Optional[dict]], None]):
+        """Worker pool entry point: handle a request and pass on its response"""
+        response = None
+        try:
+            response = self._handle_request(request)
+        except Exception as e:
+            sys.stderr.write(f"Server error: {e}\n")
+            sys.stderr.flush()
+        reply(response)
+    
+    def _dispatch_request(self, request: Any, reply: Optional[Callable[[Any], None]] = None):
+        """Run a request, or each request of a batch, where its method asks to.
+        reply gets the response (None for notifications) when it is ready"""
+        reply = reply or self._write_response
+        if isinstance(request, list):
+            if not request:
+                reply(make_response(None, error=JsonRpcError(ErrorCodes.INVALID_REQUEST, "Empty batch")))
+                return
+            batch = _BatchReply(len(request), reply)
+            for item in request:
+                self._dispatch_call(item, batch)
+            return
+        self._dispatch_call(request, reply)
+    
+    def _dispatch_call(self, request: Any, reply: Callable[[Optional[dict]], None]):
+        method = request.get("method") if isinstance(request, dict) else None
+        handler = self._handlers.get(method) if isinstance(method, str) else None
+        if handler is None:
+            # Invalid request or unknown method: answered straight away
+            reply(self._handle_request(request))
+            return
+        
+        if inspect.iscoroutinefunction(handler):
+            future = asyncio.run_coroutine_threadsafe(self._handle_async(request, handler), self._get_async_loop())
+            future.add_done_callback(lambda f: reply(None if f.cancelled() else f.result()))
+            return
+        
+        dispatch = self._dispatch.get(method, DISPATCH_POOL)
+        if dispatch == DISPATCH_INLINE:
+            reply(self._handle_request(request))
+        elif dispatch == DISPATCH_LONG:
+            self._long_pool.submit(self._run_request, request, reply)
+        else:
+            self._pool.submit(self._run_request, request, reply)
     
     def run(self):
         """Run the server, reading from stdin"""
         self._running = True
+        stdin = getattr(sys.stdin, "buffer", sys.stdin)
         
-        while self._running:
-            try:
-                line = sys.stdin.readline()
-                if not line:
-                    break
-                
-                line = line.strip()
-                if not line:
-                    continue
-                
+        try:
+            while self._running:
                 try:
-                    request = json.loads(line)
-                except json.JSONDecodeError as e:
-                    response = make_response(
-                        None,
-                        error=JsonRpcError(ErrorCodes.PARSE_ERROR, f"Parse error: {e}")
-                    )
-                    self._write_line(json.dumps(response))
-                    continue
-                
-                response = self._handle_request(request)
-                if response:
-                    self._write_line(json.dumps(response))
+                    data = self._framing.read(stdin)
+                    if data is None:
+                        break
+                    if not data:
+                        continue
                     
-            except Exception as e:
-                sys.stderr.write(f"Server error: {e}\n")
-                sys.stderr.flush()
+                    try:
+                        request = self._codec.loads(data)
+                    except ValueError as e:
+                        response = make_response(
+                            None,
+                            error=JsonRpcError(ErrorCodes.PARSE_ERROR, f"Parse error: {e}")
+                        )
+                        self._write_response(response)
+                        continue
+                    
+                    self._dispatch_request(request)
+                
+                except Exception as e:
+                    sys.stderr.write(f"Server error: {e}\n")
+                    sys.stderr.flush()
+        finally:
+            self._stop_workers()
+    
+    def _stop_workers(self):
+        """Drop queued calls; calls already running finish on their own"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._long_pool.shutdown(wait=False, cancel_futures=True)
+        if self._async_loop is not None:
+            self._async_loop.call_soon_threadsafe(self._async_loop.stop)
+        self._channel.close()
     
     def shutdown(self):
         """Shutdown the server"""
         self._running = False
+
+
+class _BatchReply:
+    """Collects the responses to a batch request and sends them as one array.
+    Notifications in the batch get no entry; an all-notification batch gets no reply."""
+    
+    def __init__(self, size: int, reply: Callable[[Any], None]):
+        self._remaining = size
+        self._responses: List[dict] = []
+        self._lock = threading.Lock()
+        self._reply = reply
+    
+    def __call__(self, response: Optional[dict]):
+        with self._lock:
+            if response:
+                self._responses.append(response)
+            self._remaining -= 1
+            if self._remaining:
+                return
+        if self._responses:
+            self._reply(self._responses)
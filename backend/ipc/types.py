@@ -19,6 +19,7 @@ class ErrorCodes(IntEnum):
     APP_FILE_NOT_FOUND = -32095
     APP_PERMISSION_DENIED = -32094
     APP_TTS_FAILED = -32093
+    APP_VERSION_CONFLICT = -32092
 
 
 @dataclass
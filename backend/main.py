@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 """2TTS Backend - JSON-RPC 2.0 server over stdio"""
+import os
 import sys
 import io
 from pathlib import Path
@@ -17,7 +18,9 @@ from ipc.handlers import register_handlers
 
 
 def main():
-    server = JsonRpcServer()
+    # TTS_IPC_CODEC: auto (default), json or orjson. TTS_IPC_FRAMING: line (default) or length;
+    # the desktop app reads TTS_IPC_FRAMING too and passes its choice on to the sidecar
+    server = JsonRpcServer(codec=os.environ.get("TTS_IPC_CODEC"), framing=os.environ.get("TTS_IPC_FRAMING"))
     register_handlers(server)
     server.run()
 
@@ -42,12 +42,7 @@ pub async fn ipc_call(
 
     state.add_pending(id, tx);
 
-    let mut request_line = request_str.clone();
-    if !request_line.ends_with('\n') {
-        request_line.push('\n');
-    }
-
-    if let Err(e) = state.write(request_line.as_bytes()) {
+    if let Err(e) = state.write_message(&request_str) {
         state.pending_requests.lock().remove(&id);
         let response = JsonRpcResponse {
             jsonrpc: "2.0".to_string(),
@@ -94,6 +89,75 @@ pub async fn ipc_call(
     }
 }
 
+/// Send a JSON-RPC batch (an array of requests) as one message and wait for all of its responses.
+/// Returns the responses as a JSON array, in request order; notifications get no entry.
+#[tauri::command]
+pub async fn ipc_call_batch(
+    request_str: String,
+    state: State<'_, BackendState>,
+) -> Result<String, String> {
+    let error_response = |id: Option<u64>, code: i32, message: String| JsonRpcResponse {
+        jsonrpc: "2.0".to_string(),
+        result: None,
+        error: Some(JsonRpcError {
+            code,
+            message,
+            data: None,
+        }),
+        id,
+    };
+
+    let requests: Vec<serde_json::Value> = serde_json::from_str(&request_str)
+        .map_err(|e| serde_json::to_string(&error_response(None, -32700, format!("Parse error: {}", e))).unwrap())?;
+    let ids: Vec<u64> = requests
+        .iter()
+        .filter_map(|r| r.get("id").and_then(|id| id.as_u64()))
+        .collect();
+
+    if !state.is_running() {
+        let error = state.get_error().unwrap_or_else(|| "Backend not running".to_string());
+        let responses: Vec<JsonRpcResponse> = ids
+            .iter()
+            .map(|id| error_response(Some(*id), -32603, error.clone()))
+            .collect();
+        return Ok(serde_json::to_string(&responses).unwrap());
+    }
+
+    let mut receivers = Vec::with_capacity(ids.len());
+    for id in &ids {
+        let (tx, rx) = oneshot::channel();
+        state.add_pending(*id, tx);
+        receivers.push((*id, rx));
+    }
+
+    if let Err(e) = state.write_message(&request_str) {
+        let responses: Vec<JsonRpcResponse> = ids
+            .iter()
+            .map(|id| {
+                state.pending_requests.lock().remove(id);
+                error_response(Some(*id), -32603, e.clone())
+            })
+            .collect();
+        return Ok(serde_json::to_string(&responses).unwrap());
+    }
+
+    // One deadline for the whole batch
+    let deadline = tokio::time::Instant::now() + Duration::from_secs(30);
+    let mut responses = Vec::with_capacity(receivers.len());
+    for (id, rx) in receivers {
+        let response = match tokio::time::timeout_at(deadline, rx).await {
+            Ok(Ok(response)) => response,
+            Ok(Err(_)) => error_response(Some(id), -32603, "Request cancelled".to_string()),
+            Err(_) => {
+                state.pending_requests.lock().remove(&id);
+                error_response(Some(id), -32603, "Request timeout".to_string())
+            }
+        };
+        responses.push(response);
+    }
+    Ok(serde_json::to_string(&responses).unwrap())
+}
+
 #[tauri::command]
 pub async fn window_minimize(app: AppHandle) -> Result<(), String> {
     if let Some(window) = app.get_webview_window("main") {
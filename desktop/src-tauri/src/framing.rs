@@ -0,0 +1,144 @@
+//! Message framing on the backend's stdio, the Rust side of backend/ipc/codec.py
+
+/// Environment variable both sides read; the sidecar is spawned with it set
+pub const FRAMING_ENV: &str = "TTS_IPC_FRAMING";
+
+const LENGTH_HEADER: &str = "content-length";
+
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub enum Framing {
+    /// One JSON document per line
+    Line,
+    /// `Content-Length: N` header, blank line, then exactly N bytes, as in LSP
+    Length,
+}
+
+impl Framing {
+    /// "line" (default) or "length"; anything else falls back to line
+    pub fn parse(name: Option<&str>) -> Self {
+        match name.map(|n| n.trim().to_ascii_lowercase()).as_deref() {
+            Some("length") => Framing::Length,
+            _ => Framing::Line,
+        }
+    }
+
+    pub fn from_env() -> Self {
+        Self::parse(std::env::var(FRAMING_ENV).ok().as_deref())
+    }
+
+    pub fn name(self) -> &'static str {
+        match self {
+            Framing::Line => "line",
+            Framing::Length => "length",
+        }
+    }
+
+    /// Frame one encoded document for writing
+    pub fn encode(self, body: &[u8]) -> Vec<u8> {
+        match self {
+            Framing::Line => {
+                let mut data = Vec::with_capacity(body.len() + 1);
+                data.extend_from_slice(body);
+                data.push(b'\n');
+                data
+            }
+            Framing::Length => {
+                let mut data = format!("Content-Length: {}\r\n\r\n", body.len()).into_bytes();
+                data.extend_from_slice(body);
+                data
+            }
+        }
+    }
+}
+
+/// Reassembles documents from stdout chunks, which may split or join frames anywhere
+pub struct FrameReader {
+    framing: Framing,
+    buffer: Vec<u8>,
+    start: usize,
+}
+
+impl FrameReader {
+    pub fn new(framing: Framing) -> Self {
+        Self {
+            framing,
+            buffer: Vec::new(),
+            start: 0,
+        }
+    }
+
+    pub fn push(&mut self, data: &[u8]) {
+        // Drop what was already consumed before growing the buffer
+        if self.start > 0 {
+            self.buffer.drain(..self.start);
+            self.start = 0;
+        }
+        self.buffer.extend_from_slice(data);
+    }
+
+    /// Next complete document, skipping blank lines; None until more data arrives.
+    /// A header block without a usable Content-Length is returned as an Err and skipped.
+    pub fn next_frame(&mut self) -> Option<Result<Vec<u8>, String>> {
+        loop {
+            let pending = &self.buffer[self.start..];
+            match self.framing {
+                Framing::Line => {
+                    let end = pending.iter().position(|&b| b == b'\n')?;
+                    let line = trim(&pending[..end]).to_vec();
+                    self.start += end + 1;
+                    if !line.is_empty() {
+                        return Some(Ok(line));
+                    }
+                }
+                Framing::Length => {
+                    let (header_end, body_start) = find_header_end(pending)?;
+                    let length = parse_length(&pending[..header_end]);
+                    let Some(length) = length else {
+                        let header = String::from_utf8_lossy(&pending[..header_end]).trim().to_string();
+                        self.start += body_start;
+                        if header.is_empty() {
+                            continue; // Stray blank line between messages
+                        }
+                        return Some(Err(format!("No Content-Length in header: {}", header)));
+                    };
+                    if pending.len() < body_start + length {
+                        return None;
+                    }
+                    let body = pending[body_start..body_start + length].to_vec();
+                    self.start += body_start + length;
+                    return Some(Ok(body));
+                }
+            }
+        }
+    }
+}
+
+fn trim(bytes: &[u8]) -> &[u8] {
+    let start = bytes.iter().position(|b| !b.is_ascii_whitespace()).unwrap_or(bytes.len());
+    let end = bytes.iter().rposition(|b| !b.is_ascii_whitespace()).map_or(start, |i| i + 1);
+    &bytes[start..end]
+}
+
+/// End of the header block and start of the body: the first empty line, with \r\n or \n endings
+fn find_header_end(data: &[u8]) -> Option<(usize, usize)> {
+    let mut line_start = 0;
+    while let Some(offset) = data[line_start..].iter().position(|&b| b == b'\n') {
+        let line_end = line_start + offset;
+        if trim(&data[line_start..line_end]).is_empty() {
+            return Some((line_start, line_end + 1));
+        }
+        line_start = line_end + 1;
+    }
+    None
+}
+
+fn parse_length(header: &[u8]) -> Option<usize> {
+    String::from_utf8_lossy(header).lines().find_map(|line| {
+        let (key, value) = line.split_once(':')?;
+        if key.trim().eq_ignore_ascii_case(LENGTH_HEADER) {
+            value.trim().parse().ok()
+        } else {
+            None
+        }
+    })
+}
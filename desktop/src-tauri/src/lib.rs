@@ -9,6 +9,9 @@ use tauri_plugin_shell::ShellExt;
 use tokio::sync::oneshot;
 
 mod commands;
+mod framing;
+
+use framing::{FrameReader, Framing, FRAMING_ENV};
 
 #[derive(Debug, Clone, Serialize, Deserialize)]
 pub struct JsonRpcRequest {
@@ -55,6 +58,7 @@ pub struct BackendState {
     pending_requests: PendingRequests,
     request_id: AtomicU64,
     backend_error: Mutex<Option<String>>,
+    framing: Framing,
 }
 
 impl BackendState {
@@ -64,6 +68,7 @@ impl BackendState {
             pending_requests: Arc::new(Mutex::new(HashMap::new())),
             request_id: AtomicU64::new(0),
             backend_error: Mutex::new(None),
+            framing: Framing::from_env(),
         }
     }
 
@@ -98,6 +103,11 @@ impl BackendState {
         }
     }
 
+    /// Frame one JSON document (request or batch) and write it
+    pub fn write_message(&self, body: &str) -> Result<(), String> {
+        self.write(&self.framing.encode(body.trim().as_bytes()))
+    }
+
     pub fn add_pending(&self, id: u64, sender: oneshot::Sender<JsonRpcResponse>) {
         self.pending_requests.lock().insert(id, sender);
     }
@@ -115,6 +125,36 @@ impl Default for BackendState {
     }
 }
 
+/// Resolve a response to its pending request, or emit a notification as "backend-event"
+fn route_backend_message(message: serde_json::Value, pending: &PendingRequests, app_handle: &tauri::AppHandle) {
+    if let Some(method) = message.get("method").and_then(|m| m.as_str()) {
+        let _ = app_handle.emit("backend-event", serde_json::json!({
+            "method": method,
+            "params": message.get("params")
+        }));
+        return;
+    }
+    match serde_json::from_value::<JsonRpcResponse>(message) {
+        Ok(response) => {
+            if let Some(id) = response.id {
+                if let Some(sender) = pending.lock().remove(&id) {
+                    let _ = sender.send(response);
+                }
+            } else if let Some(ref result) = response.result {
+                if let Some(method) = result.get("method").and_then(|m| m.as_str()) {
+                    let _ = app_handle.emit("backend-event", serde_json::json!({
+                        "method": method,
+                        "params": result.get("params")
+                    }));
+                }
+            }
+        }
+        Err(e) => {
+            log::warn!("Failed to parse backend response: {}", e);
+        }
+    }
+}
+
 fn spawn_backend(app: &tauri::AppHandle) -> Result<(), Box<dyn std::error::Error>> {
     let state = app.state::<BackendState>();
     let shell = app.shell();
@@ -128,6 +168,11 @@ fn spawn_backend(app: &tauri::AppHandle) -> Result<(), Box<dyn std::error::Error
         log::error!("Failed to create sidecar command: {} - Make sure backend-x86_64-pc-windows-msvc.exe exists", e);
         e
     })?;
+    // Raw stdout: frames are cut by FrameReader, not by the shell plugin's line splitting.
+    // The backend gets the framing explicitly so both ends always agree.
+    let framing = state.framing;
+    let sidecar = sidecar.set_raw_out(true).env(FRAMING_ENV, framing.name());
+    log::info!("Backend IPC framing: {}", framing.name());
 
     let (mut rx, child) = sidecar.spawn().map_err(|e| {
         let error = format!("Failed to spawn backend: {}", e);
@@ -143,39 +188,32 @@ fn spawn_backend(app: &tauri::AppHandle) -> Result<(), Box<dyn std::error::Error
     let pending = state.pending_requests.clone();
 
     tauri::async_runtime::spawn(async move {
-        let mut buffer = String::new();
+        let mut reader = FrameReader::new(framing);
 
         while let Some(event) = rx.recv().await {
             match event {
-                CommandEvent::Stdout(line_bytes) => {
-                    let line = String::from_utf8_lossy(&line_bytes);
-                    buffer.push_str(&line);
+                CommandEvent::Stdout(bytes) => {
+                    reader.push(&bytes);
 
-                    while let Some(newline_pos) = buffer.find('\n') {
-                        let json_line = buffer[..newline_pos].trim().to_string();
-                        buffer = buffer[newline_pos + 1..].to_string();
-
-                        if json_line.is_empty() {
-                            continue;
-                        }
+                    while let Some(frame) = reader.next_frame() {
+                        let frame = match frame {
+                            Ok(frame) => frame,
+                            Err(e) => {
+                                log::warn!("Failed to read backend message: {}", e);
+                                continue;
+                            }
+                        };
 
-                        match serde_json::from_str::<JsonRpcResponse>(&json_line) {
-                            Ok(response) => {
-                                if let Some(id) = response.id {
-                                    if let Some(sender) = pending.lock().remove(&id) {
-                                        let _ = sender.send(response);
-                                    }
-                                } else if let Some(ref result) = response.result {
-                                    if let Some(method) = result.get("method").and_then(|m| m.as_str()) {
-                                        let _ = app_handle.emit("backend-event", serde_json::json!({
-                                            "method": method,
-                                            "params": result.get("params")
-                                        }));
-                                    }
+                        // A frame holds one message, or a JSON array of them (batched events)
+                        match serde_json::from_slice::<serde_json::Value>(&frame) {
+                            Ok(serde_json::Value::Array(messages)) => {
+                                for message in messages {
+                                    route_backend_message(message, &pending, &app_handle);
                                 }
                             }
+                            Ok(message) => route_backend_message(message, &pending, &app_handle),
                             Err(e) => {
-                                log::warn!("Failed to parse backend response: {} - {}", e, json_line);
+                                log::warn!("Failed to parse backend response: {} - {}", e, String::from_utf8_lossy(&frame));
                             }
                         }
                     }
@@ -269,6 +307,7 @@ pub fn run() {
         })
         .invoke_handler(tauri::generate_handler![
             commands::ipc_call,
+            commands::ipc_call_batch,
             commands::window_minimize,
             commands::window_maximize,
             commands::window_close,
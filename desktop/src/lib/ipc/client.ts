@@ -5,12 +5,20 @@ import {
   Voice,
   TTSJobParams,
   TTSJobResult,
+  TTSCacheStats,
+  TransportPoolStats,
+  TransferStatsSnapshot,
+  TTSPreviewEvent,
   ConfigResult,
   APIKey,
   APIKeyStatus,
+  APIKeyValidationBatch,
+  APIKeyValidatedEvent,
   Proxy,
+  ProxyHealth,
   ProgressEvent,
 } from './types';
+import { v4 as uuidv4 } from 'uuid';
 import { getPlatformAPI } from '../platform';
 
 const UI_VERSION = '1.4.6';
@@ -71,6 +79,38 @@ class IPCClient {
     return response.result as T;
   }
 
+  // Sends several calls as one JSON-RPC batch (one round trip). Results come back in call order;
+  // a call that failed yields an IPCError in its slot instead of rejecting the whole batch.
+  async callBatch(
+    calls: { method: string; params?: Record<string, unknown> }[],
+    timeout = DEFAULT_TIMEOUT
+  ): Promise<unknown[]> {
+    if (calls.length === 0) return [];
+    const api = await getPlatformAPI();
+
+    const requests: JsonRpcRequest[] = calls.map(({ method, params }) => ({
+      jsonrpc: '2.0',
+      method,
+      params,
+      id: this.getNextId(),
+    }));
+
+    const responses = await Promise.race([
+      api.ipcCallBatch(JSON.stringify(requests)),
+      new Promise<never>((_, reject) =>
+        setTimeout(() => reject(new Error(`Request timeout after ${timeout}ms`)), timeout)
+      ),
+    ]) as JsonRpcResponse[];
+
+    const byId = new Map(responses.map((r) => [r.id, r]));
+    return requests.map((request) => {
+      const response = byId.get(request.id);
+      if (!response) return new IPCError(-32603, 'No response');
+      if (response.error) return new IPCError(response.error.code, response.error.message, response.error.data);
+      return response.result;
+    });
+  }
+
   on<T>(event: string, callback: EventCallback<T>): () => void {
     if (!this.eventListeners.has(event)) {
       this.eventListeners.set(event, new Set());
@@ -104,12 +144,27 @@ class IPCClient {
     return this.call<Voice[]>('voices.refresh');
   }
 
-  async startTTSJob(params: TTSJobParams): Promise<TTSJobResult> {
-    return this.call<TTSJobResult>('tts.start', params as unknown as Record<string, unknown>, 300000);
+  /**
+   * Render one line. With onPreview, the first audio chunk is delivered as soon
+   * as it arrives, matched to this call by job_id, before the result resolves.
+   */
+  async startTTSJob(params: TTSJobParams, onPreview?: (event: TTSPreviewEvent) => void): Promise<TTSJobResult> {
+    const jobId = params.job_id ?? uuidv4();
+    const unsubscribe = onPreview
+      ? this.onTTSPreview((event) => {
+          if (event.job_id === jobId) onPreview(event);
+        })
+      : undefined;
+    try {
+      const request = { ...params, job_id: jobId, preview: params.preview ?? Boolean(onPreview) };
+      return await this.call<TTSJobResult>('tts.start', request as unknown as Record<string, unknown>, 300000);
+    } finally {
+      unsubscribe?.();
+    }
   }
 
-  async cancelJob(jobId: string): Promise<void> {
-    return this.call<void>('jobs.cancel', { job_id: jobId });
+  async cancelJob(jobId: string): Promise<{ success: boolean }> {
+    return this.call<{ success: boolean }>('jobs.cancel', { job_id: jobId });
   }
 
   async getConfig(): Promise<ConfigResult> {
@@ -136,6 +191,11 @@ class IPCClient {
     return this.call<APIKey>('apikeys.validate', { id });
   }
 
+  // Validates the given keys (all keys when omitted) concurrently; results also stream as event.apikey_validated
+  async validateAPIKeys(ids?: string[]): Promise<APIKeyValidationBatch> {
+    return this.call<APIKeyValidationBatch>('apikeys.validate', ids ? { ids } : { all: true }, 120000);
+  }
+
   async getAPIKeyStatus(): Promise<APIKeyStatus> {
     return this.call<APIKeyStatus>('apikeys.status');
   }
@@ -157,6 +217,11 @@ class IPCClient {
     return result.success;
   }
 
+  // Latency scores from the background prober, fastest first by rank; probe=true probes all proxies now
+  async getProxyHealth(probe = false): Promise<ProxyHealth[]> {
+    return this.call<ProxyHealth[]>('proxies.health', probe ? { probe: true } : {}, probe ? 60000 : undefined);
+  }
+
   async exportDiagnostics(): Promise<string> {
     return this.call<string>('system.export_diagnostics');
   }
@@ -242,6 +307,60 @@ class IPCClient {
     });
   }
 
+  // Backend-owned projects: open or create once, then send patches and save only what changed
+  async openProject(filePath: string, subscribe = false): Promise<ProjectInfo & { project: ProjectData }> {
+    return this.call('project.open', { file_path: filePath, subscribe }, 120000);
+  }
+
+  async createProject(project: ProjectData, filePath?: string, subscribe = false): Promise<ProjectInfo> {
+    return this.call('project.create', { project, file_path: filePath, subscribe }, 120000);
+  }
+
+  async getProject(projectId: string, offset = 0, limit?: number): Promise<ProjectInfo & { project: ProjectData }> {
+    return this.call('project.get', { project_id: projectId, offset, limit });
+  }
+
+  async closeProject(projectId: string): Promise<{ success: boolean }> {
+    return this.call('project.close', { project_id: projectId });
+  }
+
+  async updateProjectLines(projectId: string, lines: ProjectLine[], baseVersion?: number): Promise<{ version: number }> {
+    return this.call('project.lines.update', { project_id: projectId, lines, base_version: baseVersion });
+  }
+
+  async insertProjectLines(projectId: string, lines: ProjectLine[], index?: number, baseVersion?: number): Promise<{ version: number }> {
+    return this.call('project.lines.insert', { project_id: projectId, lines, index, base_version: baseVersion });
+  }
+
+  async deleteProjectLines(projectId: string, ids: string[], baseVersion?: number): Promise<{ version: number }> {
+    return this.call('project.lines.delete', { project_id: projectId, ids, base_version: baseVersion });
+  }
+
+  async moveProjectLines(projectId: string, ids: string[], index: number, baseVersion?: number): Promise<{ version: number }> {
+    return this.call('project.lines.move', { project_id: projectId, ids, index, base_version: baseVersion });
+  }
+
+  async updateProjectMeta(projectId: string, fields: Record<string, unknown>, baseVersion?: number): Promise<{ version: number }> {
+    return this.call('project.meta.update', { project_id: projectId, fields, base_version: baseVersion });
+  }
+
+  async getProjectChanges(projectId: string, since: number): Promise<{ version: number; reset: boolean; changes: ProjectChange[] }> {
+    return this.call('project.changes', { project_id: projectId, since });
+  }
+
+  async subscribeProject(projectId: string, enabled = true): Promise<{ success: boolean; version: number }> {
+    return this.call('project.subscribe', { project_id: projectId, enabled });
+  }
+
+  // Writes the changes since the last save (or a full snapshot for a new path)
+  async saveProjectChanges(projectId: string, filePath?: string): Promise<ProjectSaveResult> {
+    return this.call('project.save', { project_id: projectId, file_path: filePath }, 120000);
+  }
+
+  onProjectChanged(callback: EventCallback<ProjectChange & { project_id: string }>): () => void {
+    return this.on('event.project_changed', callback);
+  }
+
   onProgress(callback: EventCallback<ProgressEvent>): () => void {
     return this.on('event.progress', callback);
   }
@@ -254,6 +373,14 @@ class IPCClient {
     return this.on('event.job_error', callback);
   }
 
+  onTTSPreview(callback: EventCallback<TTSPreviewEvent>): () => void {
+    return this.on('event.tts_preview', callback);
+  }
+  
+  onAPIKeyValidated(callback: EventCallback<APIKeyValidatedEvent>): () => void {
+    return this.on('event.apikey_validated', callback);
+  }
+
   onCreditsUpdate(callback: EventCallback<{ total: number }>): () => void {
     return this.on('event.credits_update', callback);
   }
@@ -431,11 +558,111 @@ class IPCClient {
       output_path: string;
     }>;
     thread_count?: number;
+    max_retries?: number;
     settings?: VoiceSettingsParams;
-  }): Promise<BatchTTSResult> {
-    return this.call<BatchTTSResult>('tts.batch_start', params, 1800000); // 30 min timeout
+    loop_enabled?: boolean;
+    loop_count?: number;
+  }): Promise<BatchJobInfo> {
+    return this.call<BatchJobInfo>('tts.batch_start', params);
+  }
+
+  /** Start a batch and resolve once its job completes; onLine sees each line as it finishes */
+  async runBatchTTS(
+    params: Parameters<IPCClient['startBatchTTS']>[0],
+    onLine?: (result: BatchLineResult) => void,
+    onStarted?: (job: BatchJobInfo) => void
+  ): Promise<BatchTTSResult> {
+    const results = new Map<string, BatchLineResult>();
+    let jobId: string | null = null;
+    const early: BatchLineResult[] = [];
+    const earlyDone = new Map<string, BatchJobInfo>();
+    let finish: (job: BatchJobInfo) => void = () => {};
+    const completed = new Promise<BatchJobInfo>((resolve) => { finish = resolve; });
+
+    const offLine = this.onLineDone((line) => {
+      if (jobId === null) {
+        early.push(line);
+        return;
+      }
+      if (line.job_id !== jobId) return;
+      results.set(line.id, line);
+      onLine?.(line);
+    });
+    const offComplete = this.on<{ job_id: string; result: BatchJobInfo }>('event.job_complete', (event) => {
+      if (jobId === null) earlyDone.set(event.job_id, event.result);
+      else if (event.job_id === jobId) finish(event.result);
+    });
+
+    try {
+      const job = await this.startBatchTTS(params);
+      jobId = job.job_id;
+      onStarted?.(job);
+      early.filter((line) => line.job_id === jobId).forEach((line) => {
+        results.set(line.id, line);
+        onLine?.(line);
+      });
+      const done = earlyDone.get(jobId) ?? (job.status === 'running' ? await completed : job);
+      const final = await this.getJobStatus(done.job_id, true);
+      (final.results || []).forEach((line) => {
+        if (!results.has(line.id)) {
+          results.set(line.id, line);
+          onLine?.(line);
+        }
+      });
+      return {
+        batch_id: final.job_id,
+        status: final.status,
+        total: final.total,
+        completed: final.completed,
+        failed: final.failed,
+        cached: final.cached,
+        results: Array.from(results.values()),
+      };
+    } finally {
+      offLine();
+      offComplete();
+    }
+  }
+
+  async pauseJob(jobId: string): Promise<{ success: boolean }> {
+    return this.call<{ success: boolean }>('jobs.pause', { job_id: jobId });
+  }
+
+  async resumeJob(jobId: string): Promise<{ success: boolean }> {
+    return this.call<{ success: boolean }>('jobs.resume', { job_id: jobId });
+  }
+
+  async getJobStatus(jobId: string, includeResults = false): Promise<BatchJobInfo & { results?: BatchLineResult[] }> {
+    return this.call<BatchJobInfo & { results?: BatchLineResult[] }>('jobs.status', {
+      job_id: jobId,
+      include_results: includeResults,
+    });
+  }
+
+  async listJobs(): Promise<BatchJobInfo[]> {
+    return this.call<BatchJobInfo[]>('jobs.list');
+  }
+
+  onLineDone(callback: EventCallback<BatchLineResult>): () => void {
+    return this.on('event.line_done', callback);
+  }
+
+  async getTTSCacheStats(): Promise<TTSCacheStats> {
+    return this.call<TTSCacheStats>('tts.cache_stats');
+  }
+
+  async clearTTSCache(): Promise<void> {
+    return this.call<void>('tts.cache_clear');
+  }
+
+  async getTransportStats(): Promise<TransportPoolStats[]> {
+    return this.call<TransportPoolStats[]>('tts.transport_stats');
   }
 
+  async getTransferStats(): Promise<TransferStatsSnapshot> {
+    return this.call<TransferStatsSnapshot>('tts.transfer_stats');
+  }
+  
   // ============================================
   // LOCALIZATION METHODS
   // ============================================
@@ -559,19 +786,72 @@ export interface VoiceDetails extends Voice {
   settings: VoiceSettingsParams | null;
 }
 
+export type JobStatus = 'running' | 'paused' | 'cancelling' | 'completed' | 'cancelled' | 'failed';
+
+export interface BatchJobInfo {
+  job_id: string;
+  kind: string;
+  status: JobStatus;
+  total: number;
+  completed: number;
+  failed: number;
+  cached: number;
+  current_loop: number;
+  created_at: string;
+  finished_at: string | null;
+  error: string | null;
+}
+
+export interface BatchLineResult {
+  job_id?: string;
+  id: string;
+  success: boolean;
+  output_path?: string;
+  duration_ms?: number;
+  error?: string;
+}
+
 export interface BatchTTSResult {
   batch_id: string;
+  status: JobStatus;
   total: number;
   completed: number;
   failed: number;
-  results: Array<{
-    id: string;
-    success: boolean;
-    output_path?: string;
-    duration_ms?: number;
-    language_code?: string;
-    error?: string;
-  }>;
+  cached: number;
+  results: BatchLineResult[];
+}
+
+export interface ProjectLine {
+  id: string;
+  [field: string]: unknown;
+}
+
+export interface ProjectData {
+  lines: ProjectLine[];
+  [field: string]: unknown;
+}
+
+export interface ProjectInfo {
+  project_id: string;
+  version: number;
+  file_path: string | null;
+  line_count: number;
+  dirty: boolean;
+}
+
+export type ProjectChange =
+  | { op: 'update'; version: number; lines: ProjectLine[] }
+  | { op: 'insert'; version: number; index: number | null; lines: ProjectLine[] }
+  | { op: 'delete'; version: number; ids: string[] }
+  | { op: 'move'; version: number; ids: string[]; index: number }
+  | { op: 'meta'; version: number; fields: Record<string, unknown> };
+
+export interface ProjectSaveResult {
+  success: boolean;
+  file_path: string;
+  version: number;
+  snapshot: boolean;
+  changes: number;
 }
 
 export class IPCError extends Error {
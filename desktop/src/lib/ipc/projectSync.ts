@@ -0,0 +1,127 @@
+/**
+ * Keeps a backend-owned project in step with the UI's copy.
+ *
+ * The first save hands the whole project to the backend. Later saves to the
+ * same file diff the UI state against what was last synced and send only
+ * the changed lines and settings as patches, in one batch, followed by a
+ * delta save. Anything the patches can't express falls back to a full sync.
+ */
+
+import { ipcClient, IPCError, ProjectData, ProjectLine, ProjectSaveResult } from './client';
+
+interface SyncedState {
+  projectId: string;
+  filePath: string;
+  version: number;
+  lines: Map<string, string>; // line id -> serialized fields as last synced
+  order: string[];
+  meta: string;
+}
+
+function splitProject(project: ProjectData): { meta: Record<string, unknown>; lines: ProjectLine[] } {
+  const { lines, ...meta } = project;
+  return { meta, lines };
+}
+
+function serializeLine(line: ProjectLine): string {
+  const { index: _index, ...fields } = line;
+  return JSON.stringify(fields);
+}
+
+export class ProjectSync {
+  private state: SyncedState | null = null;
+
+  get projectId(): string | null {
+    return this.state?.projectId ?? null;
+  }
+
+  async open(filePath: string): Promise<ProjectData> {
+    await this.close();
+    const result = await ipcClient.openProject(filePath);
+    this.remember(result.project_id, filePath, result.version, result.project);
+    return result.project;
+  }
+
+  async save(filePath: string, project: ProjectData): Promise<ProjectSaveResult> {
+    if (this.state && this.state.filePath === filePath) {
+      const result = await this.saveChanges(project);
+      if (result) return result;
+    }
+    return this.saveFull(filePath, project);
+  }
+
+  async close(): Promise<void> {
+    if (this.state) {
+      const { projectId } = this.state;
+      this.state = null;
+      await ipcClient.closeProject(projectId).catch(() => undefined);
+    }
+  }
+
+  private remember(projectId: string, filePath: string, version: number, project: ProjectData) {
+    const { meta, lines } = splitProject(project);
+    this.state = {
+      projectId,
+      filePath,
+      version,
+      lines: new Map(lines.map((l) => [l.id, serializeLine(l)])),
+      order: lines.map((l) => l.id),
+      meta: JSON.stringify(meta),
+    };
+  }
+
+  private async saveFull(filePath: string, project: ProjectData): Promise<ProjectSaveResult> {
+    await this.close();
+    const info = await ipcClient.createProject(project, filePath);
+    const result = await ipcClient.saveProjectChanges(info.project_id);
+    this.remember(info.project_id, filePath, result.version, project);
+    return result;
+  }
+
+  // Patches plus a delta save; null when the changes need a full sync instead
+  private async saveChanges(project: ProjectData): Promise<ProjectSaveResult | null> {
+    const state = this.state!;
+    const { meta, lines } = splitProject(project);
+    const current = new Set(lines.map((l) => l.id));
+
+    const deleted = state.order.filter((id) => !current.has(id));
+    const kept = state.order.filter((id) => current.has(id));
+    const keptNow = lines.filter((l) => state.lines.has(l.id)).map((l) => l.id);
+    if (kept.length !== keptNow.length || kept.some((id, i) => id !== keptNow[i])) {
+      return null; // Lines were reordered
+    }
+
+    const updated: ProjectLine[] = [];
+    const inserts: { index: number; lines: ProjectLine[] }[] = [];
+    lines.forEach((line, index) => {
+      const synced = state.lines.get(line.id);
+      if (synced === undefined) {
+        // Runs of new lines go in as one insert each, in ascending position
+        const run = inserts[inserts.length - 1];
+        if (run && run.index + run.lines.length === index) run.lines.push(line);
+        else inserts.push({ index, lines: [line] });
+      } else if (synced !== serializeLine(line)) {
+        updated.push(line);
+      }
+    });
+
+    const base = { project_id: state.projectId };
+    const calls: { method: string; params: Record<string, unknown> }[] = [];
+    if (deleted.length) calls.push({ method: 'project.lines.delete', params: { ...base, ids: deleted } });
+    inserts.forEach((run) => calls.push({ method: 'project.lines.insert', params: { ...base, ...run } }));
+    if (updated.length) calls.push({ method: 'project.lines.update', params: { ...base, lines: updated } });
+    if (JSON.stringify(meta) !== state.meta) calls.push({ method: 'project.meta.update', params: { ...base, fields: meta } });
+    calls.push({ method: 'project.save', params: base });
+
+    // Patches run in order on the backend; the save runs after them
+    const results = await ipcClient.callBatch(calls, 120000);
+    if (results.some((r) => r instanceof IPCError)) {
+      return null;
+    }
+    const result = results[results.length - 1] as ProjectSaveResult;
+    this.remember(state.projectId, state.filePath, result.version, project);
+    return result;
+  }
+}
+
+export const projectSync = new ProjectSync();
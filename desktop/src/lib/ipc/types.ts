@@ -77,6 +77,10 @@ export interface TTSJobParams {
   output_path: string;
   voice_settings?: VoiceSettings;
   debug?: boolean;
+  output_format?: string;
+  stream?: boolean;
+  preview?: boolean;
+  job_id?: string; // Tags progress and preview events; echoed in the result
 }
 
 export interface TTSDebugData {
@@ -103,9 +107,56 @@ export interface TTSJobResult {
   duration_ms: number;
   characters_used: number;
   language_code?: string;
+  cached?: boolean;
+  ttfb_ms?: number;
+  first_chunk_ms?: number;
+  transfer_ms?: number;
   debug?: TTSDebugData;
 }
 
+export interface TTSPreviewEvent {
+  job_id: string;
+  chunk: string;
+  mime_type: string;
+}
+
+export interface TTSCacheStats {
+  hits: number;
+  misses: number;
+  stores: number;
+  evictions: number;
+  entries: number;
+  size_bytes: number;
+  hit_rate: number;
+}
+
+export interface TransportPoolStats {
+  transport: string;
+  pool_size: number;
+  active_requests: number;
+  peak_active_requests: number;
+  requests: number;
+  idle_connections: number;
+  connections_opened: number;
+  utilization: number;
+}
+
+export interface TransferStats {
+  requests: number;
+  avg_ttfb_ms: number;
+  avg_first_chunk_ms: number;
+  max_first_chunk_ms: number;
+  avg_transfer_ms: number;
+  bytes: number;
+  throughput_kbps: number;
+}
+
+export interface TransferStatsSnapshot {
+  overall: TransferStats;
+  keys: Record<string, TransferStats>;
+  proxies: Record<string, TransferStats>;
+}
+
 export interface ConfigResult {
   theme: string;
   background_image?: string | null;
@@ -137,6 +188,30 @@ export interface APIKey {
   assigned_proxy_id: string | null;
 }
 
+export interface APIKeyValidation {
+  id: string;
+  name: string;
+  key: string;
+  remaining_credits: number;
+  character_count: number;
+  character_limit: number;
+  is_valid: boolean;
+  message: string;
+  assigned_proxy_id: string | null;
+}
+
+export interface APIKeyValidationBatch {
+  results: APIKeyValidation[];
+  validated: number;
+  total: number;
+}
+
+export interface APIKeyValidatedEvent extends APIKeyValidation {
+  success: boolean;
+  done: number;
+  total: number;
+}
+
 export interface APIKeyStatusItem {
   id: string;
   key: string;
@@ -165,6 +240,23 @@ export interface Proxy {
   proxy_type: string;
   enabled: boolean;
   is_healthy: boolean;
+  health?: ProxyHealth | null;
+}
+
+// Background probe score for one proxy (proxies.health)
+export interface ProxyHealth {
+  proxy_id: string;
+  connect_ms: number | null;
+  tls_ms: number | null;
+  latency_ms: number | null;
+  error_rate: number;
+  probes: number;
+  failures: number;
+  state: 'closed' | 'open' | 'half_open';
+  available: boolean;
+  last_probe: string | null;
+  last_error: string;
+  rank?: number | null;
 }
 
 // Line status enum
@@ -201,6 +293,7 @@ export interface ProjectSettings {
   loop_count: number;
   loop_delay: number;
   silence_gap: number;
+  output_format?: string;
   auto_split_enabled: boolean;
   split_delimiter: string;
   max_chars: number;
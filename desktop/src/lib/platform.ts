@@ -19,6 +19,7 @@ interface DebugInfo {
 
 interface PlatformAPI {
   ipcCall: (request: string) => Promise<JsonRpcResponse>;
+  ipcCallBatch: (requests: string) => Promise<JsonRpcResponse[]>;
   invoke: <T>(cmd: string, args?: Record<string, unknown>) => Promise<T>;
   onBackendEvent: (callback: (data: { method: string; params: unknown }) => void) => () => void;
   onDebugInfo: (callback: (data: DebugInfo) => void) => () => void;
@@ -41,6 +42,11 @@ function createTauriAPI(): PlatformAPI {
       return JSON.parse(responseStr);
     },
 
+    ipcCallBatch: async (requests: string) => {
+      const responseStr = await invoke<string>('ipc_call_batch', { requestStr: requests });
+      return JSON.parse(responseStr);
+    },
+
     invoke: async <T>(cmd: string, args?: Record<string, unknown>): Promise<T> => {
       return invoke<T>(cmd, args);
     },
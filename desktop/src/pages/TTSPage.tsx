@@ -1,6 +1,6 @@
 import { useState, useEffect, useCallback, useRef, useMemo } from 'react';
 import { useAppStore } from '../stores/appStore';
-import { ipcClient, AudioProcessingSettings } from '../lib/ipc';
+import { ipcClient, AudioProcessingSettings, projectSync } from '../lib/ipc';
 import { getPlatformAPI } from '../lib/platform';
 import DropZone from '../components/DropZone';
 import LineTable from '../components/LineTable';
@@ -21,6 +21,7 @@ export default function TTSPage() {
     voices,
     setVoices,
     lines,
+    setLines,
     addLines,
     updateLine,
     updateLineStatus,
@@ -76,6 +77,7 @@ export default function TTSPage() {
     },
   });
   const processingRef = useRef(false);
+  const batchJobRef = useRef<string | null>(null);
   const [logs, setLogs] = useState<string[]>([]);
   const [showLogs, setShowLogs] = useState(true);
   const logsEndRef = useRef<HTMLDivElement>(null);
@@ -390,7 +392,11 @@ export default function TTSPage() {
       
       if (validLines.length > 0) {
         try {
-          const result = await ipcClient.startBatchTTS({
+          // Lines are updated as the backend reports them; the call resolves when the job ends
+          let completed = 0;
+          let failed = invalidCount;
+          
+          const result = await ipcClient.runBatchTTS({
             lines: validLines,
             thread_count: threadCount,
             settings: {
@@ -400,13 +406,7 @@ export default function TTSPage() {
               use_speaker_boost: voiceSettings.useSpeakerBoost,
               speed: voiceSettings.speed,
             },
-          });
-          
-          // Process results
-          let completed = 0;
-          let failed = invalidCount;
-          
-          result.results.forEach((r) => {
+          }, (r) => {
             const line = pendingLines.find(l => l.id === r.id);
             if (r.success && r.output_path) {
               updateLine(r.id, {
@@ -430,7 +430,18 @@ export default function TTSPage() {
               updateLineStatus(r.id, 'error', r.error || 'Unknown error');
               failed++;
             }
+          }, (job) => {
+            batchJobRef.current = job.job_id;
+            addLog(`Batch job started: ${job.job_id}`);
           });
+          batchJobRef.current = null;
+          
+          if (result.status === 'cancelled') {
+            addLog('Stopped by user');
+            // Lines the job never reached go back to pending
+            const reported = new Set(result.results.map(r => r.id));
+            validLines.filter(l => !reported.has(l.id)).forEach(l => updateLineStatus(l.id, 'pending'));
+          }
           
           addLog(`BATCH DONE - Completed: ${completed}, Failed: ${failed}`);
           
@@ -444,6 +455,7 @@ export default function TTSPage() {
             characters_processed: lines.filter(l => l.status === 'done').reduce((sum, l) => sum + l.text.length, 0),
           });
         } catch (err) {
+          batchJobRef.current = null;
           const errMsg = err instanceof Error ? err.message : 'Batch processing failed';
           addLog(`BATCH ERROR: ${errMsg}`);
           pendingLines.forEach(l => updateLineStatus(l.id, 'error', errMsg));
@@ -566,13 +578,22 @@ export default function TTSPage() {
 
   const handlePauseProcessing = () => {
     setPaused(true);
+    if (batchJobRef.current) {
+      ipcClient.pauseJob(batchJobRef.current).catch(() => {});
+    }
   };
 
   const handleResumeProcessing = () => {
     setPaused(false);
+    if (batchJobRef.current) {
+      ipcClient.resumeJob(batchJobRef.current).catch(() => {});
+    }
   };
 
   const handleStopProcessing = () => {
+    if (batchJobRef.current) {
+      ipcClient.cancelJob(batchJobRef.current).catch(() => {});
+    }
     processingRef.current = false;
     setProcessing(false);
     setPaused(false);
@@ -676,7 +697,8 @@ export default function TTSPage() {
           })),
         };
         
-        await ipcClient.saveProject(filePath, projectData);
+        // Only what changed since the last save crosses the pipe and hits the disk
+        await projectSync.save(filePath, projectData);
         addLog(`Project saved: ${filePath}`);
         setProjectName(filePath.split('\\').pop()?.replace('.2tts', '') || projectName);
       }
@@ -695,9 +717,9 @@ export default function TTSPage() {
       });
       
       if (filePaths && filePaths.length > 0) {
-        const result = await ipcClient.loadProject(filePaths[0]);
-        if (result.success && result.project) {
-          const proj = result.project as {
+        const project = await projectSync.open(filePaths[0]);
+        if (project) {
+          const proj = project as {
             name?: string;
             outputFolder?: string;
             defaultVoiceId?: string;
@@ -713,17 +735,27 @@ export default function TTSPage() {
           if (proj.voiceSettings) setVoiceSettings(proj.voiceSettings);
           if (proj.name) setProjectName(proj.name);
           
-          // Restore lines
+          // Restore lines, keeping their ids so the next save only sends what changed
           if (proj.lines && proj.lines.length > 0) {
-            clearLines();
-            const texts = proj.lines.map(l => l.text);
-            addLines(texts);
-            // Restore voice assignments
-            proj.lines.forEach(l => {
-              if (l.voice_id && l.voice_name) {
-                setLineVoice(l.id, l.voice_id, l.voice_name);
-              }
-            });
+            setLines(proj.lines.map((l, index) => ({
+              id: l.id,
+              index,
+              text: l.text.trim(),
+              original_text: l.text.trim(),
+              voice_id: l.voice_id || proj.defaultVoiceId || defaultVoiceId,
+              voice_name: l.voice_name || proj.defaultVoiceName || defaultVoiceName,
+              status: 'pending' as const,
+              error_message: null,
+              source_file: null,
+              start_time: null,
+              end_time: null,
+              audio_duration: null,
+              output_path: null,
+              retry_count: 0,
+              detected_language: null,
+              model_id: null,
+            })));
+            updateProcessingStats({ total: proj.lines.length, pending: proj.lines.length });
           }
           
           addLog(`Project loaded: ${filePaths[0]}`);